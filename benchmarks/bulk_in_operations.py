@@ -0,0 +1,93 @@
+"""登录日志按10万条键批量删除时，单条IN语句、分块IN语句与临时键表三种方式的耗时对比
+
+用法：python benchmarks/bulk_in_operations.py [peewee|sqlalchemy|sqlmodel] [键数量]
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def load_models(engine_name: str):
+    sys.path.insert(0, str(TEMPLATE_ROOT))
+    models = importlib.import_module(f"models._{engine_name}")
+    logs = importlib.import_module(f"models._{engine_name}.logs")
+    return models, logs.LoginLogs
+
+
+def seed_logs(LoginLogs, key_count: int):
+    LoginLogs.truncate_logs()
+    LoginLogs.add_logs(
+        [
+            {
+                "user_name": f"user{index % 100}",
+                "user_id": f"user{index % 100}",
+                "ip": "127.0.0.1",
+                "browser": "Chrome 120.0",
+                "os": "Windows 10",
+                "status": "登录成功",
+                "login_datetime": "2024-01-01 08:00:00",
+            }
+            for index in range(key_count)
+        ]
+    )
+    return [record["id"] for record in LoginLogs.iter_logs()]
+
+
+def run_single_in(models, LoginLogs, log_ids):
+    """不分块，以单条IN语句携带全部键"""
+
+    if hasattr(models, "session_scope"):
+        from sqlalchemy import delete
+
+        with models.session_scope() as session:
+            session.execute(delete(LoginLogs).where(LoginLogs.id.in_(log_ids)))
+    else:
+        with models.connection_scope():
+            with models.db.atomic():
+                LoginLogs.delete().where(LoginLogs.id << log_ids).execute()
+
+
+def main():
+    engine_name = sys.argv[1] if len(sys.argv) > 1 else "peewee"
+    key_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    # 在临时目录中创建SQLite数据库，避免影响模板目录
+    os.chdir(tempfile.mkdtemp())
+    models, LoginLogs = load_models(engine_name)
+    models.create_tables([LoginLogs])
+
+    def run_bulk_in(log_ids, temp_table_threshold):
+        # 覆盖临时键表阈值，分别以分块IN语句与临时键表执行
+        models.get_bulk_temp_table_threshold = lambda _: temp_table_threshold
+        LoginLogs.delete_logs(log_ids)
+
+    cases = [
+        ("单条IN语句", lambda log_ids: run_single_in(models, LoginLogs, log_ids)),
+        ("分块IN语句", lambda log_ids: run_bulk_in(log_ids, None)),
+        ("临时键表", lambda log_ids: run_bulk_in(log_ids, 0)),
+    ]
+
+    print(f"ORM：{engine_name}，键数量：{key_count}")
+    for name, case in cases:
+        log_ids = seed_logs(LoginLogs, key_count)
+        start = time.perf_counter()
+        try:
+            case(log_ids)
+        except Exception as e:
+            # 键数量超出数据库单条语句参数上限时，单条IN语句直接执行失败
+            print(f"{name}：执行失败（{type(e).__name__}）")
+            continue
+        seconds = time.perf_counter() - start
+        print(f"{name}：{seconds * 1000:.1f} ms，剩余记录数：{LoginLogs.get_count(True)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""批量导入用户时，逐个添加与批量导入的写入耗时，以及串行与进程池并行计算密码散列的耗时对比
+
+密码散列为CPU密集型计算，10万用户的整体导入耗时约为散列耗时除以CPU核心数，再加上写入耗时
+
+用法：python benchmarks/bulk_user_import.py [peewee|sqlalchemy|sqlmodel] [用户数量] [散列数量] [进程数]
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def load_models(engine_name: str):
+    sys.path.insert(0, str(TEMPLATE_ROOT))
+    models = importlib.import_module(f"models._{engine_name}")
+    users = importlib.import_module(f"models._{engine_name}.users")
+    departments = importlib.import_module(f"models._{engine_name}.departments")
+    models.create_tables([users.Users, departments.Departments])
+    return users.Users
+
+
+def build_records(prefix: str, user_count: int):
+    return [
+        {
+            "user_id": f"{prefix}{index}",
+            "user_name": f"{prefix}{index}",
+            "password": f"password{index}",
+            "user_email": f"{prefix}{index}@example.com",
+        }
+        for index in range(user_count)
+    ]
+
+
+def run_add_user(Users, records):
+    """逐个调用add_user添加用户，每次添加均单独查询校验并写入"""
+
+    for record in records:
+        Users.add_user(
+            record["user_id"],
+            record["user_name"],
+            record["password"],
+            user_email=record["user_email"],
+        )
+
+
+def fake_hasher(passwords):
+    """跳过密码散列计算，仅统计校验与写入耗时"""
+
+    return passwords
+
+
+def main():
+    engine_name = sys.argv[1] if len(sys.argv) > 1 else "peewee"
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    hash_count = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    max_workers = int(sys.argv[4]) if len(sys.argv) > 4 else os.cpu_count()
+
+    # 在临时目录中创建SQLite数据库，避免影响模板目录
+    os.chdir(tempfile.mkdtemp())
+    Users = load_models(engine_name)
+    from utils.import_utils import hash_passwords
+
+    print(f"ORM：{engine_name}，CPU核心数：{os.cpu_count()}")
+
+    print(f"写入{user_count}个用户：")
+    for case_index, (name, case) in enumerate(
+        [
+            ("逐个添加用户", partial(run_add_user, Users)),
+            ("批量导入", partial(Users.import_users, password_hasher=fake_hasher)),
+        ]
+    ):
+        records = build_records(f"case{case_index}_", user_count)
+        start = time.perf_counter()
+        case(records)
+        seconds = time.perf_counter() - start
+        print(
+            f"{name}：{seconds:.2f} s，"
+            f"折算10万用户约{seconds / user_count * 100000:.0f} s"
+        )
+
+    print(f"计算{hash_count}个密码散列值：")
+    passwords = [f"password{index}" for index in range(hash_count)]
+    for name, workers in [("串行计算", 1), (f"{max_workers}进程并行计算", max_workers)]:
+        start = time.perf_counter()
+        hash_passwords(passwords, max_workers=workers, parallel_threshold=0)
+        seconds = time.perf_counter() - start
+        print(
+            f"{name}：{seconds:.2f} s，"
+            f"折算10万用户约{seconds / hash_count * 100000 / 60:.1f} min"
+        )
+
+
+if __name__ == "__main__":
+    main()
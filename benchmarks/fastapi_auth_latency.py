@@ -0,0 +1,179 @@
+"""magic-dash-pro-fastapi鉴权中间件在慢速数据库下的请求延迟压测
+
+模拟每次用户查询与缓存版本检查均耗时较长的数据库，对比以下两种实现：
+- legacy：缓存版本检查在事件循环中同步执行，用户加载经由fastapi-login默认线程池逐请求查询
+- current：两者均在有界线程池中执行，同一用户的并发请求共享同一次查询
+
+用法：python benchmarks/fastapi_auth_latency.py
+"""
+
+import asyncio
+import importlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1]
+    / "magic_dash"
+    / "templates"
+    / "magic-dash-pro-fastapi"
+)
+
+# 模拟的单次数据库查询耗时，单位：秒
+DB_LATENCY_SECONDS = 0.05
+USER_COUNT = 20
+REQUESTS_PER_USER = 10
+ANONYMOUS_REQUESTS = 100
+ROUNDS = 5
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class InlineRunner:
+    """在事件循环中直接执行阻塞调用，还原优化前的中间件行为"""
+
+    async def run(self, key, func, *args):
+        return func(*args)
+
+
+async def call_asgi(app, path: str, cookie: str = "") -> float:
+    """直接调用ASGI应用完成一次GET请求，返回耗时"""
+
+    headers = [(b"host", b"benchmark"), (b"user-agent", USER_AGENT.encode())]
+    if cookie:
+        headers.append((b"cookie", cookie.encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("benchmark", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started_at = time.perf_counter()
+    await app(scope, receive, send)
+    return time.perf_counter() - started_at
+
+
+def load_server():
+    os.chdir(tempfile.mkdtemp())
+    sys.path.insert(0, str(TEMPLATE_ROOT))
+    return importlib.import_module("server")
+
+
+def patch_slow_database(server, lookup_counter):
+    from models.caches import CachedUser
+
+    def get_cached_user(user_id):
+        lookup_counter[0] += 1
+        time.sleep(DB_LATENCY_SECONDS)
+        return CachedUser(user_id, user_id, "normal", None)
+
+    def get_versions():
+        time.sleep(DB_LATENCY_SECONDS)
+        return {}
+
+    # 不经过进程内缓存，模拟大量用户缓存未命中的场景
+    server.Users.get_cached_user = get_cached_user
+    server.CacheVersions.get_versions = get_versions
+    server.cache_invalidation_bus.check_interval_seconds = 0.2
+
+
+def use_legacy_implementation(server):
+    def user_loader(user_id):
+        match_user = server.Users.get_cached_user(user_id)
+        return server.User(
+            id=match_user.user_id,
+            user_name=match_user.user_name,
+            user_role=match_user.user_role,
+            session_token=match_user.session_token,
+        )
+
+    server.manager._user_callback = user_loader
+    server.auth_loader = InlineRunner()
+
+
+async def run_load(server):
+    cookies = [
+        "{}={}".format(
+            server.manager.cookie_name,
+            server.manager.create_access_token(data={"sub": f"user-{index}"}),
+        )
+        for index in range(USER_COUNT)
+    ]
+    authenticated_latencies = []
+    anonymous_latencies = []
+
+    for _ in range(ROUNDS):
+        authenticated_tasks = [
+            call_asgi(server.server, "/_benchmark", cookie)
+            for cookie in cookies
+            for _ in range(REQUESTS_PER_USER)
+        ]
+        # 无需鉴权的轻量请求，用于观察事件循环是否被阻塞
+        anonymous_tasks = [
+            call_asgi(server.server, "/_dash-dependencies")
+            for _ in range(ANONYMOUS_REQUESTS)
+        ]
+        results = await asyncio.gather(*authenticated_tasks, *anonymous_tasks)
+        authenticated_latencies.extend(results[: len(authenticated_tasks)])
+        anonymous_latencies.extend(results[len(authenticated_tasks) :])
+        await asyncio.sleep(0.2)
+
+    return authenticated_latencies, anonymous_latencies
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] * 1000
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode is None:
+        # 两种实现分别在独立进程中运行，避免共享模块状态
+        import subprocess
+
+        for mode in ["legacy", "current"]:
+            subprocess.run([sys.executable, __file__, mode], check=True)
+        return
+
+    server = load_server()
+    lookup_counter = [0]
+    patch_slow_database(server, lookup_counter)
+    if mode == "legacy":
+        use_legacy_implementation(server)
+
+    authenticated_latencies, anonymous_latencies = asyncio.run(run_load(server))
+    print(f"[{mode}] 用户查询次数：{lookup_counter[0]}")
+    for name, latencies in [
+        ("鉴权请求", authenticated_latencies),
+        ("匿名请求", anonymous_latencies),
+    ]:
+        print(
+            f"[{mode}] {name} p50={percentile(latencies, 50):.1f}ms "
+            f"p99={percentile(latencies, 99):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
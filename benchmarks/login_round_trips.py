@@ -0,0 +1,108 @@
+"""密码登录时，原有逐步查询校验方式与合并后的登录认证服务执行的SQL语句数量及耗时对比
+
+登录日志经后台队列批量写入，不计入单次登录的语句数量
+
+用法：python benchmarks/login_round_trips.py [peewee|sqlalchemy|sqlmodel] [登录次数]
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from werkzeug.security import generate_password_hash
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def load_models(engine_name: str):
+    sys.path.insert(0, str(TEMPLATE_ROOT))
+
+    # 使外层models/*.py导出当前测试的ORM实现
+    registry = importlib.import_module("models._registry")
+    registry.get_engine_package = lambda: registry.ENGINE_PACKAGES[engine_name]
+
+    models = importlib.import_module(f"models._{engine_name}")
+    users = importlib.import_module(f"models._{engine_name}.users")
+    models.create_tables([users.Users])
+    return models, users.Users, importlib.import_module("models.auth_service")
+
+
+def install_statement_counter(engine_name: str, models):
+    """统计实际发送至数据库的SQL语句数量"""
+
+    counter = {"statements": 0}
+
+    if engine_name == "peewee":
+        execute_sql = models.db.execute_sql
+
+        def counted_execute_sql(*args, **kwargs):
+            counter["statements"] += 1
+            return execute_sql(*args, **kwargs)
+
+        models.db.execute_sql = counted_execute_sql
+    else:
+        from sqlalchemy import event
+
+        @event.listens_for(models.engine, "before_cursor_execute")
+        def count_statement(*args):
+            counter["statements"] += 1
+
+    return counter
+
+
+def run_legacy_login(Users, auth_service, user_name, password):
+    """原有方式：依次查询用户、校验密码并更新会话token"""
+
+    match_user = Users.get_user_by_name(user_name)
+    assert Users.check_user_password(match_user.user_id, password)
+    Users.update_user(match_user.user_id, session_token=str(uuid4()))
+
+
+def run_service_login(Users, auth_service, user_name, password):
+    """登录认证服务：单次查询校验信息，单条条件更新语句轮换会话token"""
+
+    login_user, login_status = auth_service.authenticate_password(user_name, password)
+    assert login_status == "登录成功"
+    assert auth_service.start_user_session(login_user)
+
+
+def main():
+    engine_name = sys.argv[1] if len(sys.argv) > 1 else "peewee"
+    login_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    # 在临时目录中创建SQLite数据库，避免影响模板目录
+    os.chdir(tempfile.mkdtemp())
+    models, Users, auth_service = load_models(engine_name)
+
+    # 使用低迭代次数的密码散列，使耗时对比集中于数据库交互
+    Users.add_user(
+        "bench",
+        "bench",
+        generate_password_hash("password", method="pbkdf2:sha256:1"),
+    )
+    counter = install_statement_counter(engine_name, models)
+
+    print(f"ORM：{engine_name}，登录次数：{login_count}")
+    for name, case in [
+        ("原有逐步查询校验", run_legacy_login),
+        ("登录认证服务", run_service_login),
+    ]:
+        counter["statements"] = 0
+        start = time.perf_counter()
+        for _ in range(login_count):
+            case(Users, auth_service, "bench", "password")
+        seconds = time.perf_counter() - start
+        print(
+            f"{name}：每次登录{counter['statements'] / login_count:.1f}条SQL语句，"
+            f"平均耗时{seconds / login_count * 1000:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
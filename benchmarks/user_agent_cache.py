@@ -0,0 +1,64 @@
+"""浏览器检查钩子中User-Agent解析的单次请求耗时对比
+
+用法：python benchmarks/user_agent_cache.py [模板名称]
+"""
+
+import importlib.util
+import sys
+import timeit
+from pathlib import Path
+
+TEMPLATES_ROOT = Path(__file__).resolve().parents[1] / "magic_dash" / "templates"
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/17.1 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.2210.91",
+]
+
+
+def load_browser_utils(template_name: str):
+    template_root = TEMPLATES_ROOT / template_name
+    sys.path.insert(0, str(template_root))
+    spec = importlib.util.spec_from_file_location(
+        "browser_utils", template_root / "utils" / "browser_utils.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    template_name = sys.argv[1] if len(sys.argv) > 1 else "magic-dash-pro"
+    browser_utils = load_browser_utils(template_name)
+    number = 2000
+
+    def uncached():
+        for user_agent_string in USER_AGENTS:
+            browser_utils.get_browser_block_message(
+                browser_utils.parse(user_agent_string)
+            )
+
+    def cached():
+        for user_agent_string in USER_AGENTS:
+            browser_utils.check_user_agent(user_agent_string).block_message
+
+    # 预热缓存，模拟同一批客户端持续发送请求的稳态
+    cached()
+
+    uncached_seconds = min(timeit.repeat(uncached, number=number, repeat=3))
+    cached_seconds = min(timeit.repeat(cached, number=number, repeat=3))
+    requests = number * len(USER_AGENTS)
+
+    print(f"模板：{template_name}，请求数：{requests}")
+    print(f"逐次解析：{uncached_seconds / requests * 1e6:.2f} μs/请求")
+    print(f"LRU缓存：{cached_seconds / requests * 1e6:.2f} μs/请求")
+    print(f"加速比：{uncached_seconds / cached_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
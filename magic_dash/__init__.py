@@ -448,49 +448,14 @@ def _convert_magic_dash_server_to_fastapi(project_path):
         "from fastapi import Request\nfrom fastapi.responses import HTMLResponse",
     )
 
-    middleware = '''def _browser_block_message(request: Request):
+    middleware = '''@app.server.middleware("http")
+async def check_browser(request: Request, call_next):
     """检查浏览器版本是否符合最低要求"""
 
-    user_agent = parse(request.headers.get("user-agent", ""))
-
-    if user_agent.browser.version == ():
-        return None
-
-    if user_agent.browser.family == "IE":
-        return (
-            "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-            "请不要使用IE浏览器，或开启了IE内核兼容模式的其他浏览器访问本应用</div>"
-        )
-
-    for rule in BaseConfig.min_browser_versions:
-        if (
-            user_agent.browser.family == rule["browser"]
-            and user_agent.browser.version[0] < rule["version"]
-        ):
-            return (
-                "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                "您的{}浏览器版本低于本应用最低支持版本（{}），请升级浏览器后再访问</div>"
-            ).format(rule["browser"], rule["version"])
-
-    if BaseConfig.strict_browser_type_check:
-        if user_agent.browser.family not in [
-            rule["browser"] for rule in BaseConfig.min_browser_versions
-        ]:
-            return (
-                "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                "当前浏览器类型不在支持的范围内，支持的浏览器类型有：{}</div>"
-            ).format(
-                "、".join(
-                    [rule["browser"] for rule in BaseConfig.min_browser_versions]
-                )
-            )
-
-    return None
-
-
-@app.server.middleware("http")
-async def check_browser(request: Request, call_next):
-    browser_block_message = _browser_block_message(request)
+    # 基于缓存的User-Agent检查结论，不符合要求时直接返回拦截提示
+    browser_block_message = check_user_agent(
+        request.headers.get("user-agent", "")
+    ).block_message
     if browser_block_message:
         return HTMLResponse(browser_block_message)
 
@@ -602,8 +567,10 @@ def _materialize_magic_dash_pro_orm_engine(project_path, orm_engine):
 
     model_files = [
         "__init__.py",
+        "cache_versions.py",
         "departments.py",
         "email_verifications.py",
+        "login_stats.py",
         "logs.py",
         "otp_credentials.py",
         "user_permission_groups.py",
@@ -622,6 +589,17 @@ def _materialize_magic_dash_pro_orm_engine(project_path, orm_engine):
             [
                 ("from ..exceptions", "from .exceptions"),
                 ("from ..schema_contract", "from .schema_contract"),
+                ("from ..caches", "from .caches"),
+                ("from ..access_policy", "from .access_policy"),
+                ("from ..unit_of_work", "from .unit_of_work"),
+                ("from ..batch_writer", "from .batch_writer"),
+                ("from ..log_archive", "from .log_archive"),
+                ("from ..search_index", "from .search_index"),
+                ("from ..login_rollups", "from .login_rollups"),
+                ("from ..bulk_operations", "from .bulk_operations"),
+                ("from ..department_tree", "from .department_tree"),
+                ("from ..department_members", "from .department_members"),
+                ("from ..user_import", "from .user_import"),
             ],
         )
 
@@ -1,4 +1,3 @@
-import re
 import dash
 from dash import html, set_props, dcc
 import feffery_antd_components as fac
@@ -12,6 +11,7 @@ from feffery_dash_utils.version_utils import (
 from server import app, current_user, logout_current_user, request
 from models.users import Users
 from models.user_permission_groups import UserPermissionGroups
+from models.access_policy import PathnameMatcher
 from views import core_pages, login
 from views.status_pages import _403, _404, _500
 from configs import BaseConfig, RouterConfig
@@ -23,6 +23,9 @@ check_dependencies_version(
     requirements_file="./requirements.txt",
 )
 
+# 预编译全部有效页面地址，供根节点路由判断使用
+valid_pathname_matcher = PathnameMatcher(RouterConfig.valid_pathnames.keys())
+
 app.layout = lambda: fuc.FefferyTopProgress(
     [
         # 全局消息提示
@@ -125,26 +128,17 @@ def root_router(pathname, trigger):
         return dash.no_update
 
     # 检查当前访问目标pathname是否为有效页面
-    if (
-        # 硬编码页面地址
-        pathname in RouterConfig.valid_pathnames.keys()
-        or
-        # 通配模式页面地址
-        any(
-            pattern.match(pathname)
-            for pattern in RouterConfig.valid_pathnames.keys()
-            if isinstance(pattern, re.Pattern)
-        )
-    ):
-        # 校验当前用户是否具有针对当前访问目标页面的权限
-        current_user_access_rule = (
-            UserPermissionGroups.get_effective_pathname_access_rule(
-                current_user.user_role
-            )
+    if valid_pathname_matcher.match(pathname):
+        # 获取当前用户角色预编译的页面访问策略
+        current_user_access_policy = UserPermissionGroups.get_pathname_access_policy(
+            current_user.user_role
         )
 
-        # 若当前用户角色不属于配置参数或数据库定义的有效权限分组
-        if not current_user_access_rule:
+        # 若当前用户角色不属于配置参数或数据库定义的有效权限分组，
+        # 或当前用户不具有针对当前访问目标页面的权限
+        if not (
+            current_user_access_policy and current_user_access_policy.allows(pathname)
+        ):
             # 重定向至403页面
             set_props(
                 "global-redirect",
@@ -157,62 +151,12 @@ def root_router(pathname, trigger):
 
             return dash.no_update
 
-        # 检查是否满足通配渲染页面规则
-        match_wildcard_patterns = [
-            pattern
-            for pattern in current_user_access_rule.get("keys", [])
-            if isinstance(pattern, re.Pattern) and pattern.match(pathname)
-        ]
-
-        # 若当前用户页面权限规则类型为'include'
-        if current_user_access_rule["type"] == "include":
-            # 若当前用户不具有针对当前访问目标页面的权限
-            if (
-                pathname not in current_user_access_rule.get("keys", [])
-                and not match_wildcard_patterns
-            ):
-                # 首页不受权限控制影响
-                if pathname not in [
-                    "/",
-                    RouterConfig.index_pathname,
-                ]:
-                    # 重定向至403页面
-                    set_props(
-                        "global-redirect",
-                        {
-                            "children": dcc.Location(
-                                pathname="/403-demo", id="global-redirect-target"
-                            )
-                        },
-                    )
-
-                    return dash.no_update
-
-        # 若当前用户页面权限规则类型为'exclude'
-        elif current_user_access_rule["type"] == "exclude":
-            # 若当前用户不具有针对当前访问目标页面的权限
-            if (
-                pathname in current_user_access_rule.get("keys", [])
-                or match_wildcard_patterns
-            ):
-                # 重定向至403页面
-                set_props(
-                    "global-redirect",
-                    {
-                        "children": dcc.Location(
-                            pathname="/403-demo", id="global-redirect-target"
-                        )
-                    },
-                )
-
-                return dash.no_update
-
         # 处理核心功能页面渲染
         # 返回带水印的页面内容
         if BaseConfig.enable_fullscreen_watermark:
             return fac.AntdWatermark(
                 core_pages.render(
-                    current_user_access_rule=current_user_access_rule,
+                    current_user_access_policy=current_user_access_policy,
                     current_pathname=pathname,
                 ),
                 # 处理水印内容生成
@@ -221,7 +165,8 @@ def root_router(pathname, trigger):
 
         # 返回不带水印的页面内容
         return core_pages.render(
-            current_user_access_rule=current_user_access_rule, current_pathname=pathname
+            current_user_access_policy=current_user_access_policy,
+            current_pathname=pathname,
         )
 
     # 返回404状态页面
@@ -0,0 +1,97 @@
+from dash.dependencies import Input, Output
+
+from server import app
+from models.login_stats import LoginStats
+from models.login_rollups import LOGIN_SUCCESS_STATUSES
+
+
+def build_trend_figure(trend: list):
+    """构造登录成功、失败次数趋势折线图"""
+
+    return {
+        "data": [
+            {
+                "type": "scatter",
+                "mode": "lines",
+                "name": name,
+                "x": [item["bucket"] for item in trend],
+                "y": [item[key] for item in trend],
+                "line": {"color": color},
+            }
+            for key, name, color in [
+                ("success", "登录成功", "#52c41a"),
+                ("failure", "登录失败", "#ff4d4f"),
+            ]
+        ],
+        "layout": {
+            "margin": {"l": 40, "r": 16, "t": 16, "b": 40},
+            "legend": {"orientation": "h"},
+            "hovermode": "x unified",
+        },
+    }
+
+
+def build_breakdown_figure(breakdown: list, top_n: int = 10):
+    """构造维度分布条形图，仅展示登录次数最多的若干项"""
+
+    breakdown = breakdown[:top_n]
+
+    return {
+        "data": [
+            {
+                "type": "bar",
+                "orientation": "h",
+                # 条形图自下而上绘制，反转后登录次数最多的项位于顶部
+                "x": [item["count"] for item in reversed(breakdown)],
+                "y": [item["name"] for item in reversed(breakdown)],
+                "marker": {"color": "#1677ff"},
+            }
+        ],
+        "layout": {
+            "margin": {"l": 120, "r": 16, "t": 16, "b": 32},
+        },
+    }
+
+
+@app.callback(
+    [
+        Output("core-login-stats-total-statistic", "value"),
+        Output("core-login-stats-success-statistic", "value"),
+        Output("core-login-stats-failure-statistic", "value"),
+        Output("core-login-stats-success-rate-statistic", "value"),
+        Output("core-login-stats-trend-chart", "figure"),
+        Output("core-login-stats-status-chart", "figure"),
+        Output("core-login-stats-browser-chart", "figure"),
+        Output("core-login-stats-os-chart", "figure"),
+    ],
+    [
+        Input("core-login-stats-init-data-trigger", "timeoutCount"),
+        Input("core-login-stats-refresh-data", "nClicks"),
+        Input("core-login-stats-date-range", "value"),
+        Input("core-login-stats-granularity", "value"),
+    ],
+    prevent_initial_call=True,
+)
+def handle_login_stats_data_load(timeoutCount, nClicks, date_range, granularity):
+    """处理登录统计数据加载，全部统计数据均读取自预聚合的登录统计表"""
+
+    status_breakdown = LoginStats.get_breakdown("status", date_range)
+
+    # 基于登录状态分布汇总登录成功、失败次数
+    total_count = sum(item["count"] for item in status_breakdown)
+    success_count = sum(
+        item["count"]
+        for item in status_breakdown
+        if item["name"] in LOGIN_SUCCESS_STATUSES
+    )
+
+    return [
+        total_count,
+        success_count,
+        total_count - success_count,
+        round(success_count / total_count * 100, 2) if total_count else 0,
+        build_trend_figure(LoginStats.get_trend(date_range, granularity)),
+        build_breakdown_figure(status_breakdown),
+        build_breakdown_figure(LoginStats.get_breakdown("browser_family", date_range)),
+        build_breakdown_figure(LoginStats.get_breakdown("os_family", date_range)),
+    ]
@@ -1,3 +1,4 @@
+import re
 from copy import deepcopy
 import feffery_antd_components as fac
 import feffery_utils_components as fuc
@@ -6,47 +7,35 @@ from feffery_dash_utils.tree_utils import TreeManager
 
 # 路由配置参数
 from configs import RouterConfig, LayoutConfig
+from models.access_policy import PathnameAccessPolicy
 
 
-def render(current_user_access_rule: str):
+def render(current_user_access_policy: PathnameAccessPolicy):
     """渲染核心功能页面侧边菜单栏
 
     Args:
-        current_user_access_rule (str): 当前用户页面可访问性规则
+        current_user_access_policy (PathnameAccessPolicy): 当前用户预编译的页面访问策略
     """
 
     current_menu_items = deepcopy(RouterConfig.core_side_menu)
 
-    # 根据current_user_access_rule规则过滤菜单结构
-    if current_user_access_rule["type"] == "include":
+    # 根据current_user_access_policy策略过滤菜单结构
+    if current_user_access_policy.rule_type != "all":
         for key in RouterConfig.valid_pathnames.keys():
-            if key not in current_user_access_rule.get("keys", []):
-                # 首页不受权限控制影响
-                if key not in [
-                    "/",
-                    RouterConfig.index_pathname,
-                ]:
-                    current_menu_items = TreeManager.delete_node(
-                        current_menu_items,
-                        key,
-                        data_type="menu",  # 菜单数据模式
-                        keep_empty_children_node=False,  # 去除children字段为空列表的节点
-                    )
-
-    elif current_user_access_rule["type"] == "exclude":
-        for key in RouterConfig.valid_pathnames.keys():
-            if key in current_user_access_rule.get("keys", []):
-                # 首页不受权限控制影响
-                if key not in [
-                    "/",
-                    RouterConfig.index_pathname,
-                ]:
-                    current_menu_items = TreeManager.delete_node(
-                        current_menu_items,
-                        key,
-                        data_type="menu",  # 菜单数据模式
-                        keep_empty_children_node=False,  # 去除children字段为空列表的节点
-                    )
+            # 通配页面不对应菜单项，首页不受权限控制影响
+            if isinstance(key, re.Pattern) or key in [
+                "/",
+                RouterConfig.index_pathname,
+            ]:
+                continue
+
+            if not current_user_access_policy.allows(key):
+                current_menu_items = TreeManager.delete_node(
+                    current_menu_items,
+                    key,
+                    data_type="menu",  # 菜单数据模式
+                    keep_empty_children_node=False,  # 去除children字段为空列表的节点
+                )
 
     return fac.AntdAffix(
         fuc.FefferyDiv(
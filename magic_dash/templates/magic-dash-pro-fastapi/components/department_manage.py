@@ -1,7 +1,7 @@
 import uuid
 import time
 import dash
-from dash import set_props
+from dash import dcc, set_props
 import feffery_antd_components as fac
 from feffery_dash_utils.style_utils import style
 from dash.dependencies import Input, Output, State
@@ -59,8 +59,9 @@ def update_department_manage_drawer_content():
         ]
     )
 
-    # 查询当前全部部门信息
-    departments = Departments.get_all_departments()
+    # 读取部门层级索引，稳态下不访问数据库
+    department_tree = Departments.get_department_tree()
+    departments = department_tree.departments
 
     # 若当前无有效部门信息
     if not departments:
@@ -82,6 +83,9 @@ def update_department_manage_drawer_content():
             ]
         )
 
+    # 以单次分组查询统计各部门用户数量，再沿部门层级汇总至各部门子树
+    member_counts = department_tree.rollup_counts(Users.get_department_member_counts())
+
     return fac.Fragment(
         [
             # 构建相关操作模态框
@@ -119,7 +123,10 @@ def update_department_manage_drawer_content():
                             },
                             *[
                                 {
-                                    "title": item["department_name"],
+                                    "title": "{}（{}人）".format(
+                                        item["department_name"],
+                                        member_counts[item["department_id"]],
+                                    ),
                                     "key": item["department_id"],
                                     "parent": (
                                         item["parent_department_id"]
@@ -189,8 +196,8 @@ def render_department_manage_drawer(visible):
 def open_add_department_modal(nClicks):
     """打开新增部门模态框"""
 
-    # 查询当前全部部门信息
-    departments = Departments.get_all_departments()
+    # 读取部门层级索引中的全部部门信息
+    departments = Departments.get_department_tree().departments
 
     return [
         True,
@@ -300,6 +307,77 @@ def handle_add_department(okCounts, values):
             )
 
 
+# 部门人员调整表格每页记录数
+ALTER_MEMBERS_TABLE_PAGE_SIZE = 8
+
+
+def refresh_alter_members_table_data(
+    department_id, member_changes, keyword=None, scope="全部人员", current=1
+):
+    """当前模块内复用工具函数，分页查询部门人员调整表格数据
+
+    每次仅查询一页人员信息，并结合本次调整中待移入、待移出的用户id确定各行的可用操作
+    """
+
+    query_condition = {"keyword": keyword}
+    # 仅查看当前部门人员时附加所属部门筛选条件
+    if scope == "当前部门人员":
+        query_condition["department_ids"] = [department_id]
+
+    match_users = Users.get_users(
+        limit=ALTER_MEMBERS_TABLE_PAGE_SIZE,
+        offset=(current - 1) * ALTER_MEMBERS_TABLE_PAGE_SIZE,
+        **query_condition,
+    )
+
+    added_user_ids = set(member_changes["added_user_ids"])
+    removed_user_ids = set(member_changes["removed_user_ids"])
+
+    table_data = []
+    for item in match_users:
+        # 结合待提交的调整记录，判断当前用户调整后是否属于当前部门
+        is_member = item["user_id"] in added_user_ids or (
+            item["department_id"] == department_id
+            and item["user_id"] not in removed_user_ids
+        )
+        user_department = item["department_name"] or "无"
+        if item["user_id"] in added_user_ids:
+            user_department += "（待移入）"
+        elif item["user_id"] in removed_user_ids:
+            user_department += "（待移出）"
+
+        table_data.append(
+            {
+                "key": item["user_id"],
+                "user_id": item["user_id"],
+                "user_name": item["user_name"],
+                "user_email": item["user_email"] or "无",
+                "user_department": user_department,
+                "操作": {
+                    "content": "移出" if is_member else "移入",
+                    "type": "link",
+                    "danger": is_member,
+                },
+            }
+        )
+
+    return table_data, {
+        "current": current,
+        "total": Users.count_users(**query_condition),
+        "pageSize": ALTER_MEMBERS_TABLE_PAGE_SIZE,
+        "showSizeChanger": False,
+    }
+
+
+def render_alter_members_summary(member_changes):
+    """当前模块内复用工具函数，渲染部门人员调整待提交内容概览"""
+
+    return "待移入：{} 人，待移出：{} 人".format(
+        len(member_changes["added_user_ids"]),
+        len(member_changes["removed_user_ids"]),
+    )
+
+
 @app.callback(
     Input("department-manage-tree", "clickedContextMenu"),
 )
@@ -312,20 +390,23 @@ def open_delete_department_modal(clickedContextMenu):
             department_id=clickedContextMenu["nodeKey"]
         )
 
-        # 查询当前对应部门内部员工信息
-        match_users = Users.get_users_by_department_id(
-            department_id=clickedContextMenu["nodeKey"]
+        # 仅查询首页人员信息，后续检索、翻页均由服务端按需查询
+        member_changes = {"added_user_ids": [], "removed_user_ids": []}
+        table_data, pagination = refresh_alter_members_table_data(
+            match_department.department_id, member_changes
         )
 
-        # 查询全部人员信息
-        all_users = Users.get_all_users(with_department_name=True)
-
         set_props(
             "department-manage-alter-members-modal",
             {
                 "visible": True,
                 "children": fac.AntdSpace(
                     [
+                        # 记录本次调整中待移入、待移出的用户id
+                        dcc.Store(
+                            id="department-manage-alter-members-changes",
+                            data=member_changes,
+                        ),
                         fac.AntdAlert(
                             message="操作提示：通过下方控件进行当前部门人员临时调整后，点击确认保存调整结果",
                             type="info",
@@ -335,38 +416,56 @@ def open_delete_department_modal(clickedContextMenu):
                             "当前部门：" + match_department.department_name,
                             type="secondary",
                         ),
-                        fac.AntdTransfer(
-                            id="department-manage-alter-members-transfer",
-                            dataSource=[
+                        fac.AntdSpace(
+                            [
+                                fac.AntdSegmented(
+                                    id="department-manage-alter-members-scope",
+                                    options=["全部人员", "当前部门人员"],
+                                    value="全部人员",
+                                ),
+                                fac.AntdInput(
+                                    id="department-manage-alter-members-search",
+                                    placeholder="输入用户名或邮箱进行检索",
+                                    mode="search",
+                                    allowClear=True,
+                                    debounceWait=300,
+                                    style=style(width=260),
+                                ),
+                            ]
+                        ),
+                        fac.AntdTable(
+                            id="department-manage-alter-members-table",
+                            columns=[
                                 {
-                                    "key": item["user_id"],
-                                    "title": fac.AntdSpace(
-                                        [
-                                            item["user_name"],
-                                            fac.AntdTag(
-                                                content=item["department_name"] or "无",
-                                                color=(
-                                                    "blue"
-                                                    if item["department_id"]
-                                                    == match_department.department_id
-                                                    else None
-                                                ),
-                                            ),
-                                        ]
-                                    ),
-                                }
-                                for item in all_users
-                            ],
-                            targetKeys=[
-                                item["user_id"]
-                                for item in all_users
-                                if item["department_id"]
-                                == match_department.department_id
+                                    "dataIndex": "user_name",
+                                    "title": "用户名",
+                                },
+                                {
+                                    "dataIndex": "user_email",
+                                    "title": "用户邮箱",
+                                },
+                                {
+                                    "dataIndex": "user_department",
+                                    "title": "所属部门",
+                                },
+                                {
+                                    "dataIndex": "操作",
+                                    "title": "操作",
+                                    "renderOptions": {
+                                        "renderType": "button",
+                                    },
+                                },
                             ],
-                            height=350,
-                            titles=["其他部门人员", "当前部门人员"],
-                            operations=["移入", "移出"],
-                            showSearch=True,
+                            data=table_data,
+                            pagination=pagination,
+                            mode="server-side",  # 使用服务端数据分页模式
+                            size="small",
+                            tableLayout="fixed",
+                        ),
+                        fac.AntdText(
+                            render_alter_members_summary(member_changes),
+                            id="department-manage-alter-members-summary",
+                            type="secondary",
                         ),
                     ],
                     direction="vertical",
@@ -381,9 +480,9 @@ def open_delete_department_modal(clickedContextMenu):
             department_id=clickedContextMenu["nodeKey"]
         )
 
-        # 查询当前对应部门内部员工信息
-        match_users = Users.get_users_by_department_id(
-            department_id=clickedContextMenu["nodeKey"]
+        # 删除部门时将一并删除其全部后代部门，统计整个子树涉及的用户数量
+        match_user_count = Users.get_subtree_member_counts().get(
+            clickedContextMenu["nodeKey"], 0
         )
 
         set_props(
@@ -411,11 +510,11 @@ def open_delete_department_modal(clickedContextMenu):
                             (
                                 # 高亮警示
                                 fac.AntdText(
-                                    len(match_users),
+                                    match_user_count,
                                     strong=True,
                                     type="danger",
                                 )
-                                if match_users
+                                if match_user_count
                                 else fac.AntdText(0)
                             ),
                         ]
@@ -426,30 +525,97 @@ def open_delete_department_modal(clickedContextMenu):
         )
 
 
+@app.callback(
+    [
+        Output("department-manage-alter-members-table", "data"),
+        Output("department-manage-alter-members-table", "pagination"),
+    ],
+    [
+        Input("department-manage-alter-members-search", "debounceValue"),
+        Input("department-manage-alter-members-scope", "value"),
+        Input("department-manage-alter-members-table", "pagination"),
+        Input("department-manage-alter-members-changes", "data"),
+    ],
+    State("department-manage-tree", "clickedContextMenu"),
+    prevent_initial_call=True,
+)
+def handle_alter_members_table_data_load(
+    keyword, scope, pagination, member_changes, clickedContextMenu
+):
+    """处理部门人员调整表格检索、翻页数据加载"""
+
+    current = pagination["current"]
+    # 检索关键词、人员范围变化时回到首页
+    if dash.ctx.triggered_id in [
+        "department-manage-alter-members-search",
+        "department-manage-alter-members-scope",
+    ]:
+        current = 1
+
+    return refresh_alter_members_table_data(
+        clickedContextMenu["nodeKey"],
+        member_changes,
+        keyword=keyword,
+        scope=scope,
+        current=current,
+    )
+
+
+@app.callback(
+    [
+        Output("department-manage-alter-members-changes", "data"),
+        Output("department-manage-alter-members-summary", "children"),
+    ],
+    Input("department-manage-alter-members-table", "nClicksButton"),
+    [
+        State("department-manage-alter-members-table", "clickedContent"),
+        State("department-manage-alter-members-table", "recentlyButtonClickedRow"),
+        State("department-manage-alter-members-changes", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def handle_alter_members_change(
+    nClicksButton, clickedContent, recentlyButtonClickedRow, member_changes
+):
+    """处理部门人员调整表格中的移入、移出操作，仅记录相对原有人员的差异"""
+
+    user_id = recentlyButtonClickedRow["user_id"]
+    added_user_ids = member_changes["added_user_ids"]
+    removed_user_ids = member_changes["removed_user_ids"]
+
+    if clickedContent == "移入":
+        # 撤销此前的移出操作，或记录为待移入
+        if user_id in removed_user_ids:
+            removed_user_ids.remove(user_id)
+        else:
+            added_user_ids.append(user_id)
+
+    elif clickedContent == "移出":
+        # 撤销此前的移入操作，或记录为待移出
+        if user_id in added_user_ids:
+            added_user_ids.remove(user_id)
+        else:
+            removed_user_ids.append(user_id)
+
+    return member_changes, render_alter_members_summary(member_changes)
+
+
 @app.callback(
     Input("department-manage-alter-members-modal", "okCounts"),
     [
         State("department-manage-tree", "clickedContextMenu"),
-        State("department-manage-alter-members-transfer", "targetKeys"),
+        State("department-manage-alter-members-changes", "data"),
     ],
     prevent_initial_call=True,
 )
-def handle_alter_members(okCounts, clickedContextMenu, targetKeys):
+def handle_alter_members(okCounts, clickedContextMenu, member_changes):
     """处理部门人员调整逻辑"""
 
-    # 查询当前对应部门内部员工信息
-    match_users = Users.get_users_by_department_id(
-        department_id=clickedContextMenu["nodeKey"]
-    )
-
-    # 提取当前部门原有人员用户id
-    match_user_ids = [item["user_id"] for item in match_users]
-
-    # 执行部门人员调整操作
+    # 仅提交本次调整涉及的移入、移出用户id
     Users.alter_department_members(
         department_id=clickedContextMenu["nodeKey"],
-        origin_user_ids=match_user_ids,
-        target_user_ids=targetKeys,
+        added_user_ids=member_changes["added_user_ids"],
+        removed_user_ids=member_changes["removed_user_ids"],
     )
 
     set_props(
@@ -462,6 +628,14 @@ def handle_alter_members(okCounts, clickedContextMenu, targetKeys):
         },
     )
 
+    # 清空已保存的调整记录，并重新加载部门人员调整表格
+    member_changes = {"added_user_ids": [], "removed_user_ids": []}
+    set_props("department-manage-alter-members-changes", {"data": member_changes})
+    set_props(
+        "department-manage-alter-members-summary",
+        {"children": render_alter_members_summary(member_changes)},
+    )
+
     # 刷新部门管理抽屉内容
     set_props(
         "department-manage-drawer",
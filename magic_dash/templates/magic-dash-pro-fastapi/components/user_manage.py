@@ -1,7 +1,8 @@
 import uuid
 import time
+import base64
 import dash
-from dash import set_props
+from dash import dcc, html, set_props
 import feffery_antd_components as fac
 from feffery_dash_utils.style_utils import style
 from dash.dependencies import Input, Output, State
@@ -13,7 +14,14 @@ from models.departments import Departments
 from models.user_permission_groups import UserPermissionGroups
 from models.exceptions import InvalidUserError, ExistingUserError
 
-from configs import AuthConfig
+from configs import AuthConfig, ImportConfig
+from utils.import_utils import (
+    USER_IMPORT_FIELDNAMES,
+    get_user_import_job,
+    read_user_import_rows,
+    remove_user_import_job,
+    start_user_import_job,
+)
 from utils.validation_utils import validate_optional_email
 
 
@@ -27,16 +35,56 @@ def render():
     )
 
 
-def refresh_user_manage_table_data():
-    """当前模块内复用工具函数，刷新用户管理表格数据"""
+# 用户管理表格每页记录数
+USER_MANAGE_TABLE_PAGE_SIZE = 10
+
+
+def get_user_manage_query_condition(sorter, _filter):
+    """根据用户管理表格当前的排序、筛选状态构造查询条件"""
+
+    query_condition = {}
+
+    # 若存在有效排序条件
+    if sorter and sorter["columns"]:
+        query_condition["order_by"] = sorter["columns"][0]
+        query_condition["order"] = sorter["orders"][0]
+
+    # 若存在有效筛选条件
+    if _filter:
+        if _filter.get("user_name"):
+            query_condition["user_name_keyword"] = _filter["user_name"][0]
+        if _filter.get("user_email"):
+            query_condition["user_email_keyword"] = _filter["user_email"][0]
+        if _filter.get("user_role"):
+            query_condition["user_roles"] = _filter["user_role"]
+        if _filter.get("user_department"):
+            query_condition["department_ids"] = _filter["user_department"]
+
+    return query_condition
+
+
+def refresh_user_manage_table_data(pagination=None, sorter=None, _filter=None):
+    """当前模块内复用工具函数，按表格当前的分页、排序、筛选状态查询当前页数据
+
+    返回当前页表格数据，以及携带最新记录总数的分页参数
+    """
 
-    # 查询全部用户信息（含部门名称）
-    all_users = Users.get_all_users(with_department_name=True)
+    current = (pagination or {}).get("current") or 1
+    query_condition = get_user_manage_query_condition(sorter, _filter)
 
+    # 查询当前页用户信息（含部门名称）
+    match_users = Users.get_users(
+        limit=USER_MANAGE_TABLE_PAGE_SIZE,
+        offset=(current - 1) * USER_MANAGE_TABLE_PAGE_SIZE,
+        **query_condition,
+    )
+
+    # 有效用户角色读取自进程内只读快照，当前页全部行共用
     effective_roles = UserPermissionGroups.get_effective_roles()
 
-    return [
+    table_data = [
         {
+            "key": item["user_id"],
             "user_id": item["user_id"],
             "user_name": item["user_name"],
             "user_email": item["user_email"] or "无",
@@ -80,10 +128,52 @@ def refresh_user_manage_table_data():
                 ]
             ),
         }
-        for item in all_users
+        for item in match_users
+    ]
+
+    return table_data, {
+        "current": current,
+        "total": Users.count_users(
+            **{
+                key: value
+                for key, value in query_condition.items()
+                if key not in ["order_by", "order"]
+            }
+        ),
+        "pageSize": USER_MANAGE_TABLE_PAGE_SIZE,
+        "showSizeChanger": False,
+    }
+
+
+def build_department_filter_items(department_tree, department_ids=None):
+    """当前模块内工具函数，基于部门层级索引构造所属部门树形筛选菜单项"""
+
+    if department_ids is None:
+        department_ids = department_tree.get_root_ids()
+
+    department_names = {
+        item["department_id"]: item["department_name"]
+        for item in department_tree.departments
+    }
+
+    return [
+        {
+            "text": department_names[department_id],
+            "value": department_id,
+            "children": build_department_filter_items(
+                department_tree, department_tree.children.get(department_id, [])
+            ),
+        }
+        for department_id in department_ids
     ]
 
 
+def refresh_user_manage_table():
+    """当前模块内复用工具函数，按表格当前的分页、排序、筛选状态重新加载用户管理表格"""
+
+    set_props("user-manage-table-refresh-trigger", {"data": str(uuid.uuid4())})
+
+
 def check_department_id_valid(department_id):
     """检查部门id是否为空或对应有效部门"""
 
@@ -124,8 +214,14 @@ def render_user_manage_drawer(visible):
     if visible:
         time.sleep(0.5)
 
+        # 首次打开时直接查询首页数据，后续翻页、排序、筛选均由服务端按需查询
+        table_data, pagination = refresh_user_manage_table_data()
+        effective_roles = UserPermissionGroups.get_effective_roles()
+
         return [
             [
+                # 触发用户管理表格按当前状态重新加载
+                dcc.Store(id="user-manage-table-refresh-trigger"),
                 # 新增用户模态框
                 fac.AntdModal(
                     id="user-manage-add-user-modal",
@@ -136,6 +232,15 @@ def render_user_manage_drawer(visible):
                     renderFooter=True,
                     okClickClose=False,
                 ),
+                # 批量导入用户模态框
+                fac.AntdModal(
+                    id="user-manage-import-users-modal",
+                    title=fac.AntdSpace(
+                        [fac.AntdIcon(icon="antd-cloud-upload"), "批量导入用户"]
+                    ),
+                    mask=False,
+                    width=700,
+                ),
                 # 编辑用户模态框
                 fac.AntdModal(
                     id="user-manage-edit-user-modal",
@@ -190,8 +295,18 @@ def render_user_manage_drawer(visible):
                                     },
                                 },
                             ],
-                            data=refresh_user_manage_table_data(),
+                            data=table_data,
+                            pagination=pagination,
+                            mode="server-side",  # 使用服务端数据分页模式
                             tableLayout="fixed",
+                            sortOptions={
+                                "sortDataIndexes": [
+                                    "user_name",
+                                    "user_email",
+                                    "user_role",
+                                ],
+                            },
+                            # 各筛选条件均由服务端基于索引查询，筛选菜单项读取自进程内快照
                             filterOptions={
                                 "user_name": {
                                     "filterMode": "keyword",
@@ -200,10 +315,22 @@ def render_user_manage_drawer(visible):
                                     "filterMode": "keyword",
                                 },
                                 "user_department": {
-                                    "filterMode": "checkbox",
+                                    "filterMode": "tree",
+                                    "filterCustomTreeItems": (
+                                        build_department_filter_items(
+                                            Departments.get_department_tree()
+                                        )
+                                    ),
                                 },
                                 "user_role": {
-                                    "filterMode": "checkbox",
+                                    "filterMode": "tree",
+                                    "filterCustomTreeItems": [
+                                        {
+                                            "text": role_info["description"],
+                                            "value": role,
+                                        }
+                                        for role, role_info in effective_roles.items()
+                                    ],
                                 },
                             },
                             bordered=True,
@@ -214,7 +341,12 @@ def render_user_manage_drawer(visible):
                                         id="user-manage-add-user",
                                         type="primary",
                                         size="small",
-                                    )
+                                    ),
+                                    fac.AntdButton(
+                                        "批量导入",
+                                        id="user-manage-import-users",
+                                        size="small",
+                                    ),
                                 ]
                             ),
                         )
@@ -229,6 +361,32 @@ def render_user_manage_drawer(visible):
     return dash.no_update
 
 
+@app.callback(
+    [
+        Output("user-manage-table", "data"),
+        Output("user-manage-table", "pagination"),
+    ],
+    [
+        Input("user-manage-table", "pagination"),
+        Input("user-manage-table", "sorter"),
+        Input("user-manage-table", "filter"),
+        Input("user-manage-table-refresh-trigger", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def handle_user_manage_table_data_load(pagination, sorter, _filter, refresh_trigger):
+    """处理用户管理表格数据加载"""
+
+    # 排序、筛选条件变化时回到首页
+    if dash.ctx.triggered_id == "user-manage-table" and any(
+        prop_id in dash.ctx.triggered_prop_ids
+        for prop_id in ["user-manage-table.sorter", "user-manage-table.filter"]
+    ):
+        pagination = {**(pagination or {}), "current": 1}
+
+    return refresh_user_manage_table_data(pagination, sorter, _filter)
+
+
 @app.callback(
     [
         Output("user-manage-add-user-modal", "visible"),
@@ -240,8 +398,8 @@ def render_user_manage_drawer(visible):
 def open_add_user_modal(nClicks):
     """打开新增用户模态框"""
 
-    # 查询当前全部部门信息
-    departments = Departments.get_all_departments()
+    # 读取部门层级索引中的全部部门信息
+    departments = Departments.get_department_tree().departments
     # 查询配置参数与数据库综合后的全部有效用户角色
     role_options = UserPermissionGroups.get_effective_role_options()
 
@@ -308,6 +466,268 @@ def open_add_user_modal(nClicks):
     ]
 
 
+@app.callback(
+    [
+        Output("user-manage-import-users-modal", "visible"),
+        Output("user-manage-import-users-modal", "children"),
+    ],
+    Input("user-manage-import-users", "nClicks"),
+    prevent_initial_call=True,
+)
+def open_import_users_modal(nClicks):
+    """打开批量导入用户模态框"""
+
+    return [
+        True,
+        fac.AntdSpace(
+            [
+                fac.AntdAlert(
+                    message="支持上传CSV或XLSX格式的文件，首行为字段名",
+                    description=(
+                        "可用字段："
+                        + "、".join(USER_IMPORT_FIELDNAMES)
+                        + "，其中user_name、password为必填字段，未填写user_id时自动生成，"
+                        "未填写user_role时默认为常规用户，department_id需为已有部门id"
+                    ),
+                    type="info",
+                    showIcon=True,
+                ),
+                dcc.Upload(
+                    fac.AntdButton(
+                        "选择文件",
+                        icon=fac.AntdIcon(icon="antd-upload"),
+                    ),
+                    id="user-manage-import-users-upload",
+                    accept=".csv,.xlsx",
+                ),
+                fac.AntdSpin(
+                    html.Div(id="user-manage-import-users-result"),
+                    text="读取中",
+                ),
+                # 导入任务在后台执行，定时轮询导入进度
+                html.Div(id="user-manage-import-users-progress"),
+                dcc.Store(id="user-manage-import-users-job-id"),
+                dcc.Interval(
+                    id="user-manage-import-users-progress-interval",
+                    interval=1000,
+                    disabled=True,
+                ),
+            ],
+            key=str(uuid.uuid4()),  # 强制刷新
+            direction="vertical",
+            style=style(width="100%", marginTop=16),
+        ),
+    ]
+
+
+def render_import_users_progress(progress):
+    """当前模块内工具函数，渲染批量导入用户进度"""
+
+    return fac.AntdSpace(
+        [
+            fac.AntdProgress(
+                percent=(
+                    round(progress["processed_count"] * 100 / progress["total_count"])
+                    if progress["total_count"]
+                    else 0
+                ),
+                status="active",
+            ),
+            fac.AntdText(
+                "已处理{}/{}个用户，成功导入{}个用户".format(
+                    progress["processed_count"],
+                    progress["total_count"],
+                    progress["imported_count"],
+                ),
+                type="secondary",
+            ),
+            fac.AntdButton(
+                "取消导入",
+                id="user-manage-import-users-cancel",
+                danger=True,
+                size="small",
+            ),
+        ],
+        direction="vertical",
+        style=style(width="100%"),
+    )
+
+
+def render_import_users_result(imported_count, errors, cancelled=False):
+    """当前模块内工具函数，渲染批量导入用户结果"""
+
+    return fac.AntdSpace(
+        [
+            fac.AntdAlert(
+                message=("导入已取消，" if cancelled else "")
+                + f"成功导入{imported_count}个用户，导入失败{len(errors)}个用户",
+                type="warning" if errors or cancelled else "success",
+                showIcon=True,
+            ),
+            *(
+                [
+                    fac.AntdTable(
+                        columns=[
+                            {"dataIndex": "row_number", "title": "行号", "width": 80},
+                            {"dataIndex": "user_name", "title": "用户名"},
+                            {"dataIndex": "error", "title": "失败原因"},
+                        ],
+                        data=errors,
+                        size="small",
+                        pagination={"pageSize": 5, "showSizeChanger": False},
+                    )
+                ]
+                if errors
+                else []
+            ),
+        ],
+        direction="vertical",
+        style=style(width="100%"),
+    )
+
+
+@app.callback(
+    [
+        Output("user-manage-import-users-result", "children"),
+        Output("user-manage-import-users-progress", "children"),
+        Output("user-manage-import-users-job-id", "data"),
+        Output("user-manage-import-users-progress-interval", "disabled"),
+        Output("user-manage-import-users-upload", "disabled"),
+    ],
+    Input("user-manage-import-users-upload", "contents"),
+    State("user-manage-import-users-upload", "filename"),
+    prevent_initial_call=True,
+)
+def handle_import_users(contents, filename):
+    """处理批量导入用户逻辑，读取并预校验文件后在后台启动导入任务"""
+
+    try:
+        records = read_user_import_rows(
+            filename,
+            base64.b64decode(contents.split(",", 1)[-1]),
+            max_rows=ImportConfig.user_import_max_rows,
+        )
+    except (ValueError, RuntimeError) as e:
+        return [
+            fac.AntdAlert(message=str(e), type="error", showIcon=True),
+            None,
+            None,
+            True,
+            False,
+        ]
+
+    rejected = {}
+    for index, record in enumerate(records):
+        # 未填写用户id时自动生成
+        record["user_id"] = record.get("user_id") or str(uuid.uuid4())
+
+        # 检查邮箱格式
+        if not validate_optional_email(record.get("user_email")):
+            rejected[index] = "邮箱格式不正确"
+
+    # 在后台一次性校验全部记录，并行计算密码散列值后分批写入，每个批次独立提交
+    job = start_user_import_job(
+        Users.import_users,
+        records,
+        rejected=rejected,
+        batch_size=ImportConfig.user_import_batch_size,
+        max_workers=ImportConfig.user_import_hash_workers,
+        parallel_threshold=ImportConfig.user_import_parallel_threshold,
+    )
+
+    return [None, render_import_users_progress(job.snapshot()), job.job_id, False, True]
+
+
+@app.callback(
+    [
+        Output("user-manage-import-users-result", "children", allow_duplicate=True),
+        Output("user-manage-import-users-progress", "children", allow_duplicate=True),
+        Output(
+            "user-manage-import-users-progress-interval",
+            "disabled",
+            allow_duplicate=True,
+        ),
+        Output("user-manage-import-users-upload", "disabled", allow_duplicate=True),
+    ],
+    Input("user-manage-import-users-progress-interval", "n_intervals"),
+    State("user-manage-import-users-job-id", "data"),
+    prevent_initial_call=True,
+)
+def update_import_users_progress(n_intervals, job_id):
+    """轮询批量导入用户任务进度，任务结束后展示导入结果"""
+
+    job = get_user_import_job(job_id) if job_id else None
+
+    # 任务状态仅保存在启动任务的工作进程内
+    if job is None:
+        return [
+            fac.AntdAlert(
+                message="导入任务不存在，请刷新用户列表确认导入结果",
+                type="error",
+                showIcon=True,
+            ),
+            None,
+            True,
+            False,
+        ]
+
+    progress = job.snapshot()
+    if progress["status"] == "running":
+        return [
+            dash.no_update,
+            render_import_users_progress(progress),
+            dash.no_update,
+            dash.no_update,
+        ]
+
+    remove_user_import_job(job_id)
+
+    # 存在导入成功的用户时重新加载用户管理表格
+    if progress["imported_count"]:
+        refresh_user_manage_table()
+
+    if progress["status"] == "failed":
+        result = fac.AntdAlert(
+            message=f"成功导入{progress['imported_count']}个用户后导入失败",
+            description=progress["error_message"],
+            type="error",
+            showIcon=True,
+        )
+    else:
+        records = job.records
+        result = render_import_users_result(
+            progress["imported_count"],
+            [
+                {
+                    "key": records[index]["row_number"],
+                    "row_number": records[index]["row_number"],
+                    "user_name": records[index].get("user_name") or "无",
+                    "error": error,
+                }
+                for index, error in sorted(
+                    progress["errors"].items(),
+                    key=lambda item: records[item[0]]["row_number"],
+                )
+            ],
+            cancelled=progress["status"] == "cancelled",
+        )
+
+    return [result, None, True, False]
+
+
+@app.callback(
+    Input("user-manage-import-users-cancel", "nClicks"),
+    State("user-manage-import-users-job-id", "data"),
+    prevent_initial_call=True,
+)
+def cancel_import_users(nClicks, job_id):
+    """取消批量导入用户任务，当前批次写入完成后停止"""
+
+    job = get_user_import_job(job_id) if job_id else None
+    if job is not None:
+        job.cancel()
+
+
 @app.callback(
     Input("user-manage-add-user-modal", "okCounts"),
     [State("user-manage-add-user-form", "values")],
@@ -414,17 +834,14 @@ def handle_add_user(okCounts, values):
             )
 
             # 刷新用户列表
-            set_props(
-                "user-manage-table",
-                {"data": refresh_user_manage_table_data()},
-            )
+            refresh_user_manage_table()
 
 
 def build_edit_user_form(match_user):
     """构建编辑用户表单"""
 
-    # 查询当前全部部门信息
-    departments = Departments.get_all_departments()
+    # 读取部门层级索引中的全部部门信息
+    departments = Departments.get_department_tree().departments
     # 查询配置参数与数据库综合后的全部有效用户角色
     role_options = UserPermissionGroups.get_effective_role_options()
 
@@ -545,10 +962,7 @@ def handle_user_action(nClicksButton, clickedContent, recentlyButtonClickedRow):
         )
 
         # 刷新用户列表
-        set_props(
-            "user-manage-table",
-            {"data": refresh_user_manage_table_data()},
-        )
+        refresh_user_manage_table()
 
 
 @app.callback(
@@ -638,7 +1052,4 @@ def handle_edit_user(okCounts, values):
     set_props("user-manage-edit-user-modal", {"visible": False})
 
     # 刷新用户列表
-    set_props(
-        "user-manage-table",
-        {"data": refresh_user_manage_table_data()},
-    )
+    refresh_user_manage_table()
@@ -5,3 +5,6 @@ from .auth_config import AuthConfig  # noqa: F401
 from .email_config import EmailConfig  # noqa: F401
 from .otp_config import OtpConfig  # noqa: F401
 from .database_config import DatabaseConfig  # noqa: F401
+from .cache_config import CacheConfig  # noqa: F401
+from .log_config import LogConfig  # noqa: F401
+from .import_config import ImportConfig  # noqa: F401
@@ -50,6 +50,10 @@ class BaseConfig:
     # 勾选“记住我”后的登录会话有效期，单位：秒
     remember_login_expire_seconds: int = 30 * 24 * 60 * 60
 
+    # 鉴权用户加载线程池的最大线程数
+    # 进程内缓存未命中时的用户查询在该线程池中执行，避免阻塞事件循环
+    auth_loader_max_workers: int = 8
+
     # 浏览器最低版本限制规则
     min_browser_versions: List[dict] = [
         {"browser": "Chrome", "version": 88},
@@ -99,3 +103,6 @@ class BaseConfig:
 
     # 针对用户登录页面，是否启用OTP动态口令登录功能
     enable_otp_login: bool = False
+
+    # 登录日志导出时，是否对导出的CSV文件进行gzip压缩
+    compress_login_logs_export: bool = False
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from .base_config import BaseConfig
 
@@ -30,8 +30,39 @@ class EmailConfig:
     # SMTP服务连接超时时间，单位：秒
     smtp_timeout: int = 10
 
+    # 每个进程保持的已认证SMTP空闲连接数量上限
+    smtp_pool_size: int = 2
+
+    # SMTP空闲连接超过该时长后，复用前先通过NOOP命令检查可用性，单位：秒
+    smtp_health_check_interval_seconds: int = 10
+
+    # 每个进程中后台发送邮件的线程数量
+    email_send_workers: int = 2
+
+    # 每个进程中等待发送的邮件数量上限，超出时验证码发送失败
+    email_send_queue_size: int = 1000
+
+    # 单封邮件遇到临时性错误时的最大发送次数
+    email_send_max_attempts: int = 3
+
+    # 邮件重试发送的初始等待时间，之后每次重试翻倍，单位：秒
+    email_send_retry_backoff_seconds: float = 1
+
     # 邮箱验证码有效期，单位：秒
     verification_code_expire_seconds: int = 300
 
     # 同一邮箱重复发送验证码的等待时间，单位：秒
     verification_code_resend_interval_seconds: int = 60
+
+    # 邮箱验证码存储方式
+    # database：存储于应用数据库的邮箱验证码信息表，适用于任意部署方式
+    # memory：存储于当前进程内存，不产生数据库写入，仅适用于单进程部署；
+    #   多worker部署时各进程分别保存验证码，校验请求落到其他worker时将返回not_found，切勿使用
+    # sqlite：存储于独立的WAL模式SQLite文件，适用于同一主机上的多进程部署
+    verification_code_store: Literal["database", "memory", "sqlite"] = "database"
+
+    # 当verification_code_store为'sqlite'时使用的数据库文件路径
+    verification_code_sqlite_path: str = "verification_codes.db"
+
+    # 后台清理过期验证码记录的间隔，单位：秒，设置为0时不启用
+    verification_code_sweep_interval_seconds: int = 60
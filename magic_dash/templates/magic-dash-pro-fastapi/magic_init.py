@@ -14,6 +14,8 @@ from configs import AuthConfig, BaseConfig
 from models import (
     create_tables,
     db,  # noqa: F401
+    ensure_model_indexes,
+    ensure_search_indexes,
     ensure_user_email_schema as ensure_model_user_email_schema,
     get_model_table_name,
     model_table_exists,
@@ -21,6 +23,8 @@ from models import (
 )
 from models.departments import Departments
 from models.email_verifications import EmailVerifications
+from models.logs import LoginLogs
+from models.login_stats import LoginStats
 from models.otp_credentials import OtpCredentials
 from models.user_permission_groups import UserPermissionGroups
 from models.users import Users
@@ -214,6 +218,21 @@ def main():
     for operation in ensure_user_email_schema():
         executed_operations.append((operation, "已自动补充", "yellow", "green"))
 
+    # 为旧版本已存在的登录日志表、用户信息表补齐分页查询所需的复合索引
+    for table_model in [LoginLogs, Users]:
+        for operation in ensure_model_indexes(table_model):
+            executed_operations.append((operation, "已自动补充", "yellow", "green"))
+
+    # 为登录日志表、用户信息表建立关键词检索所需的文本检索索引
+    for table_model in [LoginLogs, Users]:
+        for operation in ensure_search_indexes(table_model):
+            executed_operations.append((operation, "已自动补充", "yellow", "green"))
+
+    # 登录统计表为空而登录日志表已有数据时，基于已有登录日志生成登录统计数据
+    if not model_table_has_data(LoginStats) and model_table_has_data(LoginLogs):
+        LoginStats.rebuild_stats(LoginLogs.iter_logs(order="ascend"))
+        executed_operations.append(("登录统计数据", "已自动生成", "yellow", "green"))
+
     # 0. RSA密钥对生成
     if BaseConfig.enable_login_rsa_crypto:
         # 检查是否已存在RSA密钥对
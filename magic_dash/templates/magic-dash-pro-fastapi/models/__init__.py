@@ -14,6 +14,8 @@ get_model_table_name = _engine_module.get_model_table_name
 model_table_exists = _engine_module.model_table_exists
 model_table_has_data = _engine_module.model_table_has_data
 ensure_user_email_schema = _engine_module.ensure_user_email_schema
+ensure_model_indexes = _engine_module.ensure_model_indexes
+ensure_search_indexes = _engine_module.ensure_search_indexes
 
 __all__ = [
     "db",
@@ -23,4 +25,6 @@ __all__ = [
     "model_table_exists",
     "model_table_has_data",
     "ensure_user_email_schema",
+    "ensure_model_indexes",
+    "ensure_search_indexes",
 ]
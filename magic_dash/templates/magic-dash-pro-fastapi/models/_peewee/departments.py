@@ -2,9 +2,19 @@ from peewee import CharField
 from typing import Union, Dict, List
 from playhouse.sqlite_ext import JSONField
 
-from . import db, BaseModel
+from . import (
+    db,
+    BaseModel,
+    connection_scope,
+    execute_bulk_in,
+    supports_recursive_cte,
+)
+from .cache_versions import CacheVersions
+from ..caches import department_tree_snapshot
+from ..department_tree import DepartmentTree
 from ..exceptions import InvalidDepartmentError, ExistingDepartmentError
 from ..schema_contract import TABLE_NAMES
+from ..unit_of_work import run_after_transaction
 
 
 class Departments(BaseModel):
@@ -31,14 +41,14 @@ class Departments(BaseModel):
     def get_department(cls, department_id: str):
         """根据部门id查询部门信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.department_id == department_id)
 
     @classmethod
     def get_children_departments(cls, department_id: str):
         """根据部门id查询子部门信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return list(
                 cls.select().where(cls.parent_department_id == department_id).dicts()
             )
@@ -47,16 +57,65 @@ class Departments(BaseModel):
     def get_department_by_name(cls, department_name: str):
         """根据部门名称查询部门信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.department_name == department_name)
 
     @classmethod
     def get_all_departments(cls):
         """获取所有部门信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return list(cls.select().dicts())
 
+    @classmethod
+    def get_department_tree(cls) -> DepartmentTree:
+        """获取部门层级索引，稳态下直接读取进程内快照而不访问数据库"""
+
+        return department_tree_snapshot.get_or_build(
+            lambda: DepartmentTree(cls.get_all_departments())
+        )
+
+    @classmethod
+    def get_descendant_ids(cls, department_id: str) -> List[str]:
+        """查询指定部门及其全部后代部门id
+
+        支持递归查询的数据库中以单条WITH RECURSIVE语句完成，否则一次性读取部门层级关系后在内存中遍历
+        """
+
+        with connection_scope():
+            if not supports_recursive_cte():
+                return DepartmentTree(
+                    cls.select(cls.department_id, cls.parent_department_id).dicts()
+                ).get_descendant_ids(department_id)
+
+            return [row[0] for row in cls.build_subtree_query(department_id).tuples()]
+
+    @classmethod
+    def build_subtree_query(cls, department_id: str):
+        """构造查询指定部门及其全部后代部门id的递归查询"""
+
+        subtree = (
+            cls.select(cls.department_id)
+            .where(cls.department_id == department_id)
+            .cte("subtree", recursive=True)
+        )
+        Children = cls.alias()
+        # 使用UNION去重，历史数据中存在循环引用时递归查询同样可以终止
+        subtree = subtree.union(
+            Children.select(Children.department_id).join(
+                subtree,
+                on=(Children.parent_department_id == subtree.c.department_id),
+            )
+        )
+
+        return subtree.select_from(subtree.c.department_id)
+
+    @classmethod
+    def get_ancestor_ids(cls, department_id: str) -> List[str]:
+        """由近及远获取指定部门的全部祖先部门id"""
+
+        return cls.get_department_tree().get_ancestor_ids(department_id)
+
     @classmethod
     def add_department(
         cls,
@@ -67,7 +126,7 @@ class Departments(BaseModel):
     ):
         """添加部门"""
 
-        with db.connection_context():
+        with connection_scope():
             # 若必要部门信息不完整
             if not (department_id and department_name):
                 raise InvalidDepartmentError("部门信息不完整")
@@ -88,26 +147,24 @@ class Departments(BaseModel):
                     parent_department_id=parent_department_id,
                     other_info=other_info,
                 )
+                CacheVersions.bump_versions(["departments"])
+
+        run_after_transaction(department_tree_snapshot.invalidate)
 
     @classmethod
     def delete_department(cls, department_id: str):
         """删除部门，并删除关联的全部后代部门"""
 
-        with db.connection_context():
-            # 递归查询所有后代部门id
-            def get_descendant_ids(dept_id: str) -> list:
-                ids = [dept_id]
-                children = cls.select(cls.department_id).where(
-                    cls.parent_department_id == dept_id
+        with connection_scope():
+            with db.atomic():
+                execute_bulk_in(
+                    cls.department_id,
+                    cls.get_descendant_ids(department_id),
+                    cls.delete().where,
                 )
-                for child in children:
-                    ids.extend(get_descendant_ids(child.department_id))
-                return ids
-
-            all_ids = get_descendant_ids(department_id)
+                CacheVersions.bump_versions(["departments"])
 
-            with db.atomic():
-                cls.delete().where(cls.department_id.in_(all_ids)).execute()
+        run_after_transaction(department_tree_snapshot.invalidate)
 
     @classmethod
     def truncate_departments(cls, execute: bool = False):
@@ -115,17 +172,23 @@ class Departments(BaseModel):
 
         # 若保险参数execute=True
         if execute:
-            with db.connection_context():
+            with connection_scope():
                 with db.atomic():
                     cls.delete().execute()
+                    CacheVersions.bump_versions(["departments"])
+
+            run_after_transaction(department_tree_snapshot.invalidate)
 
     @classmethod
     def update_department(cls, department_id: str, **kwargs):
         """更新部门信息"""
 
-        with db.connection_context():
+        with connection_scope():
             with db.atomic():
                 cls.update(**kwargs).where(cls.department_id == department_id).execute()
+                CacheVersions.bump_versions(["departments"])
+
+            run_after_transaction(department_tree_snapshot.invalidate)
 
             # 返回成功更新后的部门信息
             return cls.get_or_none(cls.department_id == department_id)
@@ -2,9 +2,10 @@ import math
 import secrets
 from datetime import datetime, timedelta
 
-from peewee import CharField, DateTimeField, IntegrityError
+from peewee import CharField, DateTimeField
 
-from . import db, BaseModel
+from configs.database_config import DatabaseConfig
+from . import db, BaseModel, connection_scope, supports_returning
 from ..schema_contract import TABLE_NAMES
 
 
@@ -55,12 +56,45 @@ class EmailVerifications(BaseModel):
         if not email:
             return None
 
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.email == email)
 
+    @classmethod
+    def _insert_or_lock_verification(
+        cls, email: str, verification_code: str, generated_at: datetime
+    ):
+        """邮箱不存在验证码记录时插入新记录，否则不修改并锁定已有记录，返回当前记录
+
+        以冲突时空更新的单条语句实现，数据库支持RETURNING时无需额外查询
+        """
+
+        query = cls.insert(
+            email=email,
+            verification_code=verification_code,
+            generated_at=generated_at,
+        ).on_conflict(
+            # MySQL的ON DUPLICATE KEY UPDATE语法不支持指定冲突字段
+            conflict_target=(
+                None if DatabaseConfig.database_type == "mysql" else [cls.email]
+            ),
+            update={cls.verification_code: cls.verification_code},
+        )
+
+        if supports_returning():
+            return next(
+                iter(query.returning(cls.verification_code, cls.generated_at).execute())
+            )
+
+        query.execute()
+        return cls.get_by_id(email)
+
     @classmethod
     def issue_verification(cls, email: str, resend_interval_seconds: int):
-        """在重复发送等待时间结束后为邮箱签发新验证码"""
+        """在重复发送等待时间结束后为邮箱签发新验证码
+
+        首次签发及等待时间内的重复请求均只需执行一条语句，替换已过等待时间的旧记录时
+        额外执行一条更新语句，同时返回旧记录快照，供邮件发送失败时安全恢复
+        """
 
         email = (email or "").strip()
         if not email:
@@ -71,62 +105,53 @@ class EmailVerifications(BaseModel):
         )
 
         verification_code = cls.generate_code()
+        generated_at = datetime.now()
+        if DatabaseConfig.database_type == "mysql":
+            # MySQL的DATETIME字段不保存微秒，保证与回查记录一致
+            generated_at = generated_at.replace(microsecond=0)
+        verification = cls(
+            email=email,
+            verification_code=verification_code,
+            generated_at=generated_at,
+        )
 
-        with db.connection_context():
-            # 比对旧记录后再条件更新，保证并发请求中仅一方可以成功签发，
-            # 同时保留旧记录快照，供邮件发送失败时安全恢复。
-            for _ in range(3):
-                generated_at = datetime.now()
-                resend_before = generated_at - timedelta(
-                    seconds=resend_interval_seconds
+        with connection_scope():
+            with db.atomic():
+                current_verification = cls._insert_or_lock_verification(
+                    email,
+                    verification_code,
+                    generated_at,
                 )
-                previous_verification = cls.get_or_none(cls.email == email)
 
-                if previous_verification:
-                    remaining_seconds = cls._get_record_remaining_seconds(
-                        previous_verification,
-                        resend_interval_seconds,
-                    )
-                    if remaining_seconds > 0:
-                        return None, remaining_seconds, None
-
-                    with db.atomic():
-                        updated_count = (
-                            cls.update(
-                                verification_code=verification_code,
-                                generated_at=generated_at,
-                            )
-                            .where(
-                                (cls.email == email)
-                                & (
-                                    cls.verification_code
-                                    == previous_verification.verification_code
-                                )
-                                & (
-                                    cls.generated_at
-                                    == previous_verification.generated_at
-                                )
-                                & (cls.generated_at <= resend_before)
-                            )
-                            .execute()
-                        )
+                # 本次插入的新记录
+                if (
+                    current_verification.verification_code == verification_code
+                    and current_verification.generated_at == generated_at
+                ):
+                    return verification, 0, None
 
-                    if updated_count:
-                        return cls.get_by_id(email), 0, previous_verification
-                    continue
+                remaining_seconds = cls._get_record_remaining_seconds(
+                    current_verification,
+                    resend_interval_seconds,
+                )
+                if remaining_seconds > 0:
+                    return None, remaining_seconds, None
 
-                try:
-                    with db.atomic():
-                        cls.create(
-                            email=email,
-                            verification_code=verification_code,
-                            generated_at=generated_at,
-                        )
-                    return cls.get_by_id(email), 0, None
-                except IntegrityError:
-                    continue
+                # 旧记录已在本事务中锁定，可直接替换，不会与并发请求互相覆盖
+                cls.update(
+                    verification_code=verification_code,
+                    generated_at=generated_at,
+                ).where(cls.email == email).execute()
 
-            raise RuntimeError("邮箱验证码签发失败，请稍后重试")
+                return (
+                    verification,
+                    0,
+                    cls(
+                        email=email,
+                        verification_code=current_verification.verification_code,
+                        generated_at=current_verification.generated_at,
+                    ),
+                )
 
     @classmethod
     def get_resend_remaining_seconds(
@@ -155,52 +180,58 @@ class EmailVerifications(BaseModel):
         verification_code: str,
         expire_seconds: int,
     ):
-        """校验验证码，并在成功或过期时消费对应记录"""
+        """校验验证码，并在成功或过期时消费对应记录
+
+        验证码正确或已过期时以单条DELETE ... RETURNING语句完成校验与消费
+        """
 
         email = (email or "").strip()
         verification_code = (verification_code or "").strip()
         cls._validate_seconds(expire_seconds, "邮箱验证码有效期")
-        with db.connection_context():
-            for _ in range(3):
-                verification = cls.get_or_none(cls.email == email)
-                if not verification:
-                    return "not_found"
+        expire_before = datetime.now() - timedelta(seconds=expire_seconds)
+        consumable_filter = (cls.email == email) & (
+            (cls.verification_code == verification_code)
+            | (cls.generated_at <= expire_before)
+        )
 
-                remaining_seconds = cls._get_record_remaining_seconds(
-                    verification,
-                    expire_seconds,
-                )
-                if remaining_seconds <= 0:
-                    deleted_count = cls.delete_verification(
-                        email,
-                        verification.verification_code,
-                        verification.generated_at,
+        with connection_scope():
+            with db.atomic():
+                if supports_returning():
+                    consumed_verification = next(
+                        iter(
+                            cls.delete()
+                            .where(consumable_filter)
+                            .returning(cls.generated_at)
+                            .execute()
+                        ),
+                        None,
                     )
-                    if deleted_count:
+                else:
+                    query = cls.select(cls.generated_at).where(consumable_filter)
+                    if DatabaseConfig.database_type != "sqlite":
+                        query = query.for_update()
+                    consumed_verification = query.first()
+                    if consumed_verification and (
+                        not cls.delete().where(consumable_filter).execute()
+                    ):
+                        consumed_verification = None
+
+                if consumed_verification:
+                    if consumed_verification.generated_at <= expire_before:
                         return "expired"
-                    continue
+                    return "valid"
 
-                if not secrets.compare_digest(
-                    verification.verification_code,
-                    verification_code,
-                ):
+                # 未消费任何记录时，区分验证码错误与记录不存在
+                if cls.select().where(cls.email == email).exists():
                     return "invalid"
 
-                deleted_count = cls.delete_verification(
-                    email,
-                    verification.verification_code,
-                    verification.generated_at,
-                )
-                if deleted_count:
-                    return "valid"
-
-            return "invalid"
+                return "not_found"
 
     @classmethod
     def rollback_issued_verification(cls, verification, previous_verification=None):
         """邮件发送失败时回滚本次签发，且不覆盖并发产生的新记录"""
 
-        with db.connection_context():
+        with connection_scope():
             current_record_filter = (
                 (cls.email == verification.email)
                 & (cls.verification_code == verification.verification_code)
@@ -226,7 +257,7 @@ class EmailVerifications(BaseModel):
     ):
         """删除指定邮箱的验证码，可限制仅删除匹配验证码的记录"""
 
-        with db.connection_context():
+        with connection_scope():
             query = cls.delete().where(cls.email == (email or "").strip())
             if verification_code:
                 query = query.where(cls.verification_code == verification_code)
@@ -234,3 +265,13 @@ class EmailVerifications(BaseModel):
                 query = query.where(cls.generated_at == generated_at)
 
             return query.execute()
+
+    @classmethod
+    def delete_expired_verifications(cls, expire_seconds: int) -> int:
+        """删除已超过有效期的验证码记录，返回删除的记录数"""
+
+        cls._validate_seconds(expire_seconds, "邮箱验证码有效期")
+        expire_before = datetime.now() - timedelta(seconds=expire_seconds)
+
+        with connection_scope():
+            return cls.delete().where(cls.generated_at <= expire_before).execute()
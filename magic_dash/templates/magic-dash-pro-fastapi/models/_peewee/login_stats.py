@@ -0,0 +1,142 @@
+from collections import Counter
+from typing import Iterable, List, Literal
+
+from peewee import (
+    EXCLUDED,
+    BigIntegerField,
+    CharField,
+    CompositeKey,
+    DateTimeField,
+    chunked,
+    fn,
+)
+
+from configs.database_config import DatabaseConfig
+from . import db, BaseModel, connection_scope
+from ..log_archive import parse_login_datetime_range
+from ..login_rollups import (
+    LOGIN_STATS_DIMENSIONS,
+    aggregate_login_logs,
+    build_trend_series,
+)
+from ..schema_contract import TABLE_NAMES
+
+# 统计维度主键字段
+ROLLUP_KEY_FIELDS = ("bucket_start", "status", "browser_family", "os_family")
+
+
+class LoginStats(BaseModel):
+    """登录统计表模型类，按小时时间桶预聚合登录日志计数"""
+
+    # 小时时间桶起点
+    bucket_start = DateTimeField()
+
+    # 登录状态
+    status = CharField()
+
+    # 浏览器名称
+    browser_family = CharField()
+
+    # 操作系统名称
+    os_family = CharField()
+
+    # 登录次数
+    login_count = BigIntegerField(default=0)
+
+    class Meta:
+        # 显式声明表名，确保不同ORM引擎映射到同一张物理表
+        database = db
+        table_name = TABLE_NAMES["LoginStats"]
+        primary_key = CompositeKey(*ROLLUP_KEY_FIELDS)
+
+    @classmethod
+    def increment_counts(cls, counts: Counter):
+        """按统计维度累加登录次数，需在对应登录日志写入的同一事务中调用"""
+
+        # MySQL不支持EXCLUDED语法，改用VALUES()引用待插入的值
+        if DatabaseConfig.database_type == "mysql":
+            conflict_target = None
+            inserted_count = fn.VALUES(cls.login_count)
+        else:
+            conflict_target = [getattr(cls, name) for name in ROLLUP_KEY_FIELDS]
+            inserted_count = EXCLUDED.login_count
+
+        rows = [
+            {**dict(zip(ROLLUP_KEY_FIELDS, key)), "login_count": login_count}
+            for key, login_count in counts.items()
+        ]
+        for batch in chunked(rows, 100):
+            cls.insert_many(batch).on_conflict(
+                conflict_target=conflict_target,
+                update={cls.login_count: cls.login_count + inserted_count},
+            ).execute()
+
+    @classmethod
+    def rebuild_stats(cls, records: Iterable[dict]) -> int:
+        """基于登录日志记录全量重建登录统计数据，返回统计记录数"""
+
+        # 聚合结果的规模只与统计维度组合数相关，与登录日志记录数无关
+        counts = aggregate_login_logs(records)
+
+        with connection_scope():
+            with db.atomic():
+                cls.delete().execute()
+                cls.increment_counts(counts)
+
+        return len(counts)
+
+    @classmethod
+    def get_trend(
+        cls,
+        login_datetime_range: List[str] = None,
+        granularity: Literal["hour", "day"] = "hour",
+    ) -> List[dict]:
+        """获取登录成功、失败次数的时间趋势"""
+
+        start, end = parse_login_datetime_range(login_datetime_range)
+
+        with connection_scope():
+            rows = list(
+                cls.build_range_query(start, end, cls.bucket_start, cls.status).tuples()
+            )
+
+        return build_trend_series(rows, granularity, start, end)
+
+    @classmethod
+    def get_breakdown(
+        cls,
+        dimension: Literal["status", "browser_family", "os_family"],
+        login_datetime_range: List[str] = None,
+    ) -> List[dict]:
+        """获取指定维度下各取值的登录次数，按登录次数降序排列"""
+
+        if dimension not in LOGIN_STATS_DIMENSIONS:
+            raise ValueError(f"不支持的统计维度：{dimension}")
+
+        start, end = parse_login_datetime_range(login_datetime_range)
+
+        with connection_scope():
+            return [
+                {"name": name, "count": int(login_count)}
+                for name, login_count in cls.build_range_query(
+                    start, end, getattr(cls, dimension)
+                )
+                .order_by(fn.SUM(cls.login_count).desc())
+                .tuples()
+            ]
+
+    @classmethod
+    def build_range_query(cls, start, end, *group_fields):
+        """构造时间区间内按指定字段分组汇总登录次数的查询"""
+
+        query = cls.select(*group_fields, fn.SUM(cls.login_count))
+        if start:
+            query = query.where(cls.bucket_start >= start)
+        if end:
+            query = query.where(cls.bucket_start < end)
+
+        return query.group_by(*group_fields)
+
+
+# 创建表（如果表不存在）
+db.create_tables([LoginStats])
@@ -1,8 +1,37 @@
+import operator
+import time
+from datetime import datetime, timedelta
+from functools import reduce
 from typing import List, Literal
-from peewee import AutoField, CharField, DateTimeField
+from peewee import SQL, AutoField, CharField, DateTimeField, chunked
 
-from . import db, BaseModel
-from ..schema_contract import TABLE_NAMES
+from configs import CacheConfig, LogConfig
+from . import (
+    db,
+    BaseModel,
+    build_search_condition,
+    connection_scope,
+    estimate_table_row_count,
+    execute_bulk_in,
+    search_index_exists,
+)
+from .login_stats import LoginStats
+from ..batch_writer import BatchedWriter
+from ..caches import login_logs_counter
+from ..log_archive import (
+    append_to_archive_files,
+    get_archive_month,
+    get_archive_table_name,
+    get_overlapping_archive_months,
+    parse_archive_months,
+    parse_login_datetime_range,
+)
+from ..login_rollups import aggregate_login_logs
+from ..schema_contract import TABLE_INDEXES, TABLE_NAMES, TABLE_SEARCH_INDEXES
+from ..search_index import get_prefix_upper_bound
+
+# 已加载的月度归档表模型类
+_archive_models = {}
 
 
 class LoginLogs(BaseModel):
@@ -36,12 +65,30 @@ class LoginLogs(BaseModel):
         # 显式声明表名，确保不同ORM引擎映射到同一张物理表
         database = db
         table_name = TABLE_NAMES["LoginLogs"]
+        # 按索引契约声明复合索引，Peewee默认以“表名_字段名”命名，与契约中的索引名称一致
+        indexes = tuple(
+            (columns, False) for columns in TABLE_INDEXES["LoginLogs"].values()
+        )
+
+    @classmethod
+    def get_count(cls, exact: bool = False) -> int:
+        """获取日志记录总数，默认返回进程内维护的近似值，exact为True时执行精确计数"""
+
+        return login_logs_counter.get(cls.load_count, exact=exact)
 
     @classmethod
-    def get_count(cls) -> int:
-        """获取日志记录总数"""
+    def load_count(cls, exact: bool = False) -> int:
+        """获取日志记录数基准值，数据表较大时优先使用数据库统计信息估算值"""
 
-        with db.connection_context():
+        if not exact:
+            estimate = estimate_table_row_count(cls._meta.table_name)
+            if (
+                estimate is not None
+                and estimate >= CacheConfig.login_logs_exact_count_threshold
+            ):
+                return estimate
+
+        with connection_scope():
             return cls.select().count()
 
     @classmethod
@@ -52,26 +99,342 @@ class LoginLogs(BaseModel):
         order_by: Literal["id", "user_name", "status", "login_datetime"] = "id",
         order: Literal["ascend", "descend"] = "descend",
         user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        login_datetime_range: List[str] = None,
+        cursor: dict = None,
     ):
-        """条件性获取日志记录"""
-
-        with db.connection_context():
-            # 构造查询
-            query = cls.select()
-            # 若用户名关键词检索条件有效
-            if user_name_keyword:
-                query = query.where(cls.user_name.contains(user_name_keyword))
-            # 若排序条件有效
-            if order_by and order:
-                if order == "ascend":
-                    query = query.order_by(getattr(cls, order_by))
-                else:
-                    query = query.order_by(getattr(cls, order_by).desc())
+        """条件性获取日志记录
+
+        user_name_keyword为用户名关键词，存在文本检索索引时经由检索索引匹配；
+        ip_prefix为ip前缀，status为登录状态，均可命中对应的复合索引；
+        login_datetime_range为登录日期范围["YYYY-MM-DD", "YYYY-MM-DD"]，
+        日期范围涉及已归档月份时，同时查询对应的月度归档表；
+        cursor为键集分页游标，格式为{"direction": "next"或"prev", "value": 排序字段值, "id": 记录id}，
+        传入时基于相邻页首/尾行的排序键直接定位，不再使用offset扫描并丢弃前序记录
+        """
+
+        with connection_scope():
+            source_models, start, end = cls.get_source_models(login_datetime_range)
+
+            order_by = order_by or "id"
+            descending = order != "ascend"
+            # 向前翻页时按相反顺序扫描，取回结果后再恢复原有顺序
+            reverse = bool(cursor) and cursor["direction"] == "prev"
+            scan_descending = descending != reverse
+
+            # 构造查询，各数据表使用相同的筛选及键集分页条件
+            queries = [
+                source_model.build_logs_query(
+                    order_by,
+                    user_name_keyword=user_name_keyword,
+                    ip_prefix=ip_prefix,
+                    status=status,
+                    start=start,
+                    end=end,
+                    cursor=cursor,
+                    descending=scan_descending,
+                )
+                for source_model in source_models
+            ]
+
+            # 以id作为次级排序键，保证排序结果稳定且与复合索引一致
+            order_names = ["id"] if order_by == "id" else [order_by, "id"]
+            if len(queries) == 1:
+                order_fields = [getattr(cls, name) for name in order_names]
+                query = queries[0].order_by(
+                    *[
+                        field.desc() if scan_descending else field
+                        for field in order_fields
+                    ]
+                )
+            else:
+                # 跨登录日志表及归档表查询时，以UNION ALL合并后按列名统一排序
+                query = reduce(operator.add, queries).order_by(
+                    *[
+                        SQL(f"{name} DESC" if scan_descending else name)
+                        for name in order_names
+                    ]
+                )
+
             # 若分页相关参数有效
-            if limit and offset:
-                query = query.limit(limit).offset(offset)
+            if limit:
+                query = query.limit(limit)
+            if offset and not cursor:
+                query = query.offset(offset)
+
+            records = list(query.dicts())
+            if reverse:
+                records.reverse()
             # 返回查询结果
-            return list(query.dicts())
+            return records
+
+    @classmethod
+    def count_logs(
+        cls,
+        user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        login_datetime_range: List[str] = None,
+    ) -> int:
+        """按筛选条件精确统计日志记录数，筛选条件含义与get_logs一致
+
+        登录日期范围涉及已归档月份时，同时统计对应的月度归档表
+        """
+
+        with connection_scope():
+            source_models, start, end = cls.get_source_models(login_datetime_range)
+
+            return sum(
+                source_model.build_logs_query(
+                    "id",
+                    user_name_keyword=user_name_keyword,
+                    ip_prefix=ip_prefix,
+                    status=status,
+                    start=start,
+                    end=end,
+                ).count()
+                for source_model in source_models
+            )
+
+    @classmethod
+    def get_source_models(cls, login_datetime_range: List[str] = None):
+        """获取登录日期范围涉及的登录日志表及月度归档表模型，以及解析后的起止时间"""
+
+        start, end = parse_login_datetime_range(login_datetime_range)
+        source_models = [cls] + [
+            cls.get_archive_model(month)
+            for month in get_overlapping_archive_months(
+                cls.get_archive_months() if login_datetime_range else [],
+                start,
+                end,
+            )
+        ]
+
+        return source_models, start, end
+
+    @classmethod
+    def build_logs_query(
+        cls,
+        order_by: str,
+        user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+        cursor: dict = None,
+        descending: bool = True,
+    ):
+        """构造当前数据表的日志筛选查询，归档表模型复用同一查询逻辑"""
+
+        query = cls.select()
+        # 若用户名关键词检索条件有效
+        if user_name_keyword:
+            query = query.where(cls.build_user_name_condition(user_name_keyword))
+        # 若ip前缀条件有效，以范围条件代替前缀模糊查询以命中索引
+        if ip_prefix:
+            query = query.where(
+                (cls.ip >= ip_prefix) & (cls.ip < get_prefix_upper_bound(ip_prefix))
+            )
+        # 若登录状态条件有效
+        if status:
+            query = query.where(cls.status == status)
+        # 若登录时间范围条件有效
+        if start:
+            query = query.where(cls.login_datetime >= start)
+        if end:
+            query = query.where(cls.login_datetime < end)
+        # 若键集分页游标有效
+        if cursor:
+            query = query.where(
+                cls.build_seek_condition(getattr(cls, order_by), cursor, descending)
+            )
+
+        return query
+
+    @classmethod
+    def build_user_name_condition(cls, user_name_keyword: str):
+        """构造用户名关键词筛选条件，登录日志表存在文本检索索引时附加命中检索索引的条件"""
+
+        condition = cls.user_name.contains(user_name_keyword)
+
+        # 归档表未建立文本检索索引，仅使用模糊查询条件
+        index_name = TABLE_SEARCH_INDEXES["LoginLogs"]["user_name"]
+        if cls is LoginLogs and search_index_exists(cls._meta.table_name, index_name):
+            search_condition = build_search_condition(
+                cls.user_name, user_name_keyword, index_name
+            )
+            if search_condition is not None:
+                condition = search_condition & condition
+
+        return condition
+
+    @classmethod
+    def iter_logs(
+        cls,
+        order_by: Literal["id", "user_name", "status", "login_datetime"] = "id",
+        order: Literal["ascend", "descend"] = "descend",
+        user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        login_datetime_range: List[str] = None,
+        chunk_size: int = 1000,
+    ):
+        """按筛选、排序条件分批迭代全部日志记录
+
+        各批次基于上一批末行的排序键进行键集分页查询，内存占用与数据表规模无关，
+        且迭代期间不会长时间占用数据库连接
+        """
+
+        cursor = None
+        while True:
+            records = cls.get_logs(
+                limit=chunk_size,
+                order_by=order_by,
+                order=order,
+                user_name_keyword=user_name_keyword,
+                ip_prefix=ip_prefix,
+                status=status,
+                login_datetime_range=login_datetime_range,
+                cursor=cursor,
+            )
+            yield from records
+
+            if len(records) < chunk_size:
+                return
+
+            cursor = {
+                "direction": "next",
+                "value": records[-1][order_by or "id"],
+                "id": records[-1]["id"],
+            }
+
+    @classmethod
+    def build_seek_condition(cls, sort_field, cursor: dict, descending: bool):
+        """构造键集分页条件，定位排序键(sort_field, id)位于游标之后的记录"""
+
+        cursor_value = cursor["value"]
+        if sort_field is cls.login_datetime and isinstance(cursor_value, str):
+            cursor_value = datetime.strptime(cursor_value, "%Y-%m-%d %H:%M:%S")
+
+        if descending:
+            id_condition = cls.id < cursor["id"]
+            if sort_field is cls.id:
+                return id_condition
+            return (sort_field < cursor_value) | (
+                (sort_field == cursor_value) & id_condition
+            )
+
+        id_condition = cls.id > cursor["id"]
+        if sort_field is cls.id:
+            return id_condition
+        return (sort_field > cursor_value) | (
+            (sort_field == cursor_value) & id_condition
+        )
+
+    @classmethod
+    def get_archive_model(cls, month: str):
+        """获取指定月份归档表对应的模型类，归档表与登录日志表结构一致"""
+
+        archive_model = _archive_models.get(month)
+        if archive_model is None:
+            archive_meta = type(
+                "Meta", (), {"table_name": get_archive_table_name(month)}
+            )
+            archive_model = type(
+                f"LoginLogsArchive{month}", (LoginLogs,), {"Meta": archive_meta}
+            )
+            _archive_models[month] = archive_model
+
+        return archive_model
+
+    @classmethod
+    def get_archive_months(cls) -> List[str]:
+        """获取已存在归档表的月份列表"""
+
+        with connection_scope():
+            return parse_archive_months(db.get_tables())
+
+    @classmethod
+    def purge_logs(
+        cls,
+        before: datetime,
+        batch_size: int = 1000,
+        archive_mode: Literal["none", "table", "file"] = "none",
+        archive_dir: str = None,
+        batch_pause_seconds: float = 0,
+    ) -> int:
+        """分批清理登录时间早于before的日志记录，返回清理的记录数
+
+        每批记录在独立的短事务中完成归档与删除，批次之间可暂停片刻，避免长时间占用数据库写锁；
+        archive_mode为"table"时归档至月度归档表，为"file"时归档至archive_dir下的月度压缩文件
+        """
+
+        purged_count = 0
+        while True:
+            with connection_scope():
+                records = list(
+                    cls.select()
+                    .where(cls.login_datetime < before)
+                    .order_by(cls.login_datetime, cls.id)
+                    .limit(batch_size)
+                    .dicts()
+                )
+                if not records:
+                    break
+
+                # 先写入归档文件再删除，删除失败时重试只会产生重复归档而不会丢失记录
+                if archive_mode == "file":
+                    append_to_archive_files(records, archive_dir)
+
+                if archive_mode == "table":
+                    records_by_month = {}
+                    for record in records:
+                        records_by_month.setdefault(
+                            get_archive_month(record["login_datetime"]), []
+                        ).append(record)
+                    db.create_tables(
+                        [cls.get_archive_model(month) for month in records_by_month]
+                    )
+
+                with db.atomic():
+                    if archive_mode == "table":
+                        for month, month_records in records_by_month.items():
+                            for batch in chunked(month_records, 100):
+                                cls.get_archive_model(month).insert_many(
+                                    batch
+                                ).execute()
+
+                    deleted_count = execute_bulk_in(
+                        cls.id,
+                        [record["id"] for record in records],
+                        cls.delete().where,
+                    )
+
+            purged_count += deleted_count
+            login_logs_counter.adjust(-deleted_count)
+
+            if len(records) < batch_size:
+                break
+            time.sleep(batch_pause_seconds)
+
+        return purged_count
+
+    @classmethod
+    def purge_expired_logs(cls) -> int:
+        """按日志保留期限配置清理过期日志记录，未设置保留期限时不做处理"""
+
+        if LogConfig.login_logs_retention_days <= 0:
+            return 0
+
+        return cls.purge_logs(
+            before=datetime.now()
+            - timedelta(days=LogConfig.login_logs_retention_days),
+            batch_size=LogConfig.login_logs_purge_batch_size,
+            archive_mode=LogConfig.login_logs_archive_mode,
+            archive_dir=LogConfig.login_logs_archive_dir,
+            batch_pause_seconds=LogConfig.login_logs_purge_batch_pause_seconds,
+        )
 
     @classmethod
     def add_log(
@@ -86,7 +449,7 @@ class LoginLogs(BaseModel):
     ):
         """添加日志记录"""
 
-        with db.connection_context():
+        with connection_scope():
             # 执行日志记录添加操作
             with db.atomic():
                 cls.create(
@@ -98,23 +461,90 @@ class LoginLogs(BaseModel):
                     status=status,
                     login_datetime=login_datetime,
                 )
+                # 在同一事务中累加登录统计，保证统计数据与登录日志一致
+                LoginStats.increment_counts(
+                    aggregate_login_logs(
+                        [
+                            {
+                                "browser": browser,
+                                "os": os,
+                                "status": status,
+                                "login_datetime": login_datetime,
+                            }
+                        ]
+                    )
+                )
+
+        login_logs_counter.adjust(1)
+
+    @classmethod
+    def add_logs(cls, records: List[dict]):
+        """批量添加日志记录"""
+
+        with connection_scope():
+            with db.atomic():
+                # 分批插入，避免超出SQLite单条语句的参数数量上限
+                for batch in chunked(records, 100):
+                    cls.insert_many(batch).execute()
+                # 在同一事务中累加登录统计，保证统计数据与登录日志一致
+                LoginStats.increment_counts(aggregate_login_logs(records))
+
+        login_logs_counter.adjust(len(records))
+
+    @classmethod
+    def enqueue_log(
+        cls,
+        user_name: str,
+        user_id: str,
+        ip: str,
+        browser: str,
+        os: str,
+        status: str,
+        login_datetime: str,
+    ):
+        """提交日志记录至后台批量写入队列，不等待数据库写入完成"""
+
+        return login_logs_writer.submit(
+            {
+                "user_name": user_name,
+                "user_id": user_id,
+                "ip": ip,
+                "browser": browser,
+                "os": os,
+                "status": status,
+                "login_datetime": login_datetime,
+            }
+        )
 
     @classmethod
     def delete_logs(cls, log_ids: List[str]):
         """删除指定日志记录"""
 
-        with db.connection_context():
-            with db.atomic():
-                cls.delete().where(cls.id << log_ids).execute()
+        deleted_count = execute_bulk_in(cls.id, log_ids, cls.delete().where)
+
+        login_logs_counter.adjust(-deleted_count)
 
     @classmethod
     def truncate_logs(cls):
         """清空日志记录"""
 
-        with db.connection_context():
+        with connection_scope():
             with db.atomic():
                 cls.delete().execute()
 
+        login_logs_counter.reset(0)
+
 
 # 创建表（如果表不存在）
 db.create_tables([LoginLogs])
+
+# 登录日志后台批量写入器
+login_logs_writer = BatchedWriter(
+    LoginLogs.add_logs,
+    batch_size=LogConfig.login_logs_batch_size,
+    flush_interval_seconds=LogConfig.login_logs_flush_interval_seconds,
+    max_queue_size=LogConfig.login_logs_queue_max_size,
+    put_timeout_seconds=LogConfig.login_logs_queue_put_timeout_seconds,
+    synchronous=not LogConfig.login_logs_async_write,
+    thread_name="login-logs-writer",
+)
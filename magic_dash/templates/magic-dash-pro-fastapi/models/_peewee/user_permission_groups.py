@@ -1,10 +1,19 @@
 from peewee import BooleanField, CharField
+from types import MappingProxyType
 from typing import Union, Dict, List
 from playhouse.sqlite_ext import JSONField
 
-from . import db, BaseModel
+from . import db, BaseModel, connection_scope
+from .cache_versions import CacheVersions
+from ..access_policy import PathnameAccessPolicy
+from ..caches import (
+    access_policy_cache,
+    effective_roles_snapshot,
+    invalidate_permission_group_caches,
+)
 from ..exceptions import InvalidPermissionGroupError, ExistingPermissionGroupError
 from ..schema_contract import TABLE_NAMES
+from ..unit_of_work import run_after_transaction
 from configs import AuthConfig, RouterConfig
 
 
@@ -38,7 +47,7 @@ class UserPermissionGroups(BaseModel):
     def ensure_table(cls):
         """确保用户权限分组表存在，用于兼容已初始化过的旧数据库"""
 
-        with db.connection_context():
+        with connection_scope():
             if not cls.table_exists():
                 db.create_tables([cls])
 
@@ -73,10 +82,9 @@ class UserPermissionGroups(BaseModel):
         if any(not isinstance(item, str) for item in access_rule_keys):
             raise InvalidPermissionGroupError("权限规则keys必须为字符串列表")
 
+        valid_access_rule_keys = cls.get_valid_access_rule_keys()
         invalid_access_rule_keys = [
-            item
-            for item in access_rule_keys
-            if item not in cls.get_valid_access_rule_keys()
+            item for item in access_rule_keys if item not in valid_access_rule_keys
         ]
         if invalid_access_rule_keys:
             raise InvalidPermissionGroupError(
@@ -103,7 +111,13 @@ class UserPermissionGroups(BaseModel):
 
     @classmethod
     def get_effective_roles(cls):
-        """获取配置参数与数据库综合后的有效用户角色信息"""
+        """获取配置参数与数据库综合后的有效用户角色信息，返回只读快照"""
+
+        return effective_roles_snapshot.get_or_build(cls.build_effective_roles)
+
+    @classmethod
+    def build_effective_roles(cls):
+        """查询数据库并构建有效用户角色只读快照"""
 
         database_permission_groups = {
             item["permission_group_id"]: item
@@ -145,7 +159,12 @@ class UserPermissionGroups(BaseModel):
                 "is_builtin": permission_group["is_builtin"],
             }
 
-        return effective_roles
+        return MappingProxyType(
+            {
+                role_id: MappingProxyType(role_info)
+                for role_id, role_info in effective_roles.items()
+            }
+        )
 
     @staticmethod
     def get_config_role_names(exclude_role_id: str = None):
@@ -269,7 +288,7 @@ class UserPermissionGroups(BaseModel):
 
         from .users import Users
 
-        with db.connection_context():
+        with connection_scope():
             if not Users.table_exists():
                 return 0
 
@@ -323,6 +342,16 @@ class UserPermissionGroups(BaseModel):
             match_group.access_rule_keys,
         )
 
+    @classmethod
+    def get_pathname_access_policy(cls, permission_group_id: str):
+        """获取指定角色预编译的页面访问策略，角色无效时返回None"""
+
+        def load_policy():
+            access_rule = cls.get_effective_pathname_access_rule(permission_group_id)
+            return PathnameAccessPolicy(access_rule) if access_rule else None
+
+        return access_policy_cache.get_or_load(permission_group_id, load_policy)
+
     @classmethod
     def get_effective_pathname_access_rules(cls):
         """获取配置参数与数据库综合后的全部页面访问规则"""
@@ -437,7 +466,7 @@ class UserPermissionGroups(BaseModel):
             return None
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.permission_group_id == permission_group_id)
 
     @classmethod
@@ -449,7 +478,7 @@ class UserPermissionGroups(BaseModel):
             return None
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.permission_group_name == permission_group_name)
 
     @classmethod
@@ -457,7 +486,7 @@ class UserPermissionGroups(BaseModel):
         """获取所有用户权限分组信息"""
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             return list(cls.select().dicts())
 
     @classmethod
@@ -477,7 +506,7 @@ class UserPermissionGroups(BaseModel):
         access_rule = cls.normalize_access_rule(access_rule_type, access_rule_keys)
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             # 若必要权限分组信息不完整
             if not (permission_group_id and permission_group_name):
                 raise InvalidPermissionGroupError("权限分组信息不完整")
@@ -514,6 +543,10 @@ class UserPermissionGroups(BaseModel):
                     is_builtin=is_builtin,
                     other_info=other_info,
                 )
+                CacheVersions.bump_versions(["permission_groups"])
+
+        # 事务提交后使权限分组相关缓存失效
+        run_after_transaction(invalidate_permission_group_caches)
 
     @classmethod
     def upsert_permission_group(
@@ -541,7 +574,7 @@ class UserPermissionGroups(BaseModel):
             raise InvalidPermissionGroupError("硬编码权限组不允许通过新增操作覆盖")
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             duplicate_group = cls.get_or_none(
                 (cls.permission_group_name == permission_group_name)
                 & (cls.permission_group_id != permission_group_id)
@@ -576,6 +609,9 @@ class UserPermissionGroups(BaseModel):
                         is_builtin=is_builtin,
                         other_info=other_info,
                     )
+                CacheVersions.bump_versions(["permission_groups"])
+
+            run_after_transaction(invalidate_permission_group_caches)
 
             return cls.get_or_none(cls.permission_group_id == permission_group_id)
 
@@ -593,7 +629,7 @@ class UserPermissionGroups(BaseModel):
             raise InvalidPermissionGroupError("权限分组信息不完整")
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             match_group = cls.get_or_none(
                 cls.permission_group_id == permission_group_id
             )
@@ -611,11 +647,16 @@ class UserPermissionGroups(BaseModel):
                 raise InvalidPermissionGroupError("权限分组已关联用户，不允许删除")
 
             with db.atomic():
-                return (
+                deleted_count = (
                     cls.delete()
                     .where(cls.permission_group_id == permission_group_id)
                     .execute()
                 )
+                CacheVersions.bump_versions(["permission_groups"])
+
+            run_after_transaction(invalidate_permission_group_caches)
+
+            return deleted_count
 
     @classmethod
     def truncate_permission_groups(
@@ -629,7 +670,7 @@ class UserPermissionGroups(BaseModel):
         # 若保险参数execute=True
         if execute:
             cls.ensure_table()
-            with db.connection_context():
+            with connection_scope():
                 with db.atomic():
                     query = cls.delete()
                     if not include_builtin:
@@ -648,6 +689,9 @@ class UserPermissionGroups(BaseModel):
                                 cls.permission_group_id.not_in(in_use_role_ids)
                             )
                     query.execute()
+                    CacheVersions.bump_versions(["permission_groups"])
+
+            run_after_transaction(invalidate_permission_group_caches)
 
     @classmethod
     def update_permission_group(
@@ -663,7 +707,7 @@ class UserPermissionGroups(BaseModel):
             raise InvalidPermissionGroupError("权限分组信息不完整")
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             match_group = cls.get_or_none(
                 cls.permission_group_id == permission_group_id
             )
@@ -712,6 +756,9 @@ class UserPermissionGroups(BaseModel):
                 cls.update(**kwargs).where(
                     cls.permission_group_id == permission_group_id
                 ).execute()
+                CacheVersions.bump_versions(["permission_groups"])
+
+            run_after_transaction(invalidate_permission_group_caches)
 
             # 返回成功更新后的用户权限分组信息
             return cls.get_or_none(cls.permission_group_id == permission_group_id)
@@ -1,13 +1,30 @@
-from peewee import CharField, JOIN
-from typing import Union, Dict, List
+from functools import partial
+from peewee import CharField, IntegrityError, JOIN, chunked, fn
+from typing import Callable, Union, Dict, List, Literal, Optional
 from playhouse.sqlite_ext import JSONField
 from werkzeug.security import check_password_hash
 
-from . import db, BaseModel
+from . import (
+    db,
+    BaseModel,
+    build_search_condition,
+    connection_scope,
+    execute_bulk_in,
+    search_index_exists,
+)
 from configs import AuthConfig
 from .departments import Departments
+from .cache_versions import CacheVersions
+from ..caches import CachedUser, user_cache
+from ..department_members import get_department_member_changes
 from ..exceptions import InvalidUserError, ExistingUserError
-from ..schema_contract import TABLE_NAMES
+from ..schema_contract import TABLE_INDEXES, TABLE_NAMES, TABLE_SEARCH_INDEXES
+from ..unit_of_work import run_after_transaction
+from ..user_import import (
+    USER_IMPORT_COLUMNS,
+    hash_passwords_serially,
+    validate_new_user_records,
+)
 from .user_permission_groups import UserPermissionGroups
 
 
@@ -42,19 +59,39 @@ class Users(BaseModel):
         # 显式声明表名，确保不同ORM引擎映射到同一张物理表
         database = db
         table_name = TABLE_NAMES["Users"]
+        # 按索引契约声明复合索引，Peewee默认以“表名_字段名”命名，与契约中的索引名称一致
+        indexes = tuple((columns, False) for columns in TABLE_INDEXES["Users"].values())
 
     @classmethod
     def get_user(cls, user_id: str):
         """根据用户id查询用户信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.user_id == user_id)
 
+    @classmethod
+    def get_cached_user(cls, user_id: str):
+        """根据用户id查询登录态所需的轻量用户信息，优先读取进程内缓存"""
+
+        def load_user():
+            with connection_scope():
+                row = (
+                    cls.select(
+                        cls.user_id, cls.user_name, cls.user_role, cls.session_token
+                    )
+                    .where(cls.user_id == user_id)
+                    .tuples()
+                    .first()
+                )
+                return CachedUser(*row) if row else None
+
+        return user_cache.get_or_load(user_id, load_user)
+
     @classmethod
     def get_user_by_name(cls, user_name: str):
         """根据用户名查询用户信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.user_name == user_name)
 
     @classmethod
@@ -65,21 +102,147 @@ class Users(BaseModel):
         if not user_email:
             return None
 
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.user_email == user_email)
 
     @classmethod
     def get_users_by_department_id(cls, department_id: str):
         """根据部门id查询用户信息"""
 
-        with db.connection_context():
+        with connection_scope():
             return list(cls.select().where(cls.department_id == department_id).dicts())
 
+    @classmethod
+    def get_department_member_counts(cls) -> Dict[str, int]:
+        """查询各部门自身的用户数量"""
+
+        with connection_scope():
+            return dict(
+                cls.select(cls.department_id, fn.COUNT(cls.user_id))
+                .where(cls.department_id.is_null(False))
+                .group_by(cls.department_id)
+                .tuples()
+            )
+
+    @classmethod
+    def get_subtree_member_counts(cls) -> Dict[str, int]:
+        """获取各部门及其全部后代部门的用户数量合计"""
+
+        return Departments.get_department_tree().rollup_counts(
+            cls.get_department_member_counts()
+        )
+
+    @classmethod
+    def get_users(
+        cls,
+        limit: int = None,
+        offset: int = None,
+        order_by: Literal["user_name", "user_email", "user_role"] = "user_name",
+        order: Literal["ascend", "descend"] = "ascend",
+        **filters,
+    ):
+        """条件性分页获取用户信息，携带所属部门名称且不包含密码散列值等敏感字段
+
+        筛选条件参数见filter_users_query()
+        """
+
+        with connection_scope():
+            descending = order == "descend"
+            # 以用户id作为次级排序键，保证邮箱等非唯一字段排序时分页结果稳定
+            order_fields = [getattr(cls, order_by or "user_name"), cls.user_id]
+            query = (
+                cls.select(
+                    cls.user_id,
+                    cls.user_name,
+                    cls.user_email,
+                    cls.user_role,
+                    cls.department_id,
+                    Departments.department_name,
+                )
+                .join(
+                    Departments,
+                    JOIN.LEFT_OUTER,
+                    on=(cls.department_id == Departments.department_id),
+                )
+                .order_by(
+                    *[field.desc() if descending else field for field in order_fields]
+                )
+            )
+            query = cls.filter_users_query(query, **filters)
+
+            # 若分页相关参数有效
+            if limit:
+                query = query.limit(limit)
+            if offset:
+                query = query.offset(offset)
+
+            return list(query.dicts())
+
+    @classmethod
+    def count_users(cls, **filters) -> int:
+        """统计符合筛选条件的用户数量，筛选条件参数见filter_users_query()"""
+
+        with connection_scope():
+            return cls.filter_users_query(cls.select(), **filters).count()
+
+    @classmethod
+    def filter_users_query(
+        cls,
+        query,
+        keyword: str = None,
+        user_name_keyword: str = None,
+        user_email_keyword: str = None,
+        user_roles: List[str] = None,
+        department_ids: List[str] = None,
+    ):
+        """为用户查询附加筛选条件
+
+        keyword为同时匹配用户名或邮箱的关键词；
+        user_name_keyword、user_email_keyword为用户名、邮箱关键词，存在文本检索索引时经由检索索引匹配；
+        user_roles、department_ids为用户角色、所属部门id的可选值，均可命中对应的复合索引
+        """
+
+        # 若用户名或邮箱关键词筛选条件有效
+        if keyword:
+            query = query.where(
+                cls.build_keyword_condition(cls.user_name, keyword)
+                | cls.build_keyword_condition(cls.user_email, keyword)
+            )
+        # 若用户名、邮箱关键词筛选条件有效
+        for field, field_keyword in [
+            (cls.user_name, user_name_keyword),
+            (cls.user_email, user_email_keyword),
+        ]:
+            if field_keyword:
+                query = query.where(cls.build_keyword_condition(field, field_keyword))
+        # 若用户角色筛选条件有效
+        if user_roles:
+            query = query.where(cls.user_role.in_(user_roles))
+        # 若所属部门筛选条件有效
+        if department_ids:
+            query = query.where(cls.department_id.in_(department_ids))
+
+        return query
+
+    @classmethod
+    def build_keyword_condition(cls, field, keyword: str):
+        """构造关键词筛选条件，存在文本检索索引时附加命中检索索引的条件"""
+
+        condition = field.contains(keyword)
+
+        index_name = TABLE_SEARCH_INDEXES["Users"][field.name]
+        if search_index_exists(cls._meta.table_name, index_name):
+            search_condition = build_search_condition(field, keyword, index_name)
+            if search_condition is not None:
+                condition = search_condition & condition
+
+        return condition
+
     @classmethod
     def get_all_users(cls, with_department_name: bool = False):
         """获取所有用户信息"""
 
-        with db.connection_context():
+        with connection_scope():
             # 若需要额外携带部门名称信息
             if with_department_name:
                 return list(
@@ -113,7 +276,7 @@ class Users(BaseModel):
     ):
         """添加用户"""
 
-        with db.connection_context():
+        with connection_scope():
             user_email = (user_email or "").strip() or None
 
             # 若必要用户信息不完整
@@ -148,11 +311,112 @@ class Users(BaseModel):
                     other_info=other_info,
                 )
 
+    @classmethod
+    def check_new_users(cls, records: List[dict]) -> Dict[int, str]:
+        """一次性校验全部待导入用户，返回校验失败记录的下标及对应错误信息
+
+        已有用户id、用户名、邮箱仅查询一次并载入内存集合，不再逐条记录查询数据库
+        """
+
+        with connection_scope():
+            existing_users = list(
+                cls.select(cls.user_id, cls.user_name, cls.user_email).tuples()
+            )
+
+        return validate_new_user_records(
+            records,
+            existing_user_ids=(user_id for user_id, _, _ in existing_users),
+            existing_user_names=(user_name for _, user_name, _ in existing_users),
+            existing_user_emails=(
+                user_email for _, _, user_email in existing_users if user_email
+            ),
+            valid_roles=UserPermissionGroups.get_effective_roles(),
+            valid_department_ids=Departments.get_department_tree().parents,
+            default_role=AuthConfig.normal_role,
+        )
+
+    @classmethod
+    def add_users(cls, records: List[dict], batch_size: int = 1000) -> Dict[int, str]:
+        """分批次写入已通过校验的用户信息，返回写入失败记录的下标及对应错误信息
+
+        每个批次使用独立事务，批次写入失败时逐条重试该批次记录，定位与并发写入冲突的具体记录
+        """
+
+        errors = {}
+        with connection_scope():
+            for start in range(0, len(records), batch_size):
+                batch = [
+                    {
+                        **{column: record.get(column) for column in USER_IMPORT_COLUMNS},
+                        "user_role": record.get("user_role") or AuthConfig.normal_role,
+                    }
+                    for record in records[start : start + batch_size]
+                ]
+                try:
+                    with db.atomic():
+                        # 分批插入，避免超出SQLite单条语句的参数数量上限
+                        for rows in chunked(batch, 100):
+                            cls.insert_many(rows).execute()
+                except IntegrityError:
+                    for index, row in enumerate(batch, start=start):
+                        try:
+                            with db.atomic():
+                                cls.insert(row).execute()
+                        except IntegrityError:
+                            errors[index] = "用户id、用户名或邮箱已被其他用户使用"
+
+        return errors
+
+    @classmethod
+    def import_users(
+        cls,
+        records: List[dict],
+        password_hasher: Callable[[List[str]], List[str]] = None,
+        batch_size: int = 1000,
+        on_batch_imported: Callable[[int, int, Dict[int, str]], bool] = None,
+    ) -> Dict[int, str]:
+        """批量导入携带明文密码password的用户信息，返回导入失败记录的下标及对应错误信息
+
+        先一次性校验全部记录，再逐批为校验通过的记录计算密码散列值并以独立事务写入；
+        password_hasher用于批量计算密码散列值，默认在当前进程中逐个计算；
+        on_batch_imported在每个批次写入后以已处理、待处理的校验通过记录数及当前错误信息调用，
+        返回False时不再导入后续批次
+        """
+
+        errors = cls.check_new_users(records)
+        valid_indexes = [index for index in range(len(records)) if index not in errors]
+
+        for start in range(0, len(valid_indexes), batch_size):
+            batch_indexes = valid_indexes[start : start + batch_size]
+            password_hashes = (password_hasher or hash_passwords_serially)(
+                [records[index]["password"] for index in batch_indexes]
+            )
+            insert_errors = cls.add_users(
+                [
+                    {**records[index], "password_hash": password_hash}
+                    for index, password_hash in zip(batch_indexes, password_hashes)
+                ],
+                batch_size=batch_size,
+            )
+            errors.update(
+                {batch_indexes[index]: error for index, error in insert_errors.items()}
+            )
+
+            if on_batch_imported is not None and (
+                on_batch_imported(
+                    start + len(batch_indexes), len(valid_indexes), errors
+                )
+                is False
+            ):
+                break
+
+        return errors
+
     @classmethod
     def delete_user(cls, user_id: str):
         """删除用户"""
 
-        with db.connection_context():
+        with connection_scope():
             with db.atomic():
                 from .otp_credentials import OtpCredentials
 
@@ -161,6 +425,9 @@ class Users(BaseModel):
                         OtpCredentials.user_id == user_id
                     ).execute()
                 cls.delete().where(cls.user_id == user_id).execute()
+                CacheVersions.bump_versions(["users"])
+
+        run_after_transaction(partial(user_cache.invalidate, user_id))
 
     @classmethod
     def truncate_users(cls, execute: bool = False):
@@ -168,19 +435,76 @@ class Users(BaseModel):
 
         # 若保险参数execute=True
         if execute:
-            with db.connection_context():
+            with connection_scope():
                 with db.atomic():
                     from .otp_credentials import OtpCredentials
 
                     if OtpCredentials.table_exists():
                         OtpCredentials.delete().execute()
                     cls.delete().execute()
+                    CacheVersions.bump_versions(["users"])
+
+            run_after_transaction(user_cache.clear)
+
+    @classmethod
+    def get_login_user(
+        cls, user_name: str = None, user_email: str = None
+    ) -> Optional[dict]:
+        """按用户名或邮箱以单次查询获取登录校验所需的用户信息，用户不存在时返回None"""
+
+        if user_name:
+            condition = cls.user_name == user_name
+        else:
+            user_email = (user_email or "").strip()
+            if not user_email:
+                return None
+            condition = cls.user_email == user_email
+
+        with connection_scope():
+            return (
+                cls.select(
+                    cls.user_id,
+                    cls.user_name,
+                    cls.user_role,
+                    cls.password_hash,
+                )
+                .where(condition)
+                .dicts()
+                .first()
+            )
+
+    @classmethod
+    def rotate_session_token(
+        cls, user_id: str, session_token: str, password_hash: str = None
+    ) -> bool:
+        """以单条条件更新语句轮换用户会话token，返回是否更新成功
+
+        传入password_hash时，仅当密码未在登录校验之后被修改时更新
+        """
+
+        condition = cls.user_id == user_id
+        if password_hash is not None:
+            condition &= cls.password_hash == password_hash
+
+        with connection_scope():
+            with db.atomic():
+                updated = (
+                    cls.update(session_token=session_token).where(condition).execute()
+                )
+                if updated:
+                    CacheVersions.bump_versions(["users"])
+
+            if updated:
+                # 事务提交后使登录态缓存失效，确保旧会话token立即失效
+                run_after_transaction(partial(user_cache.invalidate, user_id))
+
+        return bool(updated)
 
     @classmethod
     def update_user(cls, user_id: str, **kwargs):
         """更新用户信息"""
 
-        with db.connection_context():
+        with connection_scope():
             if "user_email" in kwargs:
                 user_email = (kwargs["user_email"] or "").strip() or None
                 kwargs["user_email"] = user_email
@@ -202,6 +526,10 @@ class Users(BaseModel):
 
             with db.atomic():
                 cls.update(**kwargs).where(cls.user_id == user_id).execute()
+                CacheVersions.bump_versions(["users"])
+
+            # 事务提交后使登录态缓存失效，确保角色、会话token变更立即生效
+            run_after_transaction(partial(user_cache.invalidate, user_id))
 
             # 返回成功更新后的用户信息
             return cls.get_or_none(cls.user_id == user_id)
@@ -212,28 +540,34 @@ class Users(BaseModel):
         department_id: str,
         origin_user_ids: list = None,
         target_user_ids: list = None,
+        added_user_ids: list = None,
+        removed_user_ids: list = None,
     ):
-        """更改用户所属部门"""
+        """更改用户所属部门
+
+        可传入调整前后的完整成员列表origin_user_ids、target_user_ids，
+        也可仅传入本次移入、移出的用户id差异added_user_ids、removed_user_ids
+        """
 
-        with db.connection_context():
+        added_user_ids, removed_user_ids = get_department_member_changes(
+            origin_user_ids, target_user_ids, added_user_ids, removed_user_ids
+        )
+
+        with connection_scope():
             with db.atomic():
-                # 将本次操作被移出部门的用户所属部门更新为空
-                (
-                    cls.update(department_id=None)
-                    .where(
-                        cls.user_id
-                        << [
-                            user_id
-                            for user_id in origin_user_ids
-                            if user_id not in target_user_ids
-                        ]
-                    )
-                    .execute()
+                # 将本次操作被移出部门的用户所属部门更新为空，已被调整至其他部门的用户保持不变
+                execute_bulk_in(
+                    cls.user_id,
+                    removed_user_ids,
+                    lambda condition: cls.update(department_id=None).where(
+                        condition, cls.department_id == department_id
+                    ),
                 )
 
                 # 将本次操作被移入部门的用户所属部门更新为目标部门
-                (
-                    cls.update(department_id=department_id)
-                    .where(cls.user_id << target_user_ids)
-                    .execute()
+                execute_bulk_in(
+                    cls.user_id,
+                    added_user_ids,
+                    cls.update(department_id=department_id).where,
                 )
+
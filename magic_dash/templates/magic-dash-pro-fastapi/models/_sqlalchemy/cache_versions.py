@@ -0,0 +1,66 @@
+from typing import List
+
+from sqlalchemy import BigInteger, String, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import BaseModel, create_tables, session_scope
+from ..caches import CACHE_ENTITY_TYPES, cache_invalidation_bus
+from ..schema_contract import TABLE_NAMES
+
+
+class CacheVersions(BaseModel):
+    """SQLAlchemy版缓存版本表模型"""
+
+    __tablename__ = TABLE_NAMES["CacheVersions"]
+
+    entity_type: Mapped[str] = mapped_column(String(255), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    @classmethod
+    def ensure_table(cls):
+        """确保缓存版本表存在，并补齐各实体类型对应的版本记录"""
+
+        if not cls.table_exists():
+            create_tables([cls])
+
+        try:
+            with session_scope() as session:
+                existing_entity_types = set(session.scalars(select(cls.entity_type)))
+                session.add_all(
+                    [
+                        cls(entity_type=entity_type, version=0)
+                        for entity_type in CACHE_ENTITY_TYPES
+                        if entity_type not in existing_entity_types
+                    ]
+                )
+        except IntegrityError:
+            # 其他进程已并发补齐版本记录
+            pass
+
+    @classmethod
+    def get_versions(cls):
+        """获取全部实体类型当前的缓存版本号"""
+
+        with session_scope() as session:
+            return dict(session.execute(select(cls.entity_type, cls.version)).all())
+
+    @classmethod
+    def bump_versions(cls, session, entity_types: List[str]):
+        """递增指定实体类型的缓存版本号，需传入对应写操作所在的会话以保证同事务提交"""
+
+        session.execute(
+            update(cls)
+            .where(cls.entity_type.in_(entity_types))
+            .values(version=cls.version + 1)
+        )
+
+    @classmethod
+    def sync_local_caches(cls):
+        """按检查间隔对比缓存版本号，清理已被其他进程更新的本地缓存"""
+
+        cache_invalidation_bus.sync(cls.get_versions)
+
+
+# 保持与登录日志表一致的导入时建表行为
+CacheVersions.ensure_table()
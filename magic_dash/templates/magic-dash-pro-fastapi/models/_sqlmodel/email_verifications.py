@@ -2,11 +2,11 @@ import math
 import secrets
 from datetime import datetime, timedelta
 
-from sqlalchemy import Column, DateTime, String, delete, select, update
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import Column, DateTime, String, delete, exists, select, update
 from sqlmodel import Field
 
-from . import BaseModel, session_scope
+from configs.database_config import DatabaseConfig
+from . import BaseModel, dialect_insert, session_scope, supports_returning
 from ..schema_contract import TABLE_NAMES
 
 
@@ -46,9 +46,47 @@ class EmailVerifications(BaseModel, table=True):
         with session_scope() as session:
             return session.get(cls, email)
 
+    @classmethod
+    def _insert_or_lock_verification(
+        cls, session, email: str, verification_code: str, generated_at: datetime
+    ):
+        """邮箱不存在验证码记录时插入新记录，否则不修改并锁定已有记录，返回当前记录
+
+        以冲突时空更新的单条语句实现，数据库支持RETURNING时无需额外查询
+        """
+
+        statement = dialect_insert(cls).values(
+            email=email,
+            verification_code=verification_code,
+            generated_at=generated_at,
+        )
+        if DatabaseConfig.database_type == "mysql":
+            statement = statement.on_duplicate_key_update(
+                verification_code=cls.verification_code
+            )
+        else:
+            statement = statement.on_conflict_do_update(
+                index_elements=[cls.email],
+                set_={"verification_code": cls.verification_code},
+            )
+
+        if supports_returning():
+            return session.execute(
+                statement.returning(cls.verification_code, cls.generated_at)
+            ).one()
+
+        session.execute(statement)
+        return session.execute(
+            select(cls.verification_code, cls.generated_at).where(cls.email == email)
+        ).one()
+
     @classmethod
     def issue_verification(cls, email: str, resend_interval_seconds: int):
-        """签发验证码，通过条件更新避免并发请求互相覆盖"""
+        """签发验证码，并返回被替换旧记录的快照供邮件发送失败时安全恢复
+
+        首次签发及等待时间内的重复请求均只需执行一条语句，替换已过等待时间的旧记录时
+        额外执行一条更新语句
+        """
 
         email = (email or "").strip()
         if not email:
@@ -59,67 +97,57 @@ class EmailVerifications(BaseModel, table=True):
         )
 
         verification_code = cls.generate_code()
+        generated_at = datetime.now()
+        if DatabaseConfig.database_type == "mysql":
+            # MySQL的DATETIME字段不保存微秒，保证与回查记录一致
+            generated_at = generated_at.replace(microsecond=0)
+        verification = cls(
+            email=email,
+            verification_code=verification_code,
+            generated_at=generated_at,
+        )
 
-        for _ in range(3):
-            generated_at = datetime.now()
-            resend_before = generated_at - timedelta(seconds=resend_interval_seconds)
-
-            with session_scope() as session:
-                previous_verification = session.get(cls, email)
-                if previous_verification:
-                    remaining_seconds = cls._get_record_remaining_seconds(
-                        previous_verification,
-                        resend_interval_seconds,
-                    )
-                    if remaining_seconds > 0:
-                        return None, remaining_seconds, None
-
-                    previous_snapshot = cls(
-                        email=previous_verification.email,
-                        verification_code=previous_verification.verification_code,
-                        generated_at=previous_verification.generated_at,
-                    )
-                    updated_count = (
-                        session.execute(
-                            update(cls)
-                            .where(
-                                (cls.email == email)
-                                & (
-                                    cls.verification_code
-                                    == previous_verification.verification_code
-                                )
-                                & (
-                                    cls.generated_at
-                                    == previous_verification.generated_at
-                                )
-                                & (cls.generated_at <= resend_before)
-                            )
-                            .values(
-                                verification_code=verification_code,
-                                generated_at=generated_at,
-                            )
-                        ).rowcount
-                        or 0
-                    )
-                    if updated_count:
-                        session.flush()
-                        return session.get(cls, email), 0, previous_snapshot
-                    continue
-
-                try:
-                    verification = cls(
-                        email=email,
-                        verification_code=verification_code,
-                        generated_at=generated_at,
-                    )
-                    session.add(verification)
-                    session.flush()
-                    return verification, 0, None
-                except IntegrityError:
-                    session.rollback()
-                    continue
-
-        raise RuntimeError("邮箱验证码签发失败，请稍后重试")
+        with session_scope() as session:
+            current_verification = cls._insert_or_lock_verification(
+                session,
+                email,
+                verification_code,
+                generated_at,
+            )
+
+            # 本次插入的新记录
+            if (
+                current_verification.verification_code == verification_code
+                and current_verification.generated_at == generated_at
+            ):
+                return verification, 0, None
+
+            remaining_seconds = cls._get_record_remaining_seconds(
+                current_verification,
+                resend_interval_seconds,
+            )
+            if remaining_seconds > 0:
+                return None, remaining_seconds, None
+
+            # 旧记录已在本事务中锁定，可直接替换，不会与并发请求互相覆盖
+            session.execute(
+                update(cls)
+                .where(cls.email == email)
+                .values(
+                    verification_code=verification_code,
+                    generated_at=generated_at,
+                )
+            )
+
+            return (
+                verification,
+                0,
+                cls(
+                    email=email,
+                    verification_code=current_verification.verification_code,
+                    generated_at=current_verification.generated_at,
+                ),
+            )
 
     @classmethod
     def get_resend_remaining_seconds(
@@ -146,46 +174,41 @@ class EmailVerifications(BaseModel, table=True):
         verification_code: str,
         expire_seconds: int,
     ):
-        """校验验证码，成功或过期时消费对应记录"""
+        """校验验证码，成功或过期时以单条DELETE ... RETURNING语句消费对应记录"""
 
         email = (email or "").strip()
         verification_code = (verification_code or "").strip()
         cls._validate_seconds(expire_seconds, "邮箱验证码有效期")
+        expire_before = datetime.now() - timedelta(seconds=expire_seconds)
+        consumable_filter = (cls.email == email) & (
+            (cls.verification_code == verification_code)
+            | (cls.generated_at <= expire_before)
+        )
 
-        for _ in range(3):
-            verification = cls.get_verification(email)
-            if not verification:
-                return "not_found"
+        with session_scope() as session:
+            if supports_returning():
+                consumed_generated_at = session.execute(
+                    delete(cls).where(consumable_filter).returning(cls.generated_at)
+                ).scalar()
+            else:
+                consumed_generated_at = session.execute(
+                    select(cls.generated_at).where(consumable_filter).with_for_update()
+                ).scalar()
+                if consumed_generated_at and not (
+                    session.execute(delete(cls).where(consumable_filter)).rowcount
+                ):
+                    consumed_generated_at = None
 
-            remaining_seconds = cls._get_record_remaining_seconds(
-                verification,
-                expire_seconds,
-            )
-            if remaining_seconds <= 0:
-                deleted_count = cls.delete_verification(
-                    email,
-                    verification.verification_code,
-                    verification.generated_at,
-                )
-                if deleted_count:
+            if consumed_generated_at:
+                if consumed_generated_at <= expire_before:
                     return "expired"
-                continue
+                return "valid"
 
-            if not secrets.compare_digest(
-                verification.verification_code,
-                verification_code,
-            ):
+            # 未消费任何记录时，区分验证码错误与记录不存在
+            if session.execute(select(exists().where(cls.email == email))).scalar():
                 return "invalid"
 
-            deleted_count = cls.delete_verification(
-                email,
-                verification.verification_code,
-                verification.generated_at,
-            )
-            if deleted_count:
-                return "valid"
-
-        return "invalid"
+            return "not_found"
 
     @classmethod
     def rollback_issued_verification(cls, verification, previous_verification=None):
@@ -227,3 +250,18 @@ class EmailVerifications(BaseModel, table=True):
             if generated_at:
                 query = query.where(cls.generated_at == generated_at)
             return session.execute(query).rowcount or 0
+
+    @classmethod
+    def delete_expired_verifications(cls, expire_seconds: int) -> int:
+        """删除已超过有效期的验证码记录，返回删除的记录数"""
+
+        cls._validate_seconds(expire_seconds, "邮箱验证码有效期")
+        expire_before = datetime.now() - timedelta(seconds=expire_seconds)
+
+        with session_scope() as session:
+            return (
+                session.execute(
+                    delete(cls).where(cls.generated_at <= expire_before)
+                ).rowcount
+                or 0
+            )
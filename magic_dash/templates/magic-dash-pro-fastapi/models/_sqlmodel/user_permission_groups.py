@@ -1,3 +1,4 @@
+from types import MappingProxyType
 from typing import Any, Dict, List, Optional, Union
 
 from sqlalchemy import Boolean, Column, JSON, String, delete, func, select, update
@@ -5,8 +6,16 @@ from sqlmodel import Field
 
 from configs import AuthConfig, RouterConfig
 from . import BaseModel, create_tables, object_to_dict, session_scope
+from .cache_versions import CacheVersions
+from ..access_policy import PathnameAccessPolicy
+from ..caches import (
+    access_policy_cache,
+    effective_roles_snapshot,
+    invalidate_permission_group_caches,
+)
 from ..exceptions import ExistingPermissionGroupError, InvalidPermissionGroupError
 from ..schema_contract import TABLE_NAMES
+from ..unit_of_work import run_after_transaction
 
 
 class UserPermissionGroups(BaseModel, table=True):
@@ -67,10 +76,9 @@ class UserPermissionGroups(BaseModel, table=True):
         if any(not isinstance(item, str) for item in access_rule_keys):
             raise InvalidPermissionGroupError("权限规则keys必须为字符串列表")
 
+        valid_access_rule_keys = cls.get_valid_access_rule_keys()
         invalid_access_rule_keys = [
-            item
-            for item in access_rule_keys
-            if item not in cls.get_valid_access_rule_keys()
+            item for item in access_rule_keys if item not in valid_access_rule_keys
         ]
         if invalid_access_rule_keys:
             raise InvalidPermissionGroupError(
@@ -92,7 +100,13 @@ class UserPermissionGroups(BaseModel, table=True):
 
     @classmethod
     def get_effective_roles(cls):
-        """获取配置参数与数据库综合后的有效用户角色信息"""
+        """获取配置参数与数据库综合后的有效用户角色信息，返回只读快照"""
+
+        return effective_roles_snapshot.get_or_build(cls.build_effective_roles)
+
+    @classmethod
+    def build_effective_roles(cls):
+        """查询数据库并构建有效用户角色只读快照"""
 
         database_permission_groups = {
             item["permission_group_id"]: item
@@ -128,7 +142,12 @@ class UserPermissionGroups(BaseModel, table=True):
                 "is_builtin": permission_group["is_builtin"],
             }
 
-        return effective_roles
+        return MappingProxyType(
+            {
+                role_id: MappingProxyType(role_info)
+                for role_id, role_info in effective_roles.items()
+            }
+        )
 
     @staticmethod
     def get_config_role_names(exclude_role_id: str = None):
@@ -259,6 +278,16 @@ class UserPermissionGroups(BaseModel, table=True):
             match_group.access_rule_keys,
         )
 
+    @classmethod
+    def get_pathname_access_policy(cls, permission_group_id: str):
+        """获取指定角色预编译的页面访问策略，角色无效时返回None"""
+
+        def load_policy():
+            access_rule = cls.get_effective_pathname_access_rule(permission_group_id)
+            return PathnameAccessPolicy(access_rule) if access_rule else None
+
+        return access_policy_cache.get_or_load(permission_group_id, load_policy)
+
     @classmethod
     def get_effective_pathname_access_rules(cls):
         effective_rules = {}
@@ -422,6 +451,10 @@ class UserPermissionGroups(BaseModel, table=True):
                     other_info=other_info,
                 )
             )
+            CacheVersions.bump_versions(session, ["permission_groups"])
+
+        # 事务提交后使权限分组相关缓存失效
+        run_after_transaction(invalidate_permission_group_caches)
 
     @classmethod
     def upsert_permission_group(
@@ -480,8 +513,13 @@ class UserPermissionGroups(BaseModel, table=True):
                 )
             else:
                 session.add(cls(permission_group_id=permission_group_id, **values))
+            CacheVersions.bump_versions(session, ["permission_groups"])
             session.flush()
-            return session.get(cls, permission_group_id)
+            permission_group = session.get(cls, permission_group_id)
+
+        run_after_transaction(invalidate_permission_group_caches)
+
+        return permission_group
 
     @classmethod
     def delete_permission_group(
@@ -511,7 +549,11 @@ class UserPermissionGroups(BaseModel, table=True):
             result = session.execute(
                 delete(cls).where(cls.permission_group_id == permission_group_id)
             )
-            return result.rowcount or 0
+            CacheVersions.bump_versions(session, ["permission_groups"])
+
+        run_after_transaction(invalidate_permission_group_caches)
+
+        return result.rowcount or 0
 
     @classmethod
     def truncate_permission_groups(
@@ -537,6 +579,9 @@ class UserPermissionGroups(BaseModel, table=True):
                             cls.permission_group_id.not_in(in_use_role_ids)
                         )
                 session.execute(query)
+                CacheVersions.bump_versions(session, ["permission_groups"])
+
+            run_after_transaction(invalidate_permission_group_caches)
 
     @classmethod
     def update_permission_group(
@@ -593,8 +638,13 @@ class UserPermissionGroups(BaseModel, table=True):
                 .where(cls.permission_group_id == permission_group_id)
                 .values(**kwargs)
             )
+            CacheVersions.bump_versions(session, ["permission_groups"])
             session.flush()
-            return session.get(cls, permission_group_id)
+            permission_group = session.get(cls, permission_group_id)
+
+        run_after_transaction(invalidate_permission_group_caches)
+
+        return permission_group
 
     @classmethod
     def columns(cls):
@@ -0,0 +1,81 @@
+import re
+from typing import Iterable
+
+from configs import RouterConfig
+
+
+def compile_wildcard_patterns(patterns: Iterable[re.Pattern]):
+    """将多个通配页面正则按flags分组合并为多选分支正则，减少逐个匹配的次数"""
+
+    grouped_sources = {}
+    for pattern in patterns:
+        grouped_sources.setdefault(pattern.flags, []).append(pattern.pattern)
+
+    compiled_patterns = []
+    for flags, sources in grouped_sources.items():
+        if len(sources) == 1:
+            compiled_patterns.append(re.compile(sources[0], flags))
+            continue
+
+        try:
+            compiled_patterns.append(
+                re.compile("|".join(f"(?:{source})" for source in sources), flags)
+            )
+        except re.error:
+            # 含全局内联flags等无法合并的正则，退回逐个匹配
+            compiled_patterns.extend(re.compile(source, flags) for source in sources)
+
+    return tuple(compiled_patterns)
+
+
+class PathnameMatcher:
+    """预编译的页面地址匹配器，字面量地址走集合查找，通配地址走合并后的正则"""
+
+    __slots__ = ("literal_pathnames", "wildcard_patterns")
+
+    def __init__(self, keys: Iterable = None):
+        keys = list(keys or [])
+        self.literal_pathnames = frozenset(key for key in keys if isinstance(key, str))
+        self.wildcard_patterns = compile_wildcard_patterns(
+            key for key in keys if isinstance(key, re.Pattern)
+        )
+
+    def match(self, pathname: str) -> bool:
+        """判断页面地址是否命中任一字面量地址或通配正则"""
+
+        if pathname in self.literal_pathnames:
+            return True
+
+        return any(pattern.match(pathname) for pattern in self.wildcard_patterns)
+
+
+class PathnameAccessPolicy:
+    """由标准化页面访问规则编译得到的角色页面访问策略
+
+    与root_router、侧边菜单及页面搜索选项共用同一判断逻辑，
+    仅在权限分组变更后重新编译。
+    """
+
+    __slots__ = ("rule", "rule_type", "matcher")
+
+    def __init__(self, rule: dict):
+        self.rule = rule
+        self.rule_type = rule["type"]
+        self.matcher = PathnameMatcher(
+            rule.get("keys", []) if self.rule_type != "all" else []
+        )
+
+    def allows(self, pathname: str) -> bool:
+        """判断当前策略是否允许访问指定页面地址"""
+
+        if self.rule_type == "include":
+            # 首页不受权限控制影响
+            return pathname in [
+                "/",
+                RouterConfig.index_pathname,
+            ] or self.matcher.match(pathname)
+
+        elif self.rule_type == "exclude":
+            return not self.matcher.match(pathname)
+
+        return True
@@ -0,0 +1,145 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 通知后台线程写完剩余数据后退出的哨兵对象
+_STOP = object()
+
+
+class BatchedWriter:
+    """后台批量写入器
+
+    写入请求进入进程内有界队列，由后台线程按批量大小或刷新间隔合并为一次批量写入，
+    调用方无需等待数据库写入完成；队列已满时在等待超时后丢弃本次写入并计数，
+    进程正常退出时会写完队列中剩余的数据。
+    synchronous为True时不启用后台线程，每次提交直接同步写入，便于测试及调试。
+    """
+
+    def __init__(
+        self,
+        write_batch,
+        batch_size: int,
+        flush_interval_seconds: float,
+        max_queue_size: int,
+        put_timeout_seconds: float = 0,
+        synchronous: bool = False,
+        thread_name: str = "batched-writer",
+    ):
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue_size = max_queue_size
+        self.put_timeout_seconds = put_timeout_seconds
+        self.synchronous = synchronous
+        self.thread_name = thread_name
+        self.dropped_count = 0
+        self.failed_count = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._exit_handler_registered = False
+
+    def submit(self, item) -> bool:
+        """提交一条待写入数据，队列已满且等待超时而被丢弃时返回False"""
+
+        if self.synchronous:
+            self.write_batch([item])
+            return True
+
+        self._ensure_started()
+        try:
+            if self.put_timeout_seconds > 0:
+                # 短暂阻塞调用方，以背压方式等待后台线程消费
+                self._queue.put(item, timeout=self.put_timeout_seconds)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped_count += 1
+            return False
+
+        return True
+
+    def flush(self):
+        """阻塞等待已提交的数据全部写入完成"""
+
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self, timeout: float = 10):
+        """写完队列中剩余的数据并停止后台线程"""
+
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        """惰性启动后台线程，fork得到的子进程中重新创建队列与线程"""
+
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+
+            # 子进程不会继承父进程的后台线程，父进程队列中的数据由父进程负责写入
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name=self.thread_name, daemon=True
+            )
+            self._thread.start()
+
+            if not self._exit_handler_registered:
+                atexit.register(self.close)
+                self._exit_handler_registered = True
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            stop = item is _STOP
+            batch = [] if stop else [item]
+
+            # 凑满批量大小或到达刷新间隔后统一写入
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while not stop and len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write(batch)
+
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+
+    def _write(self, batch):
+        try:
+            self.write_batch(batch)
+        except Exception:
+            # 单批写入失败不影响后台线程继续处理后续数据
+            with self._lock:
+                self.failed_count += len(batch)
+            logger.exception("Failed to write %d queued records", len(batch))
@@ -0,0 +1,290 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from configs import CacheConfig
+
+
+class CachedUser(NamedTuple):
+    """登录态所需的轻量用户信息"""
+
+    user_id: str
+    user_name: str
+    user_role: str
+    session_token: str
+
+
+class TTLCache:
+    """线程安全的进程内TTL+LRU缓存
+
+    写操作提交后调用invalidate()/clear()使缓存失效；
+    内部版本号保证写操作提交前发起的读取结果不会在失效之后被写回缓存。
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, key):
+        """读取未过期的缓存值，未命中时返回None"""
+
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def get_or_load(self, key, loader):
+        """优先读取缓存，未命中时调用loader加载并写入缓存，None结果不缓存"""
+
+        if not self.enabled:
+            return loader()
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        version = self._version
+        value = loader()
+        if value is not None:
+            with self._lock:
+                # 加载期间发生过失效操作时，放弃写回可能已过期的结果
+                if version == self._version:
+                    self._items[key] = (value, time.monotonic() + self.ttl_seconds)
+                    self._items.move_to_end(key)
+                    while len(self._items) > self.max_size:
+                        self._items.popitem(last=False)
+
+        return value
+
+    def invalidate(self, *keys):
+        """使指定key对应的缓存失效"""
+
+        with self._lock:
+            self._version += 1
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        """清空全部缓存"""
+
+        with self._lock:
+            self._version += 1
+            self._items.clear()
+
+
+class VersionedSnapshot:
+    """线程安全的版本化只读快照容器
+
+    快照构建完成后整体原子替换，稳态读取路径无锁且不访问数据库；
+    失效时递增版本号，失效前发起的构建结果不会被写回。
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get_or_build(self, builder):
+        """读取当前有效快照，不存在或已过期时调用builder构建并原子替换"""
+
+        if not self.enabled:
+            return builder()
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[1] > time.monotonic():
+            return snapshot[0]
+
+        version = self._version
+        value = builder()
+        with self._lock:
+            # 构建期间发生过失效操作时，放弃替换可能已过期的快照
+            if version == self._version:
+                self._snapshot = (value, time.monotonic() + self.ttl_seconds)
+
+        return value
+
+    def invalidate(self):
+        """使当前快照失效"""
+
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+
+class ApproximateRowCounter:
+    """线程安全的进程内数据表近似记录数
+
+    由模型的写操作按增量调整计数，读取时不再逐次执行COUNT(*)；
+    其他进程的写操作以及回滚造成的偏差，由按校准间隔重新获取的基准值修正。
+    """
+
+    def __init__(self, reconcile_interval_seconds: float):
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+        self._value = None
+        self._reconcile_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, count_loader, exact: bool = False) -> int:
+        """读取当前计数，尚无基准值、已到校准时间或要求精确计数时调用count_loader重新获取"""
+
+        with self._lock:
+            if (
+                not exact
+                and self._value is not None
+                and self._reconcile_at > time.monotonic()
+            ):
+                return self._value
+
+        value = count_loader(exact)
+        with self._lock:
+            self._value = value
+            self._reconcile_at = time.monotonic() + self.reconcile_interval_seconds
+
+        return value
+
+    def adjust(self, delta: int):
+        """按写操作影响的记录数调整计数，尚无基准值时不做处理"""
+
+        with self._lock:
+            if self._value is not None:
+                self._value = max(self._value + delta, 0)
+
+    def reset(self, value: int = 0):
+        """以已知的准确值重置计数，例如清空数据表之后"""
+
+        with self._lock:
+            self._value = value
+            self._reconcile_at = time.monotonic() + self.reconcile_interval_seconds
+
+
+class CacheInvalidationBus:
+    """基于数据库缓存版本表的跨进程缓存失效总线
+
+    各进程按检查间隔读取缓存版本表，发现某类实体版本号变化时，
+    调用该实体类型登记的失效回调清理本进程缓存，无需依赖会话粘滞或外部消息中间件。
+    """
+
+    def __init__(self, check_interval_seconds: float):
+        self.check_interval_seconds = check_interval_seconds
+        self._handlers = {}
+        self._known_versions = None
+        self._next_check_at = 0.0
+        self._lock = threading.Lock()
+
+    def subscribe(self, entity_type: str, handler):
+        """登记指定实体类型版本变化时需要执行的失效回调"""
+
+        self._handlers.setdefault(entity_type, []).append(handler)
+
+    def is_due(self) -> bool:
+        """判断是否已到下一次检查时间，供异步调用方决定是否需要切换线程执行检查"""
+
+        return time.monotonic() >= self._next_check_at
+
+    def sync(self, load_versions):
+        """按检查间隔拉取最新版本号，版本变化时执行对应失效回调"""
+
+        if not self.is_due():
+            return
+
+        # 同一时刻仅由一个线程执行检查，其余线程继续沿用当前缓存
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            if not self.is_due():
+                return
+
+            versions = load_versions()
+            for entity_type, handlers in self._handlers.items():
+                # 首次检查时无法确认本进程缓存的构建时机，统一清理一次
+                if self._known_versions is None or self._known_versions.get(
+                    entity_type
+                ) != versions.get(entity_type):
+                    for handler in handlers:
+                        handler()
+
+            self._known_versions = versions
+            self._next_check_at = time.monotonic() + self.check_interval_seconds
+        finally:
+            self._lock.release()
+
+
+# 供user_loader使用的登录态用户信息缓存，由Users模型的写操作负责失效
+user_cache = TTLCache(
+    max_size=CacheConfig.user_cache_max_size,
+    ttl_seconds=CacheConfig.user_cache_ttl_seconds,
+)
+
+# 按用户缓存的(共享密钥密文, TOTP实例)，由OtpCredentials模型的写操作负责失效
+# 缓存命中时仍需比对密文，确保其他进程重新绑定后不会沿用旧密钥
+otp_totp_cache = TTLCache(
+    max_size=CacheConfig.otp_totp_cache_max_size,
+    ttl_seconds=CacheConfig.otp_totp_cache_ttl_seconds,
+)
+
+# 角色预编译页面访问策略缓存，由UserPermissionGroups模型的写操作负责失效
+access_policy_cache = TTLCache(
+    max_size=CacheConfig.access_policy_cache_max_size,
+    ttl_seconds=CacheConfig.access_policy_cache_ttl_seconds,
+)
+
+# 配置参数与数据库综合后的有效用户角色快照，由UserPermissionGroups模型的写操作负责失效
+effective_roles_snapshot = VersionedSnapshot(
+    ttl_seconds=CacheConfig.effective_roles_snapshot_ttl_seconds,
+)
+
+# 部门层级索引快照，由Departments模型的写操作负责失效
+department_tree_snapshot = VersionedSnapshot(
+    ttl_seconds=CacheConfig.department_tree_snapshot_ttl_seconds,
+)
+
+
+# 登录日志表近似记录数，由LoginLogs模型的写操作负责增量调整
+login_logs_counter = ApproximateRowCounter(
+    reconcile_interval_seconds=CacheConfig.login_logs_count_reconcile_interval_seconds,
+)
+
+
+def invalidate_permission_group_caches():
+    """使全部依赖权限分组数据的进程内缓存失效"""
+
+    access_policy_cache.clear()
+    effective_roles_snapshot.invalidate()
+
+
+# 缓存版本表中登记的实体类型
+CACHE_ENTITY_TYPES = ["users", "permission_groups", "departments"]
+
+# 跨进程缓存失效总线，由CacheVersions模型负责读取与递增版本号
+cache_invalidation_bus = CacheInvalidationBus(
+    check_interval_seconds=CacheConfig.cache_versions_check_interval_seconds,
+)
+cache_invalidation_bus.subscribe("users", user_cache.clear)
+cache_invalidation_bus.subscribe("permission_groups", invalidate_permission_group_caches)
+cache_invalidation_bus.subscribe("departments", department_tree_snapshot.invalidate)
@@ -0,0 +1,37 @@
+from typing import List, Tuple
+
+
+def get_department_member_changes(
+    origin_user_ids: List[str] = None,
+    target_user_ids: List[str] = None,
+    added_user_ids: List[str] = None,
+    removed_user_ids: List[str] = None,
+) -> Tuple[List[str], List[str]]:
+    """计算部门人员调整涉及的移入、移出用户id
+
+    未直接传入移入、移出差异时，由调整前后的完整成员列表计算差异，
+    调整前后均属于当前部门的用户不再重复更新
+    """
+
+    if added_user_ids is None and removed_user_ids is None:
+        origin_user_ids = origin_user_ids or []
+        target_user_ids = target_user_ids or []
+        origin_user_id_set = set(origin_user_ids)
+        target_user_id_set = set(target_user_ids)
+        added_user_ids = [
+            user_id for user_id in target_user_ids if user_id not in origin_user_id_set
+        ]
+        removed_user_ids = [
+            user_id for user_id in origin_user_ids if user_id not in target_user_id_set
+        ]
+
+    # 同时出现在移入、移出差异中的用户以移入为准
+    added_user_ids = list(dict.fromkeys(added_user_ids or []))
+    added_user_id_set = set(added_user_ids)
+    removed_user_ids = [
+        user_id
+        for user_id in dict.fromkeys(removed_user_ids or [])
+        if user_id not in added_user_id_set
+    ]
+
+    return added_user_ids, removed_user_ids
@@ -0,0 +1,91 @@
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Iterable, List, Optional, Tuple
+
+from .schema_contract import TABLE_NAMES
+
+# 登录日志月度归档表名前缀，完整表名形如loginlogs_archive_202401
+LOGIN_LOGS_ARCHIVE_TABLE_PREFIX = "{}_archive_".format(TABLE_NAMES["LoginLogs"])
+
+
+def get_archive_month(login_datetime) -> str:
+    """获取登录时间所属的归档月份，格式为YYYYMM"""
+
+    if isinstance(login_datetime, str):
+        login_datetime = datetime.strptime(login_datetime, "%Y-%m-%d %H:%M:%S")
+
+    return login_datetime.strftime("%Y%m")
+
+
+def get_archive_table_name(month: str) -> str:
+    """获取指定月份对应的归档表名"""
+
+    return f"{LOGIN_LOGS_ARCHIVE_TABLE_PREFIX}{month}"
+
+
+def parse_archive_months(table_names: Iterable[str]) -> List[str]:
+    """从数据库现有表名中解析已存在的归档月份，按时间升序返回"""
+
+    return sorted(
+        table_name[len(LOGIN_LOGS_ARCHIVE_TABLE_PREFIX) :]
+        for table_name in table_names
+        if table_name.startswith(LOGIN_LOGS_ARCHIVE_TABLE_PREFIX)
+        and table_name[len(LOGIN_LOGS_ARCHIVE_TABLE_PREFIX) :].isdigit()
+    )
+
+
+def parse_login_datetime_range(
+    login_datetime_range: Optional[List[str]],
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """将日期范围["YYYY-MM-DD", "YYYY-MM-DD"]解析为左闭右开的时间区间，结束日期当天包含在内"""
+
+    if not login_datetime_range:
+        return None, None
+
+    start_date, end_date = login_datetime_range
+    return (
+        datetime.strptime(start_date, "%Y-%m-%d") if start_date else None,
+        (
+            datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+            if end_date
+            else None
+        ),
+    )
+
+
+def get_overlapping_archive_months(
+    months: Iterable[str], start: Optional[datetime], end: Optional[datetime]
+) -> List[str]:
+    """筛选与时间区间存在交集的归档月份，未指定时间区间时不查询任何归档"""
+
+    if start is None and end is None:
+        return []
+
+    return [
+        month
+        for month in months
+        if (start is None or month >= start.strftime("%Y%m"))
+        and (end is None or month <= (end - timedelta(microseconds=1)).strftime("%Y%m"))
+    ]
+
+
+def append_to_archive_files(records: List[dict], archive_dir: str) -> None:
+    """将登录日志记录按月份追加写入gzip压缩的NDJSON归档文件
+
+    每次追加写入独立的gzip成员，多次追加后的文件仍可作为单个gzip文件整体解压读取
+    """
+
+    os.makedirs(archive_dir, exist_ok=True)
+
+    for month, month_records in groupby(
+        records, key=lambda record: get_archive_month(record["login_datetime"])
+    ):
+        archive_path = os.path.join(
+            archive_dir, f"{TABLE_NAMES['LoginLogs']}-{month}.ndjson.gz"
+        )
+        with gzip.open(archive_path, "at", encoding="utf-8") as f:
+            for record in month_records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
@@ -0,0 +1,110 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Literal, Optional, Tuple
+
+# 视为登录成功的登录状态，其余登录状态均视为登录失败
+LOGIN_SUCCESS_STATUSES = ("登录成功", "邮箱登录成功", "OTP登录成功")
+
+# 登录统计支持的分组维度字段
+LOGIN_STATS_DIMENSIONS = ("status", "browser_family", "os_family")
+
+# 浏览器、操作系统信息缺失时使用的名称
+UNKNOWN_AGENT_FAMILY = "Other"
+
+
+def get_hour_bucket(login_datetime) -> datetime:
+    """获取登录时间所属的小时时间桶起点"""
+
+    if isinstance(login_datetime, str):
+        login_datetime = datetime.strptime(login_datetime, "%Y-%m-%d %H:%M:%S")
+
+    return login_datetime.replace(minute=0, second=0, microsecond=0)
+
+
+def get_agent_family(agent_info: Optional[str]) -> str:
+    """从“名称 版本号”格式的浏览器、操作系统信息中提取名称，如Mac OS X 10.15.7提取为Mac OS X"""
+
+    agent_info = (agent_info or "").strip()
+    if not agent_info:
+        return UNKNOWN_AGENT_FAMILY
+
+    name, _, version = agent_info.rpartition(" ")
+    if name and version.replace(".", "").isdigit():
+        return name
+
+    return agent_info
+
+
+def aggregate_login_logs(records: Iterable[dict]) -> Counter:
+    """将登录日志记录按(小时时间桶, 登录状态, 浏览器名称, 操作系统名称)聚合计数"""
+
+    return Counter(
+        (
+            get_hour_bucket(record["login_datetime"]),
+            record["status"],
+            get_agent_family(record.get("browser")),
+            get_agent_family(record.get("os")),
+        )
+        for record in records
+    )
+
+
+def get_bucket_start(
+    bucket_start: datetime, granularity: Literal["hour", "day"]
+) -> datetime:
+    """将小时时间桶折算为指定统计粒度的时间桶起点"""
+
+    if granularity == "day":
+        return bucket_start.replace(hour=0)
+
+    return bucket_start
+
+
+def build_trend_series(
+    rows: Iterable[Tuple[datetime, str, int]],
+    granularity: Literal["hour", "day"] = "hour",
+    start: datetime = None,
+    end: datetime = None,
+) -> List[dict]:
+    """基于按(小时时间桶, 登录状态)汇总的计数构造登录成功、失败趋势序列
+
+    时间区间内没有登录记录的时间桶以0补齐，返回结果的规模只与时间桶数量相关
+    """
+
+    series = {}
+    for bucket_start, status, login_count in rows:
+        if isinstance(bucket_start, str):
+            bucket_start = datetime.strptime(bucket_start[:19], "%Y-%m-%d %H:%M:%S")
+        counts = series.setdefault(
+            get_bucket_start(bucket_start, granularity), {"success": 0, "failure": 0}
+        )
+        counts["success" if status in LOGIN_SUCCESS_STATUSES else "failure"] += int(
+            login_count
+        )
+
+    if not series and (start is None or end is None):
+        return []
+
+    # 未指定时间区间的一端时，以实际存在统计数据的时间桶为准
+    step = timedelta(days=1) if granularity == "day" else timedelta(hours=1)
+    current = get_bucket_start(get_hour_bucket(start or min(series)), granularity)
+    last = (
+        get_bucket_start(get_hour_bucket(end - timedelta(microseconds=1)), granularity)
+        if end
+        else max(series)
+    )
+
+    trend = []
+    while current <= last:
+        counts = series.get(current, {"success": 0, "failure": 0})
+        trend.append(
+            {
+                "bucket": current.strftime(
+                    "%Y-%m-%d" if granularity == "day" else "%Y-%m-%d %H:00"
+                ),
+                **counts,
+            }
+        )
+        current += step
+
+    return trend
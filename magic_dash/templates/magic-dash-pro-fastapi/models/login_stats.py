@@ -0,0 +1,7 @@
+from ._registry import load_model
+from . import db
+
+
+LoginStats = load_model("login_stats", "LoginStats")
+
+__all__ = ["LoginStats", "db"]
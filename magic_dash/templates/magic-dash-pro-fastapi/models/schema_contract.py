@@ -7,4 +7,37 @@ TABLE_NAMES = {
     "EmailVerifications": "emailverifications",
     "OtpCredentials": "otpcredentials",
     "UserPermissionGroups": "userpermissiongroups",
+    "CacheVersions": "cacheversions",
+    "LoginStats": "loginstats",
+}
+
+# 内置数据库表复合索引契约
+# 不同ORM实现按相同的索引名称与字段建立索引，便于初始化脚本为已存在的数据表补齐索引
+TABLE_INDEXES = {
+    "LoginLogs": {
+        # 支撑登录日志按各排序字段进行键集分页，id作为同值记录的次级排序键
+        "loginlogs_login_datetime_id": ("login_datetime", "id"),
+        "loginlogs_user_name_id": ("user_name", "id"),
+        "loginlogs_status_id": ("status", "id"),
+        # 支撑登录日志按ip精确或前缀筛选
+        "loginlogs_ip_id": ("ip", "id"),
+    },
+    "Users": {
+        # 支撑用户管理表格按用户角色、所属部门筛选后按用户名排序分页
+        "users_user_role_user_name": ("user_role", "user_name"),
+        "users_department_id_user_name": ("department_id", "user_name"),
+    },
+}
+
+# 内置数据库表文本检索索引契约，格式为{模型类名: {字段名: 索引名称}}
+# 由初始化脚本按数据库类型建立对应的子串检索索引，支撑关键词模糊查询
+TABLE_SEARCH_INDEXES = {
+    "LoginLogs": {
+        "user_name": "loginlogs_user_name_search",
+    },
+    # 用户表主键非整数，仅为唯一字段建立检索索引；SQLite下由映射表为主键分配稳定的整数编号
+    "Users": {
+        "user_name": "users_user_name_search",
+        "user_email": "users_user_email_search",
+    },
 }
@@ -0,0 +1,451 @@
+import atexit
+import logging
+import math
+import os
+import secrets
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Tuple
+
+from configs import EmailConfig
+
+logger = logging.getLogger(__name__)
+
+# SQLite文件中验证码生成时间的存储格式，定长格式保证按字符串比较与按时间比较一致
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class VerificationRecord(NamedTuple):
+    """邮箱验证码记录"""
+
+    email: str
+    verification_code: str
+    generated_at: datetime
+
+
+def _validate_seconds(seconds: int, parameter_name: str):
+    """校验以秒为单位的正整数参数"""
+
+    if not isinstance(seconds, int) or seconds <= 0:
+        raise ValueError(f"{parameter_name}必须为正整数")
+
+
+def _get_remaining_seconds(generated_at: datetime, interval_seconds: int) -> int:
+    """计算验证码记录距离指定时间间隔结束的剩余秒数"""
+
+    interval_ends_at = generated_at + timedelta(seconds=interval_seconds)
+    return max(0, math.ceil((interval_ends_at - datetime.now()).total_seconds()))
+
+
+def generate_code() -> str:
+    """生成6位数字验证码"""
+
+    return f"{secrets.randbelow(1000000):06d}"
+
+
+class VerificationCodeStore(ABC):
+    """邮箱验证码存储后端
+
+    各后端均需以原子方式实现签发、校验消费、发送失败回滚及过期清理，
+    方法签名及返回值与邮箱验证码信息表模型类保持一致，未实现全部方法的后端无法实例化
+    """
+
+    @abstractmethod
+    def issue_verification(
+        self, email: str, resend_interval_seconds: int
+    ) -> Tuple[Optional[VerificationRecord], int, Optional[VerificationRecord]]:
+        """签发验证码，返回新记录、重复发送剩余等待秒数及被替换旧记录的快照"""
+
+    @abstractmethod
+    def verify_code(self, email: str, verification_code: str, expire_seconds: int):
+        """校验验证码，返回"valid"、"invalid"、"expired"或"not_found"，成功或过期时消费记录"""
+
+    @abstractmethod
+    def rollback_issued_verification(self, verification, previous_verification=None):
+        """邮件发送失败时回滚本次签发，且不覆盖并发产生的新记录"""
+
+    @abstractmethod
+    def delete_expired_verifications(self, expire_seconds: int) -> int:
+        """删除已超过有效期的验证码记录，返回删除的记录数"""
+
+
+class DatabaseVerificationCodeStore(VerificationCodeStore):
+    """基于应用数据库邮箱验证码信息表的存储后端"""
+
+    def __init__(self):
+        from .email_verifications import EmailVerifications
+
+        self.model = EmailVerifications
+
+    def issue_verification(self, email: str, resend_interval_seconds: int):
+        return self.model.issue_verification(email, resend_interval_seconds)
+
+    def verify_code(self, email: str, verification_code: str, expire_seconds: int):
+        return self.model.verify_code(email, verification_code, expire_seconds)
+
+    def rollback_issued_verification(self, verification, previous_verification=None):
+        return self.model.rollback_issued_verification(
+            verification, previous_verification
+        )
+
+    def delete_expired_verifications(self, expire_seconds: int) -> int:
+        return self.model.delete_expired_verifications(expire_seconds)
+
+
+class MemoryVerificationCodeStore(VerificationCodeStore):
+    """基于进程内存的存储后端，全部操作在同一把锁内完成，仅适用于单进程部署"""
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def issue_verification(self, email: str, resend_interval_seconds: int):
+        email = (email or "").strip()
+        if not email:
+            raise ValueError("邮箱不能为空")
+        _validate_seconds(resend_interval_seconds, "邮箱验证码重复发送等待时间")
+
+        with self._lock:
+            previous_verification = self._records.get(email)
+            if previous_verification:
+                remaining_seconds = _get_remaining_seconds(
+                    previous_verification.generated_at, resend_interval_seconds
+                )
+                if remaining_seconds > 0:
+                    return None, remaining_seconds, None
+
+            verification = VerificationRecord(email, generate_code(), datetime.now())
+            self._records[email] = verification
+
+        return verification, 0, previous_verification
+
+    def verify_code(self, email: str, verification_code: str, expire_seconds: int):
+        email = (email or "").strip()
+        verification_code = (verification_code or "").strip()
+        _validate_seconds(expire_seconds, "邮箱验证码有效期")
+
+        with self._lock:
+            verification = self._records.get(email)
+            if not verification:
+                return "not_found"
+
+            if _get_remaining_seconds(verification.generated_at, expire_seconds) <= 0:
+                del self._records[email]
+                return "expired"
+
+            if not secrets.compare_digest(
+                verification.verification_code, verification_code
+            ):
+                return "invalid"
+
+            del self._records[email]
+            return "valid"
+
+    def rollback_issued_verification(self, verification, previous_verification=None):
+        with self._lock:
+            current_verification = self._records.get(verification.email)
+            if current_verification is None or (
+                current_verification.verification_code,
+                current_verification.generated_at,
+            ) != (verification.verification_code, verification.generated_at):
+                return 0
+
+            if previous_verification:
+                self._records[verification.email] = VerificationRecord(
+                    verification.email,
+                    previous_verification.verification_code,
+                    previous_verification.generated_at,
+                )
+            else:
+                del self._records[verification.email]
+
+            return 1
+
+    def delete_expired_verifications(self, expire_seconds: int) -> int:
+        _validate_seconds(expire_seconds, "邮箱验证码有效期")
+        expire_before = datetime.now() - timedelta(seconds=expire_seconds)
+
+        with self._lock:
+            expired_emails = [
+                email
+                for email, verification in self._records.items()
+                if verification.generated_at <= expire_before
+            ]
+            for email in expired_emails:
+                del self._records[email]
+
+        return len(expired_emails)
+
+
+class SQLiteVerificationCodeStore(VerificationCodeStore):
+    """基于独立WAL模式SQLite文件的存储后端，适用于同一主机上的多进程部署
+
+    每个线程持有独立连接，签发、校验等操作以BEGIN IMMEDIATE事务执行，
+    保证多进程并发访问同一邮箱时的原子性，且不占用应用数据库的写入资源
+    """
+
+    def __init__(self, path: str, timeout: float = 5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接，fork得到的子进程中重新建立连接"""
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        connection = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS verification_codes ("
+            "email TEXT PRIMARY KEY, "
+            "verification_code TEXT NOT NULL, "
+            "generated_at TEXT NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS verification_codes_generated_at "
+            "ON verification_codes (generated_at)"
+        )
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """以立即获取写锁的事务执行操作"""
+
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def _get_record(connection, email: str) -> Optional[VerificationRecord]:
+        row = connection.execute(
+            "SELECT verification_code, generated_at FROM verification_codes "
+            "WHERE email = ?",
+            (email,),
+        ).fetchone()
+        if not row:
+            return None
+
+        return VerificationRecord(
+            email, row[0], datetime.strptime(row[1], _DATETIME_FORMAT)
+        )
+
+    def issue_verification(self, email: str, resend_interval_seconds: int):
+        email = (email or "").strip()
+        if not email:
+            raise ValueError("邮箱不能为空")
+        _validate_seconds(resend_interval_seconds, "邮箱验证码重复发送等待时间")
+
+        with self._transaction() as connection:
+            previous_verification = self._get_record(connection, email)
+            if previous_verification:
+                remaining_seconds = _get_remaining_seconds(
+                    previous_verification.generated_at, resend_interval_seconds
+                )
+                if remaining_seconds > 0:
+                    return None, remaining_seconds, None
+
+            verification = VerificationRecord(email, generate_code(), datetime.now())
+            connection.execute(
+                "INSERT OR REPLACE INTO verification_codes "
+                "(email, verification_code, generated_at) VALUES (?, ?, ?)",
+                (
+                    email,
+                    verification.verification_code,
+                    verification.generated_at.strftime(_DATETIME_FORMAT),
+                ),
+            )
+
+        return verification, 0, previous_verification
+
+    def verify_code(self, email: str, verification_code: str, expire_seconds: int):
+        email = (email or "").strip()
+        verification_code = (verification_code or "").strip()
+        _validate_seconds(expire_seconds, "邮箱验证码有效期")
+
+        with self._transaction() as connection:
+            verification = self._get_record(connection, email)
+            if not verification:
+                return "not_found"
+
+            if _get_remaining_seconds(verification.generated_at, expire_seconds) <= 0:
+                verify_result = "expired"
+            elif secrets.compare_digest(
+                verification.verification_code, verification_code
+            ):
+                verify_result = "valid"
+            else:
+                return "invalid"
+
+            connection.execute(
+                "DELETE FROM verification_codes WHERE email = ?", (email,)
+            )
+
+        return verify_result
+
+    def rollback_issued_verification(self, verification, previous_verification=None):
+        current_record_filter = (
+            "WHERE email = ? AND verification_code = ? AND generated_at = ?"
+        )
+        current_record_params = (
+            verification.email,
+            verification.verification_code,
+            verification.generated_at.strftime(_DATETIME_FORMAT),
+        )
+
+        with self._transaction() as connection:
+            if previous_verification:
+                return connection.execute(
+                    "UPDATE verification_codes "
+                    "SET verification_code = ?, generated_at = ? "
+                    + current_record_filter,
+                    (
+                        previous_verification.verification_code,
+                        previous_verification.generated_at.strftime(
+                            _DATETIME_FORMAT
+                        ),
+                        *current_record_params,
+                    ),
+                ).rowcount
+
+            return connection.execute(
+                "DELETE FROM verification_codes " + current_record_filter,
+                current_record_params,
+            ).rowcount
+
+    def delete_expired_verifications(self, expire_seconds: int) -> int:
+        _validate_seconds(expire_seconds, "邮箱验证码有效期")
+        expire_before = datetime.now() - timedelta(seconds=expire_seconds)
+
+        with self._transaction() as connection:
+            return connection.execute(
+                "DELETE FROM verification_codes WHERE generated_at <= ?",
+                (expire_before.strftime(_DATETIME_FORMAT),),
+            ).rowcount
+
+
+class ExpiredVerificationSweeper:
+    """后台定期清理过期验证码记录
+
+    惰性启动守护线程，fork得到的子进程中重新启动；单次清理失败不影响后续清理
+    """
+
+    def __init__(self, store: VerificationCodeStore, interval_seconds: float):
+        self.store = store
+        self.interval_seconds = interval_seconds
+        self.swept_count = 0
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._exit_handler_registered = False
+
+    def sweep(self) -> int:
+        """立即清理一次过期验证码记录，返回删除的记录数"""
+
+        deleted_count = self.store.delete_expired_verifications(
+            EmailConfig.verification_code_expire_seconds
+        )
+        with self._lock:
+            self.swept_count += deleted_count
+
+        return deleted_count
+
+    def ensure_started(self):
+        """惰性启动后台清理线程，清理间隔不大于0时不启动"""
+
+        if self.interval_seconds <= 0:
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._stop_event = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, name="expired-verification-sweeper", daemon=True
+            )
+            self._thread.start()
+
+            if not self._exit_handler_registered:
+                atexit.register(self.stop)
+                self._exit_handler_registered = True
+
+    def stop(self, timeout: float = 5):
+        """停止后台清理线程"""
+
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+
+        self._stop_event.set()
+        thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Failed to delete expired email verifications")
+
+
+def create_verification_code_store(
+    store_type: str, sqlite_path: str = None
+) -> VerificationCodeStore:
+    """按存储方式创建邮箱验证码存储后端"""
+
+    if store_type == "database":
+        return DatabaseVerificationCodeStore()
+    if store_type == "memory":
+        return MemoryVerificationCodeStore()
+    if store_type == "sqlite":
+        return SQLiteVerificationCodeStore(sqlite_path)
+
+    raise ValueError(f"不支持的邮箱验证码存储方式：{store_type}")
+
+
+_store = None
+_sweeper = None
+_store_lock = threading.Lock()
+
+
+def get_verification_code_store() -> VerificationCodeStore:
+    """获取当前进程按EmailConfig配置的邮箱验证码存储后端，并确保过期记录清理线程已启动"""
+
+    global _store, _sweeper
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = create_verification_code_store(
+                    EmailConfig.verification_code_store,
+                    EmailConfig.verification_code_sqlite_path,
+                )
+                _sweeper = ExpiredVerificationSweeper(
+                    store, EmailConfig.verification_code_sweep_interval_seconds
+                )
+                _store = store
+
+    _sweeper.ensure_started()
+
+    return _store
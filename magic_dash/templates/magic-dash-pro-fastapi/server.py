@@ -1,14 +1,29 @@
 from datetime import timedelta
+from urllib.parse import quote
 
 import dash
 from fastapi import Request, status
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi_login import LoginManager
-from user_agents import parse
+from starlette.background import BackgroundTask
 
 from dash.backends._fastapi import get_current_request
+from models.logs import LoginLogs
 from models.users import Users
+from models.caches import cache_invalidation_bus, user_cache
+from models.cache_versions import CacheVersions
+from models.unit_of_work import begin_unit_of_work, end_unit_of_work
+from models.user_permission_groups import UserPermissionGroups
 from configs import AuthConfig, BaseConfig
+from utils.async_utils import SingleFlightExecutor
+from utils.browser_utils import check_user_agent
+from utils.export_utils import (
+    LOGIN_LOGS_EXPORT_FIELDNAMES,
+    LOGIN_LOGS_EXPORT_PATHNAME,
+    get_login_logs_export_filename,
+    parse_login_logs_query_condition,
+    write_csv_to_spooled_file,
+)
 from utils.fastapi_docs import (
     configure_fastapi_documentation,
     is_fastapi_documentation_pathname,
@@ -104,12 +119,24 @@ manager = LoginManager(
     default_expiry=timedelta(seconds=BaseConfig.login_session_expire_seconds),
 )
 
+# 鉴权相关数据库查询专用的有界线程池，慢查询不会阻塞事件循环中的其他请求
+auth_loader = SingleFlightExecutor(
+    max_workers=BaseConfig.auth_loader_max_workers,
+    thread_name_prefix="auth-loader",
+)
+
 
 @manager.user_loader()
-def user_loader(user_id):
+async def user_loader(user_id):
     """fastapi-login内部专用用户加载函数"""
 
-    match_user = Users.get_user(user_id)
+    # 优先读取进程内缓存，命中时无需切换线程
+    match_user = user_cache.get(user_id)
+    if match_user is None:
+        # 同一用户的并发请求共享同一次数据库查询
+        match_user = await auth_loader.run(
+            ("user", user_id), Users.get_cached_user, user_id
+        )
 
     if not match_user:
         return None
@@ -195,42 +222,8 @@ def _should_skip_auth(pathname: str):
 
 
 def _browser_block_message(request: Request):
-    user_agent = parse(request.headers.get("user-agent", ""))
-
-    if user_agent.browser.version == ():
-        return None
-
-    if user_agent.browser.family == "IE":
-        return (
-            "<div style='font-size: 16px; color: red; position: fixed; top: 40%; "
-            "left: 50%; transform: translateX(-50%);'>"
-            "请不要使用Internet Explorer或IE兼容模式访问本应用</div>"
-        )
-
-    for rule in BaseConfig.min_browser_versions:
-        if (
-            user_agent.browser.family == rule["browser"]
-            and user_agent.browser.version[0] < rule["version"]
-        ):
-            return (
-                "<div style='font-size: 16px; color: red; position: fixed; top: 40%; "
-                "left: 50%; transform: translateX(-50%);'>"
-                "您的{}浏览器版本低于本应用最低支持版本（{}），"
-                "请升级浏览器后再访问</div>"
-            ).format(rule["browser"], rule["version"])
-
-    if BaseConfig.strict_browser_type_check and user_agent.browser.family not in [
-        rule["browser"] for rule in BaseConfig.min_browser_versions
-    ]:
-        return (
-            "<div style='font-size: 16px; color: red; position: fixed; top: 40%; "
-            "left: 50%; transform: translateX(-50%);'>"
-            "当前浏览器类型不在支持范围内，支持的浏览器类型有：{}</div>"
-        ).format(
-            "、".join([rule["browser"] for rule in BaseConfig.min_browser_versions])
-        )
-
-    return None
+    # 基于缓存的User-Agent检查结论，同一User-Agent仅解析一次
+    return check_user_agent(request.headers.get("user-agent", "")).block_message
 
 
 @app.server.middleware("http")
@@ -246,6 +239,9 @@ async def load_auth_and_check_browser(request: Request, call_next):
     if _should_skip_auth(request.url.path):
         request.state.current_user = AnonymousUser()
     else:
+        # 按检查间隔同步缓存版本，清理已被其他进程更新的本地缓存
+        if cache_invalidation_bus.is_due():
+            await auth_loader.run(("cache_versions",), CacheVersions.sync_local_caches)
         request.state.current_user = await manager.optional(request) or AnonymousUser()
 
     if BaseConfig.fastapi_docs_admin_only and is_documentation_request:
@@ -260,7 +256,54 @@ async def load_auth_and_check_browser(request: Request, call_next):
                 status_code=status.HTTP_403_FORBIDDEN,
             )
 
-    return await call_next(request)
+    # 开启请求级工作单元，本次请求中的同步Dash回调共用同一数据库连接/会话
+    # Dash回调在事件循环线程中执行，不同请求会在await处交替运行，
+    # 为避免交替运行的请求共享同一事务，这里不开启请求级事务，模型方法仍逐次提交
+    begin_unit_of_work(transactional=False)
+    try:
+        return await call_next(request)
+    finally:
+        end_unit_of_work()
+
+
+@app.server.get(LOGIN_LOGS_EXPORT_PATHNAME, include_in_schema=False)
+def export_login_logs(request: Request):
+    """以文件流下载符合登录日志表当前筛选、排序条件的CSV导出文件
+
+    定义为同步接口，由FastAPI在线程池中执行，导出期间的数据库查询不会阻塞事件循环
+    """
+
+    # 仅允许有权访问登录日志页面的用户导出
+    current_user = request.state.current_user
+    access_policy = (
+        UserPermissionGroups.get_pathname_access_policy(current_user.user_role)
+        if current_user.is_authenticated
+        else None
+    )
+    if not (access_policy and access_policy.allows("/core/login-logs")):
+        return JSONResponse(
+            {"detail": "无权导出登录日志"},
+            status_code=status.HTTP_403_FORBIDDEN,
+        )
+
+    compress = request.query_params.get("compress") == "1"
+    # 逐批查询并写入临时文件，内存占用与登录日志记录数无关
+    export_file = write_csv_to_spooled_file(
+        LoginLogs.iter_logs(**parse_login_logs_query_condition(request.query_params)),
+        LOGIN_LOGS_EXPORT_FIELDNAMES,
+        compress=compress,
+    )
+
+    return StreamingResponse(
+        iter(lambda: export_file.read(64 * 1024), b""),
+        media_type="application/gzip" if compress else "text/csv",
+        headers={
+            "Content-Disposition": "attachment; filename*=UTF-8''{}".format(
+                quote(get_login_logs_export_filename(compress))
+            )
+        },
+        background=BackgroundTask(export_file.close),
+    )
 
 
 # 放在server.py末尾执行，确保配置文档路由前可以完整检查Dash及业务路由
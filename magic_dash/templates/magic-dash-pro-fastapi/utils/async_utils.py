@@ -0,0 +1,38 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SingleFlightExecutor:
+    """在有界线程池中执行同步阻塞调用的异步执行器
+
+    避免数据库查询等阻塞调用占用事件循环；相同key的并发调用共享同一次执行结果，
+    例如同一用户的多个并发请求只会触发一次用户信息查询。
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = ""):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=thread_name_prefix,
+        )
+        self._in_flight = {}
+
+    async def run(self, key, func, *args):
+        """在线程池中执行func(*args)，相同key存在执行中的调用时直接等待其结果"""
+
+        loop = asyncio.get_running_loop()
+        # 执行结果绑定所属事件循环，不同事件循环之间不共享
+        flight_key = (id(loop), key)
+        future = self._in_flight.get(flight_key)
+
+        if future is None:
+            future = loop.run_in_executor(self._executor, func, *args)
+            self._in_flight[flight_key] = future
+
+            def release(done_future):
+                if self._in_flight.get(flight_key) is done_future:
+                    del self._in_flight[flight_key]
+
+            future.add_done_callback(release)
+
+        # 单个请求被取消时不影响其他等待同一结果的请求
+        return await asyncio.shield(future)
@@ -0,0 +1,75 @@
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from user_agents import parse
+from user_agents.parsers import UserAgent
+
+from configs import BaseConfig
+
+
+class BrowserCheckResult(NamedTuple):
+    """User-Agent解析结果及对应的浏览器检查结论"""
+
+    user_agent: UserAgent
+    # 浏览器不符合要求时返回的拦截提示HTML，为None时表示允许访问
+    block_message: Optional[str]
+
+
+def get_browser_block_message(user_agent: UserAgent) -> Optional[str]:
+    """基于BaseConfig中的浏览器限制配置，计算已解析User-Agent对应的拦截提示"""
+
+    # 浏览器版本信息无效时不做限制
+    if user_agent.browser.version == ():
+        return None
+
+    # IE相关浏览器直接拦截
+    if user_agent.browser.family == "IE":
+        return (
+            "<div style='font-size: 16px; color: red; position: fixed; top: 40%; "
+            "left: 50%; transform: translateX(-50%);'>"
+            "请不要使用Internet Explorer或IE兼容模式访问本应用</div>"
+        )
+
+    # 基于BaseConfig.min_browser_versions配置，对相关浏览器最低版本进行检查
+    for rule in BaseConfig.min_browser_versions:
+        # 若当前请求对应的浏览器版本，低于声明的最低支持版本
+        if (
+            user_agent.browser.family == rule["browser"]
+            and user_agent.browser.version[0] < rule["version"]
+        ):
+            return (
+                "<div style='font-size: 16px; color: red; position: fixed; top: 40%; "
+                "left: 50%; transform: translateX(-50%);'>"
+                "您的{}浏览器版本低于本应用最低支持版本（{}），"
+                "请升级浏览器后再访问</div>"
+            ).format(rule["browser"], rule["version"])
+
+    # 若开启了严格的浏览器类型限制，且当前浏览器不在声明的浏览器范围内
+    if BaseConfig.strict_browser_type_check and user_agent.browser.family not in [
+        rule["browser"] for rule in BaseConfig.min_browser_versions
+    ]:
+        return (
+            "<div style='font-size: 16px; color: red; position: fixed; top: 40%; "
+            "left: 50%; transform: translateX(-50%);'>"
+            "当前浏览器类型不在支持范围内，支持的浏览器类型有：{}</div>"
+        ).format(
+            "、".join([rule["browser"] for rule in BaseConfig.min_browser_versions])
+        )
+
+    return None
+
+
+@lru_cache(maxsize=1024)
+def check_user_agent(user_agent_string: str) -> BrowserCheckResult:
+    """解析User-Agent并计算浏览器检查结论
+
+    同一客户端会反复发送相同的User-Agent，这里以原始字符串为键做有界LRU缓存，
+    避免每次请求都执行正则开销较大的User-Agent解析
+    """
+
+    user_agent = parse(user_agent_string)
+
+    return BrowserCheckResult(
+        user_agent=user_agent,
+        block_message=get_browser_block_message(user_agent),
+    )
@@ -0,0 +1,130 @@
+import csv
+import gzip
+import io
+import tempfile
+from datetime import datetime
+from typing import Iterable, List, Mapping
+from urllib.parse import urlencode
+
+# 导出文件在内存中缓冲的最大字节数，超出后自动转存为磁盘临时文件
+EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# 登录日志导出接口路径
+LOGIN_LOGS_EXPORT_PATHNAME = "/_export/login-logs"
+
+# 登录日志导出字段
+LOGIN_LOGS_EXPORT_FIELDNAMES = [
+    "id",
+    "user_name",
+    "user_id",
+    "ip",
+    "browser",
+    "os",
+    "status",
+    "login_datetime",
+]
+
+
+def write_csv_to_spooled_file(
+    rows: Iterable[dict],
+    fieldnames: List[str],
+    compress: bool = False,
+    max_size: int = EXPORT_SPOOL_MAX_SIZE,
+):
+    """将字典行逐行写入CSV临时文件，并返回已回到文件开头的二进制临时文件对象
+
+    文件内容超过max_size后自动转存到磁盘，内存占用与导出记录数无关；
+    compress为True时写入gzip压缩后的内容
+    """
+
+    spooled_file = tempfile.SpooledTemporaryFile(max_size=max_size)
+    binary_file = (
+        gzip.GzipFile(fileobj=spooled_file, mode="wb") if compress else spooled_file
+    )
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8", newline="")
+
+    writer = csv.DictWriter(text_file, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(
+            {
+                key: (
+                    value.strftime("%Y-%m-%d %H:%M:%S")
+                    if isinstance(value, datetime)
+                    else value
+                )
+                for key, value in row.items()
+            }
+        )
+
+    # 分离文本包装层，避免关闭包装层时连带关闭临时文件
+    text_file.flush()
+    text_file.detach()
+    if compress:
+        binary_file.close()
+
+    spooled_file.seek(0)
+    return spooled_file
+
+
+def is_valid_date(value: str) -> bool:
+    """判断字符串是否为YYYY-MM-DD格式的有效日期"""
+
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return False
+
+    return True
+
+
+def parse_login_logs_query_condition(args: Mapping) -> dict:
+    """从导出请求参数中解析登录日志查询条件，忽略无效的排序及日期参数"""
+
+    query_condition = {}
+
+    if args.get("order_by") in ["id", "user_name", "status", "login_datetime"]:
+        query_condition["order_by"] = args["order_by"]
+    if args.get("order") in ["ascend", "descend"]:
+        query_condition["order"] = args["order"]
+    if args.get("user_name_keyword"):
+        query_condition["user_name_keyword"] = args["user_name_keyword"]
+    if args.get("ip_prefix"):
+        query_condition["ip_prefix"] = args["ip_prefix"]
+    if args.get("status"):
+        query_condition["status"] = args["status"]
+    login_datetime_range = [
+        args.get("start_date") or None,
+        args.get("end_date") or None,
+    ]
+    if any(login_datetime_range) and all(
+        map(is_valid_date, filter(None, login_datetime_range))
+    ):
+        query_condition["login_datetime_range"] = login_datetime_range
+
+    return query_condition
+
+
+def build_login_logs_export_url(query_condition: dict, compress: bool = False) -> str:
+    """根据登录日志表当前的查询条件构造导出接口地址"""
+
+    query_condition = dict(query_condition)
+    # 登录日期范围拆分为开始、结束日期两个参数
+    login_datetime_range = query_condition.pop("login_datetime_range", None)
+    if login_datetime_range:
+        query_condition["start_date"], query_condition["end_date"] = (
+            login_datetime_range
+        )
+
+    return "{}?{}".format(
+        LOGIN_LOGS_EXPORT_PATHNAME,
+        urlencode({**query_condition, "compress": int(compress)}),
+    )
+
+
+def get_login_logs_export_filename(compress: bool = False) -> str:
+    """生成登录日志导出文件名"""
+
+    return "登录日志导出结果{}.csv{}".format(
+        datetime.now().strftime("%Y%m%d%H%M%S"), ".gz" if compress else ""
+    )
@@ -0,0 +1,331 @@
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from werkzeug.security import generate_password_hash
+
+# 批量导入用户文件字段，其中user_name、password为必填字段，未填写user_id时自动生成
+USER_IMPORT_FIELDNAMES = [
+    "user_id",
+    "user_name",
+    "password",
+    "user_email",
+    "department_id",
+    "user_role",
+]
+
+# 批量导入用户文件必须包含的字段
+USER_IMPORT_REQUIRED_FIELDNAMES = ["user_name", "password"]
+
+logger = logging.getLogger(__name__)
+
+
+def _load_openpyxl():
+    """按需加载openpyxl依赖"""
+
+    try:
+        import openpyxl
+
+        return openpyxl
+    except ImportError as exc:
+        raise RuntimeError(
+            "未安装openpyxl依赖，无法读取XLSX文件，请先执行pip install openpyxl"
+        ) from exc
+
+
+def _normalize_cell(value) -> Optional[str]:
+    """将单元格内容统一转换为去除首尾空白的字符串，空单元格返回None"""
+
+    if value is None:
+        return None
+
+    # XLSX中的纯数字用户id等内容会被读取为数值类型
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    return str(value).strip() or None
+
+
+def _iter_csv_rows(content: bytes):
+    """逐行读取CSV文件内容，兼容带BOM的UTF-8编码"""
+
+    yield from csv.reader(io.StringIO(content.decode("utf-8-sig"), newline=""))
+
+
+def _iter_xlsx_rows(content: bytes):
+    """以只读模式逐行读取XLSX文件首个工作表的内容"""
+
+    workbook = _load_openpyxl().load_workbook(
+        io.BytesIO(content), read_only=True, data_only=True
+    )
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_user_import_rows(
+    filename: str, content: bytes, max_rows: int = None
+) -> List[dict]:
+    """读取CSV或XLSX格式的批量导入用户文件
+
+    首行为字段名，返回的每行记录额外携带其在文件中的行号row_number，跳过全部为空的行；
+    文件格式不受支持、缺少必填字段或行数超出max_rows时抛出ValueError
+    """
+
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        rows = _iter_csv_rows(content)
+    elif extension == ".xlsx":
+        rows = _iter_xlsx_rows(content)
+    else:
+        raise ValueError("仅支持CSV或XLSX格式的文件")
+
+    header = [
+        (_normalize_cell(fieldname) or "").lower() for fieldname in next(rows, [])
+    ]
+    missing_fieldnames = [
+        fieldname
+        for fieldname in USER_IMPORT_REQUIRED_FIELDNAMES
+        if fieldname not in header
+    ]
+    if missing_fieldnames:
+        raise ValueError("文件缺少必填字段：" + "、".join(missing_fieldnames))
+
+    records = []
+    for row_number, row in enumerate(rows, start=2):
+        values = [_normalize_cell(value) for value in row]
+        if not any(values):
+            continue
+
+        records.append(
+            {
+                "row_number": row_number,
+                **{
+                    fieldname: (values[index] if index < len(values) else None)
+                    for index, fieldname in enumerate(header)
+                    if fieldname in USER_IMPORT_FIELDNAMES
+                },
+            }
+        )
+        if max_rows and len(records) > max_rows:
+            raise ValueError(f"单次最多导入{max_rows}个用户")
+
+    return records
+
+
+def create_password_hash_executor(max_workers: int) -> ProcessPoolExecutor:
+    """创建计算密码散列值的进程池
+
+    应用进程中运行着日志写入、邮件发送等后台线程，进程池以spawn方式启动子进程，
+    避免fork时复制被其他线程持有的锁导致子进程死锁
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def hash_passwords(
+    passwords: List[str],
+    max_workers: int = None,
+    parallel_threshold: int = 64,
+    executor: ProcessPoolExecutor = None,
+) -> List[str]:
+    """批量计算密码散列值，返回结果与passwords顺序一致
+
+    密码散列为CPU密集型计算，数量超过parallel_threshold时分发至进程池并行计算，
+    max_workers为None时使用全部CPU核心；传入executor时复用该进程池，否则临时创建
+    """
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if len(passwords) <= parallel_threshold or max_workers == 1:
+        return [generate_password_hash(password) for password in passwords]
+
+    if executor is None:
+        with create_password_hash_executor(max_workers) as executor:
+            return hash_passwords(
+                passwords, max_workers, parallel_threshold, executor=executor
+            )
+
+    # 按进程数适当合并任务，降低进程间通信开销
+    return list(
+        executor.map(
+            generate_password_hash,
+            passwords,
+            chunksize=max(1, len(passwords) // (max_workers * 8)),
+        )
+    )
+
+
+class UserImportJob:
+    """批量导入用户后台任务
+
+    在后台线程中调用import_users逐批计算密码散列值并以独立事务写入，各批次复用同一进程池，
+    每个批次写入后更新进度；取消后在当前批次写入完成时停止，已写入的批次不会回滚。
+    rejected为已在预校验中被拒绝的记录下标及对应错误信息，这些记录不参与导入。
+    任务状态仅保存在创建任务的进程内，多进程部署时需确保同一会话的请求由同一工作进程处理
+    """
+
+    def __init__(
+        self,
+        import_users: Callable[..., Dict[int, str]],
+        records: List[dict],
+        rejected: Dict[int, str] = None,
+        batch_size: int = 1000,
+        max_workers: int = None,
+        parallel_threshold: int = 64,
+    ):
+        self.job_id = str(uuid.uuid4())
+        self.import_users = import_users
+        self.records = records
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+        self._rejected = dict(rejected or {})
+        self._import_indexes = [
+            index for index in range(len(records)) if index not in self._rejected
+        ]
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._executor = None
+        self._status = "running"
+        self._stopped = False
+        self._processed_count = 0
+        self._errors = dict(self._rejected)
+        self._error_message = None
+
+    def start(self):
+        """在后台线程中执行导入任务"""
+
+        threading.Thread(
+            target=self.run, name=f"user-import-{self.job_id}", daemon=True
+        ).start()
+
+    def cancel(self):
+        """请求取消导入任务，当前批次写入完成后停止"""
+
+        self._cancel_event.set()
+
+    def snapshot(self) -> dict:
+        """获取导入任务当前的状态与进度
+
+        status取值为running、finished、cancelled或failed，errors为导入失败记录下标及对应错误信息
+        """
+
+        with self._lock:
+            return {
+                "status": self._status,
+                "processed_count": self._processed_count,
+                "total_count": len(self.records),
+                "imported_count": self._processed_count - len(self._errors),
+                "errors": dict(self._errors),
+                "error_message": self._error_message,
+            }
+
+    def run(self):
+        """同步执行导入任务，任务结束后释放进程池"""
+
+        try:
+            errors = self.import_users(
+                [self.records[index] for index in self._import_indexes],
+                password_hasher=self._hash_passwords,
+                batch_size=self.batch_size,
+                on_batch_imported=self._on_batch_imported,
+            )
+        except Exception as e:
+            logger.exception("批量导入用户失败")
+            with self._lock:
+                self._status = "failed"
+                self._error_message = str(e)
+        else:
+            with self._lock:
+                self._errors = self._map_errors(errors)
+                if self._stopped:
+                    self._status = "cancelled"
+                else:
+                    self._processed_count = len(self.records)
+                    self._status = "finished"
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def _map_errors(self, errors: Dict[int, str]) -> Dict[int, str]:
+        """将导入记录的错误信息下标映射回全部记录的下标，并合并预校验错误信息"""
+
+        return {
+            **self._rejected,
+            **{self._import_indexes[index]: error for index, error in errors.items()},
+        }
+
+    def _hash_passwords(self, passwords: List[str]) -> List[str]:
+        """计算单个批次的密码散列值，首次需要并行计算时启动进程池并在后续批次中复用"""
+
+        if (
+            self._executor is None
+            and len(passwords) > self.parallel_threshold
+            and self.max_workers > 1
+        ):
+            self._executor = create_password_hash_executor(self.max_workers)
+
+        return hash_passwords(
+            passwords,
+            max_workers=self.max_workers,
+            parallel_threshold=self.parallel_threshold,
+            executor=self._executor,
+        )
+
+    def _on_batch_imported(
+        self, processed_count: int, valid_count: int, errors: Dict[int, str]
+    ) -> bool:
+        """记录批次写入进度，返回是否继续导入后续批次"""
+
+        with self._lock:
+            # 预校验及一次性校验失败的记录在写入首个批次前即已处理完毕
+            self._processed_count = len(self.records) - valid_count + processed_count
+            self._errors = self._map_errors(errors)
+            # 最后一个批次写入后取消不影响导入结果
+            self._stopped = (
+                self._cancel_event.is_set() and processed_count < valid_count
+            )
+
+        return not self._stopped
+
+
+# 当前进程内的批量导入用户任务
+_user_import_jobs: Dict[str, UserImportJob] = {}
+_user_import_jobs_lock = threading.Lock()
+
+
+def start_user_import_job(
+    import_users: Callable[..., Dict[int, str]], records: List[dict], **options
+) -> UserImportJob:
+    """创建并在后台启动批量导入用户任务，options参见UserImportJob"""
+
+    job = UserImportJob(import_users, records, **options)
+    with _user_import_jobs_lock:
+        _user_import_jobs[job.job_id] = job
+    job.start()
+
+    return job
+
+
+def get_user_import_job(job_id: str) -> Optional[UserImportJob]:
+    """获取当前进程内的批量导入用户任务，不存在时返回None"""
+
+    with _user_import_jobs_lock:
+        return _user_import_jobs.get(job_id)
+
+
+def remove_user_import_job(job_id: str):
+    """移除已结束的批量导入用户任务"""
+
+    with _user_import_jobs_lock:
+        _user_import_jobs.pop(job_id, None)
@@ -0,0 +1,289 @@
+import atexit
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# 通知后台线程发送完剩余邮件后退出的哨兵对象
+_STOP = object()
+
+
+def close_smtp_client(smtp_client):
+    """关闭SMTP连接，连接已失效时直接释放底层套接字"""
+
+    try:
+        smtp_client.quit()
+    except Exception:
+        try:
+            smtp_client.close()
+        except Exception:
+            pass
+
+
+def is_retryable_smtp_error(error: Exception) -> bool:
+    """判断邮件发送异常是否为可重试的临时性错误
+
+    网络异常、连接断开及4xx临时性响应可重试，认证失败、收件人被拒等5xx永久性错误不重试
+    """
+
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+
+    return isinstance(error, OSError)
+
+
+class SMTPConnectionPool:
+    """已完成认证的SMTP长连接池
+
+    连接在使用完毕后归还以供复用，省去每封邮件的TCP连接、EHLO、STARTTLS及LOGIN开销；
+    空闲超过health_check_interval_seconds的连接在复用前通过NOOP命令检查可用性，
+    使用过程中出现异常的连接直接关闭而不再归还
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], smtplib.SMTP],
+        max_size: int = 2,
+        health_check_interval_seconds: float = 10,
+    ):
+        self.connect = connect
+        self.max_size = max_size
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.created_count = 0
+        # 空闲连接及其最近一次使用时间
+        self._idle = []
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            # fork得到的子进程不复用父进程的套接字
+            if self._pid != os.getpid():
+                self._idle = []
+                self._pid = os.getpid()
+
+            while self._idle:
+                smtp_client, last_used = self._idle.pop()
+                if (
+                    time.monotonic() - last_used < self.health_check_interval_seconds
+                    or self._check_health(smtp_client)
+                ):
+                    return smtp_client
+                close_smtp_client(smtp_client)
+
+        smtp_client = self.connect()
+        with self._lock:
+            self.created_count += 1
+
+        return smtp_client
+
+    @staticmethod
+    def _check_health(smtp_client) -> bool:
+        """通过NOOP命令检查连接是否仍可用"""
+
+        try:
+            return smtp_client.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _release(self, smtp_client):
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self.max_size:
+                self._idle.append((smtp_client, time.monotonic()))
+                return
+
+        close_smtp_client(smtp_client)
+
+    @contextmanager
+    def connection(self):
+        """获取一个可用的SMTP连接，使用完毕后自动归还连接池"""
+
+        smtp_client = self._acquire()
+        try:
+            yield smtp_client
+        except BaseException:
+            # 异常后的连接状态不可预知，关闭后由下次使用重新建立
+            close_smtp_client(smtp_client)
+            raise
+
+        self._release(smtp_client)
+
+    def close(self):
+        """关闭连接池中全部空闲连接"""
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for smtp_client, _ in idle:
+            close_smtp_client(smtp_client)
+
+
+class MailJob(NamedTuple):
+    """待发送的邮件任务"""
+
+    send: Callable[[], None]
+    # 重试次数耗尽或遇到不可重试错误时的回调，参数为最后一次发送的异常
+    on_failure: Optional[Callable[[Exception], None]] = None
+    description: str = ""
+
+
+class MailDeliveryQueue:
+    """后台邮件发送队列
+
+    邮件任务进入进程内有界队列，由后台线程发送，调用方无需等待SMTP交互完成；
+    临时性错误按指数退避重试至max_attempts次，最终失败时调用任务的on_failure回调。
+    synchronous为True时不启用后台线程，提交时直接同步发送，便于测试及调试。
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue_size: int = 1000,
+        max_attempts: int = 3,
+        retry_backoff_seconds: float = 1,
+        max_retry_backoff_seconds: float = 30,
+        synchronous: bool = False,
+        thread_name: str = "mail-delivery",
+    ):
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.max_retry_backoff_seconds = max_retry_backoff_seconds
+        self.synchronous = synchronous
+        self.thread_name = thread_name
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.failed_count = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._exit_handler_registered = False
+
+    def submit(self, job: MailJob) -> bool:
+        """提交一个邮件任务，队列已满而被丢弃时返回False"""
+
+        if self.synchronous:
+            self._deliver(job)
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.dropped_count += 1
+            return False
+
+        return True
+
+    def flush(self):
+        """阻塞等待已提交的邮件任务全部处理完成"""
+
+        if self._threads and self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self, timeout: float = 10):
+        """处理完队列中剩余的邮件任务并停止后台线程"""
+
+        threads = self._threads
+        if not threads or self._pid != os.getpid():
+            return
+
+        for _ in threads:
+            self._queue.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _ensure_started(self):
+        """惰性启动后台线程，fork得到的子进程中重新创建队列与线程"""
+
+        if self._threads and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(
+                    target=self._run,
+                    name=f"{self.thread_name}-{index}",
+                    daemon=True,
+                )
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+            if not self._exit_handler_registered:
+                atexit.register(self.close)
+                self._exit_handler_registered = True
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                self._deliver(job)
+            finally:
+                self._queue.task_done()
+
+    def _get_retry_delay(self, attempt: int) -> float:
+        return min(
+            self.retry_backoff_seconds * 2 ** (attempt - 1),
+            self.max_retry_backoff_seconds,
+        )
+
+    def _deliver(self, job: MailJob):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                job.send()
+            except Exception as error:
+                if attempt < self.max_attempts and is_retryable_smtp_error(error):
+                    logger.warning(
+                        "Failed to send mail %s (attempt %d), retrying: %s",
+                        job.description,
+                        attempt,
+                        error,
+                    )
+                    time.sleep(self._get_retry_delay(attempt))
+                    continue
+
+                with self._lock:
+                    self.failed_count += 1
+                logger.exception("Failed to send mail %s", job.description)
+                self._handle_failure(job, error)
+            else:
+                with self._lock:
+                    self.sent_count += 1
+            return
+
+    @staticmethod
+    def _handle_failure(job: MailJob, error: Exception):
+        if job.on_failure is None:
+            return
+
+        try:
+            job.on_failure(error)
+        except Exception:
+            logger.exception("Failed to handle undelivered mail %s", job.description)
@@ -1,3 +1,4 @@
+from dash import dcc
 import feffery_antd_components as fac
 import feffery_utils_components as fuc
 from feffery_dash_utils.style_utils import style
@@ -14,6 +15,8 @@ def render():
     return [
         # 稳定触发初始化数据加载
         fuc.FefferyTimeout(id="core-login-logs-table-init-data-trigger", delay=0),
+        # 记录当前页首尾行排序键，供相邻翻页时进行键集分页
+        dcc.Store(id="core-login-logs-table-page-cursor"),
         fac.AntdSpace(
             [
                 fac.AntdBreadcrumb(
@@ -83,7 +86,14 @@ def render():
                         filterOptions={
                             "user_name": {
                                 "filterMode": "keyword",
-                            }
+                            },
+                            # ip按前缀匹配，登录状态按完整值匹配，均可命中索引
+                            "ip": {
+                                "filterMode": "keyword",
+                            },
+                            "status": {
+                                "filterMode": "keyword",
+                            },
                         },
                         title=fac.AntdSpace(
                             [
@@ -125,7 +135,13 @@ def render():
                                     ),
                                     id="core-login-logs-export-data-confirm",
                                     title="导出数据",
-                                    description="导出全部记录数据",
+                                    description="导出当前筛选、排序条件下的全部记录数据",
+                                ),
+                                # 按登录日期范围筛选，范围涉及已归档月份时同时查询对应的归档表
+                                fac.AntdDateRangePicker(
+                                    id="core-login-logs-date-range",
+                                    placeholder=["登录开始日期", "登录结束日期"],
+                                    allowClear=True,
                                 ),
                             ],
                             size=3,
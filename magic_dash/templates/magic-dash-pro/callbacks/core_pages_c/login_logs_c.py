@@ -1,7 +1,3 @@
-import io
-import csv
-import time
-
 import dash
 from datetime import datetime
 from dash import set_props, dcc
@@ -9,13 +5,16 @@ import feffery_antd_components as fac
 from dash.dependencies import Input, Output, State
 
 from server import app
+from configs import BaseConfig
 from models.logs import LoginLogs
+from models.login_rollups import LOGIN_SUCCESS_STATUSES
+from utils.export_utils import build_login_logs_export_url
 
 
 def get_login_status_tag_color(status: str):
     """根据登录状态映射标签颜色"""
 
-    if status in {"登录成功", "邮箱登录成功", "OTP登录成功"}:
+    if status in LOGIN_SUCCESS_STATUSES:
         return "green"
 
     if status in {
@@ -31,20 +30,18 @@ def get_login_status_tag_color(status: str):
     return "red"
 
 
-@app.callback(
-    Output("core-login-logs-table", "data"),
-    [
-        Input("core-login-logs-table-init-data-trigger", "timeoutCount"),
-        Input("core-login-logs-table", "pagination"),
-        Input("core-login-logs-table", "sorter"),
-        Input("core-login-logs-table", "filter"),
-    ],
-    prevent_initial_call=True,
-)
-def handle_login_logs_table_data_load(timeoutCount, pagination, sorter, _filter):
-    """处理登录日志表数据加载"""
+def format_login_datetime(login_datetime):
+    """统一登录时间字段的展示格式"""
+
+    if isinstance(login_datetime, datetime):
+        return login_datetime.strftime("%Y-%m-%d %H:%M:%S")
+
+    return login_datetime
+
+
+def get_query_condition(sorter, _filter, date_range=None):
+    """根据登录日志表当前的排序、筛选状态及登录日期范围构造查询条件"""
 
-    # 为本次查询构造查询条件
     query_condition = {}
 
     # 若存在有效排序条件
@@ -56,27 +53,143 @@ def handle_login_logs_table_data_load(timeoutCount, pagination, sorter, _filter)
     if _filter:
         if _filter.get("user_name"):
             query_condition["user_name_keyword"] = _filter["user_name"][0]
+        if _filter.get("ip"):
+            query_condition["ip_prefix"] = _filter["ip"][0]
+        if _filter.get("status"):
+            query_condition["status"] = _filter["status"][0]
+
+    # 若存在有效登录日期范围
+    if date_range:
+        query_condition["login_datetime_range"] = date_range
+
+    return query_condition
+
+
+def get_filter_condition(query_condition):
+    """从查询条件中提取筛选条件及登录日期范围，不含排序条件"""
+
+    return {
+        key: value
+        for key, value in query_condition.items()
+        if key not in ["order_by", "order"]
+    }
+
+
+def get_login_logs_total(filter_condition, page_cursor):
+    """获取符合当前筛选条件及登录日期范围的登录日志记录总数
+
+    筛选条件与上一次加载页面时一致时沿用已记录的统计结果，仅翻页、排序时不再重复统计；
+    无筛选条件时使用进程内维护的登录日志记录数，否则精确统计登录日志表及涉及的月度归档表
+    """
+
+    if page_cursor and page_cursor.get("filter_condition") == filter_condition:
+        return page_cursor["total"]
+
+    if filter_condition:
+        return LoginLogs.count_logs(**filter_condition)
+
+    return LoginLogs.get_count()
+
+
+def get_page_seek_cursor(pagination, query_condition, page_cursor):
+    """相邻翻页且查询条件未变化时，基于上一次加载页面的首尾行构造键集分页游标
+
+    首页以及跳页等非相邻翻页场景返回None，由offset分页兜底
+    """
+
+    if not page_cursor or pagination["current"] == 1:
+        return None
+
+    if (
+        page_cursor["pageSize"] != pagination["pageSize"]
+        or page_cursor["query_condition"] != query_condition
+    ):
+        return None
+
+    if pagination["current"] == page_cursor["current"] + 1:
+        return {"direction": "next", **page_cursor["last"]}
 
-    # 获取登录日志数据
+    if pagination["current"] == page_cursor["current"] - 1:
+        return {"direction": "prev", **page_cursor["first"]}
+
+    return None
+
+
+def get_page_cursor_bound(record, sort_key):
+    """基于登录日志原始记录构造键集分页游标的边界，不使用展示用的表格单元格数据"""
+
+    return {"value": format_login_datetime(record[sort_key]), "id": record["id"]}
+
+
+@app.callback(
+    [
+        Output("core-login-logs-table", "data"),
+        Output("core-login-logs-table", "pagination"),
+        Output("core-login-logs-table-page-cursor", "data"),
+    ],
+    [
+        Input("core-login-logs-table-init-data-trigger", "timeoutCount"),
+        Input("core-login-logs-table", "pagination"),
+        Input("core-login-logs-table", "sorter"),
+        Input("core-login-logs-table", "filter"),
+        Input("core-login-logs-date-range", "value"),
+    ],
+    State("core-login-logs-table-page-cursor", "data"),
+    prevent_initial_call=True,
+)
+def handle_login_logs_table_data_load(
+    timeoutCount, pagination, sorter, _filter, date_range, page_cursor
+):
+    """处理登录日志表数据加载"""
+
+    # 登录日期范围变化时回到首页
+    if dash.ctx.triggered_id == "core-login-logs-date-range":
+        pagination = {**pagination, "current": 1}
+
+    # 为本次查询构造查询条件
+    query_condition = get_query_condition(sorter, _filter, date_range)
+    filter_condition = get_filter_condition(query_condition)
+    total = get_login_logs_total(filter_condition, page_cursor)
+
+    # 获取登录日志数据，相邻翻页时使用键集分页，其余情况使用offset分页
     match_login_logs = LoginLogs.get_logs(
         limit=pagination["pageSize"],
         offset=(pagination["current"] - 1) * pagination["pageSize"],
+        cursor=get_page_seek_cursor(pagination, query_condition, page_cursor),
         **query_condition,  # 传入实际查询条件
     )
 
-    return [
+    table_data = [
         {
             **item,
             "status": {
                 "tag": item["status"],
                 "color": get_login_status_tag_color(item["status"]),
             },
-            "login_datetime": item["login_datetime"].strftime("%Y-%m-%d %H:%M:%S"),
+            "login_datetime": format_login_datetime(item["login_datetime"]),
             "key": item["id"],
         }
         for item in match_login_logs
     ]
 
+    # 记录当前页首尾行排序键的原始值，供下一次相邻翻页使用，同时记录本次筛选条件下的记录总数
+    sort_key = query_condition.get("order_by") or "id"
+    new_page_cursor = (
+        {
+            "current": pagination["current"],
+            "pageSize": pagination["pageSize"],
+            "query_condition": query_condition,
+            "filter_condition": filter_condition,
+            "total": total,
+            "first": get_page_cursor_bound(match_login_logs[0], sort_key),
+            "last": get_page_cursor_bound(match_login_logs[-1], sort_key),
+        }
+        if match_login_logs
+        else None
+    )
+
+    return table_data, {**pagination, "total": total}, new_page_cursor
+
 
 @app.callback(
     [
@@ -144,7 +257,8 @@ def handle_login_logs_refresh_delete_truncate(*args):
             },
         )
 
-    # 处理上述各操作之后的数据表更新
+    # 处理上述各操作之后的数据表更新，清除分页游标以重新统计记录总数
+    set_props("core-login-logs-table-page-cursor", {"data": None})
     set_props(
         "core-login-logs-table",
         {
@@ -163,42 +277,32 @@ def handle_login_logs_refresh_delete_truncate(*args):
 
 @app.callback(
     Input("core-login-logs-export-data-confirm", "confirmCounts"),
+    [
+        State("core-login-logs-table", "sorter"),
+        State("core-login-logs-table", "filter"),
+        State("core-login-logs-date-range", "value"),
+    ],
     running=[(Output("core-login-logs-export-data", "loading"), True, False)],
 )
-def handle_login_logs_export_data(confirmCounts):
+def handle_login_logs_export_data(confirmCounts, sorter, _filter, date_range):
     """处理导出数据操作"""
 
-    # 适当增加加载动画时长
-    time.sleep(0.5)
-
-    # 查询全部数据记录
-    all_login_logs = LoginLogs.get_logs()
-
-    # 若登录日志记录不为空
-    if all_login_logs:
-        # 处理登录时间字段格式
-        for item in all_login_logs:
-            item["login_datetime"] = item["login_datetime"].strftime(
-                "%Y-%m-%d %H:%M:%S"
-            )
-
-        # 生成CSV字符串
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=all_login_logs[0].keys())
-        writer.writeheader()
-        writer.writerows(all_login_logs)
-        csv_string = output.getvalue()
+    # 导出与登录日志表当前的筛选、排序条件保持一致
+    query_condition = get_query_condition(sorter, _filter, date_range)
 
-        # 返回下载文件流
+    # 若符合条件的登录日志记录不为空
+    if LoginLogs.get_logs(limit=1, **query_condition):
+        # 由导出接口逐批查询并写入临时文件后以文件流下载，避免在回调中构造完整文件内容
         set_props(
-            "global-download",
+            "global-redirect",
             {
-                "data": dcc.send_string(
-                    csv_string,
-                    "登录日志导出结果{}.csv".format(
-                        datetime.now().strftime("%Y%m%d%H%M%S")
+                "children": dcc.Location(
+                    href=build_login_logs_export_url(
+                        query_condition,
+                        compress=BaseConfig.compress_login_logs_export,
                     ),
-                    type="text/csv",
+                    refresh=True,
+                    id="global-redirect-target",
                 )
             },
         )
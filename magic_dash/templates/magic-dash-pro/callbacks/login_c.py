@@ -1,9 +1,8 @@
 import uuid
 import time
 import dash
+from functools import partial
 from flask import request
-from datetime import datetime
-from user_agents import parse
 from dash import set_props, dcc
 from flask_login import login_user
 import feffery_antd_components as fac
@@ -13,22 +12,42 @@ from flask_principal import identity_changed, Identity
 from dash.dependencies import Input, Output, State, ClientsideFunction
 
 from server import app, User
-from models.users import Users
 from configs import BaseConfig, EmailConfig, OtpConfig
-from models.email_verifications import EmailVerifications
-from models.logs import LoginLogs
+from models.auth_service import (
+    LoginClient,
+    authenticate_password,
+    get_login_user,
+    record_login,
+    start_user_session,
+)
+from models.caches import otp_totp_cache
 from models.otp_credentials import OtpCredentials
+from models.verification_code_store import get_verification_code_store
+from utils.browser_utils import check_user_agent
 from utils.crypto_utils import restore_login_password
-from utils.email_utils import send_email_verification_code
-from utils.otp_utils import decrypt_otp_secret, verify_otp_code
+from utils.email_utils import enqueue_email_verification_code
+from utils.otp_utils import decrypt_otp_secret, get_totp, verify_totp_code
 from utils.validation_utils import validate_optional_email
 
 
 def complete_user_login(match_user, remember=False):
-    """为已完成身份校验的用户建立登录会话"""
+    """为已完成身份校验的用户建立登录会话，返回是否成功建立登录会话"""
+
+    # 以单条条件更新语句轮换会话token
+    new_session_token = start_user_session(match_user)
 
-    new_session_token = str(uuid.uuid4())
-    Users.update_user(match_user.user_id, session_token=new_session_token)
+    # 若用户已被删除或密码在身份校验之后被修改
+    if not new_session_token:
+        set_props(
+            "global-message",
+            {
+                "children": fac.AntdMessage(
+                    type="error",
+                    content="用户信息已变更，请重新登录",
+                )
+            },
+        )
+        return False
 
     new_user = User(
         id=match_user.user_id,
@@ -48,6 +67,61 @@ def complete_user_login(match_user, remember=False):
         {"children": dcc.Location(pathname="/", id="global-redirect-target")},
     )
 
+    return True
+
+
+def rollback_undelivered_verification(
+    verification, previous_verification, error: Exception = None
+):
+    """撤销验证码邮件未能送达的本次签发，恢复此前仍有效的验证码"""
+
+    try:
+        get_verification_code_store().rollback_issued_verification(
+            verification,
+            previous_verification,
+        )
+    except Exception:
+        app.server.logger.exception("发送失败后的邮箱验证码清理失败")
+
+
+def get_login_client():
+    """获取当前邮箱、OTP登录请求对应的客户端信息"""
+
+    user_agent = check_user_agent(str(request.user_agent)).user_agent
+
+    return LoginClient(
+        ip=request.remote_addr,
+        browser="{} {}".format(
+            user_agent.browser.family,
+            user_agent.browser.version_string,
+        ),
+        os="{} {}".format(user_agent.os.family, user_agent.os.version_string),
+    )
+
+
+def get_credential_totp(credential):
+    """获取OTP凭据对应的TOTP实例，按用户缓存以省去每次校验时的密钥解密与实例构造"""
+
+    cached = otp_totp_cache.get(credential.user_id)
+    if cached is not None:
+        secret_ciphertext, totp = cached
+        if secret_ciphertext == credential.secret_ciphertext:
+            return totp
+
+        # 其他进程已重新绑定，丢弃基于旧密钥构造的实例
+        otp_totp_cache.invalidate(credential.user_id)
+
+    secret_ciphertext = credential.secret_ciphertext
+    cached_ciphertext, totp = otp_totp_cache.get_or_load(
+        credential.user_id,
+        lambda: (secret_ciphertext, get_totp(decrypt_otp_secret(secret_ciphertext))),
+    )
+    if cached_ciphertext != secret_ciphertext:
+        # 并发加载写入了其他密钥对应的实例时，本次直接基于当前密钥构造
+        return get_totp(decrypt_otp_secret(secret_ciphertext))
+
+    return totp
+
 
 app.clientside_callback(
     # 基于浏览器内置Web Crypto API加密密码
@@ -97,7 +171,7 @@ def handle_login(
     }
 
     # 提取当前登录行为对应的系统、浏览器信息
-    user_agent = parse(str(request.user_agent))
+    user_agent = check_user_agent(str(request.user_agent)).user_agent
     # 系统信息
     os_info = "{} {}".format(user_agent.os.family, user_agent.os.version_string)
     # 浏览器信息
@@ -144,10 +218,13 @@ def handle_login(
 
             return [None] * 4
 
-    # 校验用户登录信息
+    # 当前登录请求对应的客户端信息
+    client = LoginClient(ip=request.remote_addr, browser=browser_info, os=os_info)
 
-    # 根据用户名尝试查询用户
-    match_user = Users.get_user_by_name(values["login-user-name"])
+    # 校验用户登录信息，仅查询一次用户信息
+    match_user, login_status = authenticate_password(
+        values["login-user-name"], values["login-password"]
+    )
 
     # 若用户不存在
     if not match_user:
@@ -162,15 +239,7 @@ def handle_login(
         )
 
         # 登录日志记录
-        LoginLogs.add_log(
-            user_name=values["login-user-name"],
-            user_id=None,  # 不存在的用户无id
-            ip=request.remote_addr,
-            browser=browser_info,
-            os=os_info,
-            status="用户不存在",
-            login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        )
+        record_login(client, login_status, values["login-user-name"])
 
         return [
             # 表单帮助信息
@@ -181,53 +250,35 @@ def handle_login(
             None,
         ]
 
-    else:
-        # 校验密码
-
-        # 若密码不正确
-        if not Users.check_user_password(match_user.user_id, values["login-password"]):
-            set_props(
-                "global-message",
-                {
-                    "children": fac.AntdMessage(
-                        type="error",
-                        content="密码错误",
-                    )
-                },
-            )
-
-            # 登录日志记录
-            LoginLogs.add_log(
-                user_name=values["login-user-name"],
-                user_id=match_user.user_id,
-                ip=request.remote_addr,
-                browser=browser_info,
-                os=os_info,
-                status="密码错误",
-                login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            )
+    # 若密码不正确
+    elif login_status == "密码错误":
+        set_props(
+            "global-message",
+            {
+                "children": fac.AntdMessage(
+                    type="error",
+                    content="密码错误",
+                )
+            },
+        )
 
-            return [
-                # 表单帮助信息
-                None,
-                "密码错误",
-                # 表单帮助状态
-                None,
-                "error",
-            ]
+        # 登录日志记录
+        record_login(
+            client, login_status, values["login-user-name"], match_user.user_id
+        )
 
-        complete_user_login(match_user, remember=remember_me)
+        return [
+            # 表单帮助信息
+            None,
+            "密码错误",
+            # 表单帮助状态
+            None,
+            "error",
+        ]
 
+    if complete_user_login(match_user, remember=remember_me):
         # 登录日志记录
-        LoginLogs.add_log(
-            user_name=match_user.user_name,
-            user_id=match_user.user_id,
-            ip=request.remote_addr,
-            browser=browser_info,
-            os=os_info,
-            status="登录成功",
-            login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        )
+        record_login(client, login_status, match_user.user_name, match_user.user_id)
 
     return [None] * 4
 
@@ -456,7 +507,7 @@ def send_login_user_email_captcha(nClicks, email):
         return
 
     try:
-        match_user = Users.get_user_by_email(email)
+        match_user = get_login_user(user_email=email)
     except Exception:
         app.server.logger.exception("邮箱登录用户信息查询失败")
         set_props(
@@ -501,7 +552,7 @@ def send_login_user_email_captcha(nClicks, email):
             verification,
             remaining_seconds,
             previous_verification,
-        ) = EmailVerifications.issue_verification(
+        ) = get_verification_code_store().issue_verification(
             email,
             resend_interval_seconds,
         )
@@ -545,16 +596,22 @@ def send_login_user_email_captcha(nClicks, email):
         return
 
     try:
-        send_email_verification_code(email, verification.verification_code)
-    except Exception:
-        app.server.logger.exception("邮箱登录验证码发送失败")
-        try:
-            EmailVerifications.rollback_issued_verification(
+        # 验证码邮件交由后台队列发送，最终发送失败时撤销本次签发的验证码
+        queued = enqueue_email_verification_code(
+            email,
+            verification.verification_code,
+            on_failure=partial(
+                rollback_undelivered_verification,
                 verification,
                 previous_verification,
-            )
-        except Exception:
-            app.server.logger.exception("发送失败后的邮箱验证码清理失败")
+            ),
+        )
+    except Exception:
+        app.server.logger.exception("邮箱登录验证码发送失败")
+        queued = False
+
+    if not queued:
+        rollback_undelivered_verification(verification, previous_verification)
         set_props(
             "global-message",
             {
@@ -654,7 +711,7 @@ def handle_login_user_email_submit(nClicks, email, verification_code):
         return
 
     try:
-        match_user = Users.get_user_by_email(email)
+        match_user = get_login_user(user_email=email)
     except Exception:
         app.server.logger.exception("邮箱登录用户信息查询失败")
         set_props(
@@ -689,7 +746,7 @@ def handle_login_user_email_submit(nClicks, email, verification_code):
         return
 
     try:
-        verify_result = EmailVerifications.verify_code(
+        verify_result = get_verification_code_store().verify_code(
             email,
             verification_code,
             EmailConfig.verification_code_expire_seconds,
@@ -738,18 +795,8 @@ def handle_login_user_email_submit(nClicks, email, verification_code):
         )
         set_props("login-user-email-submit", {"loading": False})
 
-        user_agent = parse(str(request.user_agent))
-        LoginLogs.add_log(
-            user_name=match_user.user_name,
-            user_id=match_user.user_id,
-            ip=request.remote_addr,
-            browser="{} {}".format(
-                user_agent.browser.family,
-                user_agent.browser.version_string,
-            ),
-            os="{} {}".format(user_agent.os.family, user_agent.os.version_string),
-            status=log_status,
-            login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        record_login(
+            get_login_client(), log_status, match_user.user_name, match_user.user_id
         )
         # 提前终止当前无输出回调
         return
@@ -759,21 +806,11 @@ def handle_login_user_email_submit(nClicks, email, verification_code):
         {"help": None, "validateStatus": "success"},
     )
     set_props("login-user-email-submit", {"loading": False})
-    complete_user_login(match_user)
 
-    user_agent = parse(str(request.user_agent))
-    LoginLogs.add_log(
-        user_name=match_user.user_name,
-        user_id=match_user.user_id,
-        ip=request.remote_addr,
-        browser="{} {}".format(
-            user_agent.browser.family,
-            user_agent.browser.version_string,
-        ),
-        os="{} {}".format(user_agent.os.family, user_agent.os.version_string),
-        status="邮箱登录成功",
-        login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    )
+    if complete_user_login(match_user):
+        record_login(
+            get_login_client(), "邮箱登录成功", match_user.user_name, match_user.user_id
+        )
 
 
 @app.callback(
@@ -810,12 +847,7 @@ def handle_login_user_otp_submit(nClicks, user_name, otp_code):
         set_props("login-user-otp-submit", {"loading": False})
         return
 
-    user_agent = parse(str(request.user_agent))
-    browser_info = "{} {}".format(
-        user_agent.browser.family,
-        user_agent.browser.version_string,
-    )
-    os_info = "{} {}".format(user_agent.os.family, user_agent.os.version_string)
+    client = get_login_client()
 
     def reject_login(
         match_user=None,
@@ -839,18 +871,15 @@ def handle_login_user_otp_submit(nClicks, user_name, otp_code):
         )
         set_props("login-user-otp-submit", {"loading": False})
 
-        LoginLogs.add_log(
-            user_name=match_user.user_name if match_user else user_name,
-            user_id=match_user.user_id if match_user else None,
-            ip=request.remote_addr,
-            browser=browser_info,
-            os=os_info,
-            status=log_status,
-            login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        record_login(
+            client,
+            log_status,
+            match_user.user_name if match_user else user_name,
+            match_user.user_id if match_user else None,
         )
 
     try:
-        match_user = Users.get_user_by_name(user_name)
+        match_user = get_login_user(user_name=user_name)
     except Exception:
         app.server.logger.exception("OTP登录用户信息查询失败")
         set_props(
@@ -880,8 +909,7 @@ def handle_login_user_otp_submit(nClicks, user_name, otp_code):
         return
 
     try:
-        otp_secret = decrypt_otp_secret(credential.secret_ciphertext)
-        is_valid, timecode = verify_otp_code(otp_secret, otp_code)
+        is_valid, timecode = verify_totp_code(get_credential_totp(credential), otp_code)
     except Exception:
         app.server.logger.exception("OTP动态口令校验失败")
         set_props(
@@ -905,10 +933,11 @@ def handle_login_user_otp_submit(nClicks, user_name, otp_code):
         reject_login(match_user)
         return
 
+    # 以条件更新语句记录已使用的时间窗口，并发提交的同一口令只有一次生效
     if (
         credential.last_used_timecode is not None
         and timecode <= credential.last_used_timecode
-    ):
+    ) or not OtpCredentials.mark_used(match_user.user_id, timecode):
         OtpCredentials.record_failed_attempt(
             match_user.user_id,
             OtpConfig.max_failed_attempts,
@@ -917,20 +946,11 @@ def handle_login_user_otp_submit(nClicks, user_name, otp_code):
         reject_login(match_user, "动态口令已失效，请等待下一组口令", "OTP口令失效")
         return
 
-    OtpCredentials.mark_used(match_user.user_id, timecode)
     set_props(
         "login-user-otp-code-form-item",
         {"help": None, "validateStatus": "success"},
     )
     set_props("login-user-otp-submit", {"loading": False})
-    complete_user_login(match_user)
 
-    LoginLogs.add_log(
-        user_name=match_user.user_name,
-        user_id=match_user.user_id,
-        ip=request.remote_addr,
-        browser=browser_info,
-        os=os_info,
-        status="OTP登录成功",
-        login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    )
+    if complete_user_login(match_user):
+        record_login(client, "OTP登录成功", match_user.user_name, match_user.user_id)
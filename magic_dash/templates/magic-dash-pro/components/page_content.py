@@ -11,6 +11,7 @@ from views.core_pages import (
     url_params_page,
     # 系统管理相关页面
     login_logs,
+    login_stats,
 )
 
 
@@ -71,4 +72,9 @@ def render(pathname: str, current_url: str = None):
         # 更新页面返回内容
         page_content = login_logs.render()
 
+    # 日志管理-登录统计
+    elif pathname == "/core/login-stats":
+        # 更新页面返回内容
+        page_content = login_stats.render()
+
     return page_content
@@ -27,6 +27,7 @@ class AuthConfig:
             "keys": [
                 # 常规用户禁止访问系统管理相关页面
                 "/core/login-logs",
+                "/core/login-stats",
             ],
         },
         # "normal": {"type": "include", "keys": ["/core/page2", "/core/page5"]},
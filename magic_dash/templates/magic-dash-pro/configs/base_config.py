@@ -75,3 +75,6 @@ class BaseConfig:
 
     # 针对用户登录页面，是否启用OTP动态口令登录功能
     enable_otp_login: bool = False
+
+    # 登录日志导出时，是否对导出的CSV文件进行gzip压缩
+    compress_login_logs_export: bool = False
@@ -0,0 +1,39 @@
+class CacheConfig:
+    """进程内缓存配置参数"""
+
+    # 登录态用户信息缓存的最大条目数，设置为0时关闭该缓存
+    user_cache_max_size: int = 4096
+
+    # 登录态用户信息缓存的有效期，单位：秒，设置为0时关闭该缓存
+    # 本进程内的用户信息变更会立即失效对应缓存，该有效期用于兜底其他进程中的写操作
+    user_cache_ttl_seconds: int = 30
+
+    # 角色页面访问策略缓存的最大条目数，设置为0时关闭该缓存
+    access_policy_cache_max_size: int = 256
+
+    # 角色页面访问策略缓存的有效期，单位：秒，设置为0时关闭该缓存
+    access_policy_cache_ttl_seconds: int = 30
+
+    # 有效用户角色快照的有效期，单位：秒，设置为0时关闭该缓存
+    effective_roles_snapshot_ttl_seconds: int = 30
+
+    # 部门层级索引快照的有效期，单位：秒，设置为0时关闭该缓存
+    department_tree_snapshot_ttl_seconds: int = 30
+
+    # OTP动态口令TOTP实例缓存的最大条目数，设置为0时关闭该缓存
+    otp_totp_cache_max_size: int = 1024
+
+    # OTP动态口令TOTP实例缓存的有效期，单位：秒，设置为0时关闭该缓存
+    # 缓存按用户保存由解密后的共享密钥构造的TOTP实例，有效期不宜过长以缩短明文密钥的驻留时间
+    otp_totp_cache_ttl_seconds: int = 60
+
+    # 多进程部署时检查数据库缓存版本表的最小间隔，单位：秒
+    # 其他进程写入后，本进程的缓存最迟在该间隔后失效，设置为0时每次请求都检查
+    cache_versions_check_interval_seconds: float = 1
+
+    # 登录日志表近似记录数重新校准的间隔，单位：秒，设置为0时每次读取都重新获取
+    # 本进程内的写操作会即时增量调整计数，该间隔用于修正其他进程中的写操作造成的偏差
+    login_logs_count_reconcile_interval_seconds: int = 300
+
+    # 数据库统计信息估算的登录日志记录数低于该值时，改为执行精确计数
+    login_logs_exact_count_threshold: int = 100000
@@ -0,0 +1,17 @@
+from typing import Optional
+
+
+class ImportConfig:
+    """批量导入配置参数"""
+
+    # 单次批量导入允许的最大用户数量
+    user_import_max_rows: int = 100000
+
+    # 批量导入用户时，单个事务写入的最大记录数
+    user_import_batch_size: int = 1000
+
+    # 批量导入用户时计算密码散列值的进程数，设置为None时使用全部CPU核心
+    user_import_hash_workers: Optional[int] = None
+
+    # 待导入用户数量不超过该值时，直接在当前进程中计算密码散列值，避免进程池的启动开销
+    user_import_parallel_threshold: int = 64
@@ -0,0 +1,40 @@
+from typing import Literal
+
+
+class LogConfig:
+    """日志记录配置参数"""
+
+    # 是否由后台线程批量写入登录日志，关闭后每次登录直接同步写入登录日志
+    login_logs_async_write: bool = True
+
+    # 登录日志后台批量写入时，单批写入的最大记录数
+    login_logs_batch_size: int = 200
+
+    # 登录日志后台批量写入的刷新间隔，单位：秒，未凑满单批记录数时最迟在该间隔后写入
+    login_logs_flush_interval_seconds: float = 0.2
+
+    # 登录日志待写入队列的最大记录数
+    login_logs_queue_max_size: int = 10000
+
+    # 登录日志待写入队列已满时，登录请求最多等待的时长，单位：秒
+    # 超时后丢弃本条登录日志并计数，设置为0时队列已满即直接丢弃
+    login_logs_queue_put_timeout_seconds: float = 0.05
+
+    # 登录日志保留天数，登录时间早于该期限的日志记录会被清理，设置为0时永久保留
+    # 清理任务可通过`python -m purge_login_logs`手动执行，或配置为定时任务执行
+    login_logs_retention_days: int = 0
+
+    # 清理过期登录日志时，单批删除的最大记录数
+    login_logs_purge_batch_size: int = 1000
+
+    # 清理过期登录日志时，相邻批次之间的暂停时长，单位：秒，便于其他写操作获取数据库写锁
+    login_logs_purge_batch_pause_seconds: float = 0.05
+
+    # 过期登录日志的归档方式
+    # none：直接删除，不做归档
+    # table：归档至按月划分的归档表，登录日志页面按日期范围查询时会同时查询对应月份的归档表
+    # file：归档至login_logs_archive_dir目录下按月划分的gzip压缩NDJSON文件
+    login_logs_archive_mode: Literal["none", "table", "file"] = "table"
+
+    # 过期登录日志以文件方式归档时的存放目录
+    login_logs_archive_dir: str = "login_logs_archive"
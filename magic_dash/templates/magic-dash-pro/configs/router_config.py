@@ -122,6 +122,15 @@ class RouterConfig:
                                 "href": "/core/login-logs",
                             },
                         },
+                        {
+                            "component": "Item",
+                            "props": {
+                                "key": "/core/login-stats",
+                                "title": "登录统计",
+                                "icon": "antd-bar-chart",
+                                "href": "/core/login-stats",
+                            },
+                        },
                     ],
                 },
             ],
@@ -164,6 +173,7 @@ class RouterConfig:
         "/core/independent-wildcard-page": "独立通配页面渲染入口页",
         "/core/url-params-page": "url参数提取示例",
         "/core/login-logs": "登录日志",
+        "/core/login-stats": "登录统计",
         "/core/other-page1": "其他页面1",
         "/403-demo": "403状态页演示",
         "/404-demo": "404状态页演示",
@@ -195,4 +205,5 @@ class RouterConfig:
         "/core/sub-menu-page2": ["子菜单演示"],
         "/core/sub-menu-page3": ["子菜单演示"],
         "/core/login-logs": ["日志管理"],
+        "/core/login-stats": ["日志管理"],
     }
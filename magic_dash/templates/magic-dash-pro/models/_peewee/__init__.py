@@ -1,9 +1,29 @@
+import sqlite3
+from contextlib import contextmanager
 from importlib.util import find_spec
 
-from peewee import SqliteDatabase, Model, fn
+from peewee import SQL, IntegerField, SqliteDatabase, Model, Table, fn
 from playhouse.pool import PooledPostgresqlDatabase, PooledMySQLDatabase
 
 from configs.database_config import DatabaseConfig
+from ..bulk_operations import (
+    dedupe_keys,
+    get_bulk_in_chunk_size,
+    get_bulk_temp_table_threshold,
+    get_temp_key_table_statements,
+    iter_key_chunks,
+)
+from ..schema_contract import TABLE_INDEXES, TABLE_SEARCH_INDEXES
+from ..search_index import (
+    MYSQL_NGRAM_TOKEN_SIZE,
+    TRIGRAM_MIN_KEYWORD_LENGTH,
+    build_mysql_boolean_phrase,
+    get_drop_sqlite_search_index_statements,
+    get_search_index_statements,
+    get_search_key_table_name,
+    sqlite_supports_trigram,
+)
+from ..unit_of_work import get_current_unit_of_work
 
 
 def check_database_driver_installed(package_name, import_name=None):
@@ -51,6 +71,9 @@ def get_db():
 
 db = get_db()
 
+# 文本检索索引是否存在的进程内缓存，避免每次查询重复读取数据库元数据
+_search_index_states = {}
+
 
 class BaseModel(Model):
     """数据库表模型基类"""
@@ -59,6 +82,43 @@ class BaseModel(Model):
         database = db
 
 
+def open_unit_of_work_connection(unit_of_work):
+    """为请求级工作单元打开数据库连接，事务型工作单元同时开启请求事务"""
+
+    connection_context = db.connection_context()
+    connection_context.__enter__()
+    transaction = None
+    if unit_of_work.transactional:
+        transaction = db.transaction()
+        transaction.__enter__()
+
+    def finalize(commit: bool):
+        try:
+            if transaction is not None:
+                # 以异常类型退出事务上下文时，Peewee会回滚而非提交
+                exc_type = None if commit else RuntimeError
+                transaction.__exit__(exc_type, None, None)
+        finally:
+            connection_context.__exit__(None, None, None)
+
+    return db, finalize
+
+
+@contextmanager
+def connection_scope():
+    """获取数据库连接上下文，存在请求级工作单元时复用其连接与事务
+
+    Peewee的连接上下文与atomic()均可嵌套，加入请求事务后模型方法中的atomic()自动降级为保存点
+    """
+
+    unit_of_work = get_current_unit_of_work()
+    if unit_of_work is not None:
+        unit_of_work.open(open_unit_of_work_connection)
+
+    with db.connection_context():
+        yield
+
+
 def create_tables(table_models):
     """创建指定内置模型对应的数据表"""
 
@@ -80,14 +140,14 @@ def model_table_exists(table_model):
 def model_table_has_data(table_model):
     """检查模型类对应的数据表是否已有数据"""
 
-    with db.connection_context():
+    with connection_scope():
         return table_model.select().count() > 0
 
 
 def ensure_user_email_schema(Users):
     """兼容旧项目中的用户邮箱字段与唯一索引"""
 
-    with db.connection_context():
+    with connection_scope():
         table_name = Users._meta.table_name
         column_names = {column.name for column in db.get_columns(table_name)}
         changes = []
@@ -130,3 +190,240 @@ def ensure_user_email_schema(Users):
             changes.append("用户邮箱唯一约束")
 
         return changes
+
+
+def ensure_model_indexes(table_model):
+    """为已存在的数据表补齐索引契约中声明的复合索引"""
+
+    with connection_scope():
+        table_name = table_model._meta.table_name
+        index_names = {index.name for index in db.get_indexes(table_name)}
+        changes = []
+
+        for index_name, columns in TABLE_INDEXES.get(table_model.__name__, {}).items():
+            if index_name in index_names:
+                continue
+
+            db.execute_sql(
+                f"CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)})"
+            )
+            changes.append(f"{table_name}表索引({', '.join(columns)})")
+
+        return changes
+
+
+def ensure_search_indexes(table_model):
+    """为数据表建立检索索引契约中声明的文本检索索引"""
+
+    table_name = table_model._meta.table_name
+    primary_key = table_model._meta.primary_key
+    integer_primary_key = isinstance(primary_key, IntegerField)
+    changes = []
+
+    # 低版本SQLite不支持trigram分词器，关键词查询退化为普通模糊查询
+    if DatabaseConfig.database_type == "sqlite" and not sqlite_supports_trigram():
+        return changes
+
+    for column_name, index_name in TABLE_SEARCH_INDEXES.get(
+        table_model.__name__, {}
+    ).items():
+        statements = get_search_index_statements(
+            DatabaseConfig.database_type,
+            table_name,
+            index_name,
+            column_name,
+            primary_key.column_name,
+            integer_primary_key,
+        )
+        if search_index_exists(table_name, index_name, refresh=True):
+            if not is_legacy_sqlite_search_index(
+                table_name, index_name, integer_primary_key
+            ):
+                continue
+
+            # 此前版本以内置rowid关联非整数主键数据表，先移除后按主键映射重建
+            statements = [
+                *get_drop_sqlite_search_index_statements(index_name),
+                *statements,
+            ]
+
+        with connection_scope():
+            with db.atomic():
+                for sql in statements:
+                    db.execute_sql(sql)
+
+        _search_index_states[(table_name, index_name)] = True
+        if DatabaseConfig.database_type == "sqlite" and not integer_primary_key:
+            _search_index_states[
+                (table_name, get_search_key_table_name(index_name))
+            ] = True
+        changes.append(f"{table_name}表{column_name}字段检索索引")
+
+    return changes
+
+
+def is_legacy_sqlite_search_index(
+    table_name: str, index_name: str, integer_primary_key: bool
+) -> bool:
+    """检查非整数主键数据表上的SQLite检索索引是否为缺少主键映射表的旧版本"""
+
+    return (
+        DatabaseConfig.database_type == "sqlite"
+        and not integer_primary_key
+        and not search_index_exists(
+            table_name, get_search_key_table_name(index_name), refresh=True
+        )
+    )
+
+
+def search_index_exists(table_name: str, index_name: str, refresh: bool = False):
+    """检查文本检索索引是否存在，检查结果在进程内缓存"""
+
+    key = (table_name, index_name)
+    if refresh or key not in _search_index_states:
+        with connection_scope():
+            # SQLite的检索索引为FTS5虚拟表，其余数据库为数据表上的索引
+            if DatabaseConfig.database_type == "sqlite":
+                names = db.get_tables()
+            else:
+                names = [index.name for index in db.get_indexes(table_name)]
+        _search_index_states[key] = index_name in names
+
+    return _search_index_states[key]
+
+
+def build_search_condition(field, keyword: str, index_name: str):
+    """构造可命中文本检索索引的附加筛选条件，需与原模糊查询条件组合使用以保证结果准确
+
+    PostgreSQL中模糊查询条件可直接命中pg_trgm索引，关键词过短无法利用检索索引时，
+    均无需附加条件，此时返回None
+    """
+
+    if (
+        DatabaseConfig.database_type == "sqlite"
+        and len(keyword) >= TRIGRAM_MIN_KEYWORD_LENGTH
+    ):
+        primary_key = field.model._meta.primary_key
+        search_table = Table(index_name, ("rowid", field.column_name))
+        search_field = getattr(search_table, field.column_name)
+        search_rowids = search_table.select(search_table.rowid).where(
+            search_field.contains(keyword)
+        )
+        if isinstance(primary_key, IntegerField):
+            return primary_key.in_(search_rowids)
+
+        # 非整数主键经映射表由检索索引记录的rowid取回主键，忽略缺少映射表的旧版本检索索引
+        key_table_name = get_search_key_table_name(index_name)
+        if not search_index_exists(field.model._meta.table_name, key_table_name):
+            return None
+
+        key_table = Table(key_table_name, ("id", primary_key.column_name))
+        return primary_key.in_(
+            key_table.select(getattr(key_table, primary_key.column_name)).where(
+                key_table.id.in_(search_rowids)
+            )
+        )
+
+    if (
+        DatabaseConfig.database_type == "mysql"
+        and len(keyword) >= MYSQL_NGRAM_TOKEN_SIZE
+    ):
+        return SQL(
+            f"MATCH({field.column_name}) AGAINST (%s IN BOOLEAN MODE)",
+            [build_mysql_boolean_phrase(keyword)],
+        )
+
+    return None
+
+
+def execute_bulk_in(field, keys, build_query) -> int:
+    """按键集合分批执行批量操作，返回受影响记录数
+
+    build_query接收字段的IN条件并返回待执行的更新或删除查询，键数量较少时按数据库参数上限分块执行，
+    键数量超过当前数据库的阈值时先写入临时键表，再以单条子查询语句执行，全部分块均在同一事务中完成
+    """
+
+    keys = dedupe_keys(keys)
+    if not keys:
+        return 0
+
+    chunk_size = get_bulk_in_chunk_size(DatabaseConfig.database_type)
+    temp_table_threshold = get_bulk_temp_table_threshold(DatabaseConfig.database_type)
+
+    with connection_scope():
+        with db.atomic():
+            if temp_table_threshold is None or len(keys) <= temp_table_threshold:
+                return sum(
+                    build_query(field.in_(chunk)).execute()
+                    for chunk in iter_key_chunks(keys, chunk_size)
+                )
+
+            table_name, create_sql, drop_sql = get_temp_key_table_statements(
+                DatabaseConfig.database_type, keys
+            )
+            key_table = Table(table_name, ("bulk_key",)).bind(db)
+            db.execute_sql(create_sql)
+            try:
+                for chunk in iter_key_chunks(keys, chunk_size):
+                    key_table.insert(
+                        [(key,) for key in chunk], columns=[key_table.bulk_key]
+                    ).execute()
+                affected_count = build_query(
+                    field.in_(key_table.select(key_table.bulk_key))
+                ).execute()
+            except Exception:
+                # PostgreSQL出错后事务中止、临时表随回滚撤销，其余数据库需显式删除临时表
+                if DatabaseConfig.database_type != "postgresql":
+                    db.execute_sql(drop_sql)
+                raise
+            db.execute_sql(drop_sql)
+
+            return affected_count
+
+
+def supports_recursive_cte():
+    """检查当前数据库是否支持WITH RECURSIVE递归查询，MySQL 8.0之前的版本不支持"""
+
+    if DatabaseConfig.database_type == "mysql":
+        with connection_scope():
+            return db.server_version >= (8, 0)
+
+    return True
+
+
+def supports_returning():
+    """检查当前数据库是否支持INSERT/DELETE ... RETURNING语法
+
+    MySQL及3.35之前版本的SQLite不支持，需在写入后额外查询受影响记录
+    """
+
+    if DatabaseConfig.database_type == "mysql":
+        return False
+
+    if DatabaseConfig.database_type == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+
+    return True
+
+
+def estimate_table_row_count(table_name: str):
+    """基于数据库统计信息估算数据表记录数，SQLite等无可用统计信息时返回None"""
+
+    if DatabaseConfig.database_type == "postgresql":
+        sql = "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)"
+    elif DatabaseConfig.database_type == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+    else:
+        return None
+
+    with connection_scope():
+        row = db.execute_sql(sql, (table_name,)).fetchone()
+
+    # PostgreSQL中从未执行过VACUUM/ANALYZE的数据表reltuples为-1
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+
+    return int(row[0])
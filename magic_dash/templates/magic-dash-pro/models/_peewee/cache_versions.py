@@ -0,0 +1,69 @@
+from typing import List
+
+from peewee import BigIntegerField, CharField
+
+from . import db, BaseModel, connection_scope
+from ..caches import CACHE_ENTITY_TYPES, cache_invalidation_bus
+from ..schema_contract import TABLE_NAMES
+
+
+class CacheVersions(BaseModel):
+    """缓存版本表模型类，用于多进程部署时通知其他进程清理本地缓存"""
+
+    # 缓存实体类型，主键，取值见CACHE_ENTITY_TYPES
+    entity_type = CharField(primary_key=True)
+
+    # 缓存版本号，对应实体每次写操作提交时递增
+    version = BigIntegerField(default=0)
+
+    class Meta:
+        # 显式声明表名，确保不同ORM引擎映射到同一张物理表
+        database = db
+        table_name = TABLE_NAMES["CacheVersions"]
+
+    @classmethod
+    def ensure_table(cls):
+        """确保缓存版本表存在，并补齐各实体类型对应的版本记录"""
+
+        with connection_scope():
+            if not cls.table_exists():
+                db.create_tables([cls])
+
+            with db.atomic():
+                (
+                    cls.insert_many(
+                        [
+                            {"entity_type": entity_type, "version": 0}
+                            for entity_type in CACHE_ENTITY_TYPES
+                        ]
+                    )
+                    .on_conflict_ignore()
+                    .execute()
+                )
+
+    @classmethod
+    def get_versions(cls):
+        """获取全部实体类型当前的缓存版本号"""
+
+        with connection_scope():
+            return dict(cls.select(cls.entity_type, cls.version).tuples())
+
+    @classmethod
+    def bump_versions(cls, entity_types: List[str]):
+        """递增指定实体类型的缓存版本号，需在对应写操作的同一事务中调用"""
+
+        (
+            cls.update(version=cls.version + 1)
+            .where(cls.entity_type << entity_types)
+            .execute()
+        )
+
+    @classmethod
+    def sync_local_caches(cls):
+        """按检查间隔对比缓存版本号，清理已被其他进程更新的本地缓存"""
+
+        cache_invalidation_bus.sync(cls.get_versions)
+
+
+# 创建表并补齐版本记录（如果不存在）
+CacheVersions.ensure_table()
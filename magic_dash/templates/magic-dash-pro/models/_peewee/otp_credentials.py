@@ -1,9 +1,16 @@
 from datetime import datetime, timedelta
+from functools import partial
 
-from peewee import BooleanField, CharField, DateTimeField, IntegerField
+from peewee import BooleanField, Case, CharField, DateTimeField, IntegerField
 
-from . import db, BaseModel
+from configs.database_config import DatabaseConfig
+from . import db, BaseModel, connection_scope, supports_returning
+from ..caches import otp_totp_cache
 from ..schema_contract import TABLE_NAMES
+from ..unit_of_work import run_after_transaction
+
+# 当前进程是否已确认OTP凭据表存在，确认后不再重复执行表结构检查
+_table_ensured = False
 
 
 class OtpCredentials(BaseModel):
@@ -43,12 +50,19 @@ class OtpCredentials(BaseModel):
 
     @classmethod
     def ensure_table(cls):
-        """确保OTP凭据表存在，用于兼容已初始化过的旧数据库"""
+        """确保OTP凭据表存在，用于兼容已初始化过的旧数据库，每个进程只检查一次"""
+
+        global _table_ensured
 
-        with db.connection_context():
+        if _table_ensured:
+            return
+
+        with connection_scope():
             if not cls.table_exists():
                 db.create_tables([cls])
 
+        _table_ensured = True
+
     @classmethod
     def get_credential(cls, user_id: str):
         """根据用户id查询OTP凭据信息"""
@@ -58,7 +72,7 @@ class OtpCredentials(BaseModel):
             return None
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             return cls.get_or_none(cls.user_id == user_id)
 
     @classmethod
@@ -78,7 +92,7 @@ class OtpCredentials(BaseModel):
 
         cls.ensure_table()
         now = datetime.now()
-        with db.connection_context():
+        with connection_scope():
             with db.atomic():
                 credential = cls.get_or_none(cls.user_id == user_id)
                 if credential:
@@ -105,7 +119,10 @@ class OtpCredentials(BaseModel):
                         updated_at=now,
                     )
 
-            return cls.get_or_none(cls.user_id == user_id)
+            credential = cls.get_or_none(cls.user_id == user_id)
+
+        run_after_transaction(partial(otp_totp_cache.invalidate, user_id))
+        return credential
 
     @classmethod
     def disable_credential(cls, user_id: str):
@@ -116,8 +133,11 @@ class OtpCredentials(BaseModel):
             return 0
 
         cls.ensure_table()
-        with db.connection_context():
-            return cls.delete().where(cls.user_id == user_id).execute()
+        with connection_scope():
+            deleted_count = cls.delete().where(cls.user_id == user_id).execute()
+
+        run_after_transaction(partial(otp_totp_cache.invalidate, user_id))
+        return deleted_count
 
     @staticmethod
     def is_locked(credential) -> bool:
@@ -129,18 +149,31 @@ class OtpCredentials(BaseModel):
 
     @classmethod
     def mark_used(cls, user_id: str, timecode: int):
-        """记录最近一次成功使用的TOTP时间窗口"""
+        """记录最近一次成功使用的TOTP时间窗口，返回更新的记录数
+
+        凭据已停用、处于锁定状态或该时间窗口已被使用时不更新并返回0，
+        确保并发提交的同一动态口令只有一次生效
+        """
 
         cls.ensure_table()
-        with db.connection_context():
+        now = datetime.now()
+        with connection_scope():
             return (
                 cls.update(
                     last_used_timecode=timecode,
                     failed_attempts=0,
                     locked_until=None,
-                    updated_at=datetime.now(),
+                    updated_at=now,
+                )
+                .where(
+                    (cls.user_id == user_id)
+                    & (cls.is_enabled == True)  # noqa: E712
+                    & (
+                        cls.last_used_timecode.is_null()
+                        | (cls.last_used_timecode < timecode)
+                    )
+                    & (cls.locked_until.is_null() | (cls.locked_until <= now))
                 )
-                .where(cls.user_id == user_id)
                 .execute()
             )
 
@@ -151,39 +184,52 @@ class OtpCredentials(BaseModel):
         max_failed_attempts: int,
         lockout_seconds: int,
     ):
-        """记录OTP校验失败，并在达到阈值后临时锁定"""
+        """以单条原子更新语句累加OTP校验失败次数，并在达到阈值后临时锁定
 
-        cls.ensure_table()
-        with db.connection_context():
-            credential = cls.get_or_none(cls.user_id == user_id)
-            if not credential:
-                return None
-
-            failed_attempts = (credential.failed_attempts or 0) + 1
-            locked_until = (
-                datetime.now() + timedelta(seconds=lockout_seconds)
-                if failed_attempts >= max_failed_attempts
-                else credential.locked_until
-            )
+        返回更新后的凭据信息，凭据不存在时返回None
+        """
 
-            (
-                cls.update(
-                    failed_attempts=failed_attempts,
-                    locked_until=locked_until,
-                    updated_at=datetime.now(),
+        cls.ensure_table()
+        now = datetime.now()
+        # MySQL按SET子句顺序求值，锁定条件中读取到的已是累加后的失败次数
+        failed_attempts = (
+            cls.failed_attempts
+            if DatabaseConfig.database_type == "mysql"
+            else cls.failed_attempts + 1
+        )
+        query = cls.update(
+            failed_attempts=cls.failed_attempts + 1,
+            locked_until=Case(
+                None,
+                [
+                    (
+                        failed_attempts >= max_failed_attempts,
+                        now + timedelta(seconds=lockout_seconds),
+                    )
+                ],
+                cls.locked_until,
+            ),
+            updated_at=now,
+        ).where(cls.user_id == user_id)
+
+        with connection_scope():
+            if supports_returning():
+                return next(
+                    iter(query.returning(*cls._meta.sorted_fields).execute()), None
                 )
-                .where(cls.user_id == user_id)
-                .execute()
-            )
 
-            return cls.get_or_none(cls.user_id == user_id)
+            with db.atomic():
+                if not query.execute():
+                    return None
+
+                return cls.get_or_none(cls.user_id == user_id)
 
     @classmethod
     def reset_failed_attempts(cls, user_id: str):
         """清空OTP失败计数和锁定状态"""
 
         cls.ensure_table()
-        with db.connection_context():
+        with connection_scope():
             return (
                 cls.update(
                     failed_attempts=0,
@@ -1,10 +1,39 @@
+import sqlite3
 from contextlib import contextmanager
 from importlib.util import find_spec
 
-from sqlalchemy import create_engine, inspect, text, func, select, update
+from sqlalchemy import (
+    Integer,
+    create_engine,
+    func,
+    inspect,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.sql import column as sql_column, table as sql_table
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from configs.database_config import DatabaseConfig
+from ..bulk_operations import (
+    dedupe_keys,
+    get_bulk_in_chunk_size,
+    get_bulk_temp_table_threshold,
+    get_temp_key_table_statements,
+    iter_key_chunks,
+)
+from ..schema_contract import TABLE_INDEXES, TABLE_SEARCH_INDEXES
+from ..search_index import (
+    MYSQL_NGRAM_TOKEN_SIZE,
+    TRIGRAM_MIN_KEYWORD_LENGTH,
+    build_mysql_boolean_phrase,
+    get_drop_sqlite_search_index_statements,
+    get_search_index_statements,
+    get_search_key_table_name,
+    sqlite_supports_trigram,
+)
+from ..unit_of_work import get_current_unit_of_work
 
 
 def check_database_driver_installed(package_name, import_name=None):
@@ -53,6 +82,9 @@ engine = create_engine(
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
 
 
+# 文本检索索引是否存在的进程内缓存，避免每次查询重复读取数据库元数据
+_search_index_states = {}
+
 class DatabaseFacade:
     """兼容少量历史db调用的轻量门面"""
 
@@ -78,12 +110,62 @@ class BaseModel(DeclarativeBase):
 
     @classmethod
     def table_exists(cls):
-        return inspect(engine).has_table(cls.__tablename__)
+        return inspect(get_bind()).has_table(cls.__tablename__)
+
+
+def open_unit_of_work_session(unit_of_work):
+    """为请求级工作单元创建共享会话，事务型工作单元结束时统一提交或回滚"""
+
+    session = SessionLocal()
+    if unit_of_work.transactional and DatabaseConfig.database_type == "sqlite":
+        # pysqlite默认延迟到首条DML语句才开启事务，此前发出的保存点不受请求事务约束，
+        # 这里显式开启请求事务，保证模型方法中的保存点随请求事务一并回滚
+        session.connection().exec_driver_sql("BEGIN")
+
+    def finalize(commit: bool):
+        try:
+            if commit and unit_of_work.transactional:
+                session.commit()
+            else:
+                session.rollback()
+        finally:
+            session.close()
+
+    return session, finalize
+
+
+def get_bind():
+    """获取表结构检查与建表使用的连接对象，存在请求级工作单元时复用其会话连接"""
+
+    unit_of_work = get_current_unit_of_work()
+    if unit_of_work is not None:
+        return unit_of_work.open(open_unit_of_work_session).connection()
+
+    return engine
 
 
 @contextmanager
 def session_scope():
-    """统一管理SQLAlchemy会话提交、回滚与关闭"""
+    """统一管理SQLAlchemy会话提交、回滚与关闭
+
+    存在请求级工作单元时复用其会话：事务型工作单元中以保存点包裹本次操作，
+    由工作单元在请求结束时统一提交；非事务型工作单元中每次操作后直接提交
+    """
+
+    unit_of_work = get_current_unit_of_work()
+    if unit_of_work is not None:
+        session = unit_of_work.open(open_unit_of_work_session)
+        if unit_of_work.transactional:
+            with session.begin_nested():
+                yield session
+        else:
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+        return
 
     session = SessionLocal()
     try:
@@ -100,7 +182,7 @@ def create_tables(table_models):
     """创建指定内置模型对应的数据表"""
 
     for table_model in table_models:
-        table_model.__table__.create(bind=engine, checkfirst=True)
+        table_model.__table__.create(bind=get_bind(), checkfirst=True)
 
 
 def get_model_table_name(table_model):
@@ -188,6 +270,257 @@ def ensure_user_email_schema(Users):
     return changes
 
 
+def ensure_model_indexes(table_model):
+    """为已存在的数据表补齐索引契约中声明的复合索引"""
+
+    table_name = table_model.__tablename__
+    index_names = {index["name"] for index in inspect(engine).get_indexes(table_name)}
+    changes = []
+
+    for index_name, columns in TABLE_INDEXES.get(table_model.__name__, {}).items():
+        if index_name in index_names:
+            continue
+
+        with engine.begin() as connection:
+            connection.execute(
+                text(f"CREATE INDEX {index_name} ON {table_name} ({', '.join(columns)})")
+            )
+        changes.append(f"{table_name}表索引({', '.join(columns)})")
+
+    return changes
+
+
+def ensure_search_indexes(table_model):
+    """为数据表建立检索索引契约中声明的文本检索索引"""
+
+    table_name = table_model.__tablename__
+    primary_key = list(table_model.__table__.primary_key)[0]
+    integer_primary_key = isinstance(primary_key.type, Integer)
+    changes = []
+
+    # 低版本SQLite不支持trigram分词器，关键词查询退化为普通模糊查询
+    if DatabaseConfig.database_type == "sqlite" and not sqlite_supports_trigram():
+        return changes
+
+    for column_name, index_name in TABLE_SEARCH_INDEXES.get(
+        table_model.__name__, {}
+    ).items():
+        statements = get_search_index_statements(
+            DatabaseConfig.database_type,
+            table_name,
+            index_name,
+            column_name,
+            primary_key.name,
+            integer_primary_key,
+        )
+        if search_index_exists(table_name, index_name, refresh=True):
+            if not is_legacy_sqlite_search_index(
+                table_name, index_name, integer_primary_key
+            ):
+                continue
+
+            # 此前版本以内置rowid关联非整数主键数据表，先移除后按主键映射重建
+            statements = [
+                *get_drop_sqlite_search_index_statements(index_name),
+                *statements,
+            ]
+
+        with engine.begin() as connection:
+            for sql in statements:
+                connection.exec_driver_sql(sql)
+
+        _search_index_states[(table_name, index_name)] = True
+        if DatabaseConfig.database_type == "sqlite" and not integer_primary_key:
+            _search_index_states[
+                (table_name, get_search_key_table_name(index_name))
+            ] = True
+        changes.append(f"{table_name}表{column_name}字段检索索引")
+
+    return changes
+
+
+def is_legacy_sqlite_search_index(
+    table_name: str, index_name: str, integer_primary_key: bool
+) -> bool:
+    """检查非整数主键数据表上的SQLite检索索引是否为缺少主键映射表的旧版本"""
+
+    return (
+        DatabaseConfig.database_type == "sqlite"
+        and not integer_primary_key
+        and not search_index_exists(
+            table_name, get_search_key_table_name(index_name), refresh=True
+        )
+    )
+
+
+def search_index_exists(table_name: str, index_name: str, refresh: bool = False):
+    """检查文本检索索引是否存在，检查结果在进程内缓存"""
+
+    key = (table_name, index_name)
+    if refresh or key not in _search_index_states:
+        inspector = inspect(get_bind())
+        # SQLite的检索索引为FTS5虚拟表，其余数据库为数据表上的索引
+        if DatabaseConfig.database_type == "sqlite":
+            names = inspector.get_table_names()
+        else:
+            names = [index["name"] for index in inspector.get_indexes(table_name)]
+        _search_index_states[key] = index_name in names
+
+    return _search_index_states[key]
+
+
+def build_search_condition(column, keyword: str, index_name: str):
+    """构造可命中文本检索索引的附加筛选条件，需与原模糊查询条件组合使用以保证结果准确
+
+    PostgreSQL中模糊查询条件可直接命中pg_trgm索引，关键词过短无法利用检索索引时，
+    均无需附加条件，此时返回None
+    """
+
+    if (
+        DatabaseConfig.database_type == "sqlite"
+        and len(keyword) >= TRIGRAM_MIN_KEYWORD_LENGTH
+    ):
+        primary_key = list(column.table.primary_key)[0]
+        search_table = sql_table(
+            index_name, sql_column("rowid"), sql_column(column.name)
+        )
+        search_column = search_table.c[column.name]
+        search_rowids = select(search_table.c.rowid).where(
+            search_column.contains(keyword)
+        )
+        if isinstance(primary_key.type, Integer):
+            return primary_key.in_(search_rowids)
+
+        # 非整数主键经映射表由检索索引记录的rowid取回主键，忽略缺少映射表的旧版本检索索引
+        key_table_name = get_search_key_table_name(index_name)
+        if not search_index_exists(column.table.name, key_table_name):
+            return None
+
+        key_table = sql_table(
+            key_table_name, sql_column("id"), sql_column(primary_key.name)
+        )
+        return primary_key.in_(
+            select(key_table.c[primary_key.name]).where(
+                key_table.c.id.in_(search_rowids)
+            )
+        )
+
+    if (
+        DatabaseConfig.database_type == "mysql"
+        and len(keyword) >= MYSQL_NGRAM_TOKEN_SIZE
+    ):
+        return column.match(build_mysql_boolean_phrase(keyword))
+
+    return None
+
+
+def dialect_insert(table_model):
+    """构造当前数据库方言的INSERT语句，以使用冲突时更新等方言特有语法"""
+
+    if DatabaseConfig.database_type == "postgresql":
+        return postgresql.insert(table_model)
+
+    if DatabaseConfig.database_type == "mysql":
+        return mysql.insert(table_model)
+
+    return sqlite.insert(table_model)
+
+
+def execute_bulk_in(session, column, keys, build_statement) -> int:
+    """按键集合分批执行批量操作，返回受影响记录数
+
+    build_statement接收字段的IN条件并返回待执行的更新或删除语句，键数量较少时按数据库参数上限分块执行，
+    键数量超过当前数据库的阈值时先写入临时键表，再以单条子查询语句执行，全部分块均在传入会话的同一事务中完成
+    """
+
+    keys = dedupe_keys(keys)
+    if not keys:
+        return 0
+
+    chunk_size = get_bulk_in_chunk_size(DatabaseConfig.database_type)
+    temp_table_threshold = get_bulk_temp_table_threshold(DatabaseConfig.database_type)
+    # 批量语句不同步会话中已加载的对象，避免为大量键逐一计算或回查受影响记录
+    execution_options = {"synchronize_session": False}
+
+    if temp_table_threshold is None or len(keys) <= temp_table_threshold:
+        return sum(
+            session.execute(
+                build_statement(column.in_(chunk)),
+                execution_options=execution_options,
+            ).rowcount
+            for chunk in iter_key_chunks(keys, chunk_size)
+        )
+
+    table_name, create_sql, drop_sql = get_temp_key_table_statements(
+        DatabaseConfig.database_type, keys
+    )
+    key_table = sql_table(table_name, sql_column("bulk_key"))
+    session.execute(text(create_sql))
+    try:
+        for chunk in iter_key_chunks(keys, chunk_size):
+            session.execute(key_table.insert(), [{"bulk_key": key} for key in chunk])
+        affected_count = session.execute(
+            build_statement(column.in_(select(key_table.c.bulk_key))),
+            execution_options=execution_options,
+        ).rowcount
+    except Exception:
+        # PostgreSQL出错后事务中止、临时表随回滚撤销，其余数据库需显式删除临时表
+        if DatabaseConfig.database_type != "postgresql":
+            session.execute(text(drop_sql))
+        raise
+    session.execute(text(drop_sql))
+
+    return affected_count
+
+
+def supports_recursive_cte():
+    """检查当前数据库是否支持WITH RECURSIVE递归查询，MySQL 8.0之前的版本不支持"""
+
+    if DatabaseConfig.database_type == "mysql":
+        with engine.connect() as connection:
+            return connection.dialect.server_version_info >= (8, 0)
+
+    return True
+
+
+def supports_returning():
+    """检查当前数据库是否支持INSERT/DELETE ... RETURNING语法
+
+    MySQL及3.35之前版本的SQLite不支持，需在写入后额外查询受影响记录
+    """
+
+    if DatabaseConfig.database_type == "mysql":
+        return False
+
+    if DatabaseConfig.database_type == "sqlite":
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+
+    return True
+
+
+def estimate_table_row_count(table_name: str):
+    """基于数据库统计信息估算数据表记录数，SQLite等无可用统计信息时返回None"""
+
+    if DatabaseConfig.database_type == "postgresql":
+        sql = "SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table_name)"
+    elif DatabaseConfig.database_type == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = :table_name"
+        )
+    else:
+        return None
+
+    with session_scope() as session:
+        estimate = session.execute(text(sql), {"table_name": table_name}).scalar()
+
+    # PostgreSQL中从未执行过VACUUM/ANALYZE的数据表reltuples为-1
+    if estimate is None or estimate < 0:
+        return None
+
+    return int(estimate)
+
+
 def object_to_dict(obj, columns):
     """按指定字段将模型对象转换为普通字典"""
 
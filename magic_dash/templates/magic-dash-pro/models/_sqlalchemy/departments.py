@@ -1,11 +1,21 @@
 from typing import Dict, List, Union
 
 from sqlalchemy import JSON, String, delete, select, update
-from sqlalchemy.orm import Mapped, mapped_column
-
-from . import BaseModel, object_to_dict, session_scope
+from sqlalchemy.orm import Mapped, aliased, mapped_column
+
+from . import (
+    BaseModel,
+    execute_bulk_in,
+    object_to_dict,
+    session_scope,
+    supports_recursive_cte,
+)
+from .cache_versions import CacheVersions
+from ..caches import department_tree_snapshot
+from ..department_tree import DepartmentTree
 from ..exceptions import ExistingDepartmentError, InvalidDepartmentError
 from ..schema_contract import TABLE_NAMES
+from ..unit_of_work import run_after_transaction
 
 
 class Departments(BaseModel):
@@ -46,6 +56,62 @@ class Departments(BaseModel):
             records = session.scalars(select(cls)).all()
             return [object_to_dict(record, cls.columns()) for record in records]
 
+    @classmethod
+    def get_department_tree(cls) -> DepartmentTree:
+        """获取部门层级索引，稳态下直接读取进程内快照而不访问数据库"""
+
+        return department_tree_snapshot.get_or_build(
+            lambda: DepartmentTree(cls.get_all_departments())
+        )
+
+    @classmethod
+    def get_descendant_ids(cls, department_id: str) -> List[str]:
+        """查询指定部门及其全部后代部门id"""
+
+        with session_scope() as session:
+            return cls.select_descendant_ids(session, department_id)
+
+    @classmethod
+    def select_descendant_ids(cls, session, department_id: str) -> List[str]:
+        """在指定会话中查询部门及其全部后代部门id
+
+        支持递归查询的数据库中以单条WITH RECURSIVE语句完成，否则一次性读取部门层级关系后在内存中遍历
+        """
+
+        if not supports_recursive_cte():
+            return DepartmentTree(
+                session.execute(
+                    select(cls.department_id, cls.parent_department_id)
+                ).mappings()
+            ).get_descendant_ids(department_id)
+
+        return list(session.scalars(cls.build_subtree_query(department_id)))
+
+    @classmethod
+    def build_subtree_query(cls, department_id: str):
+        """构造查询指定部门及其全部后代部门id的递归查询"""
+
+        subtree = (
+            select(cls.department_id)
+            .where(cls.department_id == department_id)
+            .cte("subtree", recursive=True)
+        )
+        children = aliased(cls)
+        # 使用UNION去重，历史数据中存在循环引用时递归查询同样可以终止
+        subtree = subtree.union(
+            select(children.department_id).join(
+                subtree, children.parent_department_id == subtree.c.department_id
+            )
+        )
+
+        return select(subtree.c.department_id)
+
+    @classmethod
+    def get_ancestor_ids(cls, department_id: str) -> List[str]:
+        """由近及远获取指定部门的全部祖先部门id"""
+
+        return cls.get_department_tree().get_ancestor_ids(department_id)
+
     @classmethod
     def add_department(
         cls,
@@ -72,33 +138,33 @@ class Departments(BaseModel):
                     other_info=other_info,
                 )
             )
+            CacheVersions.bump_versions(session, ["departments"])
+
+        run_after_transaction(department_tree_snapshot.invalidate)
 
     @classmethod
     def delete_department(cls, department_id: str):
         """删除部门及其全部后代部门"""
 
         with session_scope() as session:
-
-            def get_descendant_ids(dept_id: str) -> list:
-                ids = [dept_id]
-                child_ids = session.scalars(
-                    select(cls.department_id).where(cls.parent_department_id == dept_id)
-                ).all()
-                for child_id in child_ids:
-                    ids.extend(get_descendant_ids(child_id))
-                return ids
-
-            session.execute(
-                delete(cls).where(
-                    cls.department_id.in_(get_descendant_ids(department_id))
-                )
+            execute_bulk_in(
+                session,
+                cls.department_id,
+                cls.select_descendant_ids(session, department_id),
+                delete(cls).where,
             )
+            CacheVersions.bump_versions(session, ["departments"])
+
+        run_after_transaction(department_tree_snapshot.invalidate)
 
     @classmethod
     def truncate_departments(cls, execute: bool = False):
         if execute:
             with session_scope() as session:
                 session.execute(delete(cls))
+                CacheVersions.bump_versions(session, ["departments"])
+
+            run_after_transaction(department_tree_snapshot.invalidate)
 
     @classmethod
     def update_department(cls, department_id: str, **kwargs):
@@ -106,8 +172,13 @@ class Departments(BaseModel):
             session.execute(
                 update(cls).where(cls.department_id == department_id).values(**kwargs)
             )
+            CacheVersions.bump_versions(session, ["departments"])
             session.flush()
-            return session.get(cls, department_id)
+            department = session.get(cls, department_id)
+
+        run_after_transaction(department_tree_snapshot.invalidate)
+
+        return department
 
     @classmethod
     def columns(cls):
@@ -0,0 +1,124 @@
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Literal
+
+from sqlalchemy import BigInteger, DateTime, String, delete, func, select
+from sqlalchemy.orm import Mapped, mapped_column
+
+from configs.database_config import DatabaseConfig
+from . import BaseModel, create_tables, dialect_insert, session_scope
+from ..log_archive import parse_login_datetime_range
+from ..login_rollups import (
+    LOGIN_STATS_DIMENSIONS,
+    aggregate_login_logs,
+    build_trend_series,
+)
+from ..schema_contract import TABLE_NAMES
+
+# 统计维度主键字段
+ROLLUP_KEY_FIELDS = ("bucket_start", "status", "browser_family", "os_family")
+
+
+class LoginStats(BaseModel):
+    """SQLAlchemy版登录统计表模型，按小时时间桶预聚合登录日志计数"""
+
+    __tablename__ = TABLE_NAMES["LoginStats"]
+
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    status: Mapped[str] = mapped_column(String(255), primary_key=True)
+    browser_family: Mapped[str] = mapped_column(String(255), primary_key=True)
+    os_family: Mapped[str] = mapped_column(String(255), primary_key=True)
+    login_count: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    @classmethod
+    def increment_counts(cls, session, counts: Counter):
+        """按统计维度累加登录次数，需传入对应登录日志写入所在的会话以保证同事务提交"""
+
+        rows = [
+            {**dict(zip(ROLLUP_KEY_FIELDS, key)), "login_count": login_count}
+            for key, login_count in counts.items()
+        ]
+        if not rows:
+            return
+
+        statement = dialect_insert(cls)
+        if DatabaseConfig.database_type == "mysql":
+            statement = statement.on_duplicate_key_update(
+                login_count=cls.login_count + statement.inserted.login_count
+            )
+        else:
+            statement = statement.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEY_FIELDS),
+                set_={"login_count": cls.login_count + statement.excluded.login_count},
+            )
+
+        session.execute(statement, rows)
+
+    @classmethod
+    def rebuild_stats(cls, records: Iterable[dict]) -> int:
+        """基于登录日志记录全量重建登录统计数据，返回统计记录数"""
+
+        # 聚合结果的规模只与统计维度组合数相关，与登录日志记录数无关
+        counts = aggregate_login_logs(records)
+
+        with session_scope() as session:
+            session.execute(delete(cls))
+            cls.increment_counts(session, counts)
+
+        return len(counts)
+
+    @classmethod
+    def get_trend(
+        cls,
+        login_datetime_range: List[str] = None,
+        granularity: Literal["hour", "day"] = "hour",
+    ) -> List[dict]:
+        """获取登录成功、失败次数的时间趋势"""
+
+        start, end = parse_login_datetime_range(login_datetime_range)
+
+        with session_scope() as session:
+            rows = session.execute(
+                cls.build_range_query(start, end, cls.bucket_start, cls.status)
+            ).all()
+
+        return build_trend_series(rows, granularity, start, end)
+
+    @classmethod
+    def get_breakdown(
+        cls,
+        dimension: Literal["status", "browser_family", "os_family"],
+        login_datetime_range: List[str] = None,
+    ) -> List[dict]:
+        """获取指定维度下各取值的登录次数，按登录次数降序排列"""
+
+        if dimension not in LOGIN_STATS_DIMENSIONS:
+            raise ValueError(f"不支持的统计维度：{dimension}")
+
+        start, end = parse_login_datetime_range(login_datetime_range)
+
+        with session_scope() as session:
+            return [
+                {"name": name, "count": int(login_count)}
+                for name, login_count in session.execute(
+                    cls.build_range_query(
+                        start, end, getattr(cls, dimension)
+                    ).order_by(func.sum(cls.login_count).desc())
+                )
+            ]
+
+    @classmethod
+    def build_range_query(cls, start, end, *group_columns):
+        """构造时间区间内按指定字段分组汇总登录次数的查询"""
+
+        query = select(*group_columns, func.sum(cls.login_count))
+        if start:
+            query = query.where(cls.bucket_start >= start)
+        if end:
+            query = query.where(cls.bucket_start < end)
+
+        return query.group_by(*group_columns)
+
+
+# 保持与登录日志表一致的导入时建表行为
+create_tables([LoginStats])
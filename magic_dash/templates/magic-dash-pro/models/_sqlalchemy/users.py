@@ -1,21 +1,44 @@
-from typing import Dict, List, Union
+from functools import partial
+from typing import Callable, Dict, List, Literal, Optional, Union
 
-from sqlalchemy import JSON, String, delete, select, update
+from sqlalchemy import JSON, Index, String, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Mapped, mapped_column
 from werkzeug.security import check_password_hash
 
 from configs import AuthConfig
-from . import BaseModel, object_to_dict, session_scope
+from . import (
+    BaseModel,
+    build_search_condition,
+    execute_bulk_in,
+    object_to_dict,
+    search_index_exists,
+    session_scope,
+)
+from .cache_versions import CacheVersions
 from .departments import Departments
 from .user_permission_groups import UserPermissionGroups
+from ..caches import CachedUser, user_cache
+from ..department_members import get_department_member_changes
 from ..exceptions import ExistingUserError, InvalidUserError
-from ..schema_contract import TABLE_NAMES
+from ..schema_contract import TABLE_INDEXES, TABLE_NAMES, TABLE_SEARCH_INDEXES
+from ..unit_of_work import run_after_transaction
+from ..user_import import (
+    USER_IMPORT_COLUMNS,
+    hash_passwords_serially,
+    validate_new_user_records,
+)
 
 
 class Users(BaseModel):
     """SQLAlchemy版用户信息表模型"""
 
     __tablename__ = TABLE_NAMES["Users"]
+    # 按索引契约声明复合索引，支撑用户管理表格的筛选与排序分页
+    __table_args__ = tuple(
+        Index(index_name, *columns)
+        for index_name, columns in TABLE_INDEXES["Users"].items()
+    )
 
     user_id: Mapped[str] = mapped_column(String(255), primary_key=True)
     user_name: Mapped[str] = mapped_column(String(255), unique=True)
@@ -31,6 +54,21 @@ class Users(BaseModel):
         with session_scope() as session:
             return session.get(cls, user_id)
 
+    @classmethod
+    def get_cached_user(cls, user_id: str):
+        """根据用户id查询登录态所需的轻量用户信息，优先读取进程内缓存"""
+
+        def load_user():
+            with session_scope() as session:
+                row = session.execute(
+                    select(
+                        cls.user_id, cls.user_name, cls.user_role, cls.session_token
+                    ).where(cls.user_id == user_id)
+                ).first()
+                return CachedUser(*row) if row else None
+
+        return user_cache.get_or_load(user_id, load_user)
+
     @classmethod
     def get_user_by_name(cls, user_name: str):
         with session_scope() as session:
@@ -52,6 +90,139 @@ class Users(BaseModel):
             ).all()
             return [object_to_dict(record, cls.columns()) for record in records]
 
+    @classmethod
+    def get_department_member_counts(cls) -> Dict[str, int]:
+        """查询各部门自身的用户数量"""
+
+        with session_scope() as session:
+            return dict(
+                session.execute(
+                    select(cls.department_id, func.count(cls.user_id))
+                    .where(cls.department_id.is_not(None))
+                    .group_by(cls.department_id)
+                ).all()
+            )
+
+    @classmethod
+    def get_subtree_member_counts(cls) -> Dict[str, int]:
+        """获取各部门及其全部后代部门的用户数量合计"""
+
+        return Departments.get_department_tree().rollup_counts(
+            cls.get_department_member_counts()
+        )
+
+    @classmethod
+    def get_users(
+        cls,
+        limit: int = None,
+        offset: int = None,
+        order_by: Literal["user_name", "user_email", "user_role"] = "user_name",
+        order: Literal["ascend", "descend"] = "ascend",
+        **filters,
+    ):
+        """条件性分页获取用户信息，携带所属部门名称且不包含密码散列值等敏感字段
+
+        筛选条件参数见filter_users_query()
+        """
+
+        descending = order == "descend"
+        # 以用户id作为次级排序键，保证邮箱等非唯一字段排序时分页结果稳定
+        order_columns = [getattr(cls, order_by or "user_name"), cls.user_id]
+        query = (
+            select(
+                cls.user_id,
+                cls.user_name,
+                cls.user_email,
+                cls.user_role,
+                cls.department_id,
+                Departments.department_name,
+            )
+            .join(
+                Departments,
+                cls.department_id == Departments.department_id,
+                isouter=True,
+            )
+            .order_by(
+                *[column.desc() if descending else column for column in order_columns]
+            )
+        )
+        query = cls.filter_users_query(query, **filters)
+
+        # 若分页相关参数有效
+        if limit:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+
+        with session_scope() as session:
+            return [dict(row) for row in session.execute(query).mappings()]
+
+    @classmethod
+    def count_users(cls, **filters) -> int:
+        """统计符合筛选条件的用户数量，筛选条件参数见filter_users_query()"""
+
+        with session_scope() as session:
+            return session.scalar(
+                cls.filter_users_query(
+                    select(func.count()).select_from(cls), **filters
+                )
+            )
+
+    @classmethod
+    def filter_users_query(
+        cls,
+        query,
+        keyword: str = None,
+        user_name_keyword: str = None,
+        user_email_keyword: str = None,
+        user_roles: List[str] = None,
+        department_ids: List[str] = None,
+    ):
+        """为用户查询附加筛选条件
+
+        keyword为同时匹配用户名或邮箱的关键词；
+        user_name_keyword、user_email_keyword为用户名、邮箱关键词，存在文本检索索引时经由检索索引匹配；
+        user_roles、department_ids为用户角色、所属部门id的可选值，均可命中对应的复合索引
+        """
+
+        if keyword:
+            query = query.where(
+                or_(
+                    cls.build_keyword_condition(cls.user_name, keyword),
+                    cls.build_keyword_condition(cls.user_email, keyword),
+                )
+            )
+        for column, column_keyword in [
+            (cls.user_name, user_name_keyword),
+            (cls.user_email, user_email_keyword),
+        ]:
+            if column_keyword:
+                query = query.where(
+                    cls.build_keyword_condition(column, column_keyword)
+                )
+        if user_roles:
+            query = query.where(cls.user_role.in_(user_roles))
+        if department_ids:
+            query = query.where(cls.department_id.in_(department_ids))
+
+        return query
+
+    @classmethod
+    def build_keyword_condition(cls, column, keyword: str):
+        """构造关键词筛选条件，存在文本检索索引时附加命中检索索引的条件"""
+
+        condition = column.contains(keyword)
+
+        index_name = TABLE_SEARCH_INDEXES["Users"][column.key]
+        if search_index_exists(cls.__tablename__, index_name):
+            search_condition = build_search_condition(
+                cls.__table__.c[column.key], keyword, index_name
+            )
+            if search_condition is not None:
+                condition = search_condition & condition
+
+        return condition
+
     @classmethod
     def get_all_users(cls, with_department_name: bool = False):
         """获取全部用户信息，必要时联表补充部门名称"""
@@ -120,6 +291,104 @@ class Users(BaseModel):
                 )
             )
 
+    @classmethod
+    def check_new_users(cls, records: List[dict]) -> Dict[int, str]:
+        """一次性校验全部待导入用户，返回校验失败记录的下标及对应错误信息
+
+        已有用户id、用户名、邮箱仅查询一次并载入内存集合，不再逐条记录查询数据库
+        """
+
+        with session_scope() as session:
+            existing_users = session.execute(
+                select(cls.user_id, cls.user_name, cls.user_email)
+            ).all()
+
+        return validate_new_user_records(
+            records,
+            existing_user_ids=(user_id for user_id, _, _ in existing_users),
+            existing_user_names=(user_name for _, user_name, _ in existing_users),
+            existing_user_emails=(
+                user_email for _, _, user_email in existing_users if user_email
+            ),
+            valid_roles=UserPermissionGroups.get_effective_roles(),
+            valid_department_ids=Departments.get_department_tree().parents,
+            default_role=AuthConfig.normal_role,
+        )
+
+    @classmethod
+    def add_users(cls, records: List[dict], batch_size: int = 1000) -> Dict[int, str]:
+        """分批次写入已通过校验的用户信息，返回写入失败记录的下标及对应错误信息
+
+        每个批次使用独立事务，批次写入失败时逐条重试该批次记录，定位与并发写入冲突的具体记录
+        """
+
+        errors = {}
+        for start in range(0, len(records), batch_size):
+            batch = [
+                {
+                    **{column: record.get(column) for column in USER_IMPORT_COLUMNS},
+                    "user_role": record.get("user_role") or AuthConfig.normal_role,
+                }
+                for record in records[start : start + batch_size]
+            ]
+            try:
+                with session_scope() as session:
+                    session.execute(insert(cls), batch)
+            except IntegrityError:
+                for index, row in enumerate(batch, start=start):
+                    try:
+                        with session_scope() as session:
+                            session.execute(insert(cls), [row])
+                    except IntegrityError:
+                        errors[index] = "用户id、用户名或邮箱已被其他用户使用"
+
+        return errors
+
+    @classmethod
+    def import_users(
+        cls,
+        records: List[dict],
+        password_hasher: Callable[[List[str]], List[str]] = None,
+        batch_size: int = 1000,
+        on_batch_imported: Callable[[int, int, Dict[int, str]], bool] = None,
+    ) -> Dict[int, str]:
+        """批量导入携带明文密码password的用户信息，返回导入失败记录的下标及对应错误信息
+
+        先一次性校验全部记录，再逐批为校验通过的记录计算密码散列值并以独立事务写入；
+        password_hasher用于批量计算密码散列值，默认在当前进程中逐个计算；
+        on_batch_imported在每个批次写入后以已处理、待处理的校验通过记录数及当前错误信息调用，
+        返回False时不再导入后续批次
+        """
+
+        errors = cls.check_new_users(records)
+        valid_indexes = [index for index in range(len(records)) if index not in errors]
+
+        for start in range(0, len(valid_indexes), batch_size):
+            batch_indexes = valid_indexes[start : start + batch_size]
+            password_hashes = (password_hasher or hash_passwords_serially)(
+                [records[index]["password"] for index in batch_indexes]
+            )
+            insert_errors = cls.add_users(
+                [
+                    {**records[index], "password_hash": password_hash}
+                    for index, password_hash in zip(batch_indexes, password_hashes)
+                ],
+                batch_size=batch_size,
+            )
+            errors.update(
+                {batch_indexes[index]: error for index, error in insert_errors.items()}
+            )
+
+            if on_batch_imported is not None and (
+                on_batch_imported(
+                    start + len(batch_indexes), len(valid_indexes), errors
+                )
+                is False
+            ):
+                break
+
+        return errors
+
     @classmethod
     def delete_user(cls, user_id: str):
         """删除用户，同时清理对应OTP凭据"""
@@ -132,6 +401,9 @@ class Users(BaseModel):
                     delete(OtpCredentials).where(OtpCredentials.user_id == user_id)
                 )
             session.execute(delete(cls).where(cls.user_id == user_id))
+            CacheVersions.bump_versions(session, ["users"])
+
+        run_after_transaction(partial(user_cache.invalidate, user_id))
 
     @classmethod
     def truncate_users(cls, execute: bool = False):
@@ -142,6 +414,67 @@ class Users(BaseModel):
                 if OtpCredentials.table_exists():
                     session.execute(delete(OtpCredentials))
                 session.execute(delete(cls))
+                CacheVersions.bump_versions(session, ["users"])
+
+            run_after_transaction(user_cache.clear)
+
+    @classmethod
+    def get_login_user(
+        cls, user_name: str = None, user_email: str = None
+    ) -> Optional[dict]:
+        """按用户名或邮箱以单次查询获取登录校验所需的用户信息，用户不存在时返回None"""
+
+        if user_name:
+            condition = cls.user_name == user_name
+        else:
+            user_email = (user_email or "").strip()
+            if not user_email:
+                return None
+            condition = cls.user_email == user_email
+
+        with session_scope() as session:
+            row = (
+                session.execute(
+                    select(
+                        cls.user_id,
+                        cls.user_name,
+                        cls.user_role,
+                        cls.password_hash,
+                    ).where(condition)
+                )
+                .mappings()
+                .first()
+            )
+            return dict(row) if row else None
+
+    @classmethod
+    def rotate_session_token(
+        cls, user_id: str, session_token: str, password_hash: str = None
+    ) -> bool:
+        """以单条条件更新语句轮换用户会话token，返回是否更新成功
+
+        传入password_hash时，仅当密码未在登录校验之后被修改时更新
+        """
+
+        conditions = [cls.user_id == user_id]
+        if password_hash is not None:
+            conditions.append(cls.password_hash == password_hash)
+
+        with session_scope() as session:
+            updated = session.execute(
+                update(cls)
+                .where(*conditions)
+                .values(session_token=session_token)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if updated:
+                CacheVersions.bump_versions(session, ["users"])
+
+        if updated:
+            # 事务提交后使登录态缓存失效，确保旧会话token立即失效
+            run_after_transaction(partial(user_cache.invalidate, user_id))
+
+        return bool(updated)
 
     @classmethod
     def update_user(cls, user_id: str, **kwargs):
@@ -169,8 +502,14 @@ class Users(BaseModel):
                 raise InvalidUserError("用户角色不正确")
 
             session.execute(update(cls).where(cls.user_id == user_id).values(**kwargs))
+            CacheVersions.bump_versions(session, ["users"])
             session.flush()
-            return session.get(cls, user_id)
+            user = session.get(cls, user_id)
+
+        # 事务提交后使登录态缓存失效，确保角色、会话token变更立即生效
+        run_after_transaction(partial(user_cache.invalidate, user_id))
+
+        return user
 
     @classmethod
     def alter_department_members(
@@ -178,25 +517,27 @@ class Users(BaseModel):
         department_id: str,
         origin_user_ids: list = None,
         target_user_ids: list = None,
+        added_user_ids: list = None,
+        removed_user_ids: list = None,
     ):
-        origin_user_ids = origin_user_ids or []
-        target_user_ids = target_user_ids or []
+        added_user_ids, removed_user_ids = get_department_member_changes(
+            origin_user_ids, target_user_ids, added_user_ids, removed_user_ids
+        )
         with session_scope() as session:
-            removed_user_ids = [
-                user_id for user_id in origin_user_ids if user_id not in target_user_ids
-            ]
-            if removed_user_ids:
-                session.execute(
-                    update(cls)
-                    .where(cls.user_id.in_(removed_user_ids))
-                    .values(department_id=None)
-                )
-            if target_user_ids:
-                session.execute(
-                    update(cls)
-                    .where(cls.user_id.in_(target_user_ids))
-                    .values(department_id=department_id)
-                )
+            execute_bulk_in(
+                session,
+                cls.user_id,
+                removed_user_ids,
+                lambda condition: update(cls)
+                .values(department_id=None)
+                .where(condition, cls.department_id == department_id),
+            )
+            execute_bulk_in(
+                session,
+                cls.user_id,
+                added_user_ids,
+                update(cls).values(department_id=department_id).where,
+            )
 
     @classmethod
     def columns(cls):
@@ -1,17 +1,65 @@
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
 from typing import List, Literal, Optional
 
-from sqlalchemy import Column, DateTime, Integer, String, delete, func, select
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    union_all,
+)
 from sqlmodel import Field
 
-from . import BaseModel, engine, object_to_dict, session_scope
-from ..schema_contract import TABLE_NAMES
+from configs import CacheConfig, LogConfig
+from . import (
+    BaseModel,
+    build_search_condition,
+    engine,
+    estimate_table_row_count,
+    execute_bulk_in,
+    get_bind,
+    object_to_dict,
+    search_index_exists,
+    session_scope,
+)
+from .login_stats import LoginStats
+from ..batch_writer import BatchedWriter
+from ..caches import login_logs_counter
+from ..log_archive import (
+    append_to_archive_files,
+    get_archive_month,
+    get_archive_table_name,
+    get_overlapping_archive_months,
+    parse_archive_months,
+    parse_login_datetime_range,
+)
+from ..login_rollups import aggregate_login_logs
+from ..schema_contract import TABLE_INDEXES, TABLE_NAMES, TABLE_SEARCH_INDEXES
+from ..search_index import get_prefix_upper_bound
+
+# 月度归档表独立登记，避免随内置模型元数据一并自动建表
+archive_metadata = MetaData()
+_archive_tables = {}
 
 
 class LoginLogs(BaseModel, table=True):
     """SQLModel版登录日志表模型"""
 
     __tablename__ = TABLE_NAMES["LoginLogs"]
+    # 按索引契约声明复合索引，支撑各排序字段的键集分页
+    __table_args__ = tuple(
+        Index(index_name, *columns)
+        for index_name, columns in TABLE_INDEXES["LoginLogs"].items()
+    )
 
     id: Optional[int] = Field(
         default=None,
@@ -35,7 +83,23 @@ class LoginLogs(BaseModel, table=True):
     login_datetime: datetime = Field(sa_column=Column(DateTime, nullable=False))
 
     @classmethod
-    def get_count(cls) -> int:
+    def get_count(cls, exact: bool = False) -> int:
+        """获取日志记录总数，默认返回进程内维护的近似值，exact为True时执行精确计数"""
+
+        return login_logs_counter.get(cls.load_count, exact=exact)
+
+    @classmethod
+    def load_count(cls, exact: bool = False) -> int:
+        """获取日志记录数基准值，数据表较大时优先使用数据库统计信息估算值"""
+
+        if not exact:
+            estimate = estimate_table_row_count(cls.__tablename__)
+            if (
+                estimate is not None
+                and estimate >= CacheConfig.login_logs_exact_count_threshold
+            ):
+                return estimate
+
         with session_scope() as session:
             return session.scalar(select(func.count()).select_from(cls)) or 0
 
@@ -47,22 +111,353 @@ class LoginLogs(BaseModel, table=True):
         order_by: Literal["id", "user_name", "status", "login_datetime"] = "id",
         order: Literal["ascend", "descend"] = "descend",
         user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        login_datetime_range: List[str] = None,
+        cursor: dict = None,
     ):
-        """按筛选、排序和分页条件获取登录日志字典列表"""
+        """按筛选、排序和分页条件获取登录日志字典列表
+
+        user_name_keyword为用户名关键词，存在文本检索索引时经由检索索引匹配；
+        ip_prefix为ip前缀，status为登录状态，均可命中对应的复合索引；
+        login_datetime_range为登录日期范围["YYYY-MM-DD", "YYYY-MM-DD"]，
+        日期范围涉及已归档月份时，同时查询对应的月度归档表；
+        cursor为键集分页游标，格式为{"direction": "next"或"prev", "value": 排序字段值, "id": 记录id}，
+        传入时基于相邻页首/尾行的排序键直接定位，不再使用offset扫描并丢弃前序记录
+        """
+
+        source_tables, start, end = cls.get_source_tables(login_datetime_range)
+
+        order_by = order_by or "id"
+        descending = order != "ascend"
+        # 向前翻页时按相反顺序扫描，取回结果后再恢复原有顺序
+        reverse = bool(cursor) and cursor["direction"] == "prev"
+        scan_descending = descending != reverse
+
+        # 各数据表使用相同的筛选及键集分页条件
+        queries = [
+            cls.build_logs_query(
+                source_table,
+                order_by,
+                user_name_keyword=user_name_keyword,
+                ip_prefix=ip_prefix,
+                status=status,
+                start=start,
+                end=end,
+                cursor=cursor,
+                descending=scan_descending,
+            )
+            for source_table in source_tables
+        ]
+        if len(queries) == 1:
+            source, query = cls.__table__, queries[0]
+        else:
+            # 跨登录日志表及归档表查询时，以UNION ALL合并后统一排序
+            source = union_all(*queries).subquery()
+            query = select(source)
+
+        # 以id作为次级排序键，保证排序结果稳定且与复合索引一致
+        order_columns = (
+            [source.c.id] if order_by == "id" else [source.c[order_by], source.c.id]
+        )
+        query = query.order_by(
+            *[
+                column.desc() if scan_descending else column.asc()
+                for column in order_columns
+            ]
+        )
+
+        if limit:
+            query = query.limit(limit)
+        if offset and not cursor:
+            query = query.offset(offset)
+
+        with session_scope() as session:
+            records = session.execute(query).all()
+        if reverse:
+            records = list(reversed(records))
+        return [cls.to_dict(record) for record in records]
+
+    @classmethod
+    def count_logs(
+        cls,
+        user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        login_datetime_range: List[str] = None,
+    ) -> int:
+        """按筛选条件精确统计日志记录数，筛选条件含义与get_logs一致
+
+        登录日期范围涉及已归档月份时，同时统计对应的月度归档表
+        """
+
+        source_tables, start, end = cls.get_source_tables(login_datetime_range)
 
         with session_scope() as session:
-            query = select(cls)
-            if user_name_keyword:
-                query = query.where(cls.user_name.contains(user_name_keyword))
-            if order_by and order:
-                order_column = getattr(cls, order_by)
-                query = query.order_by(
-                    order_column.asc() if order == "ascend" else order_column.desc()
+            return sum(
+                session.scalar(
+                    select(func.count()).select_from(
+                        cls.build_logs_query(
+                            source_table,
+                            "id",
+                            user_name_keyword=user_name_keyword,
+                            ip_prefix=ip_prefix,
+                            status=status,
+                            start=start,
+                            end=end,
+                        ).subquery()
+                    )
                 )
-            if limit and offset:
-                query = query.limit(limit).offset(offset)
-            records = session.scalars(query).all()
-            return [cls.to_dict(record) for record in records]
+                for source_table in source_tables
+            )
+
+    @classmethod
+    def get_source_tables(cls, login_datetime_range: List[str] = None):
+        """获取登录日期范围涉及的登录日志表及月度归档表，以及解析后的起止时间"""
+
+        start, end = parse_login_datetime_range(login_datetime_range)
+        source_tables = [cls.__table__] + [
+            cls.get_archive_table(month)
+            for month in get_overlapping_archive_months(
+                cls.get_archive_months() if login_datetime_range else [],
+                start,
+                end,
+            )
+        ]
+
+        return source_tables, start, end
+
+    @classmethod
+    def build_logs_query(
+        cls,
+        table,
+        order_by: str,
+        user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        start: datetime = None,
+        end: datetime = None,
+        cursor: dict = None,
+        descending: bool = True,
+    ):
+        """构造指定数据表的日志筛选查询，登录日志表与归档表复用同一查询逻辑"""
+
+        query = select(table)
+        if user_name_keyword:
+            query = query.where(cls.build_user_name_condition(table, user_name_keyword))
+        # 以范围条件代替前缀模糊查询以命中索引
+        if ip_prefix:
+            query = query.where(
+                table.c.ip >= ip_prefix,
+                table.c.ip < get_prefix_upper_bound(ip_prefix),
+            )
+        if status:
+            query = query.where(table.c.status == status)
+        if start:
+            query = query.where(table.c.login_datetime >= start)
+        if end:
+            query = query.where(table.c.login_datetime < end)
+        if cursor:
+            query = query.where(
+                cls.build_seek_condition(table, order_by, cursor, descending)
+            )
+
+        return query
+
+    @classmethod
+    def build_user_name_condition(cls, table, user_name_keyword: str):
+        """构造用户名关键词筛选条件，登录日志表存在文本检索索引时附加命中检索索引的条件"""
+
+        condition = table.c.user_name.contains(user_name_keyword)
+
+        # 归档表未建立文本检索索引，仅使用模糊查询条件
+        index_name = TABLE_SEARCH_INDEXES["LoginLogs"]["user_name"]
+        if table is cls.__table__ and search_index_exists(table.name, index_name):
+            search_condition = build_search_condition(
+                table.c.user_name, user_name_keyword, index_name
+            )
+            if search_condition is not None:
+                condition = search_condition & condition
+
+        return condition
+
+    @classmethod
+    def iter_logs(
+        cls,
+        order_by: Literal["id", "user_name", "status", "login_datetime"] = "id",
+        order: Literal["ascend", "descend"] = "descend",
+        user_name_keyword: str = None,
+        ip_prefix: str = None,
+        status: str = None,
+        login_datetime_range: List[str] = None,
+        chunk_size: int = 1000,
+    ):
+        """按筛选、排序条件分批迭代全部日志记录
+
+        各批次基于上一批末行的排序键进行键集分页查询，内存占用与数据表规模无关，
+        且迭代期间不会长时间占用数据库连接
+        """
+
+        cursor = None
+        while True:
+            records = cls.get_logs(
+                limit=chunk_size,
+                order_by=order_by,
+                order=order,
+                user_name_keyword=user_name_keyword,
+                ip_prefix=ip_prefix,
+                status=status,
+                login_datetime_range=login_datetime_range,
+                cursor=cursor,
+            )
+            yield from records
+
+            if len(records) < chunk_size:
+                return
+
+            cursor = {
+                "direction": "next",
+                "value": records[-1][order_by or "id"],
+                "id": records[-1]["id"],
+            }
+
+    @classmethod
+    def build_seek_condition(cls, table, order_by: str, cursor: dict, descending: bool):
+        """构造键集分页条件，定位排序键(order_by, id)位于游标之后的记录"""
+
+        sort_column = table.c[order_by]
+        cursor_value = cursor["value"]
+        if order_by == "login_datetime" and isinstance(cursor_value, str):
+            cursor_value = datetime.strptime(cursor_value, "%Y-%m-%d %H:%M:%S")
+
+        if descending:
+            id_condition = table.c.id < cursor["id"]
+            if order_by == "id":
+                return id_condition
+            return (sort_column < cursor_value) | (
+                (sort_column == cursor_value) & id_condition
+            )
+
+        id_condition = table.c.id > cursor["id"]
+        if order_by == "id":
+            return id_condition
+        return (sort_column > cursor_value) | (
+            (sort_column == cursor_value) & id_condition
+        )
+
+    @classmethod
+    def get_archive_table(cls, month: str):
+        """获取指定月份归档表对象，归档表与登录日志表结构一致"""
+
+        archive_table = _archive_tables.get(month)
+        if archive_table is None:
+            table_name = get_archive_table_name(month)
+            archive_table = Table(
+                table_name,
+                archive_metadata,
+                *[
+                    Column(
+                        column.name,
+                        column.type,
+                        primary_key=column.primary_key,
+                        nullable=column.nullable,
+                        autoincrement=False,
+                    )
+                    for column in cls.__table__.columns
+                ],
+                *[
+                    Index(f"{table_name}_{'_'.join(columns)}", *columns)
+                    for columns in TABLE_INDEXES["LoginLogs"].values()
+                ],
+                extend_existing=True,
+            )
+            _archive_tables[month] = archive_table
+
+        return archive_table
+
+    @classmethod
+    def get_archive_months(cls) -> List[str]:
+        """获取已存在归档表的月份列表"""
+
+        return parse_archive_months(inspect(get_bind()).get_table_names())
+
+    @classmethod
+    def purge_logs(
+        cls,
+        before: datetime,
+        batch_size: int = 1000,
+        archive_mode: Literal["none", "table", "file"] = "none",
+        archive_dir: str = None,
+        batch_pause_seconds: float = 0,
+    ) -> int:
+        """分批清理登录时间早于before的日志记录，返回清理的记录数
+
+        每批记录在独立的短事务中完成归档与删除，批次之间可暂停片刻，避免长时间占用数据库写锁；
+        archive_mode为"table"时归档至月度归档表，为"file"时归档至archive_dir下的月度压缩文件
+        """
+
+        purged_count = 0
+        while True:
+            with session_scope() as session:
+                records = [
+                    dict(record)
+                    for record in session.execute(
+                        select(cls.__table__)
+                        .where(cls.login_datetime < before)
+                        .order_by(cls.login_datetime, cls.id)
+                        .limit(batch_size)
+                    ).mappings()
+                ]
+            if not records:
+                break
+
+            # 先写入归档文件再删除，删除失败时重试只会产生重复归档而不会丢失记录
+            if archive_mode == "file":
+                append_to_archive_files(records, archive_dir)
+
+            with session_scope() as session:
+                if archive_mode == "table":
+                    records_by_month = {}
+                    for record in records:
+                        records_by_month.setdefault(
+                            get_archive_month(record["login_datetime"]), []
+                        ).append(record)
+                    for month, month_records in records_by_month.items():
+                        archive_table = cls.get_archive_table(month)
+                        archive_table.create(bind=session.connection(), checkfirst=True)
+                        session.execute(insert(archive_table), month_records)
+
+                deleted_count = execute_bulk_in(
+                    session,
+                    cls.id,
+                    [record["id"] for record in records],
+                    delete(cls).where,
+                )
+
+            purged_count += deleted_count
+            login_logs_counter.adjust(-deleted_count)
+
+            if len(records) < batch_size:
+                break
+            time.sleep(batch_pause_seconds)
+
+        return purged_count
+
+    @classmethod
+    def purge_expired_logs(cls) -> int:
+        """按日志保留期限配置清理过期日志记录，未设置保留期限时不做处理"""
+
+        if LogConfig.login_logs_retention_days <= 0:
+            return 0
+
+        return cls.purge_logs(
+            before=datetime.now()
+            - timedelta(days=LogConfig.login_logs_retention_days),
+            batch_size=LogConfig.login_logs_purge_batch_size,
+            archive_mode=LogConfig.login_logs_archive_mode,
+            archive_dir=LogConfig.login_logs_archive_dir,
+            batch_pause_seconds=LogConfig.login_logs_purge_batch_pause_seconds,
+        )
 
     @classmethod
     def add_log(
@@ -94,17 +489,86 @@ class LoginLogs(BaseModel, table=True):
                     login_datetime=login_datetime,
                 )
             )
+            # 在同一事务中累加登录统计，保证统计数据与登录日志一致
+            LoginStats.increment_counts(
+                session,
+                aggregate_login_logs(
+                    [
+                        {
+                            "browser": browser,
+                            "os": os,
+                            "status": status,
+                            "login_datetime": login_datetime,
+                        }
+                    ]
+                ),
+            )
+
+        login_logs_counter.adjust(1)
+
+    @classmethod
+    def add_logs(cls, records: List[dict]):
+        """批量添加日志记录"""
+
+        records = [
+            {
+                **record,
+                "login_datetime": (
+                    datetime.strptime(record["login_datetime"], "%Y-%m-%d %H:%M:%S")
+                    if isinstance(record["login_datetime"], str)
+                    else record["login_datetime"]
+                ),
+            }
+            for record in records
+        ]
+        with session_scope() as session:
+            session.execute(insert(cls), records)
+            # 在同一事务中累加登录统计，保证统计数据与登录日志一致
+            LoginStats.increment_counts(session, aggregate_login_logs(records))
+
+        login_logs_counter.adjust(len(records))
+
+    @classmethod
+    def enqueue_log(
+        cls,
+        user_name: str,
+        user_id: str,
+        ip: str,
+        browser: str,
+        os: str,
+        status: str,
+        login_datetime: str,
+    ):
+        """提交日志记录至后台批量写入队列，不等待数据库写入完成"""
+
+        return login_logs_writer.submit(
+            {
+                "user_name": user_name,
+                "user_id": user_id,
+                "ip": ip,
+                "browser": browser,
+                "os": os,
+                "status": status,
+                "login_datetime": login_datetime,
+            }
+        )
 
     @classmethod
     def delete_logs(cls, log_ids: List[str]):
         with session_scope() as session:
-            session.execute(delete(cls).where(cls.id.in_(log_ids)))
+            deleted_count = execute_bulk_in(
+                session, cls.id, log_ids, delete(cls).where
+            )
+
+        login_logs_counter.adjust(-deleted_count)
 
     @classmethod
     def truncate_logs(cls):
         with session_scope() as session:
             session.execute(delete(cls))
 
+        login_logs_counter.reset(0)
+
     @classmethod
     def columns(cls):
         return [
@@ -130,3 +594,14 @@ class LoginLogs(BaseModel, table=True):
 
 # 保持Peewee旧实现的导入时建表行为，避免日志页首次访问时报表不存在
 LoginLogs.__table__.create(bind=engine, checkfirst=True)
+
+# 登录日志后台批量写入器
+login_logs_writer = BatchedWriter(
+    LoginLogs.add_logs,
+    batch_size=LogConfig.login_logs_batch_size,
+    flush_interval_seconds=LogConfig.login_logs_flush_interval_seconds,
+    max_queue_size=LogConfig.login_logs_queue_max_size,
+    put_timeout_seconds=LogConfig.login_logs_queue_put_timeout_seconds,
+    synchronous=not LogConfig.login_logs_async_write,
+    thread_name="login-logs-writer",
+)
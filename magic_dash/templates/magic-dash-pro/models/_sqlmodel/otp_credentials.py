@@ -1,11 +1,27 @@
 from datetime import datetime, timedelta
+from functools import partial
 from typing import Optional
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, delete, update
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    case,
+    delete,
+    update,
+)
 from sqlmodel import Field
 
-from . import BaseModel, create_tables, session_scope
+from configs.database_config import DatabaseConfig
+from . import BaseModel, create_tables, session_scope, supports_returning
+from ..caches import otp_totp_cache
 from ..schema_contract import TABLE_NAMES
+from ..unit_of_work import run_after_transaction
+
+# 当前进程是否已确认OTP凭据表存在，确认后不再重复执行表结构检查
+_table_ensured = False
 
 
 class OtpCredentials(BaseModel, table=True):
@@ -46,11 +62,18 @@ class OtpCredentials(BaseModel, table=True):
 
     @classmethod
     def ensure_table(cls):
-        """确保OTP凭据表存在，用于兼容已初始化过的旧数据库"""
+        """确保OTP凭据表存在，用于兼容已初始化过的旧数据库，每个进程只检查一次"""
+
+        global _table_ensured
+
+        if _table_ensured:
+            return
 
         if not cls.table_exists():
             create_tables([cls])
 
+        _table_ensured = True
+
     @classmethod
     def get_credential(cls, user_id: str):
         user_id = (user_id or "").strip()
@@ -103,7 +126,10 @@ class OtpCredentials(BaseModel, table=True):
                     )
                 )
             session.flush()
-            return session.get(cls, user_id)
+            credential = session.get(cls, user_id)
+
+        run_after_transaction(partial(otp_totp_cache.invalidate, user_id))
+        return credential
 
     @classmethod
     def disable_credential(cls, user_id: str):
@@ -112,10 +138,13 @@ class OtpCredentials(BaseModel, table=True):
             return 0
         cls.ensure_table()
         with session_scope() as session:
-            return (
+            deleted_count = (
                 session.execute(delete(cls).where(cls.user_id == user_id)).rowcount or 0
             )
 
+        run_after_transaction(partial(otp_totp_cache.invalidate, user_id))
+        return deleted_count
+
     @staticmethod
     def is_locked(credential) -> bool:
         return bool(
@@ -125,16 +154,23 @@ class OtpCredentials(BaseModel, table=True):
     @classmethod
     def mark_used(cls, user_id: str, timecode: int):
         cls.ensure_table()
+        now = datetime.now()
         with session_scope() as session:
             return (
                 session.execute(
                     update(cls)
-                    .where(cls.user_id == user_id)
+                    .where(
+                        cls.user_id == user_id,
+                        cls.is_enabled.is_(True),
+                        (cls.last_used_timecode.is_(None))
+                        | (cls.last_used_timecode < timecode),
+                        (cls.locked_until.is_(None)) | (cls.locked_until <= now),
+                    )
                     .values(
                         last_used_timecode=timecode,
                         failed_attempts=0,
                         locked_until=None,
-                        updated_at=datetime.now(),
+                        updated_at=now,
                     )
                 ).rowcount
                 or 0
@@ -147,32 +183,42 @@ class OtpCredentials(BaseModel, table=True):
         max_failed_attempts: int,
         lockout_seconds: int,
     ):
-        """记录OTP校验失败，并在达到阈值后临时锁定"""
+        """以单条原子更新语句累加OTP校验失败次数，并在达到阈值后临时锁定"""
 
         cls.ensure_table()
+        now = datetime.now()
+        # MySQL按SET子句顺序求值，锁定条件中读取到的已是累加后的失败次数
+        failed_attempts = (
+            cls.failed_attempts
+            if DatabaseConfig.database_type == "mysql"
+            else cls.failed_attempts + 1
+        )
+        statement = (
+            update(cls)
+            .where(cls.user_id == user_id)
+            .values(
+                failed_attempts=cls.failed_attempts + 1,
+                locked_until=case(
+                    (
+                        failed_attempts >= max_failed_attempts,
+                        now + timedelta(seconds=lockout_seconds),
+                    ),
+                    else_=cls.locked_until,
+                ),
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
         with session_scope() as session:
-            credential = session.get(cls, user_id)
-            if not credential:
-                return None
+            if supports_returning():
+                return session.scalars(statement.returning(cls)).first()
 
-            failed_attempts = (credential.failed_attempts or 0) + 1
-            locked_until = (
-                datetime.now() + timedelta(seconds=lockout_seconds)
-                if failed_attempts >= max_failed_attempts
-                else credential.locked_until
-            )
+            if not session.execute(statement).rowcount:
+                return None
 
-            session.execute(
-                update(cls)
-                .where(cls.user_id == user_id)
-                .values(
-                    failed_attempts=failed_attempts,
-                    locked_until=locked_until,
-                    updated_at=datetime.now(),
-                )
-            )
-            session.flush()
-            return session.get(cls, user_id)
+            # 更新语句未同步会话中的对象，重新读取以获取最新状态
+            return session.get(cls, user_id, populate_existing=True)
 
     @classmethod
     def reset_failed_attempts(cls, user_id: str):
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+from uuid import uuid4
+
+from werkzeug.security import check_password_hash
+
+from .logs import LoginLogs
+from .users import Users
+
+
+class LoginUser(NamedTuple):
+    """登录校验所需的轻量用户信息"""
+
+    user_id: str
+    user_name: str
+    user_role: str
+    password_hash: str
+
+
+class LoginClient(NamedTuple):
+    """发起登录请求的客户端信息"""
+
+    ip: str
+    browser: str
+    os: str
+
+
+def get_login_user(user_name: str = None, user_email: str = None):
+    """按用户名或邮箱以单次查询获取登录校验所需的用户信息，用户不存在时返回None"""
+
+    record = Users.get_login_user(user_name=user_name, user_email=user_email)
+
+    return LoginUser(**record) if record else None
+
+
+def authenticate_password(
+    user_name: str, password: str
+) -> Tuple[Optional[LoginUser], str]:
+    """校验用户名及密码，返回匹配的用户信息与登录状态
+
+    登录状态为"登录成功"、"用户不存在"或"密码错误"，校验过程仅查询一次数据库
+    """
+
+    login_user = get_login_user(user_name=user_name)
+
+    # 若用户不存在
+    if not login_user:
+        return None, "用户不存在"
+
+    # 若密码不正确
+    if not check_password_hash(login_user.password_hash, password):
+        return login_user, "密码错误"
+
+    return login_user, "登录成功"
+
+
+def start_user_session(login_user: LoginUser) -> Optional[str]:
+    """为已完成身份校验的用户轮换会话token，返回新的会话token
+
+    以单条条件更新语句写入，若用户已被删除或密码在校验之后被修改则不更新并返回None
+    """
+
+    session_token = str(uuid4())
+    if Users.rotate_session_token(
+        login_user.user_id, session_token, password_hash=login_user.password_hash
+    ):
+        return session_token
+
+    return None
+
+
+def record_login(
+    client: LoginClient, status: str, user_name: str, user_id: str = None
+):
+    """提交登录日志至后台批量写入队列，不等待数据库写入完成"""
+
+    LoginLogs.enqueue_log(
+        user_name=user_name,
+        user_id=user_id,
+        ip=client.ip,
+        browser=client.browser,
+        os=client.os,
+        status=status,
+        login_datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
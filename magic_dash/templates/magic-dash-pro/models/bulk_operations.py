@@ -0,0 +1,64 @@
+from typing import Iterable, Iterator, List, Tuple
+from uuid import uuid4
+
+# 各数据库单条IN条件允许携带的最大参数数量
+# SQLite 3.32.0之前单条语句最多999个参数，这里统一按较低上限取值并为语句中的其他参数预留余量
+BULK_IN_CHUNK_SIZES = {
+    "sqlite": 900,
+    "mysql": 5000,
+    "postgresql": 5000,
+}
+
+# 键数量超过对应阈值时，先写入临时键表，再以单条子查询语句完成批量操作，减少与数据库的往返次数
+# SQLite为进程内数据库，分块语句没有网络往返开销，实测分块执行快于写入临时键表，因此不启用
+BULK_TEMP_TABLE_THRESHOLDS = {
+    "sqlite": None,
+    "mysql": 20000,
+    "postgresql": 20000,
+}
+
+
+def get_bulk_in_chunk_size(database_type: str) -> int:
+    """获取当前数据库单条IN条件的分块大小"""
+
+    return BULK_IN_CHUNK_SIZES.get(database_type, BULK_IN_CHUNK_SIZES["sqlite"])
+
+
+def get_bulk_temp_table_threshold(database_type: str):
+    """获取当前数据库启用临时键表的键数量阈值，返回None表示不启用临时键表"""
+
+    return BULK_TEMP_TABLE_THRESHOLDS.get(database_type)
+
+
+def dedupe_keys(keys: Iterable) -> list:
+    """按原有顺序去除重复键"""
+
+    return list(dict.fromkeys(keys))
+
+
+def iter_key_chunks(keys: List, chunk_size: int) -> Iterator[List]:
+    """将键列表按指定大小切分"""
+
+    for index in range(0, len(keys), chunk_size):
+        yield keys[index : index + chunk_size]
+
+
+def get_temp_key_table_statements(
+    database_type: str, keys: List, column_name: str = "bulk_key"
+) -> Tuple[str, str, str]:
+    """生成临时键表的表名及建表、删表语句，键字段类型与键值类型保持一致"""
+
+    table_name = f"bulk_keys_{uuid4().hex[:12]}"
+    column_type = "BIGINT" if isinstance(keys[0], int) else "VARCHAR(255)"
+
+    create_sql = (
+        f"CREATE TEMPORARY TABLE {table_name} ({column_name} {column_type} PRIMARY KEY)"
+    )
+    # MySQL中DROP TEMPORARY TABLE不会隐式提交当前事务
+    drop_sql = (
+        f"DROP TEMPORARY TABLE {table_name}"
+        if database_type == "mysql"
+        else f"DROP TABLE {table_name}"
+    )
+
+    return table_name, create_sql, drop_sql
@@ -0,0 +1,7 @@
+from ._registry import load_model
+from . import db
+
+
+CacheVersions = load_model("cache_versions", "CacheVersions")
+
+__all__ = ["CacheVersions", "db"]
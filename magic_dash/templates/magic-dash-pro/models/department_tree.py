@@ -0,0 +1,82 @@
+from typing import Dict, Iterable, List
+
+
+class DepartmentTree:
+    """部门层级结构的只读内存索引
+
+    基于全部部门记录一次性构建父子邻接表，祖先、后代查询与按子树汇总统计均在内存中完成，
+    不再逐个节点查询数据库；索引构建完成后不再修改，可在多线程间共享读取。
+    """
+
+    def __init__(self, departments: Iterable[dict]):
+        self.departments = list(departments)
+        self.parents = {}
+        self.children = {}
+
+        for department in self.departments:
+            department_id = department["department_id"]
+            parent_department_id = department["parent_department_id"]
+            self.parents[department_id] = parent_department_id
+            self.children.setdefault(parent_department_id, []).append(department_id)
+
+    def __len__(self):
+        return len(self.departments)
+
+    def __contains__(self, department_id: str):
+        return department_id in self.parents
+
+    def get_root_ids(self) -> List[str]:
+        """获取全部根部门id，上级部门不存在的部门同样视作根部门"""
+
+        return [
+            department_id
+            for department_id, parent_department_id in self.parents.items()
+            if parent_department_id not in self.parents
+        ]
+
+    def get_descendant_ids(
+        self, department_id: str, include_self: bool = True
+    ) -> List[str]:
+        """按广度优先顺序获取指定部门的全部后代部门id"""
+
+        descendant_ids = [department_id] if include_self else []
+        visited = {department_id}
+        queue = [department_id]
+        # 以游标遍历队列，避免逐个弹出队首元素
+        for current_id in queue:
+            for child_id in self.children.get(current_id, []):
+                # 跳过历史数据中可能存在的循环引用
+                if child_id in visited:
+                    continue
+                visited.add(child_id)
+                descendant_ids.append(child_id)
+                queue.append(child_id)
+
+        return descendant_ids
+
+    def get_ancestor_ids(self, department_id: str) -> List[str]:
+        """由近及远获取指定部门的全部祖先部门id"""
+
+        ancestor_ids = []
+        visited = {department_id}
+        parent_id = self.parents.get(department_id)
+        while parent_id in self.parents and parent_id not in visited:
+            visited.add(parent_id)
+            ancestor_ids.append(parent_id)
+            parent_id = self.parents[parent_id]
+
+        return ancestor_ids
+
+    def rollup_counts(self, counts: Dict[str, int]) -> Dict[str, int]:
+        """将各部门自身的计数汇总至其全部祖先部门，返回各部门所在子树的计数合计"""
+
+        subtree_counts = {department_id: 0 for department_id in self.parents}
+        for department_id, count in counts.items():
+            if department_id not in self.parents:
+                continue
+            subtree_counts[department_id] += count
+            for ancestor_id in self.get_ancestor_ids(department_id):
+                subtree_counts[ancestor_id] += count
+
+        return subtree_counts
+
@@ -3,5 +3,6 @@ from . import db
 
 
 LoginLogs = load_model("logs", "LoginLogs")
+login_logs_writer = load_model("logs", "login_logs_writer")
 
-__all__ = ["LoginLogs", "db"]
+__all__ = ["LoginLogs", "db", "login_logs_writer"]
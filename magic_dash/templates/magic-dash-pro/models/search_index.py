@@ -0,0 +1,151 @@
+import sqlite3
+from typing import List
+
+# SQLite自3.34.0版本起内置FTS5 trigram分词器
+SQLITE_TRIGRAM_MIN_VERSION = (3, 34, 0)
+
+# trigram分词器以3个字符为最小检索单元，更短的关键词无法利用检索索引
+TRIGRAM_MIN_KEYWORD_LENGTH = 3
+
+# MySQL ngram全文解析器的默认分词长度（ngram_token_size），短于该长度的关键词无法命中全文索引
+MYSQL_NGRAM_TOKEN_SIZE = 2
+
+
+def sqlite_supports_trigram() -> bool:
+    """判断当前SQLite版本是否支持FTS5 trigram分词器"""
+
+    return sqlite3.sqlite_version_info >= SQLITE_TRIGRAM_MIN_VERSION
+
+
+def get_search_key_table_name(index_name: str) -> str:
+    """获取SQLite检索索引记录与非整数主键的映射表名"""
+
+    return f"{index_name}_keys"
+
+
+def get_search_index_statements(
+    database_type: str,
+    table_name: str,
+    index_name: str,
+    column_name: str,
+    primary_key: str = "id",
+    integer_primary_key: bool = True,
+) -> List[str]:
+    """生成为指定文本字段建立子串检索索引的SQL语句
+
+    SQLite：FTS5 trigram虚拟表，由触发器与数据表保持同步；整数主键数据表以其为外部内容，
+    主键值即检索索引记录的rowid；非整数主键数据表的内置rowid可能在VACUUM时被重新编号，
+    改为由映射表为每个主键分配稳定的整数编号作为检索索引记录的rowid；
+    PostgreSQL：基于pg_trgm扩展的GIN索引；
+    MySQL：基于ngram全文解析器的FULLTEXT索引
+    """
+
+    if database_type == "postgresql":
+        return [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS {index_name} "
+            f"ON {table_name} USING gin ({column_name} gin_trgm_ops)",
+        ]
+
+    if database_type == "mysql":
+        return [
+            f"CREATE FULLTEXT INDEX {index_name} "
+            f"ON {table_name} ({column_name}) WITH PARSER ngram"
+        ]
+
+    if not integer_primary_key:
+        return get_keyed_sqlite_search_index_statements(
+            table_name, index_name, column_name, primary_key
+        )
+
+    insert_row = (
+        f"INSERT INTO {index_name}(rowid, {column_name}) "
+        f"VALUES (new.{primary_key}, new.{column_name});"
+    )
+    delete_row = (
+        f"INSERT INTO {index_name}({index_name}, rowid, {column_name}) "
+        f"VALUES ('delete', old.{primary_key}, old.{column_name});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5("
+        f"{column_name}, content='{table_name}', content_rowid='{primary_key}', "
+        "tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_ai AFTER INSERT ON {table_name} "
+        f"BEGIN {insert_row} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_ad AFTER DELETE ON {table_name} "
+        f"BEGIN {delete_row} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_au "
+        f"AFTER UPDATE OF {column_name} ON {table_name} "
+        f"BEGIN {delete_row} {insert_row} END",
+        # 为已有数据构建检索索引
+        f"INSERT INTO {index_name}({index_name}) VALUES ('rebuild')",
+    ]
+
+
+def get_keyed_sqlite_search_index_statements(
+    table_name: str, index_name: str, column_name: str, primary_key: str
+) -> List[str]:
+    """生成以映射表关联非整数主键的SQLite FTS5检索索引SQL语句
+
+    映射表以整数主键id为检索索引记录的rowid，并对原主键建立唯一索引，
+    检索时由rowid经映射表取回原主键，同步删除时按原主键定位检索索引记录，均无需全表扫描
+    """
+
+    key_table_name = get_search_key_table_name(index_name)
+    search_rowid = (
+        f"(SELECT id FROM {key_table_name} WHERE {primary_key} = {{}}.{primary_key})"
+    )
+    insert_row = (
+        f"INSERT INTO {key_table_name}({primary_key}) VALUES (new.{primary_key}); "
+        f"INSERT INTO {index_name}(rowid, {column_name}) "
+        f"VALUES ({search_rowid.format('new')}, new.{column_name});"
+    )
+    delete_row = (
+        f"DELETE FROM {index_name} WHERE rowid = {search_rowid.format('old')}; "
+        f"DELETE FROM {key_table_name} WHERE {primary_key} = old.{primary_key};"
+    )
+    return [
+        f"CREATE TABLE IF NOT EXISTS {key_table_name} ("
+        f"id INTEGER PRIMARY KEY, {primary_key} TEXT NOT NULL UNIQUE)",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index_name} USING fts5("
+        f"{column_name}, tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_ai AFTER INSERT ON {table_name} "
+        f"BEGIN {insert_row} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_ad AFTER DELETE ON {table_name} "
+        f"BEGIN {delete_row} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index_name}_au "
+        f"AFTER UPDATE OF {primary_key}, {column_name} ON {table_name} "
+        f"BEGIN {delete_row} {insert_row} END",
+        # 为已有数据分配整数编号并构建检索索引
+        f"INSERT INTO {key_table_name}({primary_key}) "
+        f"SELECT {primary_key} FROM {table_name}",
+        f"INSERT INTO {index_name}(rowid, {column_name}) "
+        f"SELECT {key_table_name}.id, {table_name}.{column_name} FROM {table_name} "
+        f"JOIN {key_table_name} "
+        f"ON {key_table_name}.{primary_key} = {table_name}.{primary_key}",
+    ]
+
+
+def get_drop_sqlite_search_index_statements(index_name: str) -> List[str]:
+    """生成删除SQLite FTS5检索索引虚拟表及其同步触发器、主键映射表的SQL语句"""
+
+    return [
+        *(
+            f"DROP TRIGGER IF EXISTS {index_name}_{suffix}"
+            for suffix in ("ai", "ad", "au")
+        ),
+        f"DROP TABLE IF EXISTS {index_name}",
+        f"DROP TABLE IF EXISTS {get_search_key_table_name(index_name)}",
+    ]
+
+
+def build_mysql_boolean_phrase(keyword: str) -> str:
+    """将关键词转换为MySQL布尔模式全文检索的短语，ngram分词下短语匹配即连续子串匹配"""
+
+    return '"{}"'.format(keyword.replace('"', " "))
+
+
+def get_prefix_upper_bound(prefix: str) -> str:
+    """获取前缀匹配的范围上界，以范围条件代替LIKE 'prefix%'，确保各数据库均可命中普通索引"""
+
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -0,0 +1,113 @@
+import threading
+from contextvars import ContextVar
+
+from configs import DatabaseConfig
+
+
+class UnitOfWork:
+    """请求级工作单元
+
+    由请求钩子或中间件创建，数据库连接/会话在首次被模型方法使用时才惰性打开，
+    同一请求内的全部模型方法共用该连接/会话；
+    transactional为True时整个请求共用一个事务，模型方法内部的事务降级为保存点，
+    缓存失效等操作延迟到请求事务结束后执行，避免其他请求读取并缓存尚未提交的数据。
+    """
+
+    def __init__(self, transactional: bool = True):
+        self.transactional = transactional
+        self.thread_id = threading.get_ident()
+        self.resource = None
+        self._finalizer = None
+        self._after_transaction_callbacks = []
+
+    def is_joinable(self) -> bool:
+        """仅创建工作单元的线程可加入，线程池中的模型调用保持逐次独立的行为"""
+
+        return self.thread_id == threading.get_ident()
+
+    def open(self, opener):
+        """惰性打开数据库资源，opener需返回(资源对象, 结束回调)"""
+
+        if self._finalizer is None:
+            self.resource, self._finalizer = opener(self)
+
+        return self.resource
+
+    def run_after_transaction(self, callback):
+        """事务型工作单元中登记事务结束后的回调，非事务型工作单元中立即执行"""
+
+        if self.transactional:
+            self._after_transaction_callbacks.append(callback)
+        else:
+            callback()
+
+    def finish(self, commit: bool = True):
+        """提交或回滚并释放数据库资源，随后执行已登记的回调"""
+
+        finalizer, self._finalizer = self._finalizer, None
+        callbacks, self._after_transaction_callbacks = (
+            self._after_transaction_callbacks,
+            [],
+        )
+        self.resource = None
+
+        try:
+            if finalizer is not None:
+                finalizer(commit)
+        finally:
+            # 缓存失效类回调可重复执行，提交失败或回滚时同样执行以丢弃期间写入的缓存
+            for callback in callbacks:
+                callback()
+
+
+_current_unit_of_work = ContextVar("current_unit_of_work", default=None)
+
+
+def get_current_unit_of_work():
+    """获取当前线程可加入的请求级工作单元，不存在时返回None"""
+
+    unit_of_work = _current_unit_of_work.get()
+    if unit_of_work is not None and unit_of_work.is_joinable():
+        return unit_of_work
+
+    return None
+
+
+def supports_request_transaction() -> bool:
+    """当前数据库是否适合由Web请求共用一个事务
+
+    SQLite的延迟事务在读后写时需由共享锁升级为写锁，并发请求升级失败会直接报错而不等待，
+    长事务还会阻塞后台批量写入线程，因此SQLite下请求级工作单元仅共享连接，模型方法逐次提交
+    """
+
+    return DatabaseConfig.database_type != "sqlite"
+
+
+def begin_unit_of_work(transactional: bool = True) -> UnitOfWork:
+    """开启请求级工作单元，此时并不会立即打开数据库连接"""
+
+    unit_of_work = UnitOfWork(transactional=transactional)
+    _current_unit_of_work.set(unit_of_work)
+
+    return unit_of_work
+
+
+def end_unit_of_work(commit: bool = True):
+    """结束当前请求级工作单元，重复调用时不做任何处理"""
+
+    unit_of_work = _current_unit_of_work.get()
+    if unit_of_work is None:
+        return
+
+    _current_unit_of_work.set(None)
+    unit_of_work.finish(commit=commit)
+
+
+def run_after_transaction(callback):
+    """在当前请求事务结束后执行回调，不存在事务型工作单元时立即执行"""
+
+    unit_of_work = get_current_unit_of_work()
+    if unit_of_work is None:
+        callback()
+    else:
+        unit_of_work.run_after_transaction(callback)
@@ -0,0 +1,84 @@
+from typing import Dict, Iterable, List
+
+from werkzeug.security import generate_password_hash
+
+# 批量导入用户时，写入数据库的用户信息字段
+USER_IMPORT_COLUMNS = (
+    "user_id",
+    "user_name",
+    "password_hash",
+    "user_email",
+    "department_id",
+    "user_role",
+)
+
+
+def validate_new_user_records(
+    records: List[dict],
+    existing_user_ids: Iterable[str],
+    existing_user_names: Iterable[str],
+    existing_user_emails: Iterable[str],
+    valid_roles: Iterable[str],
+    valid_department_ids: Iterable[str],
+    default_role: str,
+) -> Dict[int, str]:
+    """基于已有用户id、用户名、邮箱集合一次性校验全部携带明文密码password的待导入用户
+
+    校验规则与逐个添加用户时保持一致，同一批次内重复的用户id、用户名、邮箱仅首次出现的记录有效；
+    会就地补全各记录的默认角色并规范化空邮箱、空部门，返回校验失败记录的下标及对应错误信息
+    """
+
+    user_ids = set(existing_user_ids)
+    user_names = set(existing_user_names)
+    user_emails = set(existing_user_emails)
+    valid_roles = set(valid_roles)
+    valid_department_ids = set(valid_department_ids)
+
+    errors = {}
+    for index, record in enumerate(records):
+        record["user_email"] = (record.get("user_email") or "").strip() or None
+        record["department_id"] = record.get("department_id") or None
+        record["user_role"] = record.get("user_role") or default_role
+
+        # 若必要用户信息不完整
+        if not (
+            record.get("user_id") and record.get("user_name") and record.get("password")
+        ):
+            errors[index] = "用户信息不完整"
+
+        # 若用户id已存在
+        elif record["user_id"] in user_ids:
+            errors[index] = "用户id已存在"
+
+        # 若用户名存在重复
+        elif record["user_name"] in user_names:
+            errors[index] = "用户名已存在"
+
+        # 若非空邮箱存在重复
+        elif record["user_email"] and record["user_email"] in user_emails:
+            errors[index] = "邮箱已被其他用户使用"
+
+        # 若用户角色不属于有效角色
+        elif record["user_role"] not in valid_roles:
+            errors[index] = "用户角色不正确"
+
+        # 若所属部门不存在
+        elif (
+            record["department_id"]
+            and record["department_id"] not in valid_department_ids
+        ):
+            errors[index] = "所属部门不存在"
+
+        else:
+            user_ids.add(record["user_id"])
+            user_names.add(record["user_name"])
+            if record["user_email"]:
+                user_emails.add(record["user_email"])
+
+    return errors
+
+
+def hash_passwords_serially(passwords: List[str]) -> List[str]:
+    """在当前进程中逐个计算密码散列值"""
+
+    return [generate_password_hash(password) for password in passwords]
@@ -0,0 +1,55 @@
+import time
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.text import Text
+
+from configs import LogConfig
+from models.logs import LoginLogs
+
+# 创建rich console实例
+console = Console()
+
+ARCHIVE_MODE_DESCRIPTIONS = {
+    "none": "直接删除",
+    "table": "归档至月度归档表",
+    "file": "归档至{}目录下的月度压缩文件",
+}
+
+
+def main():
+    """按日志保留期限配置分批清理过期登录日志，可配置为定时任务周期性执行。"""
+
+    console.print(
+        Panel(
+            Text("登录日志清理工具", style="bold cyan"),
+            subtitle=Text("magic-dash-pro", style="dim"),
+            border_style="bright_blue",
+            padding=(1, 2),
+        )
+    )
+
+    if LogConfig.login_logs_retention_days <= 0:
+        console.print(
+            "[yellow]未设置登录日志保留天数（LogConfig.login_logs_retention_days），"
+            "已跳过清理[/yellow]"
+        )
+        return
+
+    started_at = time.perf_counter()
+    purged_count = LoginLogs.purge_expired_logs()
+
+    console.print(
+        "[green]已清理{}天前的登录日志{}条[/green]，处理方式：{}，耗时{:.2f}秒".format(
+            LogConfig.login_logs_retention_days,
+            purged_count,
+            ARCHIVE_MODE_DESCRIPTIONS[LogConfig.login_logs_archive_mode].format(
+                LogConfig.login_logs_archive_dir
+            ),
+            time.perf_counter() - started_at,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
 import dash
-from flask import request
-from user_agents import parse
+from flask import abort, request, send_file
 from flask_principal import Principal, Permission, RoleNeed, identity_loaded
 from flask_login import LoginManager, UserMixin, current_user, AnonymousUserMixin
 
 # 应用基础参数
+from models.logs import LoginLogs
 from models.users import Users
+from models.cache_versions import CacheVersions
+from models.unit_of_work import (
+    begin_unit_of_work,
+    end_unit_of_work,
+    supports_request_transaction,
+)
 from models.user_permission_groups import UserPermissionGroups
 from configs import BaseConfig, AuthConfig
+from utils.browser_utils import check_user_agent
+from utils.export_utils import (
+    LOGIN_LOGS_EXPORT_FIELDNAMES,
+    LOGIN_LOGS_EXPORT_PATHNAME,
+    get_login_logs_export_filename,
+    parse_login_logs_query_condition,
+    write_csv_to_spooled_file,
+)
 
 app = dash.Dash(
     __name__,
@@ -30,6 +44,33 @@ login_manager.init_app(app.server)
 principals = Principal(app.server)
 
 
+@app.server.before_request
+def begin_request_unit_of_work():
+    """开启请求级工作单元，本次请求中的模型方法共用同一数据库连接与事务
+
+    数据库连接在首次访问数据库时才惰性打开，静态资源等请求不会产生额外开销；
+    SQLite下仅共享连接，模型方法逐次提交，避免并发请求由读升级为写时相互冲突
+    """
+
+    begin_unit_of_work(transactional=supports_request_transaction())
+
+
+@app.server.after_request
+def commit_request_unit_of_work(response):
+    """提交请求级工作单元，服务端异常响应则回滚"""
+
+    end_unit_of_work(commit=response.status_code < 500)
+
+    return response
+
+
+@app.server.teardown_request
+def close_request_unit_of_work(exception=None):
+    """兜底回滚并释放未能正常结束的请求级工作单元"""
+
+    end_unit_of_work(commit=False)
+
+
 class User(UserMixin):
     """flask-login专用用户类"""
 
@@ -58,8 +99,8 @@ def user_loader(user_id):
     ):
         return AnonymousUserMixin()
 
-    # 根据当前要加载的用户id，从数据库中获取匹配用户信息
-    match_user = Users.get_user(user_id)
+    # 根据当前要加载的用户id，获取匹配用户信息（优先读取进程内缓存）
+    match_user = Users.get_cached_user(user_id)
 
     # 处理未匹配到有效用户的情况
     if not match_user:
@@ -108,40 +149,47 @@ def on_identity_loaded(sender, identity):
 def check_browser():
     """检查浏览器版本是否符合最低要求"""
 
-    # 提取当前请求对应的浏览器信息
-    user_agent = parse(str(request.user_agent))
-
-    # 若浏览器版本信息有效
-    if user_agent.browser.version != ():
-        # IE相关浏览器直接拦截
-        if user_agent.browser.family == "IE":
-            return (
-                "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                "请不要使用IE浏览器，或开启了IE内核兼容模式的其他浏览器访问本应用</div>"
-            )
-        # 基于BaseConfig.min_browser_versions配置，对相关浏览器最低版本进行检查
-        for rule in BaseConfig.min_browser_versions:
-            # 若当前请求对应的浏览器版本，低于声明的最低支持版本
-            if (
-                user_agent.browser.family == rule["browser"]
-                and user_agent.browser.version[0] < rule["version"]
-            ):
-                return (
-                    "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                    "您的{}浏览器版本低于本应用最低支持版本（{}），请升级浏览器后再访问</div>"
-                ).format(rule["browser"], rule["version"])
-
-        # 若开启了严格的浏览器类型限制
-        if BaseConfig.strict_browser_type_check:
-            # 若当前浏览器不在声明的浏览器范围内
-            if user_agent.browser.family not in [
-                rule["browser"] for rule in BaseConfig.min_browser_versions
-            ]:
-                return (
-                    "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                    "当前浏览器类型不在支持的范围内，支持的浏览器类型有：{}</div>"
-                ).format(
-                    "、".join(
-                        [rule["browser"] for rule in BaseConfig.min_browser_versions]
-                    )
-                )
+    # 基于缓存的User-Agent检查结论，不符合要求时直接返回拦截提示
+    return check_user_agent(str(request.user_agent)).block_message
+
+
+@app.server.before_request
+def sync_local_caches():
+    """按检查间隔同步缓存版本，清理已被其他进程更新的本地缓存"""
+
+    # 静态资源请求无需同步
+    if request.path.startswith("/assets/") or request.path.startswith(
+        "/_dash-component-suites/"
+    ):
+        return
+
+    CacheVersions.sync_local_caches()
+
+
+@app.server.route(LOGIN_LOGS_EXPORT_PATHNAME)
+def export_login_logs():
+    """以文件流下载符合登录日志表当前筛选、排序条件的CSV导出文件"""
+
+    # 仅允许有权访问登录日志页面的用户导出
+    access_policy = (
+        UserPermissionGroups.get_pathname_access_policy(current_user.user_role)
+        if current_user.is_authenticated
+        else None
+    )
+    if not (access_policy and access_policy.allows("/core/login-logs")):
+        abort(403)
+
+    compress = request.args.get("compress") == "1"
+    # 逐批查询并写入临时文件，内存占用与登录日志记录数无关
+    export_file = write_csv_to_spooled_file(
+        LoginLogs.iter_logs(**parse_login_logs_query_condition(request.args)),
+        LOGIN_LOGS_EXPORT_FIELDNAMES,
+        compress=compress,
+    )
+
+    return send_file(
+        export_file,
+        mimetype="application/gzip" if compress else "text/csv",
+        as_attachment=True,
+        download_name=get_login_logs_export_filename(compress),
+    )
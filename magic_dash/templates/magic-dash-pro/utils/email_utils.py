@@ -1,13 +1,22 @@
 import smtplib
 import ssl
+import threading
 from datetime import datetime, timedelta
 from email.header import Header
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formataddr
+from functools import partial
 from html import escape
+from typing import Callable
 
 from configs import BaseConfig, EmailConfig
+from .mail_delivery import (
+    MailDeliveryQueue,
+    MailJob,
+    SMTPConnectionPool,
+    close_smtp_client,
+)
 from .validation_utils import validate_optional_email
 
 
@@ -48,6 +57,21 @@ def _validate_email_config():
         raise ValueError("SMTP服务连接超时时间必须大于0秒")
     if EmailConfig.smtp_use_ssl and EmailConfig.smtp_use_starttls:
         raise ValueError("SMTP SSL与STARTTLS不能同时开启")
+    if (
+        not isinstance(EmailConfig.smtp_pool_size, int)
+        or EmailConfig.smtp_pool_size < 0
+    ):
+        raise ValueError("SMTP连接池大小不能为负数")
+    if (
+        not isinstance(EmailConfig.email_send_workers, int)
+        or EmailConfig.email_send_workers <= 0
+    ):
+        raise ValueError("邮件发送线程数量必须为正整数")
+    if (
+        not isinstance(EmailConfig.email_send_max_attempts, int)
+        or EmailConfig.email_send_max_attempts <= 0
+    ):
+        raise ValueError("邮件最大发送次数必须为正整数")
     if (
         not isinstance(EmailConfig.verification_code_expire_seconds, int)
         or EmailConfig.verification_code_expire_seconds <= 0
@@ -176,8 +200,8 @@ def _build_verification_email(verification_code: str, expire_seconds: int):
     return message
 
 
-def send_email_verification_code(recipient_email: str, verification_code: str):
-    """向指定邮箱发送登录验证码"""
+def _validate_verification_email(recipient_email: str, verification_code: str):
+    """校验发送验证码邮件所需配置及参数"""
 
     _validate_email_config()
     if (
@@ -193,7 +217,10 @@ def send_email_verification_code(recipient_email: str, verification_code: str):
     ):
         raise ValueError("邮箱验证码必须是6位数字")
 
-    smtp_server = EmailConfig.smtp_server.strip()
+
+def _prepare_verification_email(recipient_email: str, verification_code: str):
+    """构建带收发件人及主题的验证码邮件，返回发件邮箱、收件邮箱及邮件内容"""
+
     sender_email = EmailConfig.sender_email.strip()
     recipient_email = recipient_email.strip()
     expire_seconds = EmailConfig.verification_code_expire_seconds
@@ -208,44 +235,140 @@ def send_email_verification_code(recipient_email: str, verification_code: str):
         "utf-8",
     )
 
+    return sender_email, recipient_email, message.as_string()
+
+
+def _connect_smtp_client():
+    """建立并完成认证的SMTP连接"""
+
+    smtp_server = EmailConfig.smtp_server.strip()
     ssl_context = ssl.create_default_context()
 
-    smtp_client = None
+    if EmailConfig.smtp_use_ssl:
+        smtp_client = smtplib.SMTP_SSL(
+            smtp_server,
+            EmailConfig.smtp_port,
+            timeout=EmailConfig.smtp_timeout,
+            context=ssl_context,
+        )
+    else:
+        smtp_client = smtplib.SMTP(
+            smtp_server,
+            EmailConfig.smtp_port,
+            timeout=EmailConfig.smtp_timeout,
+        )
 
     try:
-        if EmailConfig.smtp_use_ssl:
-            smtp_client = smtplib.SMTP_SSL(
-                smtp_server,
-                EmailConfig.smtp_port,
-                timeout=EmailConfig.smtp_timeout,
-                context=ssl_context,
-            )
-        else:
-            smtp_client = smtplib.SMTP(
-                smtp_server,
-                EmailConfig.smtp_port,
-                timeout=EmailConfig.smtp_timeout,
-            )
-
         smtp_client.ehlo()
         if EmailConfig.smtp_use_starttls:
             smtp_client.starttls(context=ssl_context)
             smtp_client.ehlo()
         smtp_client.login(
-            sender_email,
+            EmailConfig.sender_email.strip(),
             EmailConfig.sender_password,
         )
-        smtp_client.sendmail(
-            sender_email,
-            recipient_email,
-            message.as_string(),
+    except BaseException:
+        close_smtp_client(smtp_client)
+        raise
+
+    return smtp_client
+
+
+# 当前进程的SMTP连接池，SMTP服务相关配置变化时重新创建
+_smtp_pool = None
+_smtp_pool_key = None
+
+# 当前进程的后台邮件发送队列
+_mail_delivery_queue = None
+
+_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """获取当前SMTP服务配置对应的连接池"""
+
+    global _smtp_pool, _smtp_pool_key
+
+    pool_key = (
+        EmailConfig.smtp_server.strip(),
+        EmailConfig.smtp_port,
+        EmailConfig.smtp_use_ssl,
+        EmailConfig.smtp_use_starttls,
+        EmailConfig.smtp_timeout,
+        EmailConfig.sender_email.strip(),
+        EmailConfig.sender_password,
+    )
+
+    with _lock:
+        if _smtp_pool is None or _smtp_pool_key != pool_key:
+            if _smtp_pool is not None:
+                _smtp_pool.close()
+            _smtp_pool = SMTPConnectionPool(
+                _connect_smtp_client,
+                max_size=EmailConfig.smtp_pool_size,
+                health_check_interval_seconds=(
+                    EmailConfig.smtp_health_check_interval_seconds
+                ),
+            )
+            _smtp_pool_key = pool_key
+
+        return _smtp_pool
+
+
+def get_mail_delivery_queue() -> MailDeliveryQueue:
+    """获取当前进程的后台邮件发送队列"""
+
+    global _mail_delivery_queue
+
+    with _lock:
+        if _mail_delivery_queue is None:
+            _mail_delivery_queue = MailDeliveryQueue(
+                workers=EmailConfig.email_send_workers,
+                max_queue_size=EmailConfig.email_send_queue_size,
+                max_attempts=EmailConfig.email_send_max_attempts,
+                retry_backoff_seconds=EmailConfig.email_send_retry_backoff_seconds,
+                thread_name="email-verification-delivery",
+            )
+
+        return _mail_delivery_queue
+
+
+def _send_prepared_email(sender_email: str, recipient_email: str, message: str):
+    """通过连接池中的SMTP连接发送已构建的邮件"""
+
+    with get_smtp_pool().connection() as smtp_client:
+        smtp_client.sendmail(sender_email, recipient_email, message)
+
+
+def send_email_verification_code(recipient_email: str, verification_code: str):
+    """向指定邮箱同步发送登录验证码"""
+
+    _validate_verification_email(recipient_email, verification_code)
+    _send_prepared_email(
+        *_prepare_verification_email(recipient_email, verification_code)
+    )
+
+
+def enqueue_email_verification_code(
+    recipient_email: str,
+    verification_code: str,
+    on_failure: Callable[[Exception], None] = None,
+) -> bool:
+    """提交登录验证码邮件至后台发送队列，不等待SMTP交互完成
+
+    配置或参数不正确时直接抛出ValueError，发送队列已满时返回False；
+    后台发送遇到临时性错误时按指数退避重试，最终发送失败时调用on_failure
+    """
+
+    _validate_verification_email(recipient_email, verification_code)
+
+    return get_mail_delivery_queue().submit(
+        MailJob(
+            send=partial(
+                _send_prepared_email,
+                *_prepare_verification_email(recipient_email, verification_code),
+            ),
+            on_failure=on_failure,
+            description="email verification code",
         )
-    finally:
-        if smtp_client:
-            try:
-                smtp_client.quit()
-            except Exception:
-                try:
-                    smtp_client.close()
-                except Exception:
-                    pass
+    )
@@ -2,6 +2,7 @@ import base64
 import hashlib
 import hmac
 import time
+from functools import lru_cache
 
 from cryptography.fernet import Fernet
 
@@ -39,6 +40,29 @@ def validate_otp_config():
         raise ValueError("OTP密钥长度不能小于32")
 
 
+# 最近一次校验通过的OTP配置参数
+_validated_otp_config = None
+
+
+def ensure_otp_config():
+    """确保OTP动态口令相关配置已校验通过，配置参数未变化时不再重复校验"""
+
+    global _validated_otp_config
+
+    otp_config = (
+        OtpConfig.otp_digits,
+        OtpConfig.otp_interval_seconds,
+        OtpConfig.otp_valid_window,
+        OtpConfig.max_failed_attempts,
+        OtpConfig.lockout_seconds,
+        OtpConfig.secret_length,
+    )
+    if otp_config != _validated_otp_config:
+        validate_otp_config()
+        _validated_otp_config = otp_config
+
+
+@lru_cache(maxsize=None)
 def _load_pyotp():
     """按需加载pyotp依赖"""
 
@@ -50,14 +74,19 @@ def _load_pyotp():
         raise RuntimeError("未安装pyotp依赖，请先执行pip install pyotp") from exc
 
 
+@lru_cache(maxsize=8)
+def _build_secret_crypto(key_material: str):
+    """基于加密材料派生密钥并构造Fernet实例，相同加密材料复用同一实例"""
+
+    key = base64.urlsafe_b64encode(hashlib.sha256(key_material.encode("utf-8")).digest())
+    return Fernet(key)
+
+
 def _get_secret_crypto():
-    """构造用于OTP密钥加解密的Fernet实例"""
+    """获取用于OTP密钥加解密的Fernet实例"""
 
     key_material = OtpConfig.secret_crypto_key or BaseConfig.app_secret_key
-    key = base64.urlsafe_b64encode(
-        hashlib.sha256(str(key_material).encode("utf-8")).digest()
-    )
-    return Fernet(key)
+    return _build_secret_crypto(str(key_material))
 
 
 def encrypt_otp_secret(secret: str) -> str:
@@ -83,7 +112,7 @@ def decrypt_otp_secret(secret_ciphertext: str) -> str:
 def generate_otp_secret() -> str:
     """生成Base32格式OTP共享密钥"""
 
-    validate_otp_config()
+    ensure_otp_config()
     pyotp = _load_pyotp()
     return pyotp.random_base32(length=OtpConfig.secret_length)
 
@@ -91,7 +120,7 @@ def generate_otp_secret() -> str:
 def get_totp(secret: str):
     """基于配置构造TOTP实例"""
 
-    validate_otp_config()
+    ensure_otp_config()
     pyotp = _load_pyotp()
     return pyotp.TOTP(
         secret,
@@ -103,7 +132,7 @@ def get_totp(secret: str):
 def get_current_timecode() -> int:
     """获取当前TOTP时间窗口编号"""
 
-    validate_otp_config()
+    ensure_otp_config()
     return int(time.time()) // OtpConfig.otp_interval_seconds
 
 
@@ -123,7 +152,16 @@ def verify_otp_code(secret: str, otp_code: str):
     if len(otp_code) != OtpConfig.otp_digits or not otp_code.isdigit():
         return False, None
 
-    totp = get_totp(secret)
+    return verify_totp_code(get_totp(secret), otp_code)
+
+
+def verify_totp_code(totp, otp_code: str):
+    """使用已构造的TOTP实例校验6位数字动态口令，返回(是否有效, 命中的时间窗口)"""
+
+    otp_code = str(otp_code or "").strip()
+    if len(otp_code) != OtpConfig.otp_digits or not otp_code.isdigit():
+        return False, None
+
     current_timecode = get_current_timecode()
 
     for offset in range(-OtpConfig.otp_valid_window, OtpConfig.otp_valid_window + 1):
@@ -7,6 +7,7 @@ from feffery_dash_utils.style_utils import style
 
 from configs import BaseConfig, RouterConfig, LayoutConfig, AuthConfig
 from models.user_permission_groups import UserPermissionGroups
+from models.access_policy import PathnameAccessPolicy
 from views.core_pages import independent_page_demo, independent_wildcard_page_demo
 from components import (
     core_side_menu,
@@ -22,7 +23,7 @@ from components import (
 import callbacks.core_pages_c  # noqa: F401
 
 
-def get_page_search_options(current_user_access_rule: str):
+def get_page_search_options(current_user_access_policy: PathnameAccessPolicy):
     """当前模块内工具函数，生成页面搜索选项"""
 
     options = [{"label": "首页", "value": "/"}]
@@ -39,7 +40,7 @@ def get_page_search_options(current_user_access_rule: str):
         elif (
             # 公开页面全部放行
             pathname in RouterConfig.public_pathnames
-            or current_user_access_rule["type"] == "all"
+            or current_user_access_policy.allows(pathname)
         ):
             options.append(
                 {
@@ -48,32 +49,16 @@ def get_page_search_options(current_user_access_rule: str):
                 }
             )
 
-        elif current_user_access_rule["type"] == "include":
-            if pathname in current_user_access_rule.get("keys", []):
-                options.append(
-                    {
-                        "label": title,
-                        "value": f"{pathname}|{title}",
-                    }
-                )
-
-        elif current_user_access_rule["type"] == "exclude":
-            if pathname not in current_user_access_rule.get("keys", []):
-                options.append(
-                    {
-                        "label": title,
-                        "value": f"{pathname}|{title}",
-                    }
-                )
-
     return options
 
 
-def render(current_user_access_rule: str, current_pathname: str = None):
+def render(
+    current_user_access_policy: PathnameAccessPolicy, current_pathname: str = None
+):
     """渲染核心页面骨架
 
     Args:
-        current_user_access_rule (str): 当前用户页面可访问性规则
+        current_user_access_policy (PathnameAccessPolicy): 当前用户预编译的页面访问策略
         current_pathname (str, optional): 当前页面pathname. Defaults to None.
     """
 
@@ -213,7 +198,7 @@ def render(current_user_access_rule: str, current_pathname: str = None):
                                             id="core-page-search",
                                             placeholder="输入关键词搜索页面",
                                             options=get_page_search_options(
-                                                current_user_access_rule
+                                                current_user_access_policy
                                             ),
                                             variant="filled",
                                             style=style(width=250),
@@ -426,7 +411,7 @@ def render(current_user_access_rule: str, current_pathname: str = None):
                     # 侧边栏
                     fac.AntdCol(
                         core_side_menu.render(
-                            current_user_access_rule=current_user_access_rule
+                            current_user_access_policy=current_user_access_policy
                         ),
                         flex="none",
                     ),
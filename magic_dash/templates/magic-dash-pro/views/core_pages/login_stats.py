@@ -0,0 +1,124 @@
+from dash import dcc
+from datetime import date, timedelta
+import feffery_antd_components as fac
+import feffery_utils_components as fuc
+from feffery_dash_utils.style_utils import style
+
+# 令对应当前页面的回调函数子模块生效
+import callbacks.core_pages_c.login_stats_c  # noqa: F401
+
+
+def render_chart_card(title: str, graph_id: str):
+    """当前模块内工具函数，渲染统计图表卡片"""
+
+    return fac.AntdCard(
+        dcc.Graph(
+            id=graph_id,
+            config={"displayModeBar": False},
+            style=style(height=320),
+        ),
+        title=title,
+        size="small",
+    )
+
+
+def render():
+    """子页面：系统管理-日志管理-登录统计"""
+
+    today = date.today()
+
+    return [
+        # 稳定触发初始化数据加载
+        fuc.FefferyTimeout(id="core-login-stats-init-data-trigger", delay=0),
+        fac.AntdSpace(
+            [
+                fac.AntdBreadcrumb(
+                    items=[
+                        {"title": "系统管理"},
+                        {"title": "日志管理"},
+                        {"title": "登录统计"},
+                    ]
+                ),
+                fac.AntdSpace(
+                    [
+                        # 统计数据均读取自按小时预聚合的登录统计表，默认展示最近7天
+                        fac.AntdDateRangePicker(
+                            id="core-login-stats-date-range",
+                            placeholder=["统计开始日期", "统计结束日期"],
+                            value=[
+                                (today - timedelta(days=6)).strftime("%Y-%m-%d"),
+                                today.strftime("%Y-%m-%d"),
+                            ],
+                            allowClear=False,
+                        ),
+                        fac.AntdRadioGroup(
+                            id="core-login-stats-granularity",
+                            options=[
+                                {"label": "按小时", "value": "hour"},
+                                {"label": "按天", "value": "day"},
+                            ],
+                            value="day",
+                            optionType="button",
+                        ),
+                        fac.AntdButton(
+                            "刷新",
+                            id="core-login-stats-refresh-data",
+                            color="primary",
+                            variant="filled",
+                        ),
+                    ],
+                    size=3,
+                ),
+                fac.AntdSpin(
+                    fac.AntdSpace(
+                        [
+                            fac.AntdRow(
+                                [
+                                    fac.AntdCol(
+                                        fac.AntdCard(
+                                            fac.AntdStatistic(
+                                                id=f"core-login-stats-{key}-statistic",
+                                                title=title,
+                                                value=0,
+                                            ),
+                                            size="small",
+                                        ),
+                                        span=6,
+                                    )
+                                    for key, title in [
+                                        ("total", "登录总次数"),
+                                        ("success", "登录成功次数"),
+                                        ("failure", "登录失败次数"),
+                                        ("success-rate", "登录成功率（%）"),
+                                    ]
+                                ],
+                                gutter=12,
+                            ),
+                            render_chart_card(
+                                "登录成功/失败趋势", "core-login-stats-trend-chart"
+                            ),
+                            fac.AntdRow(
+                                [
+                                    fac.AntdCol(
+                                        render_chart_card(title, graph_id),
+                                        span=8,
+                                    )
+                                    for title, graph_id in [
+                                        ("登录状态分布", "core-login-stats-status-chart"),
+                                        ("浏览器分布", "core-login-stats-browser-chart"),
+                                        ("操作系统分布", "core-login-stats-os-chart"),
+                                    ]
+                                ],
+                                gutter=12,
+                            ),
+                        ],
+                        direction="vertical",
+                        style=style(width="100%"),
+                    ),
+                    delay=300,
+                ),
+            ],
+            direction="vertical",
+            style=style(width="100%"),
+        ),
+    ]
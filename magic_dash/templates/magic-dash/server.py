@@ -1,9 +1,9 @@
 import dash
 from flask import request
-from user_agents import parse
 
 # 应用基础参数
 from configs import BaseConfig
+from utils.browser_utils import check_user_agent
 
 app = dash.Dash(
     __name__,
@@ -20,40 +20,5 @@ server = app.server
 def check_browser():
     """检查浏览器版本是否符合最低要求"""
 
-    # 提取当前请求对应的浏览器信息
-    user_agent = parse(str(request.user_agent))
-
-    # 若浏览器版本信息有效
-    if user_agent.browser.version != ():
-        # IE相关浏览器直接拦截
-        if user_agent.browser.family == "IE":
-            return (
-                "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                "请不要使用IE浏览器，或开启了IE内核兼容模式的其他浏览器访问本应用</div>"
-            )
-        # 基于BaseConfig.min_browser_versions配置，对相关浏览器最低版本进行检查
-        for rule in BaseConfig.min_browser_versions:
-            # 若当前请求对应的浏览器版本，低于声明的最低支持版本
-            if (
-                user_agent.browser.family == rule["browser"]
-                and user_agent.browser.version[0] < rule["version"]
-            ):
-                return (
-                    "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                    "您的{}浏览器版本低于本应用最低支持版本（{}），请升级浏览器后再访问</div>"
-                ).format(rule["browser"], rule["version"])
-
-        # 若开启了严格的浏览器类型限制
-        if BaseConfig.strict_browser_type_check:
-            # 若当前浏览器不在声明的浏览器范围内
-            if user_agent.browser.family not in [
-                rule["browser"] for rule in BaseConfig.min_browser_versions
-            ]:
-                return (
-                    "<div style='font-size: 16px; color: red; position: fixed; top: 40%; left: 50%; transform: translateX(-50%);'>"
-                    "当前浏览器类型不在支持的范围内，支持的浏览器类型有：{}</div>"
-                ).format(
-                    "、".join(
-                        [rule["browser"] for rule in BaseConfig.min_browser_versions]
-                    )
-                )
+    # 基于缓存的User-Agent检查结论，不符合要求时直接返回拦截提示
+    return check_user_agent(str(request.user_agent)).block_message
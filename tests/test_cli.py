@@ -195,7 +195,9 @@ def assert_backend_created(project_path, template_name, backend, orm_engine="pee
             email_feature_files = [
                 os.path.join("configs", "email_config.py"),
                 os.path.join("models", "email_verifications.py"),
+                os.path.join("models", "verification_code_store.py"),
                 os.path.join("utils", "email_utils.py"),
+                os.path.join("utils", "mail_delivery.py"),
             ]
             for relative_path in email_feature_files:
                 target_path = os.path.join(project_path, relative_path)
@@ -0,0 +1,140 @@
+import importlib
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture
+def access_policy(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    yield importlib.import_module("models.access_policy")
+
+    clear_template_modules()
+
+
+def test_pathname_matcher_combines_literals_and_wildcards(access_policy):
+    matcher = access_policy.PathnameMatcher(
+        [
+            "/core/page1",
+            re.compile(r"^/core/a/(.*?)$"),
+            re.compile(r"^/core/b/\d+$"),
+            re.compile(r"^/core/c/.*$", re.IGNORECASE),
+        ]
+    )
+
+    assert matcher.literal_pathnames == frozenset({"/core/page1"})
+    # 相同flags的通配正则合并为一个，不同flags的单独保留
+    assert len(matcher.wildcard_patterns) == 2
+
+    assert matcher.match("/core/page1")
+    assert matcher.match("/core/a/anything")
+    assert matcher.match("/core/b/42")
+    assert matcher.match("/CORE/C/x")
+    assert not matcher.match("/core/b/x")
+    assert not matcher.match("/core/page2")
+
+
+def test_pathname_access_policy_keeps_rule_semantics(access_policy):
+    index_pathname = access_policy.RouterConfig.index_pathname
+    include_policy = access_policy.PathnameAccessPolicy(
+        {"type": "include", "keys": ["/core/page1", re.compile(r"^/core/a/.*$")]}
+    )
+    exclude_policy = access_policy.PathnameAccessPolicy(
+        {"type": "exclude", "keys": ["/core/login-logs"]}
+    )
+    all_policy = access_policy.PathnameAccessPolicy({"type": "all"})
+
+    assert include_policy.allows("/core/page1")
+    assert include_policy.allows("/core/a/demo")
+    assert include_policy.allows("/")
+    assert include_policy.allows(index_pathname)
+    assert not include_policy.allows("/core/login-logs")
+
+    assert exclude_policy.allows("/core/page1")
+    assert not exclude_policy.allows("/core/login-logs")
+
+    assert all_policy.allows("/core/login-logs")
+
+
+@pytest.mark.parametrize("orm_engine", ["peewee", "sqlalchemy"])
+def test_pathname_access_policy_is_rebuilt_after_permission_group_writes(
+    tmp_path,
+    monkeypatch,
+    orm_engine,
+):
+    pytest.importorskip(orm_engine)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{orm_engine}"
+    models = importlib.import_module(engine_package)
+    UserPermissionGroups = importlib.import_module(
+        f"{engine_package}.user_permission_groups"
+    ).UserPermissionGroups
+    access_policy_cache = importlib.import_module("models.caches").access_policy_cache
+    access_policy_cache.clear()
+
+    if orm_engine == "peewee":
+        models.db.create_tables([UserPermissionGroups])
+    else:
+        models.create_tables([UserPermissionGroups])
+
+    try:
+        assert UserPermissionGroups.get_pathname_access_policy("auditor") is None
+
+        UserPermissionGroups.add_permission_group(
+            "auditor",
+            "审计员",
+            access_rule_type="include",
+            access_rule_keys=["/core/page1"],
+        )
+        policy = UserPermissionGroups.get_pathname_access_policy("auditor")
+        assert policy.allows("/core/page1")
+        assert not policy.allows("/core/login-logs")
+        # 未发生变更时复用同一个预编译策略
+        assert UserPermissionGroups.get_pathname_access_policy("auditor") is policy
+
+        UserPermissionGroups.update_permission_group(
+            "auditor",
+            access_rule_keys=["/core/login-logs"],
+        )
+        policy = UserPermissionGroups.get_pathname_access_policy("auditor")
+        assert policy.allows("/core/login-logs")
+        assert not policy.allows("/core/page1")
+
+        UserPermissionGroups.upsert_permission_group(
+            "auditor",
+            "审计员",
+            access_rule_type="all",
+        )
+        assert UserPermissionGroups.get_pathname_access_policy("auditor").allows(
+            "/core/page1"
+        )
+
+        UserPermissionGroups.delete_permission_group("auditor")
+        assert UserPermissionGroups.get_pathname_access_policy("auditor") is None
+    finally:
+        access_policy_cache.clear()
+        if orm_engine == "peewee" and not models.db.is_closed():
+            models.db.close()
+        clear_template_modules()
@@ -0,0 +1,110 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def auth_service(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    # 使外层models/*.py稳定导出当前参数对应的ORM实现
+    registry = importlib.import_module("models._registry")
+    monkeypatch.setattr(registry, "get_engine_package", lambda: f"._{request.param}")
+
+    models = importlib.import_module(f"models._{request.param}")
+    users = importlib.import_module(f"models._{request.param}.users")
+    models.create_tables([users.Users])
+    users.Users.add_user(
+        "u1",
+        "alice",
+        generate_password_hash("secret"),
+        user_email="alice@example.com",
+    )
+
+    yield importlib.import_module("models.auth_service"), users.Users
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def test_authenticate_password(auth_service):
+    service, _ = auth_service
+
+    assert service.authenticate_password("nobody", "secret") == (None, "用户不存在")
+
+    login_user, status = service.authenticate_password("alice", "wrong")
+    assert status == "密码错误"
+    assert login_user.user_id == "u1"
+
+    login_user, status = service.authenticate_password("alice", "secret")
+    assert status == "登录成功"
+    assert login_user._replace(password_hash=None) == service.LoginUser(
+        "u1", "alice", "normal", None
+    )
+    assert service.get_login_user(user_email=" alice@example.com ") == login_user
+    assert service.get_login_user(user_email="") is None
+
+
+def test_start_user_session_rotates_token_conditionally(auth_service):
+    service, Users = auth_service
+
+    login_user = service.get_login_user(user_name="alice")
+    assert Users.get_cached_user("u1").session_token is None
+
+    session_token = service.start_user_session(login_user)
+    assert session_token
+    # 会话token轮换后登录态缓存随之失效
+    assert Users.get_cached_user("u1").session_token == session_token
+
+    # 密码在身份校验之后被修改时不再建立会话
+    Users.update_user("u1", password_hash=generate_password_hash("changed"))
+    assert service.start_user_session(login_user) is None
+    assert Users.get_cached_user("u1").session_token == session_token
+
+    Users.delete_user("u1")
+    assert service.start_user_session(service.LoginUser("u1", "a", "b", "c")) is None
+
+
+def test_record_login_enqueues_log(auth_service, monkeypatch):
+    service, _ = auth_service
+    enqueued_logs = []
+    monkeypatch.setattr(
+        service.LoginLogs, "enqueue_log", lambda **kwargs: enqueued_logs.append(kwargs)
+    )
+
+    service.record_login(
+        service.LoginClient("127.0.0.1", "Chrome 120", "Mac OS X 10.15"),
+        "登录成功",
+        "alice",
+        "u1",
+    )
+
+    assert len(enqueued_logs) == 1
+    assert enqueued_logs[0]["ip"] == "127.0.0.1"
+    assert enqueued_logs[0]["status"] == "登录成功"
+    assert enqueued_logs[0]["user_id"] == "u1"
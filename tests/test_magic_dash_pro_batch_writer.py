@@ -0,0 +1,151 @@
+import importlib
+import importlib.util
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def load_batch_writer():
+    spec = importlib.util.spec_from_file_location(
+        "magic_dash_pro_batch_writer", TEMPLATE_ROOT / "models" / "batch_writer.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+def test_batched_writer_merges_items_into_batches_and_flushes_on_close():
+    batches = []
+    writer = load_batch_writer().BatchedWriter(
+        batches.append,
+        batch_size=50,
+        flush_interval_seconds=0.5,
+        max_queue_size=1000,
+    )
+
+    for index in range(120):
+        assert writer.submit(index)
+    writer.flush()
+    # 数据写入在后台线程中完成
+    assert writer._thread is not threading.current_thread()
+    assert [item for batch in batches for item in batch] == list(range(120))
+    assert max(len(batch) for batch in batches) == 50
+    assert len(batches) < 120
+
+    # 关闭时写完剩余数据
+    writer.submit("last")
+    writer.close()
+    assert batches[-1] == ["last"]
+    assert writer._thread is None
+
+
+def test_batched_writer_drops_and_counts_items_when_queue_is_full():
+    release = threading.Event()
+    batches = []
+
+    def blocking_write(batch):
+        release.wait()
+        batches.append(batch)
+
+    writer = load_batch_writer().BatchedWriter(
+        blocking_write,
+        batch_size=1,
+        flush_interval_seconds=0,
+        max_queue_size=2,
+    )
+
+    results = [writer.submit(index) for index in range(10)]
+    release.set()
+    writer.close()
+
+    assert results.count(False) == writer.dropped_count
+    assert writer.dropped_count >= 7
+    assert sum(len(batch) for batch in batches) == results.count(True)
+
+
+def test_batched_writer_keeps_running_after_write_failure():
+    batches = []
+
+    def flaky_write(batch):
+        if batch == ["bad"]:
+            raise RuntimeError("write failed")
+        batches.append(batch)
+
+    writer = load_batch_writer().BatchedWriter(
+        flaky_write,
+        batch_size=1,
+        flush_interval_seconds=0,
+        max_queue_size=10,
+    )
+    writer.submit("bad")
+    writer.submit("good")
+    writer.close()
+
+    assert writer.failed_count == 1
+    assert batches == [["good"]]
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_logs(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    logs = importlib.import_module(f"{engine_package}.logs")
+    models.create_tables([logs.LoginLogs])
+
+    yield logs
+
+    logs.login_logs_writer.close()
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+@pytest.mark.parametrize("synchronous", [False, True])
+def test_enqueue_log_writes_login_logs_in_batches(
+    template_logs, monkeypatch, synchronous
+):
+    LoginLogs = template_logs.LoginLogs
+    monkeypatch.setattr(template_logs.login_logs_writer, "synchronous", synchronous)
+
+    for index in range(250):
+        LoginLogs.enqueue_log(
+            user_name=f"user-{index}",
+            user_id=f"user-{index}",
+            ip="127.0.0.1",
+            browser="Chrome",
+            os="Windows",
+            status="登录成功",
+            login_datetime="2024-01-01 08:30:00",
+        )
+    template_logs.login_logs_writer.flush()
+
+    assert LoginLogs.get_count(exact=True) == 250
+    assert LoginLogs.get_count() == 250
+    latest_log = LoginLogs.get_logs(limit=1)[0]
+    assert latest_log["user_name"] == "user-249"
+    assert str(latest_log["login_datetime"]) == "2024-01-01 08:30:00"
@@ -0,0 +1,75 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATES_ROOT = Path(__file__).resolve().parents[1] / "magic_dash" / "templates"
+
+CHROME_120 = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+CHROME_80 = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/80.0.3987.149 Safari/537.36"
+)
+IE_11 = "Mozilla/5.0 (Windows NT 10.0; Trident/7.0; rv:11.0) like Gecko"
+
+
+def clear_configs_modules():
+    for module_name in list(sys.modules):
+        if module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["magic-dash", "magic-dash-pro", "magic-dash-pro-fastapi"])
+def browser_utils(request, monkeypatch):
+    pytest.importorskip("user_agents")
+    template_root = TEMPLATES_ROOT / request.param
+    clear_configs_modules()
+    monkeypatch.syspath_prepend(str(template_root))
+
+    spec = importlib.util.spec_from_file_location(
+        "magic_dash_browser_utils", template_root / "utils" / "browser_utils.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    yield module
+
+    clear_configs_modules()
+
+
+def test_check_user_agent_returns_block_message_for_unsupported_browsers(
+    browser_utils,
+):
+    assert browser_utils.check_user_agent(CHROME_120).block_message is None
+    assert "Chrome" in browser_utils.check_user_agent(CHROME_80).block_message
+    assert "IE" in browser_utils.check_user_agent(IE_11).block_message
+    # 无法识别版本信息的User-Agent不做限制
+    assert browser_utils.check_user_agent("").block_message is None
+
+    user_agent = browser_utils.check_user_agent(CHROME_120).user_agent
+    assert user_agent.browser.family == "Chrome"
+    assert user_agent.browser.version[0] == 120
+
+
+def test_check_user_agent_parses_each_user_agent_once(browser_utils, monkeypatch):
+    parse_calls = []
+    parse = browser_utils.parse
+
+    def counting_parse(user_agent_string):
+        parse_calls.append(user_agent_string)
+        return parse(user_agent_string)
+
+    monkeypatch.setattr(browser_utils, "parse", counting_parse)
+    browser_utils.check_user_agent.cache_clear()
+
+    first_result = browser_utils.check_user_agent(CHROME_120)
+    for _ in range(100):
+        assert browser_utils.check_user_agent(CHROME_120) is first_result
+    browser_utils.check_user_agent(CHROME_80)
+
+    assert parse_calls == [CHROME_120, CHROME_80]
@@ -0,0 +1,174 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import delete
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    logs = importlib.import_module(f"{engine_package}.logs")
+    users = importlib.import_module(f"{engine_package}.users")
+    departments = importlib.import_module(f"{engine_package}.departments")
+    models.create_tables([users.Users, departments.Departments])
+
+    yield models, logs.LoginLogs, users.Users, departments.Departments
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def add_login_logs(LoginLogs, count):
+    LoginLogs.add_logs(
+        [
+            {
+                "user_name": "admin",
+                "user_id": "admin",
+                "ip": "127.0.0.1",
+                "browser": "Chrome",
+                "os": "Windows",
+                "status": "登录成功",
+                "login_datetime": f"2024-01-01 08:{index % 60:02d}:00",
+            }
+            for index in range(count)
+        ]
+    )
+
+    return [record["id"] for record in LoginLogs.iter_logs(order="ascend")]
+
+
+@pytest.mark.parametrize("temp_table_threshold", [None, 500])
+def test_delete_logs_in_chunks_or_temp_table(
+    template_models, monkeypatch, temp_table_threshold
+):
+    models, LoginLogs, _, _ = template_models
+    if temp_table_threshold:
+        monkeypatch.setattr(
+            models, "get_bulk_temp_table_threshold", lambda _: temp_table_threshold
+        )
+    log_ids = add_login_logs(LoginLogs, 2500)
+
+    # 删除键数量超过SQLite单条语句参数上限，重复键只计一次
+    LoginLogs.delete_logs(log_ids[:2000] + log_ids[:10])
+
+    assert LoginLogs.get_count(exact=True) == 500
+    assert [record["id"] for record in LoginLogs.iter_logs(order="ascend")] == (
+        log_ids[2000:]
+    )
+    assert LoginLogs.purge_logs(before="2024-01-02", batch_size=1000) == 500
+    assert LoginLogs.get_count(exact=True) == 0
+
+
+def test_bulk_in_rolls_back_executed_chunks(template_models):
+    models, LoginLogs, _, _ = template_models
+    log_ids = add_login_logs(LoginLogs, 2000)
+    conditions = []
+
+    def build_query(condition):
+        conditions.append(condition)
+        if len(conditions) > 1:
+            raise RuntimeError("批量删除失败")
+        if hasattr(models, "session_scope"):
+            return delete(LoginLogs).where(condition)
+        return LoginLogs.delete().where(condition)
+
+    with pytest.raises(RuntimeError):
+        if hasattr(models, "session_scope"):
+            with models.session_scope() as session:
+                models.execute_bulk_in(session, LoginLogs.id, log_ids, build_query)
+        else:
+            models.execute_bulk_in(LoginLogs.id, log_ids, build_query)
+
+    # 首个分块已执行删除，随后续分块失败与事务一并回滚
+    assert len(conditions) == 2
+    assert len(list(LoginLogs.iter_logs())) == 2000
+
+
+def test_department_members_and_subtree_use_bulk_in(template_models):
+    models, _, Users, Departments = template_models
+
+    Departments.add_department("root", "总部")
+    Departments.add_department("child", "研发部", parent_department_id="root")
+    Departments.add_department("grandchild", "前端组", parent_department_id="child")
+    Departments.add_department("other", "市场部")
+    for index in range(4):
+        Users.add_user(
+            f"user{index}",
+            f"用户{index}",
+            "hash",
+            department_id="child" if index < 3 else "other",
+        )
+
+    Users.alter_department_members(
+        "child",
+        origin_user_ids=["user0", "user1", "user2"],
+        target_user_ids=["user1", "user3"],
+    )
+    assert [Users.get_user(f"user{index}").department_id for index in range(4)] == [
+        None,
+        "child",
+        None,
+        "child",
+    ]
+
+    Departments.delete_department("root")
+    assert [
+        department["department_id"] for department in Departments.get_all_departments()
+    ] == ["other"]
+
+
+def test_bulk_key_helpers(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    bulk_operations = importlib.import_module("models.bulk_operations")
+
+    assert bulk_operations.dedupe_keys([3, 1, 3, 2, 1]) == [3, 1, 2]
+    assert list(bulk_operations.iter_key_chunks([1, 2, 3, 4, 5], 2)) == [
+        [1, 2],
+        [3, 4],
+        [5],
+    ]
+    assert bulk_operations.get_bulk_in_chunk_size("sqlite") == 900
+    assert bulk_operations.get_bulk_in_chunk_size("unknown") == 900
+    assert bulk_operations.get_bulk_temp_table_threshold("sqlite") is None
+    assert bulk_operations.get_bulk_temp_table_threshold("mysql") == 20000
+
+    table_name, create_sql, drop_sql = bulk_operations.get_temp_key_table_statements(
+        "mysql", ["a"]
+    )
+    assert table_name.startswith("bulk_keys_")
+    assert "VARCHAR(255) PRIMARY KEY" in create_sql
+    assert drop_sql == f"DROP TEMPORARY TABLE {table_name}"
+    _, create_sql, drop_sql = bulk_operations.get_temp_key_table_statements(
+        "postgresql", [1]
+    )
+    assert "BIGINT PRIMARY KEY" in create_sql
+    assert drop_sql.startswith("DROP TABLE ")
+    clear_template_modules()
@@ -0,0 +1,133 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    users = importlib.import_module(f"{engine_package}.users")
+    departments = importlib.import_module(f"{engine_package}.departments")
+    models.create_tables([users.Users, departments.Departments])
+
+    # 部门层级：总部 -> 研发部 -> 前端组、后端组；市场部为独立的根部门
+    for department_id, parent_department_id in [
+        ("root", None),
+        ("rd", "root"),
+        ("frontend", "rd"),
+        ("backend", "rd"),
+        ("market", None),
+    ]:
+        departments.Departments.add_department(
+            department_id, f"部门{department_id}", parent_department_id
+        )
+    for index, department_id in enumerate(["root", "frontend", "frontend", "market"]):
+        users.Users.add_user(
+            f"user{index}", f"用户{index}", "hash", department_id=department_id
+        )
+
+    yield departments, users.Users, departments.Departments
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+@pytest.mark.parametrize("recursive_cte", [True, False])
+def test_descendant_ids_with_or_without_recursive_cte(
+    template_models, monkeypatch, recursive_cte
+):
+    departments, _, Departments = template_models
+    monkeypatch.setattr(departments, "supports_recursive_cte", lambda: recursive_cte)
+
+    assert sorted(Departments.get_descendant_ids("rd")) == ["backend", "frontend", "rd"]
+    assert Departments.get_descendant_ids("market") == ["market"]
+
+    Departments.delete_department("rd")
+    assert [item["department_id"] for item in Departments.get_all_departments()] == [
+        "root",
+        "market",
+    ]
+
+
+def test_department_tree_snapshot_is_invalidated_on_writes(template_models):
+    _, Users, Departments = template_models
+
+    department_tree = Departments.get_department_tree()
+    assert Departments.get_department_tree() is department_tree
+    assert Departments.get_ancestor_ids("frontend") == ["rd", "root"]
+    assert Users.get_department_member_counts() == {
+        "root": 1,
+        "frontend": 2,
+        "market": 1,
+    }
+    assert Users.get_subtree_member_counts() == {
+        "root": 3,
+        "rd": 2,
+        "frontend": 2,
+        "backend": 0,
+        "market": 1,
+    }
+
+    # 新增、删除部门后，下一次读取重新构建部门层级索引
+    Departments.add_department("ops", "部门ops", "rd")
+    assert Departments.get_department_tree() is not department_tree
+    assert Departments.get_ancestor_ids("ops") == ["rd", "root"]
+
+    department_tree = Departments.get_department_tree()
+    Departments.delete_department("root")
+    assert Departments.get_department_tree() is not department_tree
+    assert [
+        item["department_id"] for item in Departments.get_department_tree().departments
+    ] == ["market"]
+    assert Users.get_subtree_member_counts() == {"market": 1}
+
+
+def test_department_tree_handles_cycles(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    department_tree = importlib.import_module("models.department_tree")
+
+    tree = department_tree.DepartmentTree(
+        [
+            {"department_id": "a", "parent_department_id": "c"},
+            {"department_id": "b", "parent_department_id": "a"},
+            {"department_id": "c", "parent_department_id": "b"},
+            {"department_id": "d", "parent_department_id": "missing"},
+        ]
+    )
+
+    assert len(tree) == 4
+    assert "missing" not in tree
+    assert tree.get_descendant_ids("a") == ["a", "b", "c"]
+    assert tree.get_descendant_ids("a", include_self=False) == ["b", "c"]
+    assert tree.get_ancestor_ids("a") == ["c", "b"]
+    assert tree.get_ancestor_ids("d") == []
+    assert tree.rollup_counts({"d": 2, "missing": 5}) == {"a": 0, "b": 0, "c": 0, "d": 2}
+    clear_template_modules()
@@ -0,0 +1,171 @@
+import importlib
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(
+    params=[
+        ("peewee", True),
+        ("peewee", False),
+        ("sqlalchemy", True),
+        ("sqlalchemy", False),
+    ],
+    ids=lambda param: f"{param[0]}-{'returning' if param[1] else 'fallback'}",
+)
+def verification_model(request, tmp_path, monkeypatch):
+    engine_name, returning = request.param
+    pytest.importorskip(engine_name)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    models = importlib.import_module(f"models._{engine_name}")
+    module = importlib.import_module(f"models._{engine_name}.email_verifications")
+    models.create_tables([module.EmailVerifications])
+    # 模拟不支持RETURNING语法的数据库
+    monkeypatch.setattr(module, "supports_returning", lambda: returning)
+
+    statements = []
+    if engine_name == "peewee":
+        execute_sql = models.db.execute_sql
+
+        def counted_execute_sql(sql, *args, **kwargs):
+            statements.append(sql)
+            return execute_sql(sql, *args, **kwargs)
+
+        monkeypatch.setattr(models.db, "execute_sql", counted_execute_sql)
+    else:
+        from sqlalchemy import event
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(models.engine, "before_cursor_execute", count_statement)
+
+    def count_statements(operation):
+        """统计执行单次操作发送至数据库的读写语句数量，不含事务控制语句"""
+
+        statements.clear()
+        result = operation()
+        return result, sum(
+            statement.lstrip().split(" ", 1)[0].upper()
+            in ("SELECT", "INSERT", "UPDATE", "DELETE")
+            for statement in statements
+        )
+
+    yield module.EmailVerifications, count_statements, returning
+
+    if engine_name == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        event.remove(models.engine, "before_cursor_execute", count_statement)
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def age_verification(model, email: str, seconds: int):
+    """将验证码记录的生成时间提前指定秒数"""
+
+    verification = model.get_verification(email)
+    model.rollback_issued_verification(
+        verification,
+        model(
+            email=email,
+            verification_code=verification.verification_code,
+            generated_at=verification.generated_at - timedelta(seconds=seconds),
+        ),
+    )
+
+
+def test_issue_verification_statement_counts(verification_model, monkeypatch):
+    model, count_statements, returning = verification_model
+    verification_codes = iter(["111111", "222222", "333333"])
+    monkeypatch.setattr(
+        model, "generate_code", staticmethod(lambda: next(verification_codes))
+    )
+    email = "user@example.com"
+
+    (verification, remaining_seconds, previous_verification), count = (
+        count_statements(lambda: model.issue_verification(email, 60))
+    )
+    assert verification.verification_code == "111111"
+    assert (remaining_seconds, previous_verification) == (0, None)
+    assert count == (1 if returning else 2)
+
+    (verification, remaining_seconds, previous_verification), count = (
+        count_statements(lambda: model.issue_verification(email, 60))
+    )
+    assert verification is None
+    assert 1 <= remaining_seconds <= 60
+    assert previous_verification is None
+    assert count == (1 if returning else 2)
+
+    age_verification(model, email, 61)
+    old_generated_at = model.get_verification(email).generated_at
+    (verification, remaining_seconds, previous_verification), count = (
+        count_statements(lambda: model.issue_verification(email, 60))
+    )
+    assert verification.verification_code == "333333"
+    assert remaining_seconds == 0
+    assert previous_verification.verification_code == "111111"
+    assert previous_verification.generated_at == old_generated_at
+    assert count == (2 if returning else 3)
+
+    # 返回的新记录与旧记录快照可直接用于邮件发送失败时的恢复
+    current = model.get_verification(email)
+    assert current.verification_code == verification.verification_code
+    assert current.generated_at == verification.generated_at
+    assert model.rollback_issued_verification(verification, previous_verification) == 1
+    restored = model.get_verification(email)
+    assert restored.verification_code == "111111"
+    assert restored.generated_at == old_generated_at
+
+
+def test_verify_code_statement_counts(verification_model, monkeypatch):
+    model, count_statements, returning = verification_model
+    monkeypatch.setattr(model, "generate_code", staticmethod(lambda: "123456"))
+    email = "user@example.com"
+    model.issue_verification(email, 60)
+
+    assert count_statements(lambda: model.verify_code(email, "000000", 300)) == (
+        "invalid",
+        2,
+    )
+    assert count_statements(lambda: model.verify_code(email, "123456", 300)) == (
+        "valid",
+        1 if returning else 2,
+    )
+    assert count_statements(lambda: model.verify_code(email, "123456", 300)) == (
+        "not_found",
+        2,
+    )
+
+    # 已过期的记录无论验证码是否正确均被消费
+    model.issue_verification(email, 60)
+    age_verification(model, email, 301)
+    assert count_statements(lambda: model.verify_code(email, "000000", 300)) == (
+        "expired",
+        1 if returning else 2,
+    )
+    assert model.get_verification(email) is None
+    assert model.verify_code(" ", "123456", 300) == "not_found"
+
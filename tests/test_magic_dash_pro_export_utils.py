@@ -0,0 +1,87 @@
+import csv
+import gzip
+import importlib.util
+import io
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+
+def load_export_utils():
+    module_path = (
+        Path(__file__).resolve().parents[1]
+        / "magic_dash"
+        / "templates"
+        / "magic-dash-pro"
+        / "utils"
+        / "export_utils.py"
+    )
+    spec = importlib.util.spec_from_file_location(
+        "magic_dash_pro_export_utils", module_path
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def iter_rows(count):
+    for index in range(count):
+        yield {
+            "id": index,
+            "user_name": f"用户{index}",
+            "login_datetime": datetime(2024, 1, 1, 8, 30),
+        }
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_write_csv_to_spooled_file_streams_rows_to_disk(compress):
+    export_utils = load_export_utils()
+
+    export_file = export_utils.write_csv_to_spooled_file(
+        iter_rows(2000),
+        ["id", "user_name", "login_datetime"],
+        compress=compress,
+        max_size=1024,
+    )
+
+    # 超过内存缓冲上限后转存为磁盘临时文件
+    assert export_file._rolled
+    content = export_file.read()
+    export_file.close()
+    if compress:
+        content = gzip.decompress(content)
+
+    rows = list(csv.DictReader(io.StringIO(content.decode("utf-8"))))
+    assert len(rows) == 2000
+    assert rows[1] == {
+        "id": "1",
+        "user_name": "用户1",
+        "login_datetime": "2024-01-01 08:30:00",
+    }
+
+
+def test_login_logs_export_url_round_trips_query_condition():
+    export_utils = load_export_utils()
+    query_condition = {
+        "order_by": "login_datetime",
+        "order": "ascend",
+        "user_name_keyword": "管理员",
+        "ip_prefix": "192.168.",
+        "status": "登录成功",
+        "login_datetime_range": ["2024-01-01", "2024-01-31"],
+    }
+
+    export_url = urlsplit(
+        export_utils.build_login_logs_export_url(query_condition, compress=True)
+    )
+    args = dict(parse_qsl(export_url.query))
+
+    assert export_url.path == export_utils.LOGIN_LOGS_EXPORT_PATHNAME
+    assert args["compress"] == "1"
+    assert export_utils.parse_login_logs_query_condition(args) == query_condition
+    # 非法排序字段不会透传到模型查询
+    assert export_utils.parse_login_logs_query_condition(
+        {"order_by": "__class__", "order": "random", "start_date": "2024/01/01"}
+    ) == {}
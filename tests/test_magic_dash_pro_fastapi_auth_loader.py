@@ -0,0 +1,67 @@
+import asyncio
+import importlib.util
+import threading
+import time
+from pathlib import Path
+
+
+def load_async_utils():
+    module_path = (
+        Path(__file__).resolve().parents[1]
+        / "magic_dash"
+        / "templates"
+        / "magic-dash-pro-fastapi"
+        / "utils"
+        / "async_utils.py"
+    )
+    spec = importlib.util.spec_from_file_location(
+        "magic_dash_pro_fastapi_async_utils", module_path
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_single_flight_executor_shares_concurrent_calls_with_same_key():
+    executor = load_async_utils().SingleFlightExecutor(max_workers=2)
+    calls = []
+    loop_thread_ids = []
+
+    def slow_lookup(user_id):
+        calls.append((user_id, threading.get_ident()))
+        time.sleep(0.05)
+        return f"user:{user_id}"
+
+    async def main():
+        loop_thread_ids.append(threading.get_ident())
+        results = await asyncio.gather(
+            *[executor.run(("user", "a"), slow_lookup, "a") for _ in range(10)],
+            executor.run(("user", "b"), slow_lookup, "b"),
+        )
+        # 上一次调用结束后，相同key的新调用重新执行
+        results.append(await executor.run(("user", "a"), slow_lookup, "a"))
+        return results
+
+    results = asyncio.run(main())
+
+    assert results == ["user:a"] * 10 + ["user:b", "user:a"]
+    assert sorted(user_id for user_id, _ in calls) == ["a", "a", "b"]
+    # 阻塞调用不在事件循环线程中执行
+    assert all(thread_id != loop_thread_ids[0] for _, thread_id in calls)
+
+
+def test_single_flight_executor_keeps_shared_call_when_one_waiter_is_cancelled():
+    executor = load_async_utils().SingleFlightExecutor(max_workers=1)
+
+    def slow_lookup():
+        time.sleep(0.05)
+        return "done"
+
+    async def main():
+        cancelled_waiter = asyncio.ensure_future(executor.run("key", slow_lookup))
+        other_waiter = asyncio.ensure_future(executor.run("key", slow_lookup))
+        await asyncio.sleep(0)
+        cancelled_waiter.cancel()
+        return await other_waiter
+
+    assert asyncio.run(main()) == "done"
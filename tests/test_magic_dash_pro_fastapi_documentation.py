@@ -132,11 +132,14 @@ def get_authenticated_client(template_server, monkeypatch, user_role):
         user_role=user_role,
         session_token="test-session-token",
     )
-    monkeypatch.setattr(
-        template_server.Users,
-        "get_user",
-        staticmethod(lambda match_user_id: user if match_user_id == user_id else None),
-    )
+    for method_name in ["get_user", "get_cached_user"]:
+        monkeypatch.setattr(
+            template_server.Users,
+            method_name,
+            staticmethod(
+                lambda match_user_id: user if match_user_id == user_id else None
+            ),
+        )
 
     access_token = template_server.manager.create_access_token(
         data={"sub": user_id},
@@ -274,7 +277,7 @@ def test_admin_only_documentation_uses_current_database_role(
 
     monkeypatch.setattr(
         template_server.Users,
-        "get_user",
+        "get_cached_user",
         staticmethod(get_user),
     )
     access_token = template_server.manager.create_access_token(data={"sub": user_id})
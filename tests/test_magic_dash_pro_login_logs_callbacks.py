@@ -0,0 +1,179 @@
+import importlib
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+# 以顶层包名导入的模板模块
+TEMPLATE_PACKAGES = ("models", "configs", "callbacks", "views", "components", "utils")
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块及应用实例，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "server" or module_name.split(".")[0] in TEMPLATE_PACKAGES:
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture
+def login_logs_callbacks(tmp_path, monkeypatch):
+    pytest.importorskip("peewee")
+    pytest.importorskip("dash")
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    models = importlib.import_module("models._peewee")
+    LoginLogs = importlib.import_module("models._peewee.logs").LoginLogs
+    models.create_tables([LoginLogs])
+
+    # 登录状态、用户名及登录时间均存在大量重复值，覆盖次级排序键id的分页边界
+    base_datetime = datetime(2024, 1, 1)
+    for index in range(23):
+        LoginLogs.add_log(
+            user_name=f"user-{index % 4}",
+            user_id=f"user-{index % 4}",
+            ip="127.0.0.1",
+            browser="Chrome",
+            os="Windows",
+            status="登录成功" if index % 2 else "密码错误",
+            login_datetime=base_datetime + timedelta(minutes=index // 2),
+        )
+
+    module = importlib.import_module("callbacks.core_pages_c.login_logs_c")
+
+    yield module, LoginLogs
+
+    if not models.db.is_closed():
+        models.db.close()
+    clear_template_modules()
+
+
+def load_login_logs_table(module, triggered_prop_id, *args):
+    """模拟由指定输入属性触发登录日志表数据加载回调"""
+
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    context_value.set(
+        AttributeDict(triggered_inputs=[{"prop_id": triggered_prop_id, "value": None}])
+    )
+    return module.handle_login_logs_table_data_load(None, *args)
+
+
+@pytest.mark.parametrize("order_by", ["id", "user_name", "status", "login_datetime"])
+@pytest.mark.parametrize("order", ["ascend", "descend"])
+def test_adjacent_page_turns_follow_offset_pages(login_logs_callbacks, order_by, order):
+    module, LoginLogs = login_logs_callbacks
+    page_size = 5
+    page_count = 5
+    sorter = {"columns": [order_by], "orders": [order]}
+
+    offset_pages = [
+        [
+            record["id"]
+            for record in LoginLogs.get_logs(
+                limit=page_size,
+                offset=page * page_size,
+                order_by=order_by,
+                order=order,
+            )
+        ]
+        for page in range(page_count)
+    ]
+
+    def load_page(current, page_cursor):
+        table_data, _, page_cursor = load_login_logs_table(
+            module,
+            "core-login-logs-table.pagination",
+            {"current": current, "pageSize": page_size},
+            sorter,
+            None,
+            None,
+            page_cursor,
+        )
+        return [row["id"] for row in table_data], page_cursor
+
+    # 逐页向后翻页，再逐页向前翻回首页，每一页均经由上一页生成的游标加载
+    page_cursor = None
+    for current in [*range(1, page_count + 1), *range(page_count - 1, 0, -1)]:
+        page_ids, page_cursor = load_page(current, page_cursor)
+        assert page_ids == offset_pages[current - 1]
+        assert not isinstance(page_cursor["first"]["value"], dict)
+
+
+def test_date_range_change_resets_page_and_counts_archives(
+    login_logs_callbacks, monkeypatch
+):
+    module, LoginLogs = login_logs_callbacks
+    page_size = 5
+    # 将登录时间早于00:05的10条登录日志归档至月度归档表
+    assert LoginLogs.purge_logs(datetime(2024, 1, 1, 0, 5), archive_mode="table") == 10
+
+    table_data, pagination, page_cursor = load_login_logs_table(
+        module,
+        "core-login-logs-table.pagination",
+        {"current": 2, "pageSize": page_size},
+        None,
+        None,
+        None,
+        None,
+    )
+    assert pagination == {"current": 2, "pageSize": page_size, "total": 13}
+    assert [row["id"] for row in table_data] == [18, 17, 16, 15, 14]
+
+    # 位于第2页时变更登录日期范围，回到首页并统计登录日志表及归档表中的记录总数
+    date_range = ["2024-01-01", "2024-01-01"]
+    table_data, pagination, page_cursor = load_login_logs_table(
+        module,
+        "core-login-logs-date-range.value",
+        pagination,
+        None,
+        None,
+        date_range,
+        page_cursor,
+    )
+    assert pagination == {"current": 1, "pageSize": page_size, "total": 23}
+    assert [row["id"] for row in table_data] == [23, 22, 21, 20, 19]
+
+    # 筛选条件未变化时翻页沿用已统计的记录总数
+    count_logs = LoginLogs.count_logs
+    count_calls = []
+
+    def counted_count_logs(**filters):
+        count_calls.append(filters)
+        return count_logs(**filters)
+
+    monkeypatch.setattr(LoginLogs, "count_logs", counted_count_logs)
+    table_data, pagination, page_cursor = load_login_logs_table(
+        module,
+        "core-login-logs-table.pagination",
+        {**pagination, "current": 5},
+        None,
+        None,
+        date_range,
+        page_cursor,
+    )
+    assert pagination["total"] == 23
+    assert [row["id"] for row in table_data] == [3, 2, 1]
+    assert count_calls == []
+
+    # 筛选条件变化时重新统计
+    table_data, pagination, _ = load_login_logs_table(
+        module,
+        "core-login-logs-table.filter",
+        {**pagination, "current": 1},
+        None,
+        {"status": ["登录成功"]},
+        date_range,
+        page_cursor,
+    )
+    assert pagination["total"] == 11
+    assert len(count_calls) == 1
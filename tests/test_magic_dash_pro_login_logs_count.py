@@ -0,0 +1,119 @@
+import importlib
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    logs = importlib.import_module(f"{engine_package}.logs")
+    models.create_tables([logs.LoginLogs])
+
+    # 统计重新获取计数基准值的次数
+    load_count_calls = [0]
+    load_count = logs.LoginLogs.load_count.__func__
+
+    def counting_load_count(cls, exact=False):
+        load_count_calls[0] += 1
+        return load_count(cls, exact)
+
+    monkeypatch.setattr(logs.LoginLogs, "load_count", classmethod(counting_load_count))
+
+    yield models, logs, load_count_calls
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def add_logs(LoginLogs, count):
+    for index in range(count):
+        LoginLogs.add_log(
+            user_name=f"user-{index}",
+            user_id=f"user-{index}",
+            ip="127.0.0.1",
+            browser="Chrome",
+            os="Windows",
+            status="登录成功",
+            login_datetime=datetime(2024, 1, 1),
+        )
+
+
+def test_get_count_is_maintained_incrementally_by_writes(template_models):
+    _, logs, load_count_calls = template_models
+    LoginLogs = logs.LoginLogs
+
+    add_logs(LoginLogs, 3)
+    assert LoginLogs.get_count() == 3
+    assert load_count_calls[0] == 1
+
+    add_logs(LoginLogs, 2)
+    LoginLogs.delete_logs([1, 2, 999])
+    assert LoginLogs.get_count() == 3
+
+    LoginLogs.truncate_logs()
+    assert LoginLogs.get_count() == 0
+    # 写操作之后的读取均未重新计数
+    assert load_count_calls[0] == 1
+
+    # 要求精确计数时重新获取基准值
+    add_logs(LoginLogs, 1)
+    assert LoginLogs.get_count(exact=True) == 1
+    assert load_count_calls[0] == 2
+
+
+def test_get_count_reconciles_after_interval(template_models, monkeypatch):
+    _, logs, load_count_calls = template_models
+    LoginLogs = logs.LoginLogs
+
+    monkeypatch.setattr(logs.login_logs_counter, "reconcile_interval_seconds", 0)
+    assert LoginLogs.get_count() == 0
+    # 模拟其他进程的写操作：绕过计数调整直接写入
+    monkeypatch.setattr(logs.login_logs_counter, "adjust", lambda delta: None)
+    add_logs(LoginLogs, 2)
+
+    assert LoginLogs.get_count() == 2
+    assert load_count_calls[0] == 2
+
+
+def test_load_count_prefers_planner_estimate_for_large_tables(
+    template_models, monkeypatch
+):
+    _, logs, _ = template_models
+    LoginLogs = logs.LoginLogs
+    add_logs(LoginLogs, 2)
+
+    monkeypatch.setattr(logs, "estimate_table_row_count", lambda table_name: 250000)
+    assert LoginLogs.load_count() == 250000
+    assert LoginLogs.load_count(exact=True) == 2
+
+    # 估算值低于阈值时改为精确计数
+    monkeypatch.setattr(logs, "estimate_table_row_count", lambda table_name: 10)
+    assert LoginLogs.load_count() == 2
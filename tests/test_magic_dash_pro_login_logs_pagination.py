@@ -0,0 +1,174 @@
+import importlib
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    LoginLogs = importlib.import_module(f"{engine_package}.logs").LoginLogs
+    models.create_tables([LoginLogs])
+
+    # 构造大量重复的排序字段值，覆盖次级排序键id的分页边界
+    base_datetime = datetime(2024, 1, 1)
+    for index in range(23):
+        LoginLogs.add_log(
+            user_name=f"user-{index % 4}",
+            user_id=f"user-{index % 4}",
+            ip="127.0.0.1",
+            browser="Chrome",
+            os="Windows",
+            status="登录成功" if index % 3 else "密码错误",
+            login_datetime=base_datetime + timedelta(minutes=index // 2),
+        )
+
+    yield models, LoginLogs
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def to_cursor(direction, record, order_by):
+    value = record[order_by]
+    if isinstance(value, datetime):
+        value = value.strftime("%Y-%m-%d %H:%M:%S")
+    return {"direction": direction, "value": value, "id": record["id"]}
+
+
+@pytest.mark.parametrize("order_by", ["id", "user_name", "status", "login_datetime"])
+@pytest.mark.parametrize("order", ["ascend", "descend"])
+def test_keyset_pages_match_offset_pages(template_models, order_by, order):
+    _, LoginLogs = template_models
+    page_size = 5
+    page_count = 5
+
+    offset_pages = [
+        [
+            record["id"]
+            for record in LoginLogs.get_logs(
+                limit=page_size,
+                offset=page * page_size,
+                order_by=order_by,
+                order=order,
+            )
+        ]
+        for page in range(page_count)
+    ]
+    # 首页同样受limit约束，不再返回全部记录
+    assert [len(page) for page in offset_pages] == [5, 5, 5, 5, 3]
+    assert len({id_ for page in offset_pages for id_ in page}) == 23
+
+    # 逐页向后翻页
+    page = LoginLogs.get_logs(limit=page_size, order_by=order_by, order=order)
+    keyset_pages = [[record["id"] for record in page]]
+    for _ in range(page_count - 1):
+        page = LoginLogs.get_logs(
+            limit=page_size,
+            order_by=order_by,
+            order=order,
+            cursor=to_cursor("next", page[-1], order_by),
+        )
+        keyset_pages.append([record["id"] for record in page])
+    assert keyset_pages == offset_pages
+
+    # 从末页逐页向前翻页
+    for page_index in range(page_count - 2, -1, -1):
+        page = LoginLogs.get_logs(
+            limit=page_size,
+            order_by=order_by,
+            order=order,
+            cursor=to_cursor("prev", page[0], order_by),
+        )
+        assert [record["id"] for record in page] == offset_pages[page_index]
+
+
+def test_keyset_pagination_keeps_user_name_filter(template_models):
+    _, LoginLogs = template_models
+
+    first_page = LoginLogs.get_logs(limit=3, user_name_keyword="user-1")
+    second_page = LoginLogs.get_logs(
+        limit=3,
+        user_name_keyword="user-1",
+        cursor=to_cursor("next", first_page[-1], "id"),
+    )
+
+    assert {record["user_name"] for record in first_page + second_page} == {"user-1"}
+    assert [record["id"] for record in first_page + second_page] == [
+        22,
+        18,
+        14,
+        10,
+        6,
+        2,
+    ]
+
+
+def test_ensure_model_indexes_adds_missing_composite_indexes(template_models):
+    models, LoginLogs = template_models
+
+    # 新建的数据表已包含全部复合索引
+    assert models.ensure_model_indexes(LoginLogs) == []
+
+    if hasattr(models, "connection_scope"):
+        with models.connection_scope():
+            models.db.execute_sql("DROP INDEX loginlogs_status_id")
+    else:
+        from sqlalchemy import text
+
+        with models.engine.begin() as connection:
+            connection.execute(text("DROP INDEX loginlogs_status_id"))
+
+    assert models.ensure_model_indexes(LoginLogs) == ["loginlogs表索引(status, id)"]
+    assert models.ensure_model_indexes(LoginLogs) == []
+
+
+@pytest.mark.parametrize("order_by", ["id", "login_datetime"])
+def test_iter_logs_walks_all_chunks_in_order(template_models, order_by):
+    _, LoginLogs = template_models
+
+    expected_ids = [
+        record["id"]
+        for record in LoginLogs.get_logs(
+            order_by=order_by, order="ascend", user_name_keyword="user-"
+        )
+    ]
+    iterated_ids = [
+        record["id"]
+        for record in LoginLogs.iter_logs(
+            order_by=order_by,
+            order="ascend",
+            user_name_keyword="user-",
+            chunk_size=4,
+        )
+    ]
+
+    assert len(expected_ids) == 23
+    assert iterated_ids == expected_ids
@@ -0,0 +1,169 @@
+import gzip
+import importlib
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_logs(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    logs = importlib.import_module(f"{engine_package}.logs")
+    models.create_tables([logs.LoginLogs])
+
+    # 1至3月每月各4条登录日志
+    for index in range(12):
+        logs.LoginLogs.add_log(
+            user_name=f"user-{index % 2}",
+            user_id=f"user-{index % 2}",
+            ip="127.0.0.1",
+            browser="Chrome",
+            os="Windows",
+            status="登录成功",
+            login_datetime=datetime(2024, 1 + index // 4, 10, 8, index),
+        )
+
+    yield logs
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def get_ids(records):
+    return [record["id"] for record in records]
+
+
+def test_purge_logs_archives_monthly_tables_in_batches(template_logs):
+    LoginLogs = template_logs.LoginLogs
+
+    purged_count = LoginLogs.purge_logs(
+        datetime(2024, 3, 1), batch_size=3, archive_mode="table"
+    )
+
+    assert purged_count == 8
+    assert LoginLogs.get_count() == 4
+    assert LoginLogs.get_archive_months() == ["202401", "202402"]
+    # 未指定日期范围时仅查询登录日志表
+    assert get_ids(LoginLogs.get_logs()) == [12, 11, 10, 9]
+
+    # 日期范围涉及已归档月份时，同时查询对应的归档表
+    all_months = ["2024-01-01", "2024-03-31"]
+    assert get_ids(LoginLogs.get_logs(login_datetime_range=all_months)) == list(
+        range(12, 0, -1)
+    )
+    assert get_ids(
+        LoginLogs.get_logs(login_datetime_range=["2024-02-01", "2024-02-29"])
+    ) == [8, 7, 6, 5]
+    assert get_ids(
+        LoginLogs.get_logs(
+            limit=3,
+            offset=3,
+            order_by="login_datetime",
+            order="ascend",
+            user_name_keyword="user-1",
+            login_datetime_range=all_months,
+        )
+    ) == [8, 10, 12]
+
+    # 按筛选条件统计记录数时同样涉及对应的归档表
+    assert LoginLogs.count_logs() == 4
+    assert LoginLogs.count_logs(login_datetime_range=all_months) == 12
+    assert (
+        LoginLogs.count_logs(user_name_keyword="user-1", login_datetime_range=all_months)
+        == 6
+    )
+
+    # 跨归档表查询时同样支持键集分页
+    first_page = LoginLogs.get_logs(limit=5, login_datetime_range=all_months)
+    second_page = LoginLogs.get_logs(
+        limit=5,
+        login_datetime_range=all_months,
+        cursor={"direction": "next", "value": None, "id": first_page[-1]["id"]},
+    )
+    assert get_ids(second_page) == [7, 6, 5, 4, 3]
+    iterated_logs = LoginLogs.iter_logs(login_datetime_range=all_months, chunk_size=5)
+    assert len(list(iterated_logs)) == 12
+
+
+def test_purge_logs_archives_to_compressed_files(template_logs, tmp_path):
+    LoginLogs = template_logs.LoginLogs
+
+    purged_count = LoginLogs.purge_logs(
+        datetime(2024, 2, 1),
+        batch_size=3,
+        archive_mode="file",
+        archive_dir=str(tmp_path / "archive"),
+    )
+
+    assert purged_count == 4
+    assert LoginLogs.get_archive_months() == []
+    # 分批追加写入的gzip成员可整体解压读取
+    with gzip.open(
+        tmp_path / "archive" / "loginlogs-202401.ndjson.gz", "rt", encoding="utf-8"
+    ) as f:
+        archived_records = [json.loads(line) for line in f]
+    assert [record["id"] for record in archived_records] == [1, 2, 3, 4]
+    assert archived_records[0]["login_datetime"] == "2024-01-10 08:00:00"
+
+
+def test_purge_expired_logs_follows_retention_config(template_logs, monkeypatch):
+    LoginLogs = template_logs.LoginLogs
+    LogConfig = template_logs.LogConfig
+
+    # 未设置保留天数时不做清理
+    monkeypatch.setattr(LogConfig, "login_logs_retention_days", 0)
+    assert LoginLogs.purge_expired_logs() == 0
+
+    retention_days = (datetime.now() - datetime(2024, 2, 1)).days
+    monkeypatch.setattr(LogConfig, "login_logs_retention_days", retention_days)
+    monkeypatch.setattr(LogConfig, "login_logs_archive_mode", "none")
+    assert LoginLogs.purge_expired_logs() == 4
+    assert LoginLogs.get_count(exact=True) == 8
+    assert LoginLogs.get_archive_months() == []
+
+
+def test_overlapping_archive_months_follow_date_range(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    log_archive = importlib.import_module("models.log_archive")
+
+    months = ["202312", "202401", "202402"]
+    start, end = log_archive.parse_login_datetime_range(["2024-01-31", "2024-02-01"])
+    assert end - start == timedelta(days=2)
+    assert log_archive.get_overlapping_archive_months(months, start, end) == [
+        "202401",
+        "202402",
+    ]
+    assert log_archive.get_overlapping_archive_months(
+        months, *log_archive.parse_login_datetime_range(["2024-02-01", "2024-02-29"])
+    ) == ["202402"]
+    assert log_archive.get_overlapping_archive_months(months, None, None) == []
+    clear_template_modules()
@@ -0,0 +1,135 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    logs = importlib.import_module(f"{engine_package}.logs")
+    models.create_tables([logs.LoginLogs])
+
+    for index, user_name in enumerate(["admin", "Alice", "bob_admin", "管理员甲"] * 3):
+        logs.LoginLogs.add_log(
+            user_name=user_name,
+            user_id=user_name,
+            ip=f"192.168.{index % 3}.{index}",
+            browser="Chrome",
+            os="Windows",
+            status="登录成功" if index % 2 == 0 else "密码错误",
+            login_datetime=f"2024-01-01 08:{index:02d}:00",
+        )
+
+    yield models, logs.LoginLogs
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def get_ids(records):
+    return [record["id"] for record in records]
+
+
+def test_user_name_keyword_search_uses_search_index(template_models):
+    models, LoginLogs = template_models
+    keywords = ["admin", "ad", "管理", "ALI", "none"]
+    expected = {
+        keyword: get_ids(LoginLogs.get_logs(user_name_keyword=keyword))
+        for keyword in keywords
+    }
+
+    assert models.ensure_search_indexes(LoginLogs) == [
+        "loginlogs表user_name字段检索索引"
+    ]
+    assert models.ensure_search_indexes(LoginLogs) == []
+    assert models.search_index_exists("loginlogs", "loginlogs_user_name_search")
+
+    # 建立检索索引前后关键词查询结果一致，且大小写匹配规则不变
+    for keyword in keywords:
+        records = LoginLogs.get_logs(user_name_keyword=keyword)
+        assert get_ids(records) == expected[keyword]
+    assert len(expected["admin"]) == 6
+    assert len(expected["ALI"]) == 3
+
+    # 检索索引随登录日志的写入、删除同步更新
+    LoginLogs.add_log(
+        user_name="new_admin",
+        user_id="new_admin",
+        ip="10.0.0.1",
+        browser="Chrome",
+        os="Windows",
+        status="登录成功",
+        login_datetime="2024-01-02 08:00:00",
+    )
+    LoginLogs.delete_logs([1])
+    records = LoginLogs.get_logs(user_name_keyword="admin")
+    assert get_ids(records) == [13, 11, 9, 7, 5, 3]
+
+    # 键集分页与检索索引条件可组合使用
+    first_page = LoginLogs.get_logs(limit=4, user_name_keyword="admin")
+    second_page = LoginLogs.get_logs(
+        limit=4,
+        user_name_keyword="admin",
+        cursor={"direction": "next", "value": None, "id": first_page[-1]["id"]},
+    )
+    assert get_ids(second_page) == [5, 3]
+
+
+def test_ip_prefix_and_status_filters(template_models):
+    _, LoginLogs = template_models
+
+    assert get_ids(LoginLogs.get_logs(ip_prefix="192.168.1.")) == [11, 8, 5, 2]
+    assert get_ids(LoginLogs.get_logs(ip_prefix="192.168.1.1")) == [11, 2]
+    records = LoginLogs.get_logs(ip_prefix="192.168.1.", status="登录成功")
+    assert get_ids(records) == [11, 5]
+    assert len(list(LoginLogs.iter_logs(status="密码错误", chunk_size=4))) == 6
+
+
+def test_search_index_statements_follow_database_type(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    search_index = importlib.import_module("models.search_index")
+
+    assert search_index.get_search_index_statements(
+        "postgresql", "loginlogs", "loginlogs_user_name_search", "user_name"
+    ) == [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS loginlogs_user_name_search "
+        "ON loginlogs USING gin (user_name gin_trgm_ops)",
+    ]
+    assert search_index.get_search_index_statements(
+        "mysql", "loginlogs", "loginlogs_user_name_search", "user_name"
+    ) == [
+        "CREATE FULLTEXT INDEX loginlogs_user_name_search "
+        "ON loginlogs (user_name) WITH PARSER ngram"
+    ]
+    assert search_index.build_mysql_boolean_phrase('a"b') == '"a b"'
+    assert search_index.get_prefix_upper_bound("10.0.") == "10.0/"
+    clear_template_modules()
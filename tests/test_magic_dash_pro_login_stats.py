@@ -0,0 +1,118 @@
+import importlib
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    logs = importlib.import_module(f"{engine_package}.logs")
+    login_stats = importlib.import_module(f"{engine_package}.login_stats")
+
+    yield logs.LoginLogs, login_stats.LoginStats
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def build_log(status, login_datetime, browser="Chrome 120.0.1", os="Windows 10"):
+    return {
+        "user_name": "admin",
+        "user_id": "admin",
+        "ip": "127.0.0.1",
+        "browser": browser,
+        "os": os,
+        "status": status,
+        "login_datetime": login_datetime,
+    }
+
+
+def test_login_stats_are_maintained_with_login_logs(template_models):
+    LoginLogs, LoginStats = template_models
+
+    LoginLogs.add_log(**build_log("登录成功", "2024-01-01 08:10:00"))
+    LoginLogs.add_logs(
+        [
+            build_log("登录成功", "2024-01-01 08:50:00"),
+            build_log("密码错误", "2024-01-01 10:00:00", browser="Firefox 121.0"),
+            build_log("OTP登录成功", "2024-01-02 09:00:00", os="Mac OS X 10.15.7"),
+        ]
+    )
+    # 批量写入中同一统计维度的记录合并累加
+    LoginLogs.add_logs([build_log("登录成功", "2024-01-01 08:30:00")])
+
+    date_range = ["2024-01-01", "2024-01-02"]
+    assert LoginStats.get_trend(date_range, "day") == [
+        {"bucket": "2024-01-01", "success": 3, "failure": 1},
+        {"bucket": "2024-01-02", "success": 1, "failure": 0},
+    ]
+    hourly_trend = LoginStats.get_trend(["2024-01-01", "2024-01-01"], "hour")
+    assert len(hourly_trend) == 24
+    assert hourly_trend[8] == {
+        "bucket": "2024-01-01 08:00",
+        "success": 3,
+        "failure": 0,
+    }
+    assert LoginStats.get_breakdown("browser_family", date_range) == [
+        {"name": "Chrome", "count": 4},
+        {"name": "Firefox", "count": 1},
+    ]
+    os_breakdown = LoginStats.get_breakdown("os_family", ["2024-01-02", "2024-01-02"])
+    assert os_breakdown == [{"name": "Mac OS X", "count": 1}]
+    with pytest.raises(ValueError):
+        LoginStats.get_breakdown("user_name", date_range)
+
+    # 基于登录日志全量重建的统计数据与增量维护结果一致
+    breakdown = LoginStats.get_breakdown("status", date_range)
+    assert LoginStats.rebuild_stats(LoginLogs.iter_logs(order="ascend")) == 3
+    assert LoginStats.get_breakdown("status", date_range) == breakdown
+    assert LoginStats.get_trend(date_range, "day")[0]["success"] == 3
+
+
+def test_trend_series_fills_empty_buckets(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    login_rollups = importlib.import_module("models.login_rollups")
+
+    assert login_rollups.get_agent_family("Mobile Safari 17.0") == "Mobile Safari"
+    assert login_rollups.get_agent_family("Other ") == "Other"
+    assert login_rollups.get_agent_family(None) == "Other"
+
+    rows = [(datetime(2024, 1, 3, 5), "登录成功", 2), (datetime(2024, 1, 1), "x", 1)]
+    assert login_rollups.build_trend_series(
+        rows, "day", datetime(2024, 1, 1), datetime(2024, 1, 4)
+    ) == [
+        {"bucket": "2024-01-01", "success": 0, "failure": 1},
+        {"bucket": "2024-01-02", "success": 0, "failure": 0},
+        {"bucket": "2024-01-03", "success": 2, "failure": 0},
+    ]
+    assert login_rollups.build_trend_series([], "hour") == []
+    clear_template_modules()
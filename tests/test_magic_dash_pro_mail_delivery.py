@@ -0,0 +1,182 @@
+import importlib
+import smtplib
+import socket
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离邮件服务配置。"""
+
+    for module_name in list(sys.modules):
+        if module_name in ("utils.email_utils", "utils.mail_delivery"):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture
+def email_utils(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    module = importlib.import_module("utils.email_utils")
+    email_config = importlib.import_module("configs").EmailConfig
+    email_config.smtp_server = "127.0.0.1"
+    email_config.smtp_port = 25
+    email_config.sender_email = "sender@example.com"
+    email_config.sender_password = "smtp-auth-code"
+    email_config.email_send_retry_backoff_seconds = 0
+
+    yield module, email_config
+
+    if module._mail_delivery_queue is not None:
+        module._mail_delivery_queue.close()
+    if module._smtp_pool is not None:
+        module._smtp_pool.close()
+    clear_template_modules()
+
+
+def test_smtp_pool_reuses_authenticated_connection(email_utils):
+    module, email_config = email_utils
+
+    with patch.object(module.smtplib, "SMTP") as smtp_class:
+        smtp_client = smtp_class.return_value
+        module.send_email_verification_code("first@example.com", "012345")
+        module.send_email_verification_code("second@example.com", "543210")
+
+        # 空闲超过健康检查间隔的连接先通过NOOP检查再复用
+        module.get_smtp_pool().health_check_interval_seconds = 0
+        smtp_client.noop.return_value = (250, b"OK")
+        module.send_email_verification_code("third@example.com", "012345")
+
+        smtp_client.noop.side_effect = smtplib.SMTPServerDisconnected()
+        module.send_email_verification_code("fourth@example.com", "012345")
+
+    assert smtp_class.call_count == 2
+    assert smtp_client.login.call_count == 2
+    assert [call.args[1] for call in smtp_client.sendmail.call_args_list] == [
+        "first@example.com",
+        "second@example.com",
+        "third@example.com",
+        "fourth@example.com",
+    ]
+
+
+def test_queue_retries_transient_errors_then_reports_failure(email_utils):
+    module, _ = email_utils
+    mail_delivery = importlib.import_module("utils.mail_delivery")
+    delivery_queue = mail_delivery.MailDeliveryQueue(
+        max_attempts=3, retry_backoff_seconds=0, synchronous=True
+    )
+    attempts = []
+    failures = []
+
+    def send_with_errors(errors):
+        def send():
+            attempts.append(errors[len(attempts)])
+            if attempts[-1]:
+                raise attempts[-1]
+
+        return send
+
+    delivery_queue.submit(
+        mail_delivery.MailJob(
+            send_with_errors([smtplib.SMTPServerDisconnected(), None]),
+            on_failure=failures.append,
+        )
+    )
+    assert len(attempts) == 2
+    assert not failures
+
+    attempts.clear()
+    transient_error = smtplib.SMTPResponseException(451, b"try again later")
+    delivery_queue.submit(
+        mail_delivery.MailJob(
+            send_with_errors([transient_error] * 3), on_failure=failures.append
+        )
+    )
+    assert len(attempts) == 3
+    assert failures == [transient_error]
+
+    # 认证失败等永久性错误不再重试
+    attempts.clear()
+    permanent_error = smtplib.SMTPAuthenticationError(535, b"auth failed")
+    delivery_queue.submit(
+        mail_delivery.MailJob(
+            send_with_errors([permanent_error]), on_failure=failures.append
+        )
+    )
+    assert len(attempts) == 1
+    assert failures == [transient_error, permanent_error]
+    assert (delivery_queue.sent_count, delivery_queue.failed_count) == (1, 2)
+
+
+def test_enqueue_rolls_back_after_final_failure(email_utils):
+    module, _ = email_utils
+    failures = []
+
+    with patch.object(module.smtplib, "SMTP") as smtp_class:
+        smtp_class.return_value.sendmail.side_effect = smtplib.SMTPServerDisconnected()
+        assert module.enqueue_email_verification_code(
+            "recipient@example.com", "012345", on_failure=failures.append
+        )
+        module.get_mail_delivery_queue().flush()
+
+    assert smtp_class.return_value.sendmail.call_count == 3
+    assert len(failures) == 1
+
+    with pytest.raises(ValueError, match="6位数字"):
+        module.enqueue_email_verification_code("recipient@example.com", "12345")
+
+
+def test_enqueue_delivers_through_local_smtp_server(email_utils):
+    pytest.importorskip("aiosmtpd")
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    module, email_config = email_utils
+    received_messages = []
+
+    class Handler:
+        async def handle_DATA(self, server, session, envelope):
+            received_messages.append(envelope)
+            return "250 OK"
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    controller = Controller(
+        Handler(),
+        hostname="127.0.0.1",
+        port=port,
+        authenticator=lambda *args: AuthResult(success=True),
+        auth_require_tls=False,
+    )
+    controller.start()
+    try:
+        email_config.smtp_port = port
+        for index in range(3):
+            assert module.enqueue_email_verification_code(
+                f"user{index}@example.com", "012345"
+            )
+        module.get_mail_delivery_queue().flush()
+    finally:
+        controller.stop()
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in received_messages) == [
+        "user0@example.com",
+        "user1@example.com",
+        "user2@example.com",
+    ]
+    # 两个后台发送线程最多各建立一个连接
+    assert module.get_smtp_pool().created_count <= email_config.email_send_workers
@@ -0,0 +1,312 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture
+def template_caches(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    yield importlib.import_module("models.caches")
+
+    clear_template_modules()
+
+
+def test_ttl_cache_expires_evicts_and_skips_stale_write_back(
+    template_caches,
+    monkeypatch,
+):
+    now = [100.0]
+    monkeypatch.setattr(template_caches.time, "monotonic", lambda: now[0])
+    cache = template_caches.TTLCache(max_size=2, ttl_seconds=10)
+
+    assert cache.get_or_load("a", lambda: "A") == "A"
+    assert cache.get_or_load("a", lambda: "changed") == "A"
+
+    # 超出容量时淘汰最久未使用的条目
+    cache.get_or_load("b", lambda: "B")
+    cache.get("a")
+    cache.get_or_load("c", lambda: "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+
+    # 超过有效期后重新加载
+    now[0] += 10
+    assert cache.get_or_load("a", lambda: "A2") == "A2"
+
+    # None结果不缓存
+    assert cache.get_or_load("missing", lambda: None) is None
+    assert cache.get("missing") is None
+
+    # 加载期间发生失效操作时，不写回加载结果
+    def load_then_invalidate():
+        cache.invalidate("d")
+        return "stale"
+
+    assert cache.get_or_load("d", load_then_invalidate) == "stale"
+    assert cache.get("d") is None
+
+    disabled_cache = template_caches.TTLCache(max_size=0, ttl_seconds=10)
+    assert disabled_cache.get_or_load("a", lambda: "A") == "A"
+    assert disabled_cache.get("a") is None
+
+
+@pytest.mark.parametrize("orm_engine", ["peewee", "sqlalchemy"])
+def test_cached_user_is_invalidated_by_user_writes(tmp_path, monkeypatch, orm_engine):
+    pytest.importorskip(orm_engine)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{orm_engine}"
+    models = importlib.import_module(engine_package)
+    Users = importlib.import_module(f"{engine_package}.users").Users
+    OtpCredentials = importlib.import_module(
+        f"{engine_package}.otp_credentials"
+    ).OtpCredentials
+    UserPermissionGroups = importlib.import_module(
+        f"{engine_package}.user_permission_groups"
+    ).UserPermissionGroups
+    user_cache = importlib.import_module("models.caches").user_cache
+    user_cache.clear()
+
+    if orm_engine == "peewee":
+        models.db.create_tables([Users, OtpCredentials, UserPermissionGroups])
+    else:
+        models.create_tables([Users, OtpCredentials, UserPermissionGroups])
+
+    try:
+        Users.add_user("user-1", "alice", "hash")
+        Users.update_user("user-1", session_token="token-1")
+
+        cached_user = Users.get_cached_user("user-1")
+        assert cached_user.user_name == "alice"
+        assert cached_user.session_token == "token-1"
+        assert user_cache.get("user-1") == cached_user
+
+        # 写操作提交后立即失效，下一次读取拿到最新会话token
+        Users.update_user("user-1", session_token="token-2")
+        assert user_cache.get("user-1") is None
+        assert Users.get_cached_user("user-1").session_token == "token-2"
+
+        Users.delete_user("user-1")
+        assert Users.get_cached_user("user-1") is None
+
+        Users.add_user("user-2", "bob", "hash")
+        assert Users.get_cached_user("user-2").user_name == "bob"
+        Users.truncate_users(execute=True)
+        assert Users.get_cached_user("user-2") is None
+    finally:
+        user_cache.clear()
+        if orm_engine == "peewee" and not models.db.is_closed():
+            models.db.close()
+        clear_template_modules()
+
+
+def test_versioned_snapshot_swaps_and_skips_stale_builds(template_caches):
+    snapshot = template_caches.VersionedSnapshot(ttl_seconds=60)
+    build_count = [0]
+
+    def build():
+        build_count[0] += 1
+        return build_count[0]
+
+    assert snapshot.get_or_build(build) == 1
+    assert snapshot.get_or_build(build) == 1
+
+    version = snapshot.version
+    snapshot.invalidate()
+    assert snapshot.version == version + 1
+    assert snapshot.get_or_build(build) == 2
+
+    # 构建期间发生失效操作时，不替换为可能已过期的快照
+    def build_then_invalidate():
+        snapshot.invalidate()
+        return "stale"
+
+    snapshot.invalidate()
+    assert snapshot.get_or_build(build_then_invalidate) == "stale"
+    assert snapshot.get_or_build(build) == 3
+
+
+@pytest.mark.parametrize("orm_engine", ["peewee", "sqlalchemy"])
+def test_effective_roles_snapshot_is_read_only_and_rebuilt_after_writes(
+    tmp_path,
+    monkeypatch,
+    orm_engine,
+):
+    pytest.importorskip(orm_engine)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{orm_engine}"
+    models = importlib.import_module(engine_package)
+    UserPermissionGroups = importlib.import_module(
+        f"{engine_package}.user_permission_groups"
+    ).UserPermissionGroups
+    invalidate_permission_group_caches = importlib.import_module(
+        "models.caches"
+    ).invalidate_permission_group_caches
+    invalidate_permission_group_caches()
+
+    if orm_engine == "peewee":
+        models.db.create_tables([UserPermissionGroups])
+    else:
+        models.create_tables([UserPermissionGroups])
+
+    try:
+        effective_roles = UserPermissionGroups.get_effective_roles()
+        assert "normal" in effective_roles
+        with pytest.raises(TypeError):
+            effective_roles["auditor"] = {}
+
+        # 稳态读取路径不访问数据库
+        def fail_query():
+            raise AssertionError("不应查询数据库")
+
+        with monkeypatch.context() as patch_context:
+            patch_context.setattr(
+                UserPermissionGroups,
+                "get_all_permission_groups",
+                classmethod(lambda cls: fail_query()),
+            )
+            assert UserPermissionGroups.get_effective_roles() is effective_roles
+            assert UserPermissionGroups.is_role_valid("normal")
+            assert not UserPermissionGroups.is_role_valid("auditor")
+
+        UserPermissionGroups.add_permission_group("auditor", "审计员")
+        assert UserPermissionGroups.is_role_valid("auditor")
+        assert UserPermissionGroups.get_role_description("auditor") == "审计员"
+
+        UserPermissionGroups.update_permission_group(
+            "auditor",
+            permission_group_name="审计人员",
+        )
+        assert UserPermissionGroups.get_role_description("auditor") == "审计人员"
+
+        UserPermissionGroups.delete_permission_group("auditor")
+        assert not UserPermissionGroups.is_role_valid("auditor")
+    finally:
+        invalidate_permission_group_caches()
+        if orm_engine == "peewee" and not models.db.is_closed():
+            models.db.close()
+        clear_template_modules()
+
+
+def test_cache_invalidation_bus_runs_handlers_when_versions_move(template_caches):
+    bus = template_caches.CacheInvalidationBus(check_interval_seconds=0)
+    cleared = []
+    bus.subscribe("users", lambda: cleared.append("users"))
+    bus.subscribe("departments", lambda: cleared.append("departments"))
+    versions = {"users": 0, "departments": 0}
+
+    # 首次检查时统一清理一次
+    bus.sync(lambda: dict(versions))
+    assert cleared == ["users", "departments"]
+
+    cleared.clear()
+    bus.sync(lambda: dict(versions))
+    assert cleared == []
+
+    versions["users"] += 1
+    bus.sync(lambda: dict(versions))
+    assert cleared == ["users"]
+
+    # 检查间隔内不重复读取版本号
+    throttled_bus = template_caches.CacheInvalidationBus(check_interval_seconds=60)
+    load_count = [0]
+
+    def load_versions():
+        load_count[0] += 1
+        return dict(versions)
+
+    throttled_bus.sync(load_versions)
+    throttled_bus.sync(load_versions)
+    assert load_count[0] == 1
+
+
+@pytest.mark.parametrize("orm_engine", ["peewee", "sqlalchemy"])
+def test_other_process_writes_invalidate_local_caches_via_cache_versions(
+    tmp_path,
+    monkeypatch,
+    orm_engine,
+):
+    pytest.importorskip(orm_engine)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{orm_engine}"
+    models = importlib.import_module(engine_package)
+    Users = importlib.import_module(f"{engine_package}.users").Users
+    UserPermissionGroups = importlib.import_module(
+        f"{engine_package}.user_permission_groups"
+    ).UserPermissionGroups
+    CacheVersions = importlib.import_module(
+        f"{engine_package}.cache_versions"
+    ).CacheVersions
+    caches = importlib.import_module("models.caches")
+    monkeypatch.setattr(
+        caches.cache_invalidation_bus,
+        "check_interval_seconds",
+        0,
+    )
+
+    if orm_engine == "peewee":
+        models.db.create_tables([Users, UserPermissionGroups])
+    else:
+        models.create_tables([Users, UserPermissionGroups])
+
+    try:
+        Users.add_user("user-1", "alice", "hash")
+        CacheVersions.sync_local_caches()
+        assert Users.get_cached_user("user-1").user_role == "normal"
+
+        # 模拟其他进程在同一事务中更新用户角色并递增缓存版本号
+        if orm_engine == "peewee":
+            with models.db.connection_context():
+                with models.db.atomic():
+                    Users.update(user_role="admin").where(
+                        Users.user_id == "user-1"
+                    ).execute()
+                    CacheVersions.bump_versions(["users"])
+        else:
+            from sqlalchemy import update
+
+            with models.session_scope() as session:
+                session.execute(
+                    update(Users)
+                    .where(Users.user_id == "user-1")
+                    .values(user_role="admin")
+                )
+                CacheVersions.bump_versions(session, ["users"])
+
+        assert Users.get_cached_user("user-1").user_role == "normal"
+
+        CacheVersions.sync_local_caches()
+        assert Users.get_cached_user("user-1").user_role == "admin"
+        assert CacheVersions.get_versions()["users"] >= 1
+    finally:
+        caches.user_cache.clear()
+        if orm_engine == "peewee" and not models.db.is_closed():
+            models.db.close()
+        clear_template_modules()
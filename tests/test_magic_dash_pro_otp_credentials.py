@@ -0,0 +1,136 @@
+import importlib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(
+    params=[
+        ("peewee", True),
+        ("peewee", False),
+        ("sqlalchemy", True),
+        ("sqlalchemy", False),
+    ],
+    ids=lambda param: f"{param[0]}-{'returning' if param[1] else 'fallback'}",
+)
+def credential_model(request, tmp_path, monkeypatch):
+    engine_name, returning = request.param
+    pytest.importorskip(engine_name)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    models = importlib.import_module(f"models._{engine_name}")
+    module = importlib.import_module(f"models._{engine_name}.otp_credentials")
+    # 模拟不支持RETURNING语法的数据库
+    monkeypatch.setattr(module, "supports_returning", lambda: returning)
+
+    statements = []
+    if engine_name == "peewee":
+        execute_sql = models.db.execute_sql
+
+        def counted_execute_sql(sql, *args, **kwargs):
+            statements.append(sql)
+            return execute_sql(sql, *args, **kwargs)
+
+        monkeypatch.setattr(models.db, "execute_sql", counted_execute_sql)
+    else:
+        from sqlalchemy import event
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(models.engine, "before_cursor_execute", count_statement)
+
+    def count_statements(operation):
+        """统计执行单次操作发送至数据库的全部语句数量，不含事务控制语句"""
+
+        statements.clear()
+        result = operation()
+        return result, sum(
+            statement.lstrip().split(" ", 1)[0].upper()
+            not in ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+            for statement in statements
+        )
+
+    yield module.OtpCredentials, count_statements, returning
+
+    if engine_name == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        event.remove(models.engine, "before_cursor_execute", count_statement)
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def test_otp_login_uses_single_statement_per_state_transition(credential_model):
+    model, count_statements, returning = credential_model
+
+    # 首次操作时确认并创建凭据表，之后不再执行表结构检查
+    model.enable_credential("user-1", "ciphertext")
+
+    credential, count = count_statements(lambda: model.get_credential("user-1"))
+    assert credential.secret_ciphertext == "ciphertext"
+    assert count == 1
+
+    assert count_statements(lambda: model.mark_used("user-1", 100)) == (1, 1)
+    # 同一时间窗口的口令只能生效一次
+    assert count_statements(lambda: model.mark_used("user-1", 100)) == (0, 1)
+
+    credential, count = count_statements(
+        lambda: model.record_failed_attempt("user-1", 2, 300)
+    )
+    assert credential.failed_attempts == 1
+    assert not model.is_locked(credential)
+    assert count == (1 if returning else 2)
+
+    credential = model.record_failed_attempt("user-1", 2, 300)
+    assert credential.failed_attempts == 2
+    assert model.is_locked(credential)
+    assert credential.last_used_timecode == 100
+
+    # 锁定期间即使口令正确也不能生效
+    assert model.mark_used("user-1", 101) == 0
+    assert model.reset_failed_attempts("user-1") == 1
+    assert model.mark_used("user-1", 101) == 1
+    assert model.get_credential("user-1").failed_attempts == 0
+
+    assert model.record_failed_attempt("missing", 2, 300) is None
+
+
+def test_concurrent_failed_attempts_are_counted_exactly(credential_model):
+    model, _, _ = credential_model
+    model.enable_credential("user-1", "ciphertext")
+    attempts = 16
+    start_barrier = threading.Barrier(4)
+
+    def record_failed_attempts(_):
+        start_barrier.wait()
+        for _ in range(attempts // 4):
+            model.record_failed_attempt("user-1", attempts, 300)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(record_failed_attempts, range(4)))
+
+    credential = model.get_credential("user-1")
+    assert credential.failed_attempts == attempts
+    assert model.is_locked(credential)
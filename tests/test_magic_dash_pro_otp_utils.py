@@ -0,0 +1,106 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离OTP配置及进程内缓存。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "utils.otp_utils":
+            sys.modules.pop(module_name)
+        elif module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture
+def otp_utils(monkeypatch):
+    pytest.importorskip("pyotp")
+    pytest.importorskip("cryptography")
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    yield importlib.import_module("utils.otp_utils")
+
+    clear_template_modules()
+
+
+def test_otp_primitives_validate_config_and_derive_key_once(otp_utils, monkeypatch):
+    otp_config = otp_utils.OtpConfig
+    validate_calls = []
+    validate_otp_config = otp_utils.validate_otp_config
+
+    def counted_validate_otp_config():
+        validate_calls.append(otp_config.otp_interval_seconds)
+        validate_otp_config()
+
+    monkeypatch.setattr(otp_utils, "validate_otp_config", counted_validate_otp_config)
+    monkeypatch.setattr(otp_config, "secret_crypto_key", "first-key")
+
+    secret = otp_utils.generate_otp_secret()
+    secret_ciphertext = otp_utils.encrypt_otp_secret(secret)
+    assert otp_utils.decrypt_otp_secret(secret_ciphertext) == secret
+    assert otp_utils._get_secret_crypto() is otp_utils._get_secret_crypto()
+
+    totp = otp_utils.get_totp(secret)
+    assert otp_utils.verify_totp_code(totp, totp.now())[0]
+    assert otp_utils.verify_otp_code(secret, totp.now())[0]
+    assert otp_utils.verify_totp_code(totp, "12345") == (False, None)
+    assert validate_calls == [30]
+
+    # 配置参数变化后重新校验，加密材料变化后重新派生密钥
+    monkeypatch.setattr(otp_config, "otp_interval_seconds", 0)
+    with pytest.raises(ValueError, match="刷新周期"):
+        otp_utils.get_current_timecode()
+    assert validate_calls == [30, 0]
+
+    first_crypto = otp_utils._get_secret_crypto()
+    monkeypatch.setattr(otp_config, "secret_crypto_key", "second-key")
+    assert otp_utils._get_secret_crypto() is not first_crypto
+
+
+@pytest.mark.parametrize("orm_engine", ["peewee", "sqlalchemy"])
+def test_credential_writes_invalidate_cached_totp(tmp_path, monkeypatch, orm_engine):
+    pytest.importorskip(orm_engine)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{orm_engine}"
+    models = importlib.import_module(engine_package)
+    OtpCredentials = importlib.import_module(
+        f"{engine_package}.otp_credentials"
+    ).OtpCredentials
+    otp_totp_cache = importlib.import_module("models.caches").otp_totp_cache
+
+    if orm_engine == "peewee":
+        models.db.create_tables([OtpCredentials])
+    else:
+        models.create_tables([OtpCredentials])
+
+    try:
+        OtpCredentials.enable_credential("user-1", "ciphertext-1")
+        otp_totp_cache.get_or_load("user-1", lambda: ("ciphertext-1", "totp-1"))
+
+        # 重新绑定与解绑均在写操作提交后失效该用户的缓存实例
+        credential = OtpCredentials.enable_credential("user-1", "ciphertext-2")
+        assert credential.secret_ciphertext == "ciphertext-2"
+        assert otp_totp_cache.get("user-1") is None
+
+        otp_totp_cache.get_or_load("user-1", lambda: ("ciphertext-2", "totp-2"))
+        assert OtpCredentials.disable_credential("user-1") == 1
+        assert otp_totp_cache.get("user-1") is None
+    finally:
+        otp_totp_cache.clear()
+        if orm_engine == "peewee" and not models.db.is_closed():
+            models.db.close()
+        clear_template_modules()
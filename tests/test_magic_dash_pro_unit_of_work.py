@@ -0,0 +1,180 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    Users = importlib.import_module(f"{engine_package}.users").Users
+    UserPermissionGroups = importlib.import_module(
+        f"{engine_package}.user_permission_groups"
+    ).UserPermissionGroups
+    models.create_tables([Users, UserPermissionGroups])
+
+    # 统计实际建立的数据库连接次数
+    connect_count = [0]
+    if request.param == "peewee":
+        models.db.close()
+        connect = models.db.connect
+
+        def counting_connect(*args, **kwargs):
+            connect_count[0] += 1
+            return connect(*args, **kwargs)
+
+        monkeypatch.setattr(models.db, "connect", counting_connect)
+    else:
+        from sqlalchemy import event
+
+        def count_checkout(*args):
+            connect_count[0] += 1
+
+        event.listen(models.engine, "checkout", count_checkout)
+
+    yield (
+        models,
+        Users,
+        importlib.import_module("models.unit_of_work"),
+        importlib.import_module("models.caches").user_cache,
+        connect_count,
+    )
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def test_unit_of_work_shares_one_connection_and_commits_once(template_models):
+    models, Users, unit_of_work, user_cache, connect_count = template_models
+
+    unit_of_work.begin_unit_of_work()
+    try:
+        # 工作单元惰性打开连接
+        assert connect_count[0] == 0
+
+        Users.add_user("user-1", "alice", "hash")
+        Users.update_user("user-1", session_token="token-1")
+        assert Users.get_user("user-1").session_token == "token-1"
+        assert Users.get_cached_user("user-1").session_token == "token-1"
+        assert connect_count[0] == 1
+    finally:
+        unit_of_work.end_unit_of_work(commit=True)
+
+    # 事务结束后统一执行缓存失效
+    assert user_cache.get("user-1") is None
+    assert Users.get_user("user-1").session_token == "token-1"
+
+
+def test_unit_of_work_rolls_back_all_writes_of_the_request(template_models):
+    models, Users, unit_of_work, user_cache, connect_count = template_models
+
+    Users.add_user("user-1", "alice", "hash")
+    assert Users.get_cached_user("user-1").session_token is None
+
+    unit_of_work.begin_unit_of_work()
+    try:
+        Users.update_user("user-1", session_token="token-1")
+        Users.add_user("user-2", "bob", "hash")
+        assert Users.get_user("user-2") is not None
+    finally:
+        unit_of_work.end_unit_of_work(commit=False)
+
+    assert Users.get_user("user-2") is None
+    assert Users.get_user("user-1").session_token is None
+    assert Users.get_cached_user("user-1").session_token is None
+
+
+def test_non_transactional_unit_of_work_commits_each_call(template_models):
+    models, Users, unit_of_work, user_cache, connect_count = template_models
+
+    unit_of_work.begin_unit_of_work(transactional=False)
+    try:
+        Users.add_user("user-1", "alice", "hash")
+    finally:
+        # 非事务型工作单元中各模型方法已逐次提交，结束时的回滚不影响已写入的数据
+        unit_of_work.end_unit_of_work(commit=False)
+
+    assert Users.get_user("user-1") is not None
+
+
+def test_unit_of_work_is_not_joined_from_other_threads(template_models):
+    models, Users, unit_of_work, user_cache, connect_count = template_models
+    from concurrent.futures import ThreadPoolExecutor
+    from contextvars import copy_context
+
+    unit_of_work.begin_unit_of_work()
+    try:
+        Users.add_user("user-1", "alice", "hash")
+
+        # 线程池中的调用即使继承了上下文，也保持逐次独立的连接与事务
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            context = copy_context()
+            assert (
+                executor.submit(
+                    context.run, unit_of_work.get_current_unit_of_work
+                ).result()
+                is None
+            )
+    finally:
+        unit_of_work.end_unit_of_work(commit=True)
+
+
+def test_concurrent_logins_with_request_unit_of_work(template_models):
+    models, Users, unit_of_work, user_cache, connect_count = template_models
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    CacheVersions = importlib.import_module(
+        f"{models.__name__}.cache_versions"
+    ).CacheVersions
+    users_count = 2
+    for index in range(users_count):
+        Users.add_user(f"user-{index}", f"user-{index}", "hash")
+    read_barrier = threading.Barrier(users_count)
+
+    def login(index):
+        # 与Web请求钩子一致：开启请求级工作单元后先同步缓存版本，再校验并轮换会话token
+        unit_of_work.begin_unit_of_work(
+            transactional=unit_of_work.supports_request_transaction()
+        )
+        try:
+            CacheVersions.get_versions()
+            login_user = Users.get_login_user(user_name=f"user-{index}")
+            read_barrier.wait()
+            return Users.rotate_session_token(
+                login_user["user_id"], f"token-{index}", login_user["password_hash"]
+            )
+        finally:
+            unit_of_work.end_unit_of_work(commit=True)
+
+    with ThreadPoolExecutor(max_workers=users_count) as executor:
+        assert list(executor.map(login, range(users_count))) == [True] * users_count
+
+    for index in range(users_count):
+        assert Users.get_user(f"user-{index}").session_token == f"token-{index}"
@@ -0,0 +1,274 @@
+import importlib
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from werkzeug.security import check_password_hash
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    users = importlib.import_module(f"{engine_package}.users")
+    departments = importlib.import_module(f"{engine_package}.departments")
+    models.create_tables([users.Users, departments.Departments])
+
+    departments.Departments.add_department("rd", "研发部")
+    users.Users.add_user("admin", "admin", "hash", user_email="admin@example.com")
+
+    yield users.Users
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+@pytest.fixture
+def import_utils(monkeypatch):
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    sys.modules.pop("utils.import_utils", None)
+
+    return importlib.import_module("utils.import_utils")
+
+
+def test_import_users_validates_all_rows_in_one_pass(template_models):
+    Users = template_models
+
+    records = [
+        {"user_id": "u1", "user_name": "user1", "password": "pw1"},
+        {"user_id": "admin", "user_name": "user2", "password": "pw2"},
+        {"user_id": "u3", "user_name": "admin", "password": "pw3"},
+        {
+            "user_id": "u4",
+            "user_name": "user4",
+            "password": "pw4",
+            "user_email": "admin@example.com",
+        },
+        {"user_id": "u5", "user_name": "user5", "password": "pw5", "user_role": "x"},
+        {
+            "user_id": "u6",
+            "user_name": "user6",
+            "password": "pw6",
+            "department_id": "missing",
+        },
+        {"user_id": "u7", "user_name": "user7", "password": None},
+        # 同一批次内重复的用户名仅首次出现的记录有效
+        {"user_id": "u8", "user_name": "user1", "password": "pw8"},
+        {
+            "user_id": "u9",
+            "user_name": "user9",
+            "password": "pw9",
+            "user_email": " user9@example.com ",
+            "department_id": "rd",
+            "user_role": "admin",
+        },
+    ]
+    hashed_passwords = []
+
+    def password_hasher(passwords):
+        hashed_passwords.extend(passwords)
+        return [f"hash:{password}" for password in passwords]
+
+    errors = Users.import_users(records, password_hasher=password_hasher, batch_size=1)
+
+    assert errors == {
+        1: "用户id已存在",
+        2: "用户名已存在",
+        3: "邮箱已被其他用户使用",
+        4: "用户角色不正确",
+        5: "所属部门不存在",
+        6: "用户信息不完整",
+        7: "用户名已存在",
+    }
+    # 仅为校验通过的记录计算密码散列值
+    assert hashed_passwords == ["pw1", "pw9"]
+    assert Users.get_user("u1").user_role == "normal"
+    assert Users.get_user("u1").password_hash == "hash:pw1"
+    assert Users.get_user("u9").user_email == "user9@example.com"
+    assert Users.get_user("u9").department_id == "rd"
+    assert Users.count_users() == 3
+
+
+def test_add_users_reports_rows_conflicting_at_insert(template_models):
+    Users = template_models
+
+    records = [
+        {"user_id": f"u{index}", "user_name": f"user{index}", "password_hash": "hash"}
+        for index in range(5)
+    ]
+    # 模拟校验后被并发写入的用户，所在批次逐条重试后仅该记录写入失败
+    records[3]["user_name"] = "admin"
+
+    assert Users.add_users(records, batch_size=2) == {
+        3: "用户id、用户名或邮箱已被其他用户使用"
+    }
+    assert Users.count_users() == 5
+
+
+def test_read_user_import_rows(import_utils):
+    content = (
+        "﻿User_Name,password,user_email,unknown\n"
+        "alice, secret ,alice@example.com,x\n"
+        ",,,\n"
+        "bob,secret\n"
+    ).encode("utf-8")
+
+    assert import_utils.read_user_import_rows("users.csv", content) == [
+        {
+            "row_number": 2,
+            "user_name": "alice",
+            "password": "secret",
+            "user_email": "alice@example.com",
+        },
+        {"row_number": 4, "user_name": "bob", "password": "secret", "user_email": None},
+    ]
+
+    with pytest.raises(ValueError, match="最多导入1个用户"):
+        import_utils.read_user_import_rows("users.csv", content, max_rows=1)
+    with pytest.raises(ValueError, match="password"):
+        import_utils.read_user_import_rows("users.csv", b"user_name\nalice\n")
+    with pytest.raises(ValueError, match="CSV或XLSX"):
+        import_utils.read_user_import_rows("users.txt", content)
+
+
+def test_hash_passwords_in_process_pool(import_utils, monkeypatch):
+    passwords = [f"password{index}" for index in range(6)]
+    start_methods = []
+    process_pool_executor = import_utils.ProcessPoolExecutor
+
+    def recording_process_pool_executor(*args, **kwargs):
+        start_methods.append(kwargs["mp_context"].get_start_method())
+        return process_pool_executor(*args, **kwargs)
+
+    monkeypatch.setattr(
+        import_utils, "ProcessPoolExecutor", recording_process_pool_executor
+    )
+
+    password_hashes = import_utils.hash_passwords(
+        passwords, max_workers=2, parallel_threshold=4
+    )
+
+    # 数量超过parallel_threshold时以spawn方式启动的进程池计算
+    assert start_methods == ["spawn"]
+    assert len(password_hashes) == len(passwords)
+    assert all(
+        check_password_hash(password_hash, password)
+        for password_hash, password in zip(password_hashes, passwords)
+    )
+
+
+def test_import_users_commits_batches_until_stopped(template_models):
+    Users = template_models
+
+    records = [
+        {"user_id": f"u{index}", "user_name": f"user{index}", "password": "pw"}
+        for index in range(5)
+    ]
+    records.insert(1, {"user_id": "u9", "user_name": "admin", "password": "pw"})
+    progress = []
+
+    def on_batch_imported(processed_count, valid_count, errors):
+        progress.append((processed_count, valid_count, dict(errors)))
+        # 第二个批次写入后停止导入
+        return len(progress) < 2
+
+    errors = Users.import_users(
+        records,
+        password_hasher=lambda passwords: ["hash"] * len(passwords),
+        batch_size=2,
+        on_batch_imported=on_batch_imported,
+    )
+
+    assert errors == {1: "用户名已存在"}
+    assert progress == [(2, 5, errors), (4, 5, errors)]
+    # 已写入的批次各自提交，停止后不再导入后续批次
+    assert [Users.get_user(f"u{index}") is not None for index in range(5)] == [
+        True,
+        True,
+        True,
+        True,
+        False,
+    ]
+
+
+def test_user_import_job_reports_progress_and_cancels(
+    template_models, import_utils, monkeypatch
+):
+    Users = template_models
+
+    records = [
+        {"user_id": f"u{index}", "user_name": f"user{index}", "password": "pw"}
+        for index in range(5)
+    ]
+    records.append({"user_id": "u5", "user_name": "admin", "password": "pw"})
+    job = import_utils.UserImportJob(
+        Users.import_users,
+        records,
+        rejected={0: "邮箱格式不正确"},
+        batch_size=2,
+        parallel_threshold=100,
+    )
+
+    def cancelling_generate_password_hash(password):
+        # 首个批次计算期间取消任务，当前批次写入完成后停止
+        job.cancel()
+        return f"hash:{password}"
+
+    monkeypatch.setattr(
+        import_utils, "generate_password_hash", cancelling_generate_password_hash
+    )
+    job.run()
+
+    assert job.snapshot() == {
+        "status": "cancelled",
+        "processed_count": 4,
+        "total_count": 6,
+        "imported_count": 2,
+        "errors": {0: "邮箱格式不正确", 5: "用户名已存在"},
+        "error_message": None,
+    }
+    assert Users.get_user("u0") is None
+    assert Users.get_user("u2").password_hash == "hash:pw"
+    assert Users.get_user("u3") is None
+
+    # 后台任务导入剩余用户
+    monkeypatch.setattr(import_utils, "generate_password_hash", lambda password: "h")
+    job = import_utils.start_user_import_job(
+        Users.import_users, records[3:5], batch_size=1
+    )
+    assert import_utils.get_user_import_job(job.job_id) is job
+    deadline = time.monotonic() + 10
+    while job.snapshot()["status"] == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    progress = job.snapshot()
+    assert progress["status"] == "finished"
+    assert (progress["processed_count"], progress["imported_count"]) == (2, 2)
+    import_utils.remove_user_import_job(job.job_id)
+    assert import_utils.get_user_import_job(job.job_id) is None
+    assert Users.count_users() == 5
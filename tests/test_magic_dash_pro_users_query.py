@@ -0,0 +1,240 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture(params=["peewee", "sqlalchemy"])
+def template_models(request, tmp_path, monkeypatch):
+    pytest.importorskip(request.param)
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    engine_package = f"models._{request.param}"
+    models = importlib.import_module(engine_package)
+    users = importlib.import_module(f"{engine_package}.users")
+    departments = importlib.import_module(f"{engine_package}.departments")
+    models.create_tables([users.Users, departments.Departments])
+
+    departments.Departments.add_department("rd", "研发部")
+    departments.Departments.add_department("market", "市场部")
+    for index in range(12):
+        users.Users.add_user(
+            f"id{index:02d}",
+            f"user{index:02d}" if index % 3 else f"member{index:02d}",
+            "hash",
+            user_email=f"user{index:02d}@example.com" if index % 2 else None,
+            department_id="rd" if index % 2 else "market",
+            user_role="admin" if index == 0 else "normal",
+        )
+
+    yield models, users.Users
+
+    if request.param == "peewee":
+        if not models.db.is_closed():
+            models.db.close()
+    else:
+        models.engine.dispose()
+    clear_template_modules()
+
+
+def test_get_users_pagination_sort_and_filters(template_models):
+    _, Users = template_models
+
+    assert Users.count_users() == 12
+    first_page = Users.get_users(limit=5, offset=0)
+    assert [item["user_name"] for item in first_page] == [
+        "member00",
+        "member03",
+        "member06",
+        "member09",
+        "user01",
+    ]
+    assert first_page[0]["department_name"] == "市场部"
+    assert [
+        item["user_name"]
+        for item in Users.get_users(limit=3, offset=0, order="descend")
+    ] == ["user11", "user10", "user08"]
+
+    assert Users.count_users(user_roles=["admin"]) == 1
+    assert Users.count_users(department_ids=["rd"]) == 6
+    assert [
+        item["user_id"]
+        for item in Users.get_users(
+            limit=10,
+            offset=0,
+            order_by="user_email",
+            department_ids=["rd"],
+            user_roles=["normal"],
+        )
+    ] == ["id01", "id03", "id05", "id07", "id09", "id11"]
+
+
+def test_user_keyword_search_with_or_without_search_indexes(template_models):
+    models, Users = template_models
+
+    def search():
+        return (
+            Users.count_users(user_name_keyword="member"),
+            Users.count_users(user_email_keyword="11@exa"),
+            [
+                item["user_id"]
+                for item in Users.get_users(
+                    limit=10,
+                    offset=0,
+                    user_name_keyword="user",
+                    department_ids=["market"],
+                )
+            ],
+        )
+
+    expected = (4, 1, ["id02", "id04", "id08", "id10"])
+    assert search() == expected
+
+    # 建立全文检索索引后，关键词检索结果保持一致
+    assert models.ensure_search_indexes(Users) == [
+        "users表user_name字段检索索引",
+        "users表user_email字段检索索引",
+    ]
+    assert models.search_index_exists("users", "users_user_name_search", refresh=True)
+    assert search() == expected
+
+    # 新增用户同步写入全文检索索引
+    Users.add_user("id99", "member99", "hash", department_id="market")
+    assert Users.count_users(user_name_keyword="member") == 5
+
+
+def search_user_ids(Users, **keywords):
+    return [
+        item["user_id"] for item in Users.get_users(limit=20, offset=0, **keywords)
+    ]
+
+
+def test_search_index_matches_user_ids_after_rowid_renumbering(template_models):
+    models, Users = template_models
+    search_index = importlib.import_module("models.search_index")
+    if not search_index.sqlite_supports_trigram():
+        pytest.skip("当前SQLite版本不支持trigram分词器")
+
+    models.ensure_search_indexes(Users)
+    # 模拟VACUUM重新编号用户表的内置rowid，检索索引以主键映射关联用户，结果不受影响
+    models.db.execute_sql("UPDATE users SET rowid = 100 - rowid")
+    assert search_user_ids(Users, user_name_keyword="member") == [
+        "id00",
+        "id03",
+        "id06",
+        "id09",
+    ]
+    assert search_user_ids(Users, user_email_keyword="r05@ex") == ["id05"]
+
+    # 修改、删除用户后检索索引同步更新
+    Users.update_user("id04", user_name="member04", user_email="member04@example.com")
+    Users.delete_user("id03")
+    assert search_user_ids(Users, user_name_keyword="member") == [
+        "id00",
+        "id04",
+        "id06",
+        "id09",
+    ]
+    assert search_user_ids(Users, user_email_keyword="member04@") == ["id04"]
+    assert search_user_ids(Users, user_email_keyword="user04@") == []
+
+
+def test_legacy_rowid_search_index_is_rebuilt_with_key_mapping(template_models):
+    models, Users = template_models
+    search_index = importlib.import_module("models.search_index")
+    if not search_index.sqlite_supports_trigram():
+        pytest.skip("当前SQLite版本不支持trigram分词器")
+
+    # 模拟此前版本以内置rowid关联用户表建立的检索索引
+    for sql in search_index.get_search_index_statements(
+        "sqlite", "users", "users_user_name_search", "user_name", "rowid"
+    ):
+        models.db.execute_sql(sql)
+    assert models.search_index_exists("users", "users_user_name_search", refresh=True)
+
+    # 重新编号用户表的内置rowid后，检索结果不得依赖缺少主键映射的旧版本检索索引
+    models.db.execute_sql("UPDATE users SET rowid = 100 - rowid")
+    expected = ["id00", "id03", "id06", "id09"]
+    assert search_user_ids(Users, user_name_keyword="member") == expected
+
+    assert models.ensure_search_indexes(Users) == [
+        "users表user_name字段检索索引",
+        "users表user_email字段检索索引",
+    ]
+    assert models.search_index_exists("users", "users_user_name_search_keys")
+    assert search_user_ids(Users, user_name_keyword="member") == expected
+    assert models.ensure_search_indexes(Users) == []
+
+
+def test_keyword_matches_user_name_or_email(template_models):
+    models, Users = template_models
+
+    def search(keyword, **filters):
+        return [
+            item["user_id"]
+            for item in Users.get_users(limit=10, offset=0, keyword=keyword, **filters)
+        ]
+
+    for _ in range(2):
+        # 用户名为member03、邮箱为user03@example.com的用户经由邮箱命中
+        assert search("user03") == ["id03"]
+        assert search("member0") == ["id00", "id03", "id06", "id09"]
+        assert search("member", department_ids=["rd"]) == ["id03", "id09"]
+        assert Users.count_users(keyword="example") == 6
+
+        # 建立全文检索索引后，关键词检索结果保持一致
+        models.ensure_search_indexes(Users)
+
+
+def test_department_member_changes(monkeypatch):
+    clear_template_modules()
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+    department_members = importlib.import_module("models.department_members")
+
+    # 由调整前后的完整成员列表计算差异，仍属于当前部门的用户不再重复更新
+    assert department_members.get_department_member_changes(
+        origin_user_ids=["id00", "id01", "id02"],
+        target_user_ids=["id01", "id03", "id03"],
+    ) == (["id03"], ["id00", "id02"])
+    # 直接传入的移入、移出差异去重，同时出现在两者中的用户以移入为准
+    assert department_members.get_department_member_changes(
+        added_user_ids=["id00", "id02", "id02"],
+        removed_user_ids=["id01", "id02", "id01"],
+    ) == (["id00", "id02"], ["id01"])
+    assert department_members.get_department_member_changes() == ([], [])
+    clear_template_modules()
+
+
+def test_alter_department_members_with_member_changes(template_models):
+    _, Users = template_models
+
+    # 移出的用户若已被调整至其他部门，则保持不变；同时移入、移出的用户以移入为准
+    Users.alter_department_members(
+        "rd",
+        added_user_ids=["id00", "id02", "id02"],
+        removed_user_ids=["id01", "id04", "id02"],
+    )
+
+    assert Users.get_user("id00").department_id == "rd"
+    assert Users.get_user("id01").department_id is None
+    assert Users.get_user("id02").department_id == "rd"
+    assert Users.get_user("id04").department_id == "market"
+    assert Users.count_users(department_ids=["rd"]) == 7
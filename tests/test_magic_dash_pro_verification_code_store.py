@@ -0,0 +1,171 @@
+import importlib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+
+TEMPLATE_ROOT = (
+    Path(__file__).resolve().parents[1] / "magic_dash" / "templates" / "magic-dash-pro"
+)
+
+
+def clear_template_modules():
+    """清理以顶层包名导入的模板模块，隔离临时数据库。"""
+
+    for module_name in list(sys.modules):
+        if module_name == "models" or module_name.startswith("models."):
+            sys.modules.pop(module_name)
+        elif module_name == "configs" or module_name.startswith("configs."):
+            sys.modules.pop(module_name)
+
+
+@pytest.fixture
+def store_module(tmp_path, monkeypatch):
+    pytest.importorskip("peewee")
+    clear_template_modules()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(TEMPLATE_ROOT))
+
+    module = importlib.import_module("models.verification_code_store")
+    email_verifications = importlib.import_module("models.email_verifications")
+    email_verifications.db.create_tables([email_verifications.EmailVerifications])
+
+    yield module
+
+    if module._sweeper is not None:
+        module._sweeper.stop()
+    if not email_verifications.db.is_closed():
+        email_verifications.db.close()
+    clear_template_modules()
+
+
+@pytest.fixture(params=["database", "memory", "sqlite"])
+def store(request, store_module, tmp_path):
+    return store_module.create_verification_code_store(
+        request.param, str(tmp_path / "verification_codes.db")
+    )
+
+
+def age_verification(store_module, store, verification, seconds: int):
+    """将验证码记录的生成时间提前指定秒数，返回调整后的记录"""
+
+    aged_verification = store_module.VerificationRecord(
+        verification.email,
+        verification.verification_code,
+        verification.generated_at - timedelta(seconds=seconds),
+    )
+    assert store.rollback_issued_verification(verification, aged_verification) == 1
+
+    return aged_verification
+
+
+def test_store_issue_verify_and_rollback(store_module, store):
+    email = "user@example.com"
+
+    verification, remaining_seconds, previous_verification = (
+        store.issue_verification(f" {email} ", 60)
+    )
+    assert verification.email == email
+    assert verification.verification_code.isdigit()
+    assert (remaining_seconds, previous_verification) == (0, None)
+
+    blocked_verification, remaining_seconds, _ = store.issue_verification(email, 60)
+    assert blocked_verification is None
+    assert 1 <= remaining_seconds <= 60
+
+    old_verification = age_verification(store_module, store, verification, 61)
+    verification, _, previous_verification = store.issue_verification(email, 60)
+    assert previous_verification.verification_code == (
+        old_verification.verification_code
+    )
+    assert previous_verification.generated_at == old_verification.generated_at
+
+    # 邮件发送失败时恢复旧验证码，已被替换的记录不会被过期的回滚覆盖
+    assert store.rollback_issued_verification(verification, previous_verification) == 1
+    assert store.rollback_issued_verification(verification, previous_verification) == 0
+    assert store.verify_code(email, "abcdef", 300) == "invalid"
+    assert store.verify_code(email, old_verification.verification_code, 300) == "valid"
+    assert store.verify_code(email, old_verification.verification_code, 300) == (
+        "not_found"
+    )
+
+    # 初次签发的邮件发送失败时直接删除记录
+    verification, _, _ = store.issue_verification(email, 60)
+    assert store.rollback_issued_verification(verification) == 1
+    assert store.verify_code(email, verification.verification_code, 300) == (
+        "not_found"
+    )
+
+
+def test_store_expires_and_sweeps_records(store_module, store):
+    expired_verification, _, _ = store.issue_verification("expired@example.com", 60)
+    age_verification(store_module, store, expired_verification, 301)
+    store.issue_verification("active@example.com", 60)
+    stale_verification, _, _ = store.issue_verification("stale@example.com", 60)
+    age_verification(store_module, store, stale_verification, 301)
+
+    assert store.verify_code(
+        "expired@example.com", expired_verification.verification_code, 300
+    ) == "expired"
+    assert store.delete_expired_verifications(300) == 1
+    assert store.verify_code("stale@example.com", "000000", 300) == "not_found"
+    assert store.verify_code("active@example.com", "000000", 300) == "invalid"
+
+
+def test_sqlite_store_issues_once_across_connections(store_module, tmp_path):
+    path = str(tmp_path / "verification_codes.db")
+    stores = [store_module.SQLiteVerificationCodeStore(path) for _ in range(4)]
+    start_barrier = threading.Barrier(len(stores))
+
+    def issue_verification(store):
+        start_barrier.wait()
+        return store.issue_verification("user@example.com", 60)
+
+    with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+        results = list(executor.map(issue_verification, stores))
+
+    issued_verifications = [result[0] for result in results if result[0]]
+    assert len(issued_verifications) == 1
+    assert stores[0].verify_code(
+        "user@example.com", issued_verifications[0].verification_code, 300
+    ) == "valid"
+    journal_mode = stores[0]._connect().execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == "wal"
+
+
+def test_configured_store_starts_expired_verification_sweeper(
+    store_module, monkeypatch
+):
+    email_config = store_module.EmailConfig
+    monkeypatch.setattr(email_config, "verification_code_store", "memory")
+    monkeypatch.setattr(email_config, "verification_code_sweep_interval_seconds", 0.05)
+
+    store = store_module.get_verification_code_store()
+    assert isinstance(store, store_module.MemoryVerificationCodeStore)
+    assert store_module.get_verification_code_store() is store
+
+    verification, _, _ = store.issue_verification("user@example.com", 60)
+    age_verification(store_module, store, verification, 301)
+    deadline = time.monotonic() + 5
+    while store_module._sweeper.swept_count < 1 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert store_module._sweeper.swept_count == 1
+    assert store.verify_code("user@example.com", "000000", 300) == "not_found"
+
+    with pytest.raises(ValueError, match="不支持的邮箱验证码存储方式"):
+        store_module.create_verification_code_store("redis")
+
+
+def test_incomplete_store_backend_cannot_be_instantiated(store_module):
+    class IncompleteVerificationCodeStore(store_module.VerificationCodeStore):
+        def issue_verification(self, email, resend_interval_seconds):
+            return None, 0, None
+
+    with pytest.raises(TypeError, match="verify_code"):
+        IncompleteVerificationCodeStore()